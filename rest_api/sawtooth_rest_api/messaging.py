@@ -391,3 +391,169 @@ class Connection:
         except zmq.ZMQError as e:
             # The monitor socket was probably closed
             LOGGER.warning('Error occurred while monitoring the socket: %s', e)
+
+
+# Requests which any validator on the network can answer. Everything else,
+# such as batch submission and status, goes to the validator the REST API
+# was configured to connect to.
+_READ_MESSAGE_TYPES = frozenset([
+    Message.CLIENT_BLOCK_LIST_REQUEST,
+    Message.CLIENT_BLOCK_GET_BY_ID_REQUEST,
+    Message.CLIENT_BATCH_LIST_REQUEST,
+    Message.CLIENT_BATCH_GET_REQUEST,
+    Message.CLIENT_TRANSACTION_LIST_REQUEST,
+    Message.CLIENT_TRANSACTION_GET_REQUEST,
+    Message.CLIENT_STATE_LIST_REQUEST,
+    Message.CLIENT_STATE_GET_REQUEST,
+    Message.CLIENT_RECEIPT_GET_REQUEST,
+])
+
+# Seconds to avoid a connection after a request over it fails
+FAILURE_BACKOFF = 5
+
+
+class _PooledConnection:
+    """A Connection in a ConnectionPool, with the number of requests awaiting
+    replies over it and whether it is healthy.
+    """
+
+    def __init__(self, connection, writable):
+        self.connection = connection
+        self.writable = writable
+        self.outstanding = 0
+        self._disconnected = False
+        self._failed_at = None
+
+        connection.on_connection_state_change(
+            ConnectionEvent.DISCONNECTED, self._handle_disconnect)
+        connection.on_connection_state_change(
+            ConnectionEvent.RECONNECTED, self._handle_reconnect)
+
+    def is_healthy(self, now):
+        if self._disconnected:
+            return False
+        return self._failed_at is None \
+            or now - self._failed_at > FAILURE_BACKOFF
+
+    def mark_failed(self, now):
+        self._failed_at = now
+
+    def mark_succeeded(self):
+        self._failed_at = None
+
+    async def _handle_disconnect(self):
+        self._disconnected = True
+
+    async def _handle_reconnect(self):
+        self._disconnected = False
+
+
+class ConnectionPool:
+    """A pool of Connections, over which validator Message objects may be
+    sent concurrently.
+
+    The pool holds a number of connections to the validator at `url`, and
+    optionally the same number to each of the validators at `read_urls`.
+    Requests which only read the chain or state may be sent to any of them,
+    while all other requests go to the validator at `url`. Each request is
+    sent over the healthy connection with the fewest replies outstanding. A
+    connection is unhealthy while disconnected, and for a few seconds after a
+    request over it fails. A read request which fails because its connection
+    was lost is retried over another connection.
+
+    Subscriptions to events must be made over the `primary` connection, from
+    which incoming messages are received.
+
+    Args:
+        url (str): The URL of the validator
+        size (int): The number of connections to each validator
+        read_urls (list of str, optional): The URLs of other validators to
+            send read requests to
+    """
+
+    def __init__(self, url, size=1, read_urls=None):
+        self._url = url
+        self._members = [
+            _PooledConnection(Connection(url), writable=True)
+            for _ in range(max(size, 1))]
+        for read_url in read_urls or []:
+            self._members.extend(
+                _PooledConnection(Connection(read_url), writable=False)
+                for _ in range(max(size, 1)))
+        self._next = 0
+
+    @property
+    def url(self):
+        return self._url
+
+    @property
+    def primary(self):
+        """The first Connection to the validator at `url`.
+        """
+        return self._members[0].connection
+
+    def open(self):
+        """Opens every connection in the pool.
+        """
+        for member in self._members:
+            member.connection.open()
+
+    def close(self):
+        """Closes every connection in the pool.
+        """
+        for member in self._members:
+            member.connection.close()
+
+    async def send(self, message_type, message_content, timeout=None):
+        """Sends a message over the least busy healthy connection which may
+        carry it, and returns the response.
+        """
+        is_read = message_type in _READ_MESSAGE_TYPES
+        tried = []
+        while True:
+            member = self._choose(is_read, tried)
+            member.outstanding += 1
+            try:
+                response = await member.connection.send(
+                    message_type, message_content, timeout=timeout)
+            except (DisconnectError, SendBackoffTimeoutError) as err:
+                member.mark_failed(_now())
+                tried.append(member)
+                if not is_read or self._choose(is_read, tried) is None:
+                    raise
+                LOGGER.debug(
+                    'Retrying request to %s over another connection: %s',
+                    member.connection.url, err)
+                continue
+            except asyncio.TimeoutError:
+                member.mark_failed(_now())
+                raise
+            finally:
+                member.outstanding -= 1
+
+            member.mark_succeeded()
+            return response
+
+    def _choose(self, is_read, tried=()):
+        """Returns the connection to send a request over, preferring healthy
+        connections, or None if every eligible connection has been tried.
+        """
+        candidates = [
+            member for member in self._members
+            if (is_read or member.writable) and member not in tried]
+        if not candidates:
+            return None
+
+        now = _now()
+        healthy = [m for m in candidates if m.is_healthy(now)]
+        if healthy:
+            candidates = healthy
+
+        # Rotate the candidates, so that ties are broken round-robin
+        self._next = (self._next + 1) % len(candidates)
+        candidates = candidates[self._next:] + candidates[:self._next]
+        return min(candidates, key=lambda member: member.outstanding)
+
+
+def _now():
+    return asyncio.get_event_loop().time()
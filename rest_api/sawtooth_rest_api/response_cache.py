@@ -0,0 +1,278 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import asyncio
+from collections import OrderedDict
+import logging
+
+from sawtooth_rest_api.messaging import Connection
+from sawtooth_rest_api.messaging import ConnectionEvent
+from sawtooth_rest_api.messaging import DisconnectError
+from sawtooth_rest_api.protobuf.validator_pb2 import Message
+from sawtooth_rest_api.protobuf import client_block_pb2
+from sawtooth_rest_api.protobuf import client_event_pb2
+from sawtooth_rest_api.protobuf import client_list_control_pb2
+from sawtooth_rest_api.protobuf import events_pb2
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30
+
+
+class ResponseCache:
+    """Caches the JSON bodies of REST API responses, up to a total size.
+
+    Responses which can never change, such as a block fetched by id, are
+    cached until evicted. Responses which depend on the current chain head,
+    such as a list of the latest blocks, are cached along with the head, and
+    dropped when a new head is set. While the head is unknown, these are not
+    cached at all. The least recently used responses are evicted once the
+    cache is full.
+
+    Args:
+        max_size (int): The maximum total size of the cached bodies, in
+            bytes. The JSON bodies are ASCII, so this is their length.
+        metrics_registry (MetricsRegistryWrapper, optional): Records hits,
+            misses, the hit ratio and the size of the cache
+    """
+
+    def __init__(self, max_size, metrics_registry=None):
+        self._max_size = max_size
+        self._head_id = None
+        # (head_id, body) by request key, in order of last use. The head id
+        # is None for responses which do not depend on the chain head.
+        self._entries = OrderedDict()
+        self._head_keys = set()
+        self._size = 0
+        self._hit_count = 0
+        self._miss_count = 0
+
+        if metrics_registry:
+            self._hits = metrics_registry.counter('response_cache_hits')
+            self._misses = metrics_registry.counter('response_cache_misses')
+            self._hit_ratio = metrics_registry.gauge(
+                'response_cache_hit_ratio')
+            self._size_gauge = metrics_registry.gauge('response_cache_size')
+        else:
+            self._hits = None
+            self._misses = None
+            self._hit_ratio = None
+            self._size_gauge = None
+
+    @property
+    def head_id(self):
+        """The id of the chain head, or None if it is unknown.
+        """
+        return self._head_id
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def hit_ratio(self):
+        """The fraction of lookups which were hits, or None if there have
+        been no lookups.
+        """
+        lookups = self._hit_count + self._miss_count
+        if not lookups:
+            return None
+        return self._hit_count / lookups
+
+    def set_head(self, head_id):
+        """Sets the current chain head, dropping the responses cached for
+        the previous head.
+
+        Args:
+            head_id (str): The id of the new chain head, or None if the head
+                is unknown
+        """
+        if head_id == self._head_id:
+            return
+
+        self._head_id = head_id
+        for key in self._head_keys:
+            _, body = self._entries.pop(key)
+            self._size -= len(body)
+        self._head_keys.clear()
+        self._update_size_gauge()
+
+    def get(self, key, head_scoped):
+        """Returns a cached response body, or None.
+
+        Args:
+            key (tuple): The normalized request
+            head_scoped (bool): Whether the response depends on the chain
+                head
+        """
+        entry = self._entries.get(key)
+        if entry is None or (head_scoped and entry[0] != self._head_id):
+            self._miss_count += 1
+            if self._misses is not None:
+                self._misses.inc()
+            self._update_hit_ratio_gauge()
+            return None
+
+        self._entries.move_to_end(key)
+        self._hit_count += 1
+        if self._hits is not None:
+            self._hits.inc()
+        self._update_hit_ratio_gauge()
+        return entry[1]
+
+    def put(self, key, body, head_id=None):
+        """Caches a response body.
+
+        Args:
+            key (tuple): The normalized request
+            body (str): The response body
+            head_id (str, optional): The chain head the response was built
+                for, if it depends on the chain head. The response is not
+                cached if the head has changed since.
+        """
+        if head_id is not None and head_id != self._head_id:
+            return
+        if len(body) > self._max_size:
+            return
+
+        self._remove(key)
+        self._entries[key] = (head_id, body)
+        self._size += len(body)
+        if head_id is not None:
+            self._head_keys.add(key)
+
+        while self._size > self._max_size:
+            self._remove(next(iter(self._entries)))
+        self._update_size_gauge()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+            self._head_keys.discard(key)
+
+    def _update_hit_ratio_gauge(self):
+        if self._hit_ratio is not None:
+            self._hit_ratio.set_value(self.hit_ratio)
+
+    def _update_size_gauge(self):
+        if self._size_gauge is not None:
+            self._size_gauge.set_value(self._size)
+
+
+class ChainHeadListener:
+    """Keeps a ResponseCache's chain head current, by subscribing to block
+    commit events from the validator.
+
+    The subscription is made over a connection of its own, so that it does
+    not take the place of the state delta subscription, and is renewed if
+    the validator reconnects. While the validator is disconnected, the head
+    is unknown.
+
+    Args:
+        url (str): The URL of the validator
+        response_cache (ResponseCache): The cache to update
+    """
+
+    def __init__(self, url, response_cache):
+        self._connection = Connection(url)
+        self._response_cache = response_cache
+        self._listen_task = None
+
+        self._connection.on_connection_state_change(
+            ConnectionEvent.DISCONNECTED,
+            self._handle_disconnect)
+        self._connection.on_connection_state_change(
+            ConnectionEvent.RECONNECTED,
+            self._subscribe)
+
+    def start(self):
+        self._connection.open()
+        asyncio.ensure_future(self._subscribe())
+
+    def stop(self):
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
+        self._connection.close()
+
+    async def _handle_disconnect(self):
+        self._response_cache.set_head(None)
+
+    async def _subscribe(self):
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
+
+        try:
+            head_id = await self._get_head_id()
+
+            response = await self._connection.send(
+                Message.CLIENT_EVENTS_SUBSCRIBE_REQUEST,
+                client_event_pb2.ClientEventsSubscribeRequest(
+                    subscriptions=[events_pb2.EventSubscription(
+                        event_type='sawtooth/block-commit')],
+                    last_known_block_ids=[head_id] if head_id else [],
+                ).SerializeToString(),
+                timeout=DEFAULT_TIMEOUT)
+        except (asyncio.TimeoutError, DisconnectError) as err:
+            LOGGER.warning(
+                'Unable to subscribe to block commits, responses which '
+                'depend on the chain head will not be cached: %s', err)
+            return
+
+        subscription = client_event_pb2.ClientEventsSubscribeResponse()
+        subscription.ParseFromString(response.content)
+        if subscription.status != \
+                client_event_pb2.ClientEventsSubscribeResponse.OK:
+            LOGGER.warning(
+                'Unable to subscribe to block commits, responses which '
+                'depend on the chain head will not be cached')
+            return
+
+        self._response_cache.set_head(head_id or None)
+        self._listen_task = asyncio.ensure_future(self._listen())
+
+    async def _get_head_id(self):
+        response = await self._connection.send(
+            Message.CLIENT_BLOCK_LIST_REQUEST,
+            client_block_pb2.ClientBlockListRequest(
+                paging=client_list_control_pb2.ClientPagingControls(limit=1)
+            ).SerializeToString(),
+            timeout=DEFAULT_TIMEOUT)
+
+        block_list = client_block_pb2.ClientBlockListResponse()
+        block_list.ParseFromString(response.content)
+        return block_list.head_id
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self._connection.receive()
+            except asyncio.CancelledError:
+                return
+
+            if message.message_type != Message.CLIENT_EVENTS:
+                continue
+
+            event_list = events_pb2.EventList()
+            event_list.ParseFromString(message.content)
+            for event in event_list.events:
+                if event.event_type != 'sawtooth/block-commit':
+                    continue
+                for attribute in event.attributes:
+                    if attribute.key == 'block_id':
+                        self._response_cache.set_head(attribute.value)
@@ -15,6 +15,8 @@
 
 import os
 import sys
+import signal
+import socket
 import logging
 import asyncio
 import argparse
@@ -32,7 +34,9 @@ from sawtooth_sdk.processor.log import log_configuration
 from sawtooth_sdk.processor.config import get_log_config
 from sawtooth_sdk.processor.config import get_log_dir
 from sawtooth_sdk.processor.config import get_config_dir
-from sawtooth_rest_api.messaging import Connection
+from sawtooth_rest_api.messaging import ConnectionPool
+from sawtooth_rest_api.response_cache import ChainHeadListener
+from sawtooth_rest_api.response_cache import ResponseCache
 from sawtooth_rest_api.route_handlers import RouteHandler
 from sawtooth_rest_api.state_delta_subscription_handler \
     import StateDeltaSubscriberHandler
@@ -59,12 +63,28 @@ def parse_args(args):
                         action='append')
     parser.add_argument('-C', '--connect',
                         help='specify URL to connect to a running validator')
+    parser.add_argument('--read-connect',
+                        help='specify URL of another validator to send \
+                        read requests to',
+                        action='append')
+    parser.add_argument('--connections',
+                        type=int,
+                        help='the number of connections to open to each \
+                        validator')
     parser.add_argument('-t', '--timeout',
                         help='set time (in seconds) to wait for validator \
                         response')
+    parser.add_argument('--workers',
+                        type=int,
+                        help='the number of REST API processes to run on \
+                        the same port')
     parser.add_argument('--client-max-size',
                         type=int,
                         help='the max size (in bytes) of a request body')
+    parser.add_argument('--response-cache-size',
+                        type=int,
+                        help='the size (in bytes) of the cache of GET \
+                        responses, 0 to disable it')
     parser.add_argument('-v', '--verbose',
                         action='count',
                         default=0,
@@ -91,8 +111,13 @@ def parse_args(args):
 
 
 def start_rest_api(host, port, connection, timeout, registry,
-                   client_max_size=None):
+                   client_max_size=None, response_cache_size=None,
+                   sock=None):
     """Builds the web app, adds route handlers, and finally starts the app.
+
+    Requests are sent over the connections of the ConnectionPool, while the
+    state delta subscriptions are made over its primary connection. If a
+    socket is given, the app serves it instead of binding host and port.
     """
     loop = asyncio.get_event_loop()
     connection.open()
@@ -102,7 +127,15 @@ def start_rest_api(host, port, connection, timeout, registry,
     # Add routes to the web app
     LOGGER.info('Creating handlers for validator at %s', connection.url)
 
-    handler = RouteHandler(loop, connection, timeout, registry)
+    response_cache = None
+    if response_cache_size:
+        response_cache = ResponseCache(response_cache_size, registry)
+        head_listener = ChainHeadListener(connection.url, response_cache)
+        head_listener.start()
+        app.on_cleanup.append(lambda app: head_listener.stop())
+
+    handler = RouteHandler(
+        loop, connection, timeout, registry, response_cache=response_cache)
 
     app.router.add_post('/batches', handler.submit_batches)
     app.router.add_get('/batch_statuses', handler.list_statuses)
@@ -128,19 +161,29 @@ def start_rest_api(host, port, connection, timeout, registry,
     app.router.add_get('/peers', handler.fetch_peers)
     app.router.add_get('/status', handler.fetch_status)
 
-    subscriber_handler = StateDeltaSubscriberHandler(connection)
+    subscriber_handler = StateDeltaSubscriberHandler(connection.primary)
     app.router.add_get('/subscriptions', subscriber_handler.subscriptions)
     app.on_shutdown.append(lambda app: subscriber_handler.on_shutdown())
 
     # Start app
     LOGGER.info('Starting REST API on %s:%s', host, port)
 
+    if sock is not None:
+        address = {'sock': sock}
+    else:
+        address = {'host': host, 'port': port}
+
     web.run_app(
         app,
-        host=host,
-        port=port,
         access_log=LOGGER,
-        access_log_format='%r: %s status, %b size, in %Tf s')
+        access_log_format='%r: %s status, %b size, in %Tf s',
+        **address)
+
+
+def _tcp_url(url):
+    if "tcp://" not in url:
+        return "tcp://" + url
+    return url
 
 
 def load_rest_api_config(first_config):
@@ -154,44 +197,185 @@ def load_rest_api_config(first_config):
 
 
 class MetricsRegistryWrapper():
-    def __init__(self, registry):
+    def __init__(self, registry, worker=None):
         self._registry = registry
+        # Each worker process reports its own metrics, tagged so that they
+        # can be summed across workers
+        self._tags = ''.join([',host=', platform.node()])
+        if worker is not None:
+            self._tags = ''.join([self._tags, ',worker=', str(worker)])
 
     def gauge(self, name):
-        return self._registry.gauge(
-            ''.join([name, ',host=', platform.node()]))
+        return self._registry.gauge(''.join([name, self._tags]))
 
     def counter(self, name):
-        return self._registry.counter(
-            ''.join([name, ',host=', platform.node()]))
+        return self._registry.counter(''.join([name, self._tags]))
 
     def timer(self, name):
-        return self._registry.timer(
-            ''.join([name, ',host=', platform.node()]))
+        return self._registry.timer(''.join([name, self._tags]))
 
 
-def main():
+def _bind_reuse_port(host, port):
+    """Returns a socket bound to host and port with SO_REUSEPORT, so that
+    the kernel spreads the connections to the port across every worker
+    process which binds it.
+    """
+    family, socktype, proto, _, address = socket.getaddrinfo(
+        host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE)[0]
+    sock = socket.socket(family, socktype, proto)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(address)
+    return sock
+
+
+def run_worker(host, port, rest_api_config, worker=None):
+    """Connects to the validator and runs the REST API until it is stopped.
+
+    Args:
+        host (str): The host to serve on
+        port (int): The port to serve on
+        rest_api_config (RestApiConfig): The merged configuration
+        worker (int, optional): The index of this worker process, if the
+            REST API runs several on the same port
+    """
     loop = ZMQEventLoop()
     asyncio.set_event_loop(loop)
 
-    connection = None
+    url = _tcp_url(rest_api_config.connect)
+    read_urls = [
+        _tcp_url(read_url)
+        for read_url in rest_api_config.read_connect or []]
+
+    connection = ConnectionPool(
+        url, size=rest_api_config.connections, read_urls=read_urls)
+    try:
+        wrapped_registry = None
+        if rest_api_config.opentsdb_url:
+            LOGGER.info("Adding metrics reporter: url=%s, db=%s",
+                        rest_api_config.opentsdb_url,
+                        rest_api_config.opentsdb_db)
+
+            url = urlparse(rest_api_config.opentsdb_url)
+            proto, db_server, db_port, = url.scheme, url.hostname, url.port
+
+            registry = MetricsRegistry()
+            wrapped_registry = MetricsRegistryWrapper(registry, worker)
+
+            reporter = InfluxReporter(
+                registry=registry,
+                reporting_interval=10,
+                database=rest_api_config.opentsdb_db,
+                prefix="sawtooth_rest_api",
+                port=db_port,
+                protocol=proto,
+                server=db_server,
+                username=rest_api_config.opentsdb_username,
+                password=rest_api_config.opentsdb_password)
+            reporter.start()
+
+        sock = None
+        if worker is not None:
+            sock = _bind_reuse_port(host, port)
+
+        start_rest_api(
+            host,
+            port,
+            connection,
+            int(rest_api_config.timeout),
+            wrapped_registry,
+            client_max_size=rest_api_config.client_max_size,
+            response_cache_size=rest_api_config.response_cache_size,
+            sock=sock)
+    finally:
+        connection.close()
+
+
+def _run_forked_worker(host, port, rest_api_config, worker):
+    """Runs a worker in a forked process, and exits the process when it
+    stops, so that the worker never returns into the parent's code.
+    """
+    status = 0
+    try:
+        run_worker(host, port, rest_api_config, worker=worker)
+        # pylint: disable=broad-except
+    except Exception as e:
+        LOGGER.exception(e)
+        status = 1
+    finally:
+        os._exit(status)  # pylint: disable=protected-access
+
+
+def _fork_worker(host, port, rest_api_config, worker):
+    """Forks a worker process and returns its pid.
+    """
+    pid = os.fork()
+    if pid == 0:
+        _run_forked_worker(host, port, rest_api_config, worker)
+    return pid
+
+
+def run_workers(host, port, rest_api_config, workers):
+    """Forks the given number of worker processes, which serve the REST API
+    on the same port, and waits for them to exit.
+
+    The workers are stopped when this process receives SIGINT or SIGTERM.
+    If a worker exits on its own, the rest are stopped too, so that the
+    process is restarted as a whole.
+
+    Returns:
+        int: The exit status for this process
+    """
+    pids = set()
+    for worker in range(workers):
+        pids.add(_fork_worker(host, port, rest_api_config, worker))
+    LOGGER.info('Started %s REST API workers on %s:%s', workers, host, port)
+
+    stopping = False
+
+    def stop(signum=None, frame=None):
+        nonlocal stopping
+        stopping = True
+        for pid in list(pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    exit_status = 0
+    while pids:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        pids.discard(pid)
+        if not stopping:
+            LOGGER.error(
+                'REST API worker %s exited, stopping the other workers', pid)
+            exit_status = 1
+            stop()
+
+    return exit_status
+
+
+def main():
     try:
         opts = parse_args(sys.argv[1:])
         opts_config = RestApiConfig(
             bind=opts.bind,
             connect=opts.connect,
+            read_connect=opts.read_connect,
+            connections=opts.connections,
             timeout=opts.timeout,
             opentsdb_url=opts.opentsdb_url,
             opentsdb_db=opts.opentsdb_db,
-            client_max_size=opts.client_max_size)
+            client_max_size=opts.client_max_size,
+            response_cache_size=opts.response_cache_size,
+            workers=opts.workers)
         rest_api_config = load_rest_api_config(opts_config)
-        url = None
-        if "tcp://" not in rest_api_config.connect:
-            url = "tcp://" + rest_api_config.connect
-        else:
-            url = rest_api_config.connect
-
-        connection = Connection(url)
 
         log_config = get_log_config(filename="rest_api_log_config.toml")
 
@@ -214,41 +398,17 @@ def main():
                   " host:port".format(rest_api_config.bind[0]))
             sys.exit(1)
 
-        wrapped_registry = None
-        if rest_api_config.opentsdb_url:
-            LOGGER.info("Adding metrics reporter: url=%s, db=%s",
-                        rest_api_config.opentsdb_url,
-                        rest_api_config.opentsdb_db)
-
-            url = urlparse(rest_api_config.opentsdb_url)
-            proto, db_server, db_port, = url.scheme, url.hostname, url.port
-
-            registry = MetricsRegistry()
-            wrapped_registry = MetricsRegistryWrapper(registry)
-
-            reporter = InfluxReporter(
-                registry=registry,
-                reporting_interval=10,
-                database=rest_api_config.opentsdb_db,
-                prefix="sawtooth_rest_api",
-                port=db_port,
-                protocol=proto,
-                server=db_server,
-                username=rest_api_config.opentsdb_username,
-                password=rest_api_config.opentsdb_password)
-            reporter.start()
+        workers = rest_api_config.workers or 1
+        if workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+            print("Unable to run {} workers: SO_REUSEPORT is not supported "
+                  "on this platform".format(workers))
+            sys.exit(1)
 
-        start_rest_api(
-            host,
-            port,
-            connection,
-            int(rest_api_config.timeout),
-            wrapped_registry,
-            client_max_size=rest_api_config.client_max_size)
+        if workers > 1:
+            sys.exit(run_workers(host, port, rest_api_config, workers))
+        else:
+            run_worker(host, port, rest_api_config)
         # pylint: disable=broad-except
     except Exception as e:
         LOGGER.exception(e)
         sys.exit(1)
-    finally:
-        if connection is not None:
-            connection.close()
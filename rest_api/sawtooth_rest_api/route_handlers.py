@@ -14,6 +14,7 @@
 # ------------------------------------------------------------------------------
 
 import asyncio
+import functools
 import re
 import logging
 import json
@@ -82,6 +83,55 @@ class TimerWrapper():
         return self._noop
 
 
+def _cached_response(head_scoped):
+    """Decorates a GET handler of RouteHandler so that its successful
+    responses are kept in the handler's ResponseCache, if it has one.
+
+    A response which depends on the chain head is cached under the head
+    named in its body.
+
+    Args:
+        head_scoped (bool): Whether the response depends on the chain head.
+            A request which names its head with the `head` query parameter
+            never does.
+    """
+    def decorator(route):
+        @functools.wraps(route)
+        async def wrapper(self, request):
+            cache = self.response_cache
+            if cache is None:
+                return await route(self, request)
+
+            scoped = head_scoped and 'head' not in request.url.query
+            key = self.get_cache_key(request)
+            body = cache.get(key, scoped)
+            if body is not None:
+                return web.Response(
+                    status=200,
+                    content_type='application/json',
+                    text=body)
+
+            response = await route(self, request)
+            if response.status != 200:
+                return response
+
+            if scoped:
+                # The request may have been answered by a validator other
+                # than the one the cache follows, so the response is cached
+                # under the head it was built for, which the cache ignores
+                # unless that is its current head
+                head_id = json.loads(response.text).get('head')
+                if head_id:
+                    cache.put(key, response.text, head_id=head_id)
+            else:
+                cache.put(key, response.text)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
 class RouteHandler(object):
     """Contains a number of aiohttp handlers for endpoints in the Rest Api.
 
@@ -98,14 +148,18 @@ class RouteHandler(object):
             with the validator.
         timeout (int, optional): The time in seconds before the Api should
             cancel a request and report that the validator is unavailable.
+        response_cache (:obj: response_cache.ResponseCache, optional): Caches
+            the responses to GET requests.
     """
 
     def __init__(
             self, loop, connection,
-            timeout=DEFAULT_TIMEOUT, metrics_registry=None):
+            timeout=DEFAULT_TIMEOUT, metrics_registry=None,
+            response_cache=None):
         self._loop = loop
         self._connection = connection
         self._timeout = timeout
+        self._response_cache = response_cache
         if metrics_registry:
             self._post_batches_count = CounterWrapper(
                 metrics_registry.counter('post_batches_count'))
@@ -121,6 +175,12 @@ class RouteHandler(object):
             self._post_batches_total_time = TimerWrapper()
             self._post_batches_validator_time = TimerWrapper()
 
+    @property
+    def response_cache(self):
+        """The ResponseCache of the GET handlers, or None.
+        """
+        return self._response_cache
+
     async def submit_batches(self, request):
         """Accepts a binary encoded BatchList and submits it to the validator.
 
@@ -246,6 +306,7 @@ class RouteHandler(object):
 
         return self._wrap_response(request, data=data, metadata=metadata)
 
+    @_cached_response(head_scoped=True)
     async def list_state(self, request):
         """Fetches list of data entries, optionally filtered by address prefix.
 
@@ -283,6 +344,7 @@ class RouteHandler(object):
             data=response.get('entries', []),
             head=head)
 
+    @_cached_response(head_scoped=True)
     async def fetch_state(self, request):
         """Fetches data from a specific address in the validator's state tree.
 
@@ -316,6 +378,7 @@ class RouteHandler(object):
             data=response['value'],
             metadata=self._get_metadata(request, response, head=head))
 
+    @_cached_response(head_scoped=True)
     async def list_blocks(self, request):
         """Fetches list of blocks from validator, optionally filtered by id.
 
@@ -348,6 +411,7 @@ class RouteHandler(object):
             controls=paging_controls,
             data=[self._expand_block(b) for b in response['blocks']])
 
+    @_cached_response(head_scoped=False)
     async def fetch_block(self, request):
         """Fetches a specific block from the validator, specified by id.
         Request:
@@ -374,6 +438,7 @@ class RouteHandler(object):
             data=self._expand_block(response['block']),
             metadata=self._get_metadata(request, response))
 
+    @_cached_response(head_scoped=True)
     async def list_batches(self, request):
         """Fetches list of batches from validator, optionally filtered by id.
 
@@ -406,6 +471,7 @@ class RouteHandler(object):
             controls=paging_controls,
             data=[self._expand_batch(b) for b in response['batches']])
 
+    @_cached_response(head_scoped=False)
     async def fetch_batch(self, request):
         """Fetches a specific batch from the validator, specified by id.
 
@@ -433,6 +499,7 @@ class RouteHandler(object):
             data=self._expand_batch(response['batch']),
             metadata=self._get_metadata(request, response))
 
+    @_cached_response(head_scoped=True)
     async def list_transactions(self, request):
         """Fetches list of txns from validator, optionally filtered by id.
 
@@ -467,6 +534,7 @@ class RouteHandler(object):
             controls=paging_controls,
             data=data)
 
+    @_cached_response(head_scoped=False)
     async def fetch_transaction(self, request):
         """Fetches a specific transaction from the validator, specified by id.
 
@@ -837,6 +905,23 @@ class RouteHandler(object):
         url = '{}://{}{}{}{}'.format(scheme, host, forwarded_path, path, query)
         return url
 
+    @staticmethod
+    def get_cache_key(request):
+        """Normalizes a request into the key of its cached response. Besides
+        the path and query, this includes everything used to build the links
+        in the response.
+        """
+        return (
+            request.path,
+            tuple(sorted(request.url.query.items())),
+            request.url.scheme,
+            request.host,
+            request.headers.get('Forwarded', ''),
+            request.headers.get('X-Forwarded-Proto', ''),
+            request.headers.get('X-Forwarded-Host', ''),
+            request.headers.get('X-Forwarded-Path', ''),
+        )
+
     @staticmethod
     def _get_forwarded(request, key):
         """Gets a forwarded value from the `Forwarded` header if present, or
@@ -69,6 +69,14 @@ class TestRestApiConfig(unittest.TestCase):
                 fd.write('opentsdb_username = "name"')
                 fd.write(os.linesep)
                 fd.write('opentsdb_password = "secret"')
+                fd.write(os.linesep)
+                fd.write('response_cache_size = 1024')
+                fd.write(os.linesep)
+                fd.write('connections = 4')
+                fd.write(os.linesep)
+                fd.write('read_connect = ["tcp://other:4004"]')
+                fd.write(os.linesep)
+                fd.write('workers = 2')
 
             config = load_toml_rest_api_config(filename)
             self.assertEqual(config.bind, ["test:1234"])
@@ -78,6 +86,10 @@ class TestRestApiConfig(unittest.TestCase):
             self.assertEqual(config.opentsdb_url, "http://data_base:0000")
             self.assertEqual(config.opentsdb_username, "name")
             self.assertEqual(config.opentsdb_password, "secret")
+            self.assertEqual(config.response_cache_size, 1024)
+            self.assertEqual(config.connections, 4)
+            self.assertEqual(config.read_connect, ["tcp://other:4004"])
+            self.assertEqual(config.workers, 2)
 
         finally:
             os.environ.clear()
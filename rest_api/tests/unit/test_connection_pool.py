@@ -0,0 +1,118 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from sawtooth_rest_api.messaging import ConnectionPool
+from sawtooth_rest_api.messaging import DisconnectError
+from sawtooth_rest_api.protobuf.validator_pb2 import Message
+
+
+class MockConnection:
+    """A Connection whose replies are resolved by the test.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.replies = []
+        self.listeners = {}
+
+    def on_connection_state_change(self, event_type, callback):
+        self.listeners[event_type] = callback
+
+    async def send(self, message_type, message_content, timeout=None):
+        reply = asyncio.Future()
+        self.replies.append(reply)
+        return await reply
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        patcher = patch(
+            'sawtooth_rest_api.messaging.Connection', MockConnection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.loop.close)
+        self.tasks = []
+
+    def tearDown(self):
+        for task in self.tasks:
+            task.cancel()
+        self.loop.run_until_complete(
+            asyncio.gather(*self.tasks, return_exceptions=True))
+
+    def _send(self, pool, message_type):
+        task = self.loop.create_task(pool.send(message_type, b''))
+        self.tasks.append(task)
+        self.loop.run_until_complete(asyncio.sleep(0))
+        return task
+
+    def _connections(self, pool):
+        # pylint: disable=protected-access
+        return [member.connection for member in pool._members]
+
+    def test_least_outstanding(self):
+        """Tests that requests are sent over the connection with the fewest
+        replies outstanding, and that only reads go to other validators.
+        """
+        pool = ConnectionPool(
+            'tcp://primary:4004', size=2, read_urls=['tcp://other:4004'])
+        connections = self._connections(pool)
+        self.assertEqual(4, len(connections))
+
+        for _ in range(4):
+            self._send(pool, Message.CLIENT_STATE_LIST_REQUEST)
+        self.assertEqual([1, 1, 1, 1],
+                         [len(conn.replies) for conn in connections])
+
+        connections[2].replies[0].set_result('reply')
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self._send(pool, Message.CLIENT_BLOCK_GET_BY_ID_REQUEST)
+        self.assertEqual(2, len(connections[2].replies))
+
+        for _ in range(2):
+            self._send(pool, Message.CLIENT_BATCH_SUBMIT_REQUEST)
+        self.assertEqual([2, 2, 2, 1],
+                         [len(conn.replies) for conn in connections])
+
+    def test_read_failover(self):
+        """Tests that a read whose connection is lost is retried over another
+        connection, which is used until the first recovers, and that other
+        requests are not retried.
+        """
+        pool = ConnectionPool(
+            'tcp://primary:4004', read_urls=['tcp://other:4004'])
+        primary, other = self._connections(pool)
+
+        read = self._send(pool, Message.CLIENT_STATE_GET_REQUEST)
+        sent_over = primary if primary.replies else other
+        sent_over.replies[0].set_exception(DisconnectError())
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+        retried_over = other if sent_over is primary else primary
+        self.assertEqual(1, len(retried_over.replies))
+        retried_over.replies[0].set_result('reply')
+        self.assertEqual('reply', self.loop.run_until_complete(read))
+
+        self._send(pool, Message.CLIENT_STATE_GET_REQUEST)
+        self.assertEqual(2, len(retried_over.replies))
+
+        submit = self._send(pool, Message.CLIENT_BATCH_SUBMIT_REQUEST)
+        primary.replies[-1].set_exception(DisconnectError())
+        with self.assertRaises(DisconnectError):
+            self.loop.run_until_complete(submit)
@@ -0,0 +1,75 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+import unittest
+
+from sawtooth_rest_api.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_immutable_responses(self):
+        """Tests that responses which do not depend on the chain head are
+        kept when the head changes, and are cached while it is unknown.
+        """
+        cache = ResponseCache(100)
+        cache.put('block', 'a block')
+
+        self.assertEqual('a block', cache.get('block', head_scoped=False))
+        cache.set_head('head-1')
+        cache.set_head(None)
+        self.assertEqual('a block', cache.get('block', head_scoped=False))
+        self.assertIsNone(cache.get('missing', head_scoped=False))
+        self.assertEqual(2 / 3, cache.hit_ratio)
+
+    def test_head_scoped_responses(self):
+        """Tests that responses which depend on the chain head are only
+        cached for the current head, and dropped when it changes.
+        """
+        cache = ResponseCache(100)
+        cache.set_head('head-1')
+        cache.put('blocks', 'list for head-1', head_id='head-1')
+        self.assertEqual(
+            'list for head-1', cache.get('blocks', head_scoped=True))
+        self.assertEqual(15, cache.size)
+
+        # A response built before the head changed is not cached
+        cache.set_head('head-2')
+        self.assertIsNone(cache.get('blocks', head_scoped=True))
+        self.assertEqual(0, cache.size)
+        cache.put('blocks', 'list for head-1', head_id='head-1')
+        self.assertIsNone(cache.get('blocks', head_scoped=True))
+
+        cache.put('blocks', 'list for head-2', head_id='head-2')
+        cache.set_head(None)
+        self.assertIsNone(cache.get('blocks', head_scoped=True))
+
+    def test_evict_least_recently_used(self):
+        """Tests that the least recently used responses are evicted once the
+        total size of the cache exceeds its maximum, and that a response
+        larger than the cache is not cached.
+        """
+        cache = ResponseCache(10)
+        cache.put('a', 'aaaa')
+        cache.put('b', 'bbbb')
+        cache.get('a', head_scoped=False)
+        cache.put('c', 'cccc')
+
+        self.assertEqual('aaaa', cache.get('a', head_scoped=False))
+        self.assertIsNone(cache.get('b', head_scoped=False))
+        self.assertEqual('cccc', cache.get('c', head_scoped=False))
+        self.assertEqual(8, cache.size)
+
+        cache.put('d', 'd' * 11)
+        self.assertIsNone(cache.get('d', head_scoped=False))
+        self.assertEqual(8, cache.size)
@@ -19,22 +19,39 @@ from sawtooth_sdk.processor.exceptions import InternalError
 from sawtooth_sdk.processor.exceptions import AuthorizationException
 
 
+# The length of a complete state address, in hex characters. Transaction
+# inputs may also be address prefixes, which cannot be fetched directly.
+_ADDRESS_LENGTH = 70
+
+
 class Context(object):
     """
     Context provides an interface for getting, setting, and deleting
     validator state. All validator interactions by a handler should be
     through a Context instance.
 
+    When created with cache_state=True, the context keeps a read cache for
+    the duration of the transaction, and buffers writes and deletes locally
+    until flush() is called. Reads of buffered addresses are served from the
+    buffer, so a handler observes its own writes.
+
     Attributes:
         _stream (sawtooth.client.stream.Stream): client grpc communication
         _context_id (str): the context_id passed in from the validator
 
     """
 
-    def __init__(self, stream, context_id):
+    def __init__(self, stream, context_id, cache_state=False):
         self._stream = stream
         self._context_id = context_id
 
+        self._cache_state = cache_state
+        # address -> data, where empty data means the address is known to
+        # have no value
+        self._cache = {}
+        self._pending_sets = {}
+        self._pending_deletes = set()
+
     def get_state(self, addresses, timeout=None):
         """
         get_state queries the validator state for data at each of the
@@ -51,6 +68,58 @@ class Context(object):
         Raises:
             AuthorizationException
         """
+        if self._cache_state:
+            return self._get_cached_state(addresses, timeout)
+
+        return self._get_state(addresses, timeout)
+
+    def _get_cached_state(self, addresses, timeout):
+        missing = [a for a in addresses if a not in self._cache]
+        if missing:
+            self._fetch(missing, timeout)
+
+        return [
+            state_context_pb2.TpStateEntry(
+                address=address, data=self._cache[address])
+            for address in addresses
+            if self._cache[address]
+        ]
+
+    def _fetch(self, addresses, timeout):
+        """Reads the addresses from the validator into the read cache.
+        """
+        entries = self._get_state(addresses, timeout)
+        for address in addresses:
+            self._cache[address] = b''
+        for entry in entries:
+            self._cache[entry.address] = entry.data
+
+    def prefetch_state(self, addresses, timeout=None):
+        """
+        prefetch_state loads the values of all of the given addresses into
+        the read cache with a single request to the validator, typically
+        with the inputs declared in the transaction header. Address prefixes
+        and addresses which are already cached are skipped. Has no effect
+        unless the context was created with cache_state=True.
+
+        Args:
+            addresses (list): the addresses to fetch
+            timeout: optional timeout, in seconds
+
+        Raises:
+            AuthorizationException
+        """
+        if not self._cache_state:
+            return
+
+        missing = [
+            a for a in set(addresses)
+            if len(a) == _ADDRESS_LENGTH and a not in self._cache
+        ]
+        if missing:
+            self._fetch(missing, timeout)
+
+    def _get_state(self, addresses, timeout):
         request = state_context_pb2.TpStateGetRequest(
             context_id=self._context_id,
             addresses=addresses)
@@ -84,6 +153,16 @@ class Context(object):
         Raises:
             AuthorizationException
         """
+        if self._cache_state:
+            for address, data in entries.items():
+                self._cache[address] = data
+                self._pending_sets[address] = data
+                self._pending_deletes.discard(address)
+            return list(entries)
+
+        return self._set_state(entries, timeout)
+
+    def _set_state(self, entries, timeout):
         state_entries = [
             state_context_pb2.TpStateEntry(address=e, data=entries[e])
             for e in entries
@@ -118,6 +197,16 @@ class Context(object):
         Raises:
             AuthorizationException
         """
+        if self._cache_state:
+            for address in addresses:
+                self._cache[address] = b''
+                self._pending_sets.pop(address, None)
+                self._pending_deletes.add(address)
+            return list(addresses)
+
+        return self._delete_state(addresses, timeout)
+
+    def _delete_state(self, addresses, timeout):
         request = state_context_pb2.TpStateDeleteRequest(
             context_id=self._context_id,
             addresses=addresses).SerializeToString()
@@ -131,6 +220,28 @@ class Context(object):
                 'Tried to delete unauthorized address: {}'.format(addresses))
         return response.addresses
 
+    def flush(self, timeout=None):
+        """
+        flush sends the writes and deletes buffered by a context created
+        with cache_state=True to the validator, using at most one set
+        request and one delete request.
+
+        Args:
+            timeout: optional timeout, in seconds
+
+        Raises:
+            AuthorizationException
+        """
+        if self._pending_sets:
+            pending_sets = self._pending_sets
+            self._pending_sets = {}
+            self._set_state(pending_sets, timeout)
+
+        if self._pending_deletes:
+            pending_deletes = sorted(self._pending_deletes)
+            self._pending_deletes = set()
+            self._delete_state(pending_deletes, timeout)
+
     def add_receipt_data(self, data, timeout=None):
         """Add a blob to the execution result for this transaction.
 
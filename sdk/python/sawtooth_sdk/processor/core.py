@@ -14,6 +14,7 @@
 # ------------------------------------------------------------------------------
 
 from concurrent.futures import CancelledError
+from concurrent.futures import ThreadPoolExecutor
 import concurrent.futures
 import itertools
 import logging
@@ -48,14 +49,25 @@ class TransactionProcessor(object):
     handler. It uses ZMQ and channels to handle requests concurrently.
     """
 
-    def __init__(self, url):
+    def __init__(self, url, max_workers=None, cache_state=False):
         """
         Args:
             url (string): The URL of the validator
+            max_workers (int): The number of transactions which are
+                processed concurrently. If None or 1, transactions are
+                processed one at a time on the thread which calls start().
+            cache_state (bool): Whether handlers are given contexts which
+                cache reads and buffer writes until the handler returns.
         """
         self._stream = Stream(url)
         self._url = url
         self._handlers = []
+        self._cache_state = cache_state
+
+        self._max_workers = max_workers
+        self._executor = None
+        if max_workers is not None and max_workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
 
     @property
     def zmq_id(self):
@@ -95,11 +107,20 @@ class TransactionProcessor(object):
                 [TpRegisterRequest(
                     family=n,
                     version=v,
-                    namespaces=h.namespaces)
+                    namespaces=h.namespaces,
+                    max_occupancy=self._max_occupancy())
                  for n, v in itertools.product(
                     [h.family_name],
                      h.family_versions,)] for h in self._handlers])
 
+    def _max_occupancy(self):
+        """Returns the number of transactions the validator may send to this
+        processor at once. Zero lets the validator use its default.
+        """
+        if self._executor is None:
+            return 0
+        return self._max_workers
+
     def _unregister_request(self):
         """Returns a single TP_UnregisterRequest that requests
         that the validator stop sending transactions for previously
@@ -119,7 +140,8 @@ class TransactionProcessor(object):
 
         request = TpProcessRequest()
         request.ParseFromString(msg.content)
-        state = Context(self._stream, request.context_id)
+        state = Context(
+            self._stream, request.context_id, cache_state=self._cache_state)
         header = request.header
         try:
             if not self._stream.is_ready():
@@ -128,6 +150,7 @@ class TransactionProcessor(object):
             if handler is None:
                 return
             handler.apply(request, state)
+            state.flush()
             self._stream.send_back(
                 message_type=Message.TP_PROCESS_RESPONSE,
                 correlation_id=msg.correlation_id,
@@ -213,7 +236,33 @@ class TransactionProcessor(object):
                     correlation_id=msg.correlation_id,
                     content=PingResponse().SerializeToString())
                 return
+            if self._executor is not None:
+                # Each request is answered with its own correlation id, so
+                # responses may be sent back in any order.
+                self._executor.submit(self._process_safely, msg)
+            else:
+                self._process(msg)
+
+    def _process_safely(self, msg):
+        try:
             self._process(msg)
+        # pylint: disable=broad-except
+        except Exception as e:
+            # Unlike the serial path, a worker cannot stop the processor, so
+            # the validator is told the transaction failed instead of waiting
+            # on it forever.
+            LOGGER.exception("Unhandled exception while processing "
+                             "transaction")
+            try:
+                self._stream.send_back(
+                    message_type=Message.TP_PROCESS_RESPONSE,
+                    correlation_id=msg.correlation_id,
+                    content=TpProcessResponse(
+                        status=TpProcessResponse.INTERNAL_ERROR,
+                        message=str(e)
+                    ).SerializeToString())
+            except ValidatorConnectionError as vce:
+                LOGGER.warning("during internal error response: %s", vce)
 
     def _register(self):
         futures = []
@@ -289,4 +338,6 @@ class TransactionProcessor(object):
         """Closes the connection between the TransactionProcessor and the
         validator.
         """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
         self._stream.close()
@@ -144,3 +144,93 @@ class ContextTest(unittest.TestCase):
                     event_type="test",
                     attributes=[Event.Attribute(key="test", value="test")],
                     data=b"test")).SerializeToString())
+
+    def test_cached_state_get(self):
+        """Tests that a caching context only requests addresses which are
+        not already cached.
+        """
+        context = Context(self.mock_stream, self.context_id, cache_state=True)
+        self.mock_stream.send.return_value = self._make_future(
+            message_type=Message.TP_STATE_GET_RESPONSE,
+            content=TpStateGetResponse(
+                status=TpStateGetResponse.OK,
+                entries=self._make_entries()).SerializeToString())
+
+        entries = context.get_state(self.addresses)
+        entries = context.get_state(self.addresses[:1])
+
+        self.assertEqual(1, self.mock_stream.send.call_count)
+        self.assertEqual(
+            [(self.addresses[0], self.data[0])],
+            [(e.address, e.data) for e in entries])
+
+    def test_cached_state_prefetch(self):
+        """Tests that a caching context prefetches complete addresses in one
+        request, skipping address prefixes.
+        """
+        context = Context(self.mock_stream, self.context_id, cache_state=True)
+        address = 'a' * 70
+        self.mock_stream.send.return_value = self._make_future(
+            message_type=Message.TP_STATE_GET_RESPONSE,
+            content=TpStateGetResponse(
+                status=TpStateGetResponse.OK,
+                entries=[TpStateEntry(address=address, data=b'data')]
+            ).SerializeToString())
+
+        context.prefetch_state([address, 'abcdef'])
+
+        self.mock_stream.send.assert_called_once_with(
+            Message.TP_STATE_GET_REQUEST,
+            TpStateGetRequest(
+                context_id=self.context_id,
+                addresses=[address]).SerializeToString())
+
+        entries = context.get_state([address])
+        self.assertEqual(1, self.mock_stream.send.call_count)
+        self.assertEqual(b'data', entries[0].data)
+
+    def test_cached_state_set_and_delete(self):
+        """Tests that a caching context buffers sets and deletes, serves reads
+        from the buffer, and sends them in a single request of each type on
+        flush.
+        """
+        context = Context(self.mock_stream, self.context_id, cache_state=True)
+
+        context.set_state(self._make_entries(protobuf=False))
+        context.delete_state(self.addresses[2:])
+
+        self.mock_stream.send.assert_not_called()
+        self.assertEqual(
+            [(a, d) for a, d in zip(self.addresses[:2], self.data[:2])],
+            [(e.address, e.data) for e in context.get_state(self.addresses)])
+
+        set_future = self._make_future(
+            message_type=Message.TP_STATE_SET_RESPONSE,
+            content=TpStateSetResponse(
+                status=TpStateSetResponse.OK,
+                addresses=self.addresses[:2]).SerializeToString())
+        delete_future = self._make_future(
+            message_type=Message.TP_STATE_DELETE_RESPONSE,
+            content=TpStateDeleteResponse(
+                status=TpStateDeleteResponse.OK,
+                addresses=self.addresses[2:]).SerializeToString())
+        self.mock_stream.send.side_effect = [set_future, delete_future]
+
+        context.flush()
+
+        self.assertEqual(2, self.mock_stream.send.call_count)
+        set_call, delete_call = self.mock_stream.send.call_args_list
+        request = TpStateSetRequest()
+        request.ParseFromString(set_call[0][1])
+        self.assertEqual(
+            sorted(zip(self.addresses[:2], self.data[:2])),
+            sorted((e.address, e.data) for e in request.entries))
+        self.assertEqual(
+            delete_call[0][1],
+            TpStateDeleteRequest(
+                context_id=self.context_id,
+                addresses=self.addresses[2:]).SerializeToString())
+
+        # Nothing is left to send
+        context.flush()
+        self.assertEqual(2, self.mock_stream.send.call_count)
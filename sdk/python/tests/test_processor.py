@@ -0,0 +1,149 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+# pylint: disable=protected-access
+
+import threading
+import unittest
+from unittest.mock import patch
+
+from sawtooth_sdk.processor.core import TransactionProcessor
+from sawtooth_sdk.processor.handler import TransactionHandler
+from sawtooth_sdk.messaging.future import Future
+
+from sawtooth_sdk.protobuf.processor_pb2 import TpProcessRequest
+from sawtooth_sdk.protobuf.processor_pb2 import TpProcessResponse
+from sawtooth_sdk.protobuf.transaction_pb2 import TransactionHeader
+from sawtooth_sdk.protobuf.validator_pb2 import Message
+
+
+class BarrierHandler(TransactionHandler):
+    """A handler which only completes once `parties` transactions are being
+    applied at the same time.
+    """
+
+    def __init__(self, parties):
+        self._barrier = threading.Barrier(parties, timeout=5)
+
+    @property
+    def family_name(self):
+        return 'test'
+
+    @property
+    def family_versions(self):
+        return ['1.0']
+
+    @property
+    def namespaces(self):
+        return ['abcdef']
+
+    def apply(self, transaction, context):
+        self._barrier.wait()
+
+
+class FailingHandler(BarrierHandler):
+    """A handler which raises an unexpected exception.
+    """
+
+    def __init__(self):
+        super().__init__(parties=1)
+
+    def apply(self, transaction, context):
+        raise ValueError('unexpected')
+
+
+class TransactionProcessorTest(unittest.TestCase):
+    def _make_request_future(self, correlation_id):
+        request = TpProcessRequest(
+            header=TransactionHeader(
+                family_name='test',
+                family_version='1.0'),
+            context_id='context')
+        future = Future(correlation_id)
+        future.set_result(Message(
+            message_type=Message.TP_PROCESS_REQUEST,
+            correlation_id=correlation_id,
+            content=request.SerializeToString()))
+        return future
+
+    @patch('sawtooth_sdk.processor.core.Stream')
+    def test_concurrent_processing(self, mock_stream_class):
+        """Tests that a processor with several workers applies transactions
+        concurrently, and responds to each with its correlation id.
+        """
+        mock_stream = mock_stream_class.return_value
+
+        processor = TransactionProcessor('tcp://test:4004', max_workers=3)
+        processor.add_handler(BarrierHandler(parties=3))
+
+        correlation_ids = ['corr_{}'.format(i) for i in range(3)]
+        for correlation_id in correlation_ids:
+            processor._process_future(
+                self._make_request_future(correlation_id))
+
+        # If the transactions were applied one at a time, the barrier
+        # would time out and no OK responses would be sent.
+        processor.stop()
+
+        responses = {}
+        for call in mock_stream.send_back.call_args_list:
+            response = TpProcessResponse()
+            response.ParseFromString(call[1]['content'])
+            responses[call[1]['correlation_id']] = response.status
+
+        self.assertEqual(
+            {correlation_id: TpProcessResponse.OK
+             for correlation_id in correlation_ids},
+            responses)
+
+    @patch('sawtooth_sdk.processor.core.Stream')
+    def test_register_max_occupancy(self, mock_stream_class):
+        """Tests that a processor with several workers registers a maximum
+        occupancy equal to its number of workers.
+        """
+        processor = TransactionProcessor('tcp://test:4004', max_workers=4)
+        processor.add_handler(BarrierHandler(parties=1))
+
+        for request in processor._register_requests():
+            self.assertEqual(4, request.max_occupancy)
+
+        processor.stop()
+
+        processor = TransactionProcessor('tcp://test:4004')
+        processor.add_handler(BarrierHandler(parties=1))
+
+        for request in processor._register_requests():
+            self.assertEqual(0, request.max_occupancy)
+
+    @patch('sawtooth_sdk.processor.core.Stream')
+    def test_worker_unexpected_exception(self, mock_stream_class):
+        """Tests that a worker whose handler raises an unexpected exception
+        responds with an internal error, rather than leaving the validator
+        waiting for a response.
+        """
+        mock_stream = mock_stream_class.return_value
+
+        processor = TransactionProcessor('tcp://test:4004', max_workers=2)
+        processor.add_handler(FailingHandler())
+
+        processor._process_future(self._make_request_future('corr_0'))
+        processor.stop()
+
+        self.assertEqual(1, mock_stream.send_back.call_count)
+        kwargs = mock_stream.send_back.call_args[1]
+        response = TpProcessResponse()
+        response.ParseFromString(kwargs['content'])
+        self.assertEqual('corr_0', kwargs['correlation_id'])
+        self.assertEqual(TpProcessResponse.INTERNAL_ERROR, response.status)
@@ -37,7 +37,9 @@ def load_default_validator_config():
         scheduler='serial',
         minimum_peer_connectivity=3,
         maximum_peer_connectivity=10,
-        state_pruning_block_depth=100)
+        state_pruning_block_depth=100,
+        state_snapshot_interval=0,
+        state_snapshot_bootstrap=False)
 
 
 def load_toml_validator_config(filename):
@@ -65,7 +67,9 @@ def load_toml_validator_config(filename):
          'network_private_key', 'scheduler', 'permissions', 'roles',
          'opentsdb_url', 'opentsdb_db', 'opentsdb_username',
          'opentsdb_password', 'minimum_peer_connectivity',
-         'maximum_peer_connectivity', 'state_pruning_block_depth'])
+         'maximum_peer_connectivity', 'state_pruning_block_depth',
+         'state_snapshot_interval', 'state_snapshot_bootstrap',
+         'state_snapshot_trusted_block_id'])
     if invalid_keys:
         raise LocalConfigurationError(
             "Invalid keys in validator config: "
@@ -112,7 +116,13 @@ def load_toml_validator_config(filename):
         maximum_peer_connectivity=toml_config.get(
             "maximum_peer_connectivity", None),
         state_pruning_block_depth=toml_config.get(
-            "state_pruning_block_depth", None)
+            "state_pruning_block_depth", None),
+        state_snapshot_interval=toml_config.get(
+            "state_snapshot_interval", None),
+        state_snapshot_bootstrap=toml_config.get(
+            "state_snapshot_bootstrap", None),
+        state_snapshot_trusted_block_id=toml_config.get(
+            "state_snapshot_trusted_block_id", None)
     )
 
     return config
@@ -143,6 +153,9 @@ def merge_validator_config(configs):
     minimum_peer_connectivity = None
     maximum_peer_connectivity = None
     state_pruning_block_depth = None
+    state_snapshot_interval = None
+    state_snapshot_bootstrap = None
+    state_snapshot_trusted_block_id = None
 
     for config in reversed(configs):
         if config.bind_network is not None:
@@ -183,6 +196,13 @@ def merge_validator_config(configs):
             maximum_peer_connectivity = config.maximum_peer_connectivity
         if config.state_pruning_block_depth is not None:
             state_pruning_block_depth = config.state_pruning_block_depth
+        if config.state_snapshot_interval is not None:
+            state_snapshot_interval = config.state_snapshot_interval
+        if config.state_snapshot_bootstrap is not None:
+            state_snapshot_bootstrap = config.state_snapshot_bootstrap
+        if config.state_snapshot_trusted_block_id is not None:
+            state_snapshot_trusted_block_id = \
+                config.state_snapshot_trusted_block_id
 
     return ValidatorConfig(
         bind_network=bind_network,
@@ -203,7 +223,10 @@ def merge_validator_config(configs):
         opentsdb_password=opentsdb_password,
         minimum_peer_connectivity=minimum_peer_connectivity,
         maximum_peer_connectivity=maximum_peer_connectivity,
-        state_pruning_block_depth=state_pruning_block_depth)
+        state_pruning_block_depth=state_pruning_block_depth,
+        state_snapshot_interval=state_snapshot_interval,
+        state_snapshot_bootstrap=state_snapshot_bootstrap,
+        state_snapshot_trusted_block_id=state_snapshot_trusted_block_id)
 
 
 def parse_permissions(permissions):
@@ -253,7 +276,10 @@ class ValidatorConfig:
                  opentsdb_username=None, opentsdb_password=None,
                  minimum_peer_connectivity=None,
                  maximum_peer_connectivity=None,
-                 state_pruning_block_depth=None):
+                 state_pruning_block_depth=None,
+                 state_snapshot_interval=None,
+                 state_snapshot_bootstrap=None,
+                 state_snapshot_trusted_block_id=None):
 
         self._bind_network = bind_network
         self._bind_component = bind_component
@@ -274,6 +300,9 @@ class ValidatorConfig:
         self._minimum_peer_connectivity = minimum_peer_connectivity
         self._maximum_peer_connectivity = maximum_peer_connectivity
         self._state_pruning_block_depth = state_pruning_block_depth
+        self._state_snapshot_interval = state_snapshot_interval
+        self._state_snapshot_bootstrap = state_snapshot_bootstrap
+        self._snapshot_trusted_block = state_snapshot_trusted_block_id
 
     @property
     def bind_network(self):
@@ -351,6 +380,18 @@ class ValidatorConfig:
     def state_pruning_block_depth(self):
         return self._state_pruning_block_depth
 
+    @property
+    def state_snapshot_interval(self):
+        return self._state_snapshot_interval
+
+    @property
+    def state_snapshot_bootstrap(self):
+        return self._state_snapshot_bootstrap
+
+    @property
+    def state_snapshot_trusted_block_id(self):
+        return self._snapshot_trusted_block
+
     def __repr__(self):
         # not including  password for opentsdb
         return (
@@ -360,7 +401,9 @@ class ValidatorConfig:
             "scheduler={}, permissions={}, roles={} "
             "opentsdb_url={}, opentsdb_db={}, opentsdb_username={}, "
             "minimum_peer_connectivity={}, maximum_peer_connectivity={}, "
-            "state_pruning_block_depth={})"
+            "state_pruning_block_depth={}, state_snapshot_interval={}, "
+            "state_snapshot_bootstrap={}, "
+            "state_snapshot_trusted_block_id={})"
         ).format(
             self.__class__.__name__,
             repr(self._bind_network),
@@ -380,7 +423,10 @@ class ValidatorConfig:
             repr(self._opentsdb_username),
             repr(self._minimum_peer_connectivity),
             repr(self._maximum_peer_connectivity),
-            repr(self._state_pruning_block_depth))
+            repr(self._state_pruning_block_depth),
+            repr(self._state_snapshot_interval),
+            repr(self._state_snapshot_bootstrap),
+            repr(self._snapshot_trusted_block))
 
     def to_dict(self):
         return collections.OrderedDict([
@@ -402,7 +448,11 @@ class ValidatorConfig:
             ('opentsdb_password', self._opentsdb_password),
             ('minimum_peer_connectivity', self._minimum_peer_connectivity),
             ('maximum_peer_connectivity', self._maximum_peer_connectivity),
-            ('state_pruning_block_depth', self._state_pruning_block_depth)
+            ('state_pruning_block_depth', self._state_pruning_block_depth),
+            ('state_snapshot_interval', self._state_snapshot_interval),
+            ('state_snapshot_bootstrap', self._state_snapshot_bootstrap),
+            ('state_snapshot_trusted_block_id',
+             self._snapshot_trusted_block)
         ])
 
     def to_toml_string(self):
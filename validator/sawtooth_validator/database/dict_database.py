@@ -30,8 +30,10 @@ class DictDatabase(database.Database):
                 name: ({}, key_fn)
                 for name, key_fn in indexes.items()
             }
+            self._locations = {name: {} for name in indexes}
         else:
             self._indexes = {}
+            self._locations = {}
 
         self._data = {}
         if data is not None:
@@ -72,6 +74,26 @@ class DictDatabase(database.Database):
                 continue
         return out
 
+    def get_multi_located(self, keys, index):
+        """Retrieves the values referenced by the given keys of an index,
+        along with the location recorded for each index entry. Values are
+        returned as stored, as this database does not serialize them.
+        """
+        if index not in self._indexes:
+            raise ValueError('Index {} does not exist'.format(index))
+
+        index_data = self._indexes[index][0]
+        locations = self._locations[index]
+        out = []
+        for key in keys:
+            idx_key = key.encode()
+            if idx_key not in index_data:
+                continue
+            out.append((key,
+                        locations.get(idx_key),
+                        self._data[index_data[idx_key]]))
+        return out
+
     def cursor(self, index=None):
         if index is not None and index not in self._indexes:
             raise ValueError('Index {} does not exist'.format(index))
@@ -87,9 +109,12 @@ class DictDatabase(database.Database):
     def update(self, puts, deletes):
         for key, val in puts:
             self._data[key] = val
-            for (index_data, key_fn) in self._indexes.values():
+            for name, (index_data, key_fn) in self._indexes.items():
                 index_keys = key_fn(val)
                 for idx_key in index_keys:
+                    if isinstance(idx_key, tuple):
+                        idx_key, location = idx_key
+                        self._locations[name][idx_key] = location
                     index_data[idx_key] = key
 
         for k in deletes:
@@ -98,10 +123,13 @@ class DictDatabase(database.Database):
 
             old_value = self._data[k]
             del self._data[k]
-            for (index_data, key_fn) in self._indexes.values():
+            for name, (index_data, key_fn) in self._indexes.items():
                 index_keys = key_fn(old_value)
                 for idx_key in index_keys:
+                    if isinstance(idx_key, tuple):
+                        idx_key, _ = idx_key
                     del index_data[idx_key]
+                    self._locations[name].pop(idx_key, None)
 
     def keys(self, index=None):
         return self._data.keys()
@@ -24,6 +24,10 @@ LOGGER = logging.getLogger(__name__)
 
 DEFAULT_SIZE = 1024**4
 
+# Separates the referenced primary key from the location recorded with an
+# index entry.
+_LOCATION_SEPARATOR = b'\x00'
+
 
 class IndexOutOfSyncError(Exception):
     pass
@@ -50,7 +54,10 @@ class IndexedDatabase(database.Database):
             indexes (dict:(str,function):optional): dict of index names to key
                 functions.  The key functions use the deserialized value and
                 produce n index keys, that will reference the items primary
-                key. Defaults to None
+                key. A key function may also produce (index key, location)
+                pairs, where location is a bytes value recorded with the
+                reference, such as the position of the indexed entry within
+                the item. Defaults to None
             flag (str:optional): a flag indicating the mode for opening the
                 database.  Refer to the documentation for anydbm.open().
                 Defaults to None.
@@ -153,6 +160,7 @@ class IndexedDatabase(database.Database):
                         raise KeyError("Invalid key: %s" % read_key)
                     if not read_key:
                         continue
+                    read_key, _ = _split_reference(read_key)
 
                 try:
                     packed = cursor.get(read_key)
@@ -168,6 +176,46 @@ class IndexedDatabase(database.Database):
 
         return result
 
+    def get_multi_located(self, keys, index):
+        """Retrieves the serialized values referenced by the given keys of an
+        index, along with the location recorded for each index entry.
+
+        Any key not found will not be in the resulting list.
+
+        Args:
+            keys (:iterable:str:): an iterable of index keys
+            index (str): the index name
+
+        Returns:
+            list: a list of (key, location, packed value) tuples, where the
+                location is None for entries indexed without one
+        """
+        if index not in self._indexes:
+            raise ValueError('Index {} does not exist'.format(index))
+
+        with self._lmdb.begin() as txn:
+            result = []
+            cursor = txn.cursor(self._main_db)
+            index_cursor = txn.cursor(self._indexes[index][0])
+
+            for key in keys:
+                try:
+                    reference = index_cursor.get(key.encode())
+                except lmdb.BadValsizeError:
+                    raise KeyError("Invalid key: %s" % key)
+                if not reference:
+                    continue
+
+                read_key, location = _split_reference(reference)
+                packed = cursor.get(read_key)
+                if packed is None:
+                    raise IndexOutOfSyncError(
+                        'Index is out of sync for key {}'.format(key))
+
+                result.append((key, location, packed))
+
+        return result
+
     def cursor(self, index=None):
         if index is not None and index not in self._indexes:
             raise ValueError('Index {} does not exist'.format(index))
@@ -202,6 +250,8 @@ class IndexedDatabase(database.Database):
                     index_keys = index_key_fn(value)
                     index_cursor = txn.cursor(index_db)
                     for idx_key in index_keys:
+                        if isinstance(idx_key, tuple):
+                            idx_key, _ = idx_key
                         if index_cursor.set_key(idx_key):
                             index_cursor.delete()
 
@@ -215,7 +265,11 @@ class IndexedDatabase(database.Database):
                     index_keys = index_key_fn(value)
                     index_cursor = txn.cursor(index_db)
                     for idx_key in index_keys:
-                        index_cursor.put(idx_key, key.encode())
+                        reference = key.encode()
+                        if isinstance(idx_key, tuple):
+                            idx_key, location = idx_key
+                            reference += _LOCATION_SEPARATOR + location
+                        index_cursor.put(idx_key, reference)
 
         self.sync()
 
@@ -335,11 +389,19 @@ class ReferenceChainCursor(database.Cursor):
         return _WrapperIter()
 
 
+def _split_reference(reference):
+    """Splits an index entry's value into the referenced primary key and the
+    location recorded with it, if any.
+    """
+    key, _, location = bytes(reference).partition(_LOCATION_SEPARATOR)
+    return key, location or None
+
+
 def _read(initial_key, cursor_chain, deserializer):
     key = initial_key
     packed = key
     for curs in cursor_chain:
-        packed = curs.get(key)
+        packed = curs.get(_split_reference(key)[0])
         if not packed:
             raise IndexOutOfSyncError(
                 'Index is out of date for key {}'.format(key))
@@ -13,11 +13,13 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+import bisect
 import logging
 import re
 
 from collections import deque
 from threading import Lock
+from queue import Empty
 from queue import Queue
 
 from sawtooth_validator.concurrent.thread import InstrumentedThread
@@ -54,6 +56,7 @@ class ContextManager(object):
         self._database = database
         self._first_merkle_root = None
         self._contexts = _ThreadsafeContexts()
+        self._chain_index = _ContextChainIndex()
 
         self._address_regex = re.compile('^[0-9a-f]{70}$')
 
@@ -133,6 +136,8 @@ class ContextManager(object):
         context.create_initial(address_values)
 
         self._contexts[context.session_id] = context
+        self._chain_index.add_context(
+            context.session_id, base_contexts, addresses_to_find)
 
         if reads:
             context.create_prefetch(reads)
@@ -144,6 +149,10 @@ class ContextManager(object):
         """Breadth first search through the chain of contexts searching for
         the bytes values at the addresses in addresses_to_find.
 
+        Whenever the search is down to a single context, the run of contexts
+        beneath it which are each based only on the previous one is resolved
+        through the chain index, rather than by visiting each context.
+
         Args:
             base_contexts (list of str): The context ids to start with.
             addresses_to_find (list of str): Addresses to find values in the
@@ -157,8 +166,17 @@ class ContextManager(object):
         contexts_in_chain.extend(base_contexts)
         reads = list(addresses_to_find)
         address_values = []
-        context_ids_already_searched = []
-        context_ids_already_searched.extend(base_contexts)
+        context_ids_already_searched = set(base_contexts)
+        # chain -> the highest position in the chain at or below which every
+        # context has already been searched
+        chains_already_searched = {}
+
+        def already_searched(c_id):
+            if c_id in context_ids_already_searched:
+                return True
+            chain, position = self._chain_index.position(c_id)
+            return chain is not None and \
+                position <= chains_already_searched.get(chain, -1)
 
         # There are two loop exit conditions, either all the addresses that
         # are being searched for have been found, or we run out of contexts
@@ -170,6 +188,30 @@ class ContextManager(object):
             except IndexError:
                 # There aren't any more contexts known about.
                 break
+
+            if not contexts_in_chain:
+                chain, position = self._chain_index.position(current_c_id)
+                if chain is not None:
+                    addresses_not_found = []
+                    for address in reads:
+                        c_id = self._chain_index.find(
+                            chain, address, position)
+                        if c_id is None:
+                            addresses_not_found.append(address)
+                        else:
+                            address_values.append(
+                                (address,
+                                 self._value_in_context(c_id, address)))
+                    reads = addresses_not_found
+
+                    chains_already_searched[chain] = max(
+                        position, chains_already_searched.get(chain, -1))
+                    for c_id in chain.base_contexts:
+                        if not already_searched(c_id):
+                            contexts_in_chain.append(c_id)
+                            context_ids_already_searched.add(c_id)
+                    continue
+
             current_context = self._contexts[current_c_id]
 
             # First, check for addresses that have been deleted.
@@ -178,7 +220,8 @@ class ContextManager(object):
                 if address is not None:
                     address_values.append((address, None))
 
-            reads = list(set(reads) - set(deleted_addresses))
+            deleted_addresses = set(deleted_addresses)
+            reads = [add for add in reads if add not in deleted_addresses]
 
             # Second, check for addresses that have been set in the context,
             # and remove those addresses from being asked about again. Here
@@ -203,16 +246,31 @@ class ContextManager(object):
 
             address_values.extend(list(zip(addresses_in_inputs, values)))
 
-            for add in addresses_in_inputs:
-                reads.remove(add)
+            addresses_in_inputs = set(addresses_in_inputs)
+            reads = [add for add in reads if add not in addresses_in_inputs]
 
             for c_id in current_context.base_contexts:
-                if c_id not in context_ids_already_searched:
+                if not already_searched(c_id):
                     contexts_in_chain.append(c_id)
-                    context_ids_already_searched.append(c_id)
+                    context_ids_already_searched.add(c_id)
 
         return address_values, reads
 
+    def _value_in_context(self, context_id, address):
+        """Returns the value of an address which is known to be in the
+        context, or None if the address was deleted in the context.
+        """
+        context = self._contexts[context_id]
+
+        if context.get_if_deleted([address])[0] is not None:
+            return None
+
+        value = context.get_if_set([address])[0]
+        if value is not None:
+            return value
+
+        return context.get_if_not_set([address])[0]
+
     def delete_contexts(self, context_id_list):
         """Delete contexts from the ContextManager.
 
@@ -226,6 +284,7 @@ class ContextManager(object):
         for c_id in context_id_list:
             if c_id in self._contexts:
                 del self._contexts[c_id]
+            self._chain_index.remove(c_id)
 
     def delete(self, context_id, address_list):
         """Delete the values associated with list of addresses, for a specific
@@ -257,7 +316,11 @@ class ContextManager(object):
             if not self.address_is_valid(address=add):
                 raise AuthorizationException(address=add)
 
-        context.delete_direct(address_list)
+        try:
+            context.delete_direct(address_list)
+        finally:
+            self._chain_index.add_addresses(
+                context_id, [add for add in address_list if add in context])
 
         return True
 
@@ -359,7 +422,12 @@ class ContextManager(object):
                 if not self.address_is_valid(address=add):
                     raise AuthorizationException(address=add)
                 add_value_dict[add] = val
-        context.set_direct(add_value_dict)
+
+        try:
+            context.set_direct(add_value_dict)
+        finally:
+            self._chain_index.add_addresses(
+                context_id, [add for add in add_value_dict if add in context])
         return True
 
     def get_squash_handler(self):
@@ -368,6 +436,7 @@ class ContextManager(object):
             contexts_in_chain.extend(context_ids)
             context_ids_already_searched = []
             context_ids_already_searched.extend(context_ids)
+            context_ids_seen = set(context_ids)
 
             # There is only one exit condition and that is when all the
             # contexts have been accessed once.
@@ -396,9 +465,10 @@ class ContextManager(object):
                         deletes.add(add)
 
                 for c_id in current_context.base_contexts:
-                    if c_id not in context_ids_already_searched:
+                    if c_id not in context_ids_seen:
                         contexts_in_chain.append(c_id)
                         context_ids_already_searched.append(c_id)
+                        context_ids_seen.add(c_id)
 
             tree = MerkleDatabase(self._database, state_root)
 
@@ -486,19 +556,48 @@ class _ContextReader(InstrumentedThread):
 
     def run(self):
         while True:
-            context_state_addresslist_tuple = self._addresses.get(block=True)
-            if context_state_addresslist_tuple is _SHUTDOWN_SENTINEL:
+            requests = [self._addresses.get(block=True)]
+
+            # Drain any other requests already waiting, so that those
+            # against the same state root can share a single read
+            while requests[-1] is not _SHUTDOWN_SENTINEL:
+                try:
+                    requests.append(self._addresses.get(block=False))
+                except Empty:
+                    break
+
+            shutdown = requests[-1] is _SHUTDOWN_SENTINEL
+            if shutdown:
+                requests.pop()
+
+            self._read_requests(requests)
+
+            if shutdown:
                 break
-            c_id, state_hash, address_list = context_state_addresslist_tuple
+
+    def _read_requests(self, requests):
+        """Reads the addresses requested by several contexts, fetching the
+        addresses for each distinct state root with one call to the state
+        database.
+
+        Args:
+            requests (list of tuple): (context_id, state_hash, address_list)
+        """
+        addresses_by_root = {}
+        for _, state_hash, address_list in requests:
+            addresses_by_root.setdefault(state_hash, set()).update(
+                address_list)
+
+        values_by_root = {}
+        for state_hash, addresses in addresses_by_root.items():
             tree = MerkleDatabase(self._database, state_hash)
-            return_values = []
-            for address in address_list:
-                value = None
-                try:
-                    value = tree.get(address)
-                except KeyError:
-                    pass
-                return_values.append((address, value))
+            values_by_root[state_hash] = dict(
+                tree.get_multi(list(addresses)))
+
+        for c_id, state_hash, address_list in requests:
+            values = values_by_root[state_hash]
+            return_values = [
+                (address, values.get(address)) for address in address_list]
             self._inflated_addresses.put((c_id, return_values))
 
 
@@ -532,6 +631,113 @@ class _ContextWriter(InstrumentedThread):
                 self._contexts[c_id].set_from_tree(inflated_value_map)
 
 
+class _ContextChain(object):
+    """A run of contexts in which every context after the first is based
+    solely on the context before it, as produced by the serial scheduler and
+    by dependent transactions in the parallel scheduler.
+
+    For each address, the chain records the positions of the contexts in
+    which the address is present, so the nearest context at or below any
+    position holding an address is found with a binary search.
+    """
+
+    def __init__(self, base_contexts):
+        """
+        Args:
+            base_contexts (list of str): The context ids the first context in
+                the chain is based on.
+        """
+        self.base_contexts = base_contexts
+        self._context_ids = []
+        self._positions_by_address = {}
+
+    @property
+    def head(self):
+        return self._context_ids[-1]
+
+    def append(self, context_id):
+        self._context_ids.append(context_id)
+        return len(self._context_ids) - 1
+
+    def add_addresses(self, position, addresses):
+        for address in addresses:
+            positions = self._positions_by_address.setdefault(address, [])
+            if not positions or positions[-1] < position:
+                positions.append(position)
+            elif positions[bisect.bisect_left(positions, position)] != \
+                    position:
+                bisect.insort(positions, position)
+
+    def find(self, address, position):
+        """Returns the id of the nearest context at or below position in
+        which the address is present, or None.
+        """
+        positions = self._positions_by_address.get(address)
+        if not positions:
+            return None
+
+        index = bisect.bisect_right(positions, position)
+        if index == 0:
+            return None
+
+        return self._context_ids[positions[index - 1]]
+
+
+class _ContextChainIndex(object):
+    """Indexes contexts by the chain they belong to, so that the context
+    holding the latest value of an address beneath a given context is found
+    without walking the chain of base contexts.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        # context id -> (chain, position in chain)
+        self._positions = {}
+
+    def add_context(self, context_id, base_contexts, addresses):
+        """Adds a new context to the head of its base context's chain, or
+        starts a new chain if the context has several base contexts or its
+        base context is not the head of a chain.
+        """
+        with self._lock:
+            chain = None
+            if len(base_contexts) == 1 and base_contexts[0] in self._positions:
+                base_chain, _ = self._positions[base_contexts[0]]
+                if base_chain.head == base_contexts[0]:
+                    chain = base_chain
+
+            if chain is None:
+                chain = _ContextChain(list(base_contexts))
+
+            position = chain.append(context_id)
+            chain.add_addresses(position, addresses)
+            self._positions[context_id] = (chain, position)
+
+    def add_addresses(self, context_id, addresses):
+        with self._lock:
+            if context_id in self._positions:
+                chain, position = self._positions[context_id]
+                chain.add_addresses(position, addresses)
+
+    def position(self, context_id):
+        """Returns the chain and position of the context, or (None, None) if
+        the context is not indexed.
+        """
+        with self._lock:
+            return self._positions.get(context_id, (None, None))
+
+    def find(self, chain, address, position):
+        """Returns the id of the nearest context at or below position in the
+        chain in which the address is present, or None.
+        """
+        with self._lock:
+            return chain.find(address, position)
+
+    def remove(self, context_id):
+        with self._lock:
+            self._positions.pop(context_id, None)
+
+
 class _ThreadsafeContexts(object):
     def __init__(self):
         self._lock = Lock()
@@ -17,6 +17,7 @@ import abc
 import json
 import logging
 import threading
+from collections import OrderedDict
 
 from sawtooth_validator.protobuf import processor_pb2
 from sawtooth_validator.protobuf import network_pb2
@@ -42,6 +43,148 @@ from sawtooth_validator import metrics
 LOGGER = logging.getLogger(__name__)
 COLLECTOR = metrics.get_collector(__name__)
 
+TP_SETTINGS_KEY = "sawtooth.validator.transaction_families"
+# The number of state roots for which the parsed transaction family policy
+# is kept in memory.
+TRANSACTION_FAMILY_POLICY_CACHE_SIZE = 64
+
+
+class _TransactionFamilyPolicy(object):
+    """The parsed value of the sawtooth.validator.transaction_families
+    setting at a single state root.
+
+    Args:
+        transaction_families (str): The raw json value of the setting.
+    """
+
+    def __init__(self, transaction_families):
+        self._required = frozenset()
+        self._namespaces = {}
+        self._prefixes = {}
+
+        # After reading the transaction families required in configuration
+        # try to json.loads them into a python object
+        # If there is a misconfiguration, proceed as if there is no
+        # configuration.
+        try:
+            families = json.loads(transaction_families)
+            required = [
+                (ProcessorType(d.get('family'), d.get('version')), d)
+                for d in families]
+        except ValueError:
+            LOGGER.error("sawtooth.validator.transaction_families "
+                         "misconfigured. Expecting a json array, found"
+                         " %s", transaction_families)
+            return
+
+        self._required = frozenset(
+            processor_type for processor_type, _ in required)
+
+        for processor_type, family in required:
+            # The first entry listed for a family and version wins
+            if processor_type in self._namespaces:
+                continue
+
+            # if no namespaces are indicated, then the empty prefix is
+            # inserted by default
+            namespaces = family.get('namespaces', [''])
+            if not isinstance(namespaces, list):
+                LOGGER.error("namespaces should be a list for "
+                             "transaction family (name=%s, version=%s)",
+                             processor_type.name,
+                             processor_type.version)
+            try:
+                prefixes = tuple(namespaces)
+            except TypeError:
+                prefixes = ()
+
+            self._namespaces[processor_type] = namespaces
+            # None marks a family whose outputs all match the empty prefix
+            self._prefixes[processor_type] = \
+                None if '' in prefixes else prefixes
+
+    def is_allowed(self, processor_type):
+        """Returns whether transactions of the given type may be executed,
+        which is the case if no families are required or the type is one
+        of them.
+        """
+        return not self._required or processor_type in self._required
+
+    def is_required(self, processor_type):
+        return processor_type in self._required
+
+    def namespaces(self, processor_type):
+        return self._namespaces.get(processor_type)
+
+    def bad_prefixes(self, processor_type, outputs):
+        """Returns the outputs of a transaction of the given required type
+        that do not start with any of its configured namespaces.
+        """
+        prefixes = self._prefixes.get(processor_type)
+        if prefixes is None:
+            return []
+        return [output for output in outputs
+                if not output.startswith(prefixes)]
+
+
+class TransactionFamilyPolicyCache(object):
+    """A bounded, least-recently-used cache of the transaction family
+    policy in effect at each state root.
+
+    Every transaction in a schedule is checked against the
+    sawtooth.validator.transaction_families setting, and most of them share
+    a state root. Parsing the setting once per state root reduces each
+    check to a dictionary lookup.
+    """
+
+    def __init__(self,
+                 settings_view_factory,
+                 size=TRANSACTION_FAMILY_POLICY_CACHE_SIZE):
+        """
+        Args:
+            settings_view_factory (SettingsViewFactory): Read the
+                configuration state
+            size (int): The number of state roots to keep policies for.
+        """
+        self._settings_view_factory = settings_view_factory
+        self._size = size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+        self._hit_count = COLLECTOR.counter(
+            'transaction_family_policy_cache_hit_count', instance=self)
+        self._miss_count = COLLECTOR.counter(
+            'transaction_family_policy_cache_miss_count', instance=self)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
+
+    def get_policy(self, state_root):
+        """Returns the _TransactionFamilyPolicy at the given state root,
+        reading and parsing the setting if it is not cached.
+        """
+        with self._lock:
+            policy = self._cache.get(state_root)
+            if policy is not None:
+                self._cache.move_to_end(state_root)
+                self._hit_count.inc()
+                return policy
+
+        self._miss_count.inc()
+        config = self._settings_view_factory.create_settings_view(
+            state_root)
+        policy = _TransactionFamilyPolicy(
+            config.get_setting(key=TP_SETTINGS_KEY, default_value="[]"))
+
+        with self._lock:
+            self._cache[state_root] = policy
+            self._cache.move_to_end(state_root)
+            while len(self._cache) > self._size:
+                self._cache.popitem(last=False)
+
+        return policy
+
 
 class TransactionExecutorThread(object):
     """A thread of execution controlled by the TransactionExecutor.
@@ -55,7 +198,8 @@ class TransactionExecutorThread(object):
                  scheduler,
                  processor_manager,
                  settings_view_factory,
-                 invalid_observers):
+                 invalid_observers,
+                 policy_cache=None):
         """
         Args:
             service (Interconnect): The zmq internal interface
@@ -66,9 +210,9 @@ class TransactionExecutorThread(object):
                 transaction processor to send to.
             settings_view_factory (SettingsViewFactory): Read the configuration
                 state
-        Attributes:
-            _tp_settings_key (str): the key used to reference the part of state
-                where the list of required transaction processors are.
+            policy_cache (TransactionFamilyPolicyCache): The parsed list of
+                required transaction processors, by state root. A new cache
+                is created from settings_view_factory if none is given.
         """
         super(TransactionExecutorThread, self).__init__()
         self._service = service
@@ -76,7 +220,9 @@ class TransactionExecutorThread(object):
         self._scheduler = scheduler
         self._processor_manager = processor_manager
         self._settings_view_factory = settings_view_factory
-        self._tp_settings_key = "sawtooth.validator.transaction_families"
+        if policy_cache is None:
+            policy_cache = TransactionFamilyPolicyCache(settings_view_factory)
+        self._policy_cache = policy_cache
         self._done = False
         self._invalid_observers = invalid_observers
         self._open_futures = {}
@@ -198,33 +344,11 @@ class TransactionExecutorThread(object):
                 header.family_name,
                 header.family_version)
 
-            config = self._settings_view_factory.create_settings_view(
-                txn_info.state_hash)
-
-            transaction_families = config.get_setting(
-                key=self._tp_settings_key,
-                default_value="[]")
-
-            # After reading the transaction families required in configuration
-            # try to json.loads them into a python object
-            # If there is a misconfiguration, proceed as if there is no
-            # configuration.
-            try:
-                transaction_families = json.loads(transaction_families)
-                required_transaction_processors = [
-                    ProcessorType(
-                        d.get('family'),
-                        d.get('version')) for d in transaction_families]
-            except ValueError:
-                LOGGER.error("sawtooth.validator.transaction_families "
-                             "misconfigured. Expecting a json array, found"
-                             " %s", transaction_families)
-                required_transaction_processors = []
+            policy = self._policy_cache.get_policy(txn_info.state_hash)
 
             # First check if the transaction should be failed
             # based on configuration
-            if required_transaction_processors and \
-                    processor_type not in required_transaction_processors:
+            if not policy.is_allowed(processor_type):
                 # The txn processor type is not in the required
                 # transaction processors so
                 # failing transaction right away
@@ -241,28 +365,12 @@ class TransactionExecutorThread(object):
                     context_id=None)
                 continue
 
-            if processor_type in required_transaction_processors:
+            if policy.is_required(processor_type):
                 # The txn processor type is in the required
                 # transaction processors: check all the outputs of
                 # the transaction match one namespace listed
-                transaction_family = \
-                    next(t for t in transaction_families
-                         if t.get('family') == header.family_name
-                         and t.get('version') == header.family_version)
-
-                # if no namespaces are indicated, then the empty prefix is
-                # inserted by default
-                namespaces = transaction_family.get('namespaces', [''])
-                if not isinstance(namespaces, list):
-                    LOGGER.error("namespaces should be a list for "
-                                 "transaction family (name=%s, version=%s)",
-                                 processor_type.name,
-                                 processor_type.version)
-                prefixes = header.outputs
-                bad_prefixes = [
-                    prefix for prefix in prefixes
-                    if not any(prefix.startswith(n) for n in namespaces)
-                ]
+                bad_prefixes = policy.bad_prefixes(
+                    processor_type, header.outputs)
                 for prefix in bad_prefixes:
                     # log each
                     LOGGER.debug("failing transaction %s of type (name=%s,"
@@ -272,7 +380,7 @@ class TransactionExecutorThread(object):
                                  txn.header_signature,
                                  processor_type.name,
                                  processor_type.version,
-                                 namespaces,
+                                 policy.namespaces(processor_type),
                                  prefix)
 
                 if bad_prefixes:
@@ -397,6 +505,8 @@ class TransactionExecutor(object):
         self._context_manager = context_manager
         self.processor_manager = ProcessorManager(RoundRobinProcessorIterator)
         self._settings_view_factory = settings_view_factory
+        self._policy_cache = TransactionFamilyPolicyCache(
+            settings_view_factory)
         self._executing_threadpool = \
             InstrumentedThreadPoolExecutor(max_workers=5, name='Executing')
         self._alive_threads = []
@@ -485,7 +595,8 @@ class TransactionExecutor(object):
             scheduler=scheduler,
             processor_manager=self.processor_manager,
             settings_view_factory=self._settings_view_factory,
-            invalid_observers=self._invalid_observers)
+            invalid_observers=self._invalid_observers,
+            policy_cache=self._policy_cache)
         self._executing_threadpool.submit(t.execute_thread)
         with self._lock:
             self._alive_threads.append(t)
@@ -31,6 +31,11 @@ from sawtooth_validator.protobuf.network_pb2 import GossipBatchByBatchIdRequest
 from sawtooth_validator.protobuf.network_pb2 import \
     GossipBatchByTransactionIdRequest
 from sawtooth_validator.protobuf.network_pb2 import GossipBlockRequest
+from sawtooth_validator.protobuf.network_pb2 import GossipBlockRangeRequest
+from sawtooth_validator.protobuf.network_pb2 import \
+    GossipStateSnapshotChunkRequest
+from sawtooth_validator.protobuf.network_pb2 import \
+    GossipStateSnapshotManifestRequest
 from sawtooth_validator.protobuf import validator_pb2
 from sawtooth_validator.protobuf.network_pb2 import PeerRegisterRequest
 from sawtooth_validator.protobuf.network_pb2 import PeerUnregisterRequest
@@ -283,6 +288,86 @@ class Gossip(object):
                   connection_id,
                   one_way=True)
 
+    def send_block_chain_requests(self, block_id, chain_length,
+                                  range_length, chain_offset=0,
+                                  exclude=None):
+        """Requests the chain of blocks ending at block_id, split into
+        ranges which are spread across the peers so they are fetched in
+        parallel.
+
+        Args:
+            block_id (str): The id of the newest block of the chain.
+            chain_length (int): The number of blocks to request.
+            range_length (int): The number of blocks to request from each
+                peer at a time.
+            chain_offset (int): The number of the newest blocks of the chain
+                to skip.
+            exclude (list): The connection ids of peers not to ask.
+
+        Returns:
+            list: The (chain_offset, chain_length, connection_id) of each
+                range requested, which is empty if there are no peers to
+                send the requests to.
+        """
+        with self._lock:
+            peers = [
+                connection_id for connection_id in self._peers
+                if self._network.is_connection_handshake_complete(
+                    connection_id)
+                and (exclude is None or connection_id not in exclude)
+            ]
+        if not peers:
+            return []
+
+        random.shuffle(peers)
+        time_to_live = self.get_time_to_live()
+        requested = []
+        end = chain_offset + chain_length
+        for i, offset in enumerate(range(chain_offset, end, range_length)):
+            # Only the range starting with the block itself is passed on
+            # by peers which do not have it, like a plain block request.
+            length = min(range_length, end - offset)
+            connection_id = peers[i % len(peers)]
+            block_request = GossipBlockRequest(
+                block_id=block_id,
+                nonce=binascii.b2a_hex(os.urandom(16)),
+                time_to_live=time_to_live if offset == 0 else 0,
+                chain_length=length,
+                chain_offset=offset)
+            self.send(validator_pb2.Message.GOSSIP_BLOCK_REQUEST,
+                      block_request.SerializeToString(),
+                      connection_id,
+                      one_way=True)
+            requested.append((offset, length, connection_id))
+        return requested
+
+    def send_block_range_request(self, start_block_num, count,
+                                 connection_id):
+        block_range_request = GossipBlockRangeRequest(
+            start_block_num=start_block_num,
+            count=count)
+        self.send(validator_pb2.Message.GOSSIP_BLOCK_RANGE_REQUEST,
+                  block_range_request.SerializeToString(),
+                  connection_id,
+                  one_way=True)
+
+    def send_state_snapshot_manifest_request(self, connection_id):
+        self.send(
+            validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_MANIFEST_REQUEST,
+            GossipStateSnapshotManifestRequest().SerializeToString(),
+            connection_id,
+            one_way=True)
+
+    def send_state_snapshot_chunk_request(self, state_root_hash, chunk_index,
+                                          connection_id):
+        chunk_request = GossipStateSnapshotChunkRequest(
+            state_root_hash=state_root_hash,
+            chunk_index=chunk_index)
+        self.send(validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_CHUNK_REQUEST,
+                  chunk_request.SerializeToString(),
+                  connection_id,
+                  one_way=True)
+
     def broadcast_batch(self, batch, exclude=None, time_to_live=None):
         if time_to_live is None:
             time_to_live = self.get_time_to_live()
@@ -15,12 +15,19 @@
 
 import logging
 import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 
 from sawtooth_signing import create_context
+from sawtooth_signing import ParseError
 from sawtooth_signing.secp256k1 import Secp256k1PublicKey
 
 from sawtooth_validator.protobuf import client_batch_submit_pb2
 from sawtooth_validator.protobuf.transaction_pb2 import TransactionHeader
+from sawtooth_validator.protobuf.batch_pb2 import Batch
 from sawtooth_validator.protobuf.batch_pb2 import BatchHeader
 from sawtooth_validator.protobuf.block_pb2 import BlockHeader
 from sawtooth_validator.protobuf.network_pb2 import GossipMessage
@@ -35,17 +42,126 @@ from sawtooth_validator.journal.timed_cache import TimedCache
 LOGGER = logging.getLogger(__name__)
 COLLECTOR = metrics.get_collector(__name__)
 
+# The signing context holds no per-call state, so a single instance is shared
+# by every verification performed in this process.
+_CONTEXT = create_context('secp256k1')
+
+# A network generally has a small number of active signers, so parsed public
+# keys are cached to avoid deserializing the same key for every signature.
+PUBLIC_KEY_CACHE_SIZE = 1024
+
+
+# The number of verified header signatures remembered by the verified
+# signature cache.
+VERIFIED_SIGNATURE_CACHE_SIZE = 65536
+
+
+class VerifiedSignatureCache:
+    """A bounded, least-recently-used record of header signatures which have
+    already been verified.
+
+    Batches are commonly received twice: once when they are gossiped or
+    submitted by a client, and again inside a gossiped block. Remembering
+    which signatures have been verified allows the second check to skip the
+    ECDSA verification.
+
+    Each signature is stored along with the digest of the header it signs,
+    so a known signature attached to a different header is not considered
+    verified.
+    """
+
+    def __init__(self, size=VERIFIED_SIGNATURE_CACHE_SIZE):
+        self._size = size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+        self._hit_count = COLLECTOR.counter(
+            'signature_cache_hit_count', instance=self)
+        self._miss_count = COLLECTOR.counter(
+            'signature_cache_miss_count', instance=self)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
+
+    def is_verified(self, signature, header):
+        """Returns whether the signature has already been verified against
+        the given header bytes.
+        """
+        digest = hashlib.sha256(header).digest()
+        with self._lock:
+            if self._cache.get(signature) == digest:
+                self._cache.move_to_end(signature)
+                self._hit_count.inc()
+                return True
+
+        self._miss_count.inc()
+        return False
+
+    def add(self, signature, header):
+        """Records that the signature is valid for the given header bytes,
+        evicting the least recently used entry if the cache is full.
+        """
+        digest = hashlib.sha256(header).digest()
+        with self._lock:
+            self._cache[signature] = digest
+            self._cache.move_to_end(signature)
+            while len(self._cache) > self._size:
+                self._cache.popitem(last=False)
+
+    def add_batch(self, batch):
+        """Records the signatures of the batch and of all of its
+        transactions as verified.
+        """
+        self.add(batch.header_signature, batch.header)
+        for txn in batch.transactions:
+            self.add(txn.header_signature, txn.header)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# The verified signature cache is shared by every verifier in the process,
+# so that signatures checked by one handler are not checked again by another.
+VERIFIED_SIGNATURES = VerifiedSignatureCache()
+
+
+@lru_cache(maxsize=PUBLIC_KEY_CACHE_SIZE)
+def _public_key_from_hex(public_key_hex):
+    return Secp256k1PublicKey.from_hex(public_key_hex)
+
+
+def _verify_signature(signature, message, public_key_hex, cached=True):
+    """Verifies the signature, skipping the ECDSA verification of one found
+    in the verified signature cache, and recording it there once verified,
+    unless `cached` is False.
+    """
+    if cached and VERIFIED_SIGNATURES.is_verified(signature, message):
+        return True
+
+    try:
+        public_key = _public_key_from_hex(public_key_hex)
+    except ParseError:
+        LOGGER.debug("unable to parse public key: %s", public_key_hex)
+        return False
+
+    if not _CONTEXT.verify(signature, message, public_key):
+        return False
+
+    if cached:
+        VERIFIED_SIGNATURES.add(signature, message)
+    return True
+
 
 def is_valid_block(block):
     # validate block signature
     header = BlockHeader()
     header.ParseFromString(block.header)
 
-    context = create_context('secp256k1')
-    public_key = Secp256k1PublicKey.from_hex(header.signer_public_key)
-    if not context.verify(block.header_signature,
-                          block.header,
-                          public_key):
+    if not _verify_signature(block.header_signature,
+                             block.header,
+                             header.signer_public_key):
         LOGGER.debug("block failed signature validation: %s",
                      block.header_signature)
         return False
@@ -58,27 +174,31 @@ def is_valid_block(block):
     return True
 
 
-def is_valid_batch(batch):
+def is_valid_batch(batch, cached=True):
     # validate batch signature
     header = BatchHeader()
     header.ParseFromString(batch.header)
 
-    context = create_context('secp256k1')
-    public_key = Secp256k1PublicKey.from_hex(header.signer_public_key)
-    if not context.verify(batch.header_signature,
-                          batch.header,
-                          public_key):
+    if not _verify_signature(batch.header_signature,
+                             batch.header,
+                             header.signer_public_key,
+                             cached):
         LOGGER.debug("batch failed signature validation: %s",
                      batch.header_signature)
         return False
 
+    return _are_valid_batch_transactions(batch, header, cached)
+
+
+def _are_valid_batch_transactions(batch, header, cached=True):
     # validate all transactions in batch
     for txn in batch.transactions:
-        if not is_valid_transaction(txn):
-            return False
-
         txn_header = TransactionHeader()
         txn_header.ParseFromString(txn.header)
+
+        if not _is_valid_transaction(txn, txn_header, cached):
+            return False
+
         if txn_header.batcher_public_key != header.signer_public_key:
             LOGGER.debug("txn batcher public_key does not match signer"
                          "public_key for batch: %s txn: %s",
@@ -94,11 +214,14 @@ def is_valid_transaction(txn):
     header = TransactionHeader()
     header.ParseFromString(txn.header)
 
-    context = create_context('secp256k1')
-    public_key = Secp256k1PublicKey.from_hex(header.signer_public_key)
-    if not context.verify(txn.header_signature,
-                          txn.header,
-                          public_key):
+    return _is_valid_transaction(txn, header)
+
+
+def _is_valid_transaction(txn, header, cached=True):
+    if not _verify_signature(txn.header_signature,
+                             txn.header,
+                             header.signer_public_key,
+                             cached):
         LOGGER.debug("transaction signature invalid for txn: %s",
                      txn.header_signature)
         return False
@@ -113,8 +236,171 @@ def is_valid_transaction(txn):
     return True
 
 
+def _is_valid_serialized_batches(serialized_batches):
+    """Verifies a list of serialized batches. This is the unit of work
+    submitted to the verification process pool, as protobuf messages are
+    passed between processes in their serialized form. The batches were
+    missing from the verified signature cache, so it is not consulted.
+    """
+    batch = Batch()
+    for serialized_batch in serialized_batches:
+        batch.ParseFromString(serialized_batch)
+        if not is_valid_batch(batch, cached=False):
+            return False
+
+    return True
+
+
+class SignatureVerificationEngine:
+    """Verifies the signatures of whole batch lists and blocks in a single
+    call.
+
+    Small batch lists are verified on the calling thread. Once a batch list
+    contains at least `parallel_threshold` signatures, it is split into
+    chunks which are verified concurrently by a pool of worker processes.
+    """
+
+    def __init__(self, max_workers=None, parallel_threshold=256):
+        """
+        Args:
+            max_workers (int): the number of worker processes used to verify
+                large batch lists; if None, the number of processors on the
+                machine is used.
+            parallel_threshold (int): the minimum number of signatures in a
+                batch list before verification is spread across the process
+                pool.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self._max_workers = max_workers
+        self._parallel_threshold = parallel_threshold
+        # The process pool is only started once a large enough batch list is
+        # received.
+        self._pool = None
+        self._lock = threading.Lock()
+
+        self._signature_count = COLLECTOR.counter(
+            'signature_count', instance=self)
+        self._parallel_verification_count = COLLECTOR.counter(
+            'parallel_verification_count', instance=self)
+        self._verification_timer = COLLECTOR.timer(
+            'verification_time', instance=self)
+
+    def verify_block(self, block):
+        """Verifies the signature of the block and of every batch and
+        transaction sent with it.
+
+        Args:
+            block (:obj:`Block`): the block to verify
+
+        Returns:
+            bool: True if all the signatures are valid, False otherwise
+        """
+        header = BlockHeader()
+        header.ParseFromString(block.header)
+
+        if not _verify_signature(block.header_signature,
+                                 block.header,
+                                 header.signer_public_key):
+            LOGGER.debug("block failed signature validation: %s",
+                         block.header_signature)
+            return False
+
+        return self.verify_batches(block.batches)
+
+    def verify_batches(self, batches):
+        """Verifies the signatures of each batch in the list and of all of
+        their transactions.
+
+        Args:
+            batches (list of :obj:`Batch`): the batches to verify
+
+        Returns:
+            bool: True if all the signatures are valid, False otherwise
+        """
+        signature_count = sum(1 + len(b.transactions) for b in batches)
+        self._signature_count.inc(signature_count)
+
+        with self._verification_timer.time():
+            if signature_count < self._parallel_threshold or len(batches) < 2:
+                return all(map(is_valid_batch, batches))
+
+            self._parallel_verification_count.inc()
+            return self._verify_in_parallel(batches, signature_count)
+
+    def _verify_in_parallel(self, batches, signature_count):
+        pool = self._get_pool()
+
+        # Chunks are sized by signature count, rather than by number of
+        # batches, so that the work is spread evenly over the workers.
+        chunk_size = max(
+            signature_count // self._max_workers,
+            self._parallel_threshold // 2)
+
+        # Batches whose signature was verified previously are checked on
+        # the calling thread, as only their transactions remain to check.
+        unverified = []
+        for batch in batches:
+            if VERIFIED_SIGNATURES.is_verified(batch.header_signature,
+                                               batch.header):
+                header = BatchHeader()
+                header.ParseFromString(batch.header)
+                if not _are_valid_batch_transactions(batch, header):
+                    return False
+            else:
+                unverified.append(batch)
+
+        results = []
+        chunk = []
+        chunk_signatures = 0
+        for batch in unverified:
+            chunk.append(batch.SerializeToString())
+            chunk_signatures += 1 + len(batch.transactions)
+            if chunk_signatures >= chunk_size:
+                results.append(pool.apply_async(
+                    _is_valid_serialized_batches, (chunk,)))
+                chunk = []
+                chunk_signatures = 0
+
+        if chunk:
+            results.append(pool.apply_async(
+                _is_valid_serialized_batches, (chunk,)))
+
+        # Once a chunk is invalid, the results of the remaining chunks are
+        # not waited for.
+        valid = all(result.get() for result in results)
+
+        # The worker processes have their own signature caches, so the
+        # verified signatures are recorded in this process's cache as well.
+        if valid:
+            for batch in unverified:
+                VERIFIED_SIGNATURES.add_batch(batch)
+
+        return valid
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # The validator is already running threads which may hold
+                # locks, so the workers are started from a fork server
+                # rather than forked from this process.
+                context = multiprocessing.get_context('forkserver')
+                self._pool = context.Pool(processes=self._max_workers)
+            return self._pool
+
+    def stop(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+
 class GossipMessageSignatureVerifier(Handler):
-    def __init__(self):
+    def __init__(self, verification_engine=None):
+        if verification_engine is None:
+            verification_engine = SignatureVerificationEngine()
+        self._verification_engine = verification_engine
         self._seen_cache = TimedCache()
         self._batch_dropped_count = COLLECTOR.counter(
             'already_validated_batch_dropped_count', instance=self)
@@ -129,7 +415,7 @@ class GossipMessageSignatureVerifier(Handler):
                 self._block_dropped_count.inc()
                 return HandlerResult(status=HandlerStatus.DROP)
 
-            if not is_valid_block(obj):
+            if not self._verification_engine.verify_block(obj):
                 LOGGER.debug("block signature is invalid: %s",
                              obj.header_signature)
                 return HandlerResult(status=HandlerStatus.DROP)
@@ -142,7 +428,7 @@ class GossipMessageSignatureVerifier(Handler):
                 self._batch_dropped_count.inc()
                 return HandlerResult(status=HandlerStatus.DROP)
 
-            if not is_valid_batch(obj):
+            if not self._verification_engine.verify_batches([obj]):
                 LOGGER.debug("batch signature is invalid: %s",
                              obj.header_signature)
                 return HandlerResult(status=HandlerStatus.DROP)
@@ -199,6 +485,11 @@ class GossipBatchResponseSignatureVerifier(Handler):
 
 
 class BatchListSignatureVerifier(Handler):
+    def __init__(self, verification_engine=None):
+        if verification_engine is None:
+            verification_engine = SignatureVerificationEngine()
+        self._verification_engine = verification_engine
+
     def handle(self, connection_id, message_content):
         response_proto = client_batch_submit_pb2.ClientBatchSubmitResponse
 
@@ -213,7 +504,8 @@ class BatchListSignatureVerifier(Handler):
                 LOGGER.debug("TRACE %s: %s", batch.header_signature,
                              self.__class__.__name__)
 
-        if not all(map(is_valid_batch, message_content.batches)):
+        if not self._verification_engine.verify_batches(
+                message_content.batches):
             return make_response(response_proto.INVALID_BATCH)
 
         return HandlerResult(status=HandlerStatus.PASS)
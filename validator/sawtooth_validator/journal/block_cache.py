@@ -13,21 +13,51 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from collections import OrderedDict
 from collections.abc import MutableMapping
 from threading import RLock
 import time
 
 from sawtooth_validator.journal.block_wrapper import NULL_BLOCK_IDENTIFIER
+from sawtooth_validator import metrics
+
+COLLECTOR = metrics.get_collector(__name__)
+
+
+def block_size(block):
+    """Returns the serialized size in bytes of a BlockWrapper, for use as a
+    BlockCache's sizeof function.
+    """
+    return block.get_block().ByteSize()
 
 
 class BlockCache(MutableMapping):
     """
     A dict like interface to access blocks. Stores BlockState objects.
+
+    Blocks are kept in order of last access, so expired blocks are purged
+    from the front of the cache and, if the cache is given a capacity, the
+    least recently accessed blocks are evicted once it is exceeded. Blocks
+    which are referenced by other blocks in the cache and have not been
+    committed to the block store are never purged or evicted.
+
+    Args:
+        block_store (:obj:`BlockStore`): Blocks not in the cache are read
+            from the block store.
+        keep_time (float): How long in seconds to hold a block for
+        purge_frequency (float): How often to look for old blocks to purge
+        max_entries (int): The maximum number of blocks to hold, or None
+        max_size (int): The maximum total size of the blocks to hold, as
+            returned by sizeof, or None
+        sizeof (function): Returns the size of a block, e.g. in bytes
+        name (str): The name to report the cache's resident blocks and size
+            under, or None to not report them
     """
 
     class CachedValue(object):
-        def __init__(self, value):
+        def __init__(self, value, size=0):
             self.value = value
+            self.size = size
             self.timestamp = time.time()  # the time this State was created,
             # used for house keeping, ie when to flush this from the cache.
             self.count = 0
@@ -47,14 +77,27 @@ class BlockCache(MutableMapping):
                 self.count -= 1
             self.touch()
 
-    def __init__(self, block_store=None, keep_time=30, purge_frequency=30):
+    def __init__(self, block_store=None, keep_time=30, purge_frequency=30,
+                 max_entries=None, max_size=None, sizeof=None, name=None):
         super(BlockCache, self).__init__()
         self._lock = RLock()
-        self._cache = {}
+        self._cache = OrderedDict()
         self._keep_time = keep_time
         self._purge_frequency = purge_frequency
         self._next_purge_time = time.time() + purge_frequency
         self._block_store = block_store if block_store is not None else {}
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._sizeof = sizeof
+        self._size = 0
+
+        self._entries_gauge = None
+        self._size_gauge = None
+        if name is not None:
+            self._entries_gauge = COLLECTOR.gauge(
+                'entries', instance=self, tags={'name': name})
+            self._size_gauge = COLLECTOR.gauge(
+                'size', instance=self, tags={'name': name})
 
     @property
     def block_store(self):
@@ -69,6 +112,7 @@ class BlockCache(MutableMapping):
             try:
                 value = self._cache[block_id]
                 value.touch()
+                self._cache.move_to_end(block_id)
                 return value.value
             except KeyError:
                 if block_id in self._block_store:
@@ -79,25 +123,26 @@ class BlockCache(MutableMapping):
 
     def __setitem__(self, block_id, block):
         with self._lock:
-            self._cache[block_id] = self.CachedValue(block)
-            if block_id != NULL_BLOCK_IDENTIFIER and \
-                    block.previous_block_id in self._cache:
-                self._cache[block.previous_block_id].inc_count()
+            self._add(block_id, block)
 
             if time.time() > self._next_purge_time:
                 self._purge_expired()
                 self._next_purge_time = time.time() + self._purge_frequency
+            self._evict()
+            self._update_gauges()
 
     def __delitem__(self, block_id):
         with self._lock:
-            block = self._cache[block_id].value
-            if block.previous_block_id in self._cache:
-                self._cache[block.previous_block_id].dec_count()
-            del self._cache[block_id]
+            if block_id not in self._cache:
+                raise KeyError(block_id)
+            self._remove(block_id)
+            self._update_gauges()
 
     def __iter__(self):
+        # Reading a block moves it to the end of the cache, so iteration is
+        # over a copy of the block ids
         with self._lock:
-            return iter(self._cache)
+            return iter(list(self._cache))
 
     def __len__(self):
         with self._lock:
@@ -120,13 +165,13 @@ class BlockCache(MutableMapping):
             for block in chain:
                 block_id = block.header_signature
                 if block_id not in self._cache:
-                    self._cache[block_id] = self.CachedValue(block)
-                    if block.previous_block_id in self._cache:
-                        self._cache[block.previous_block_id].inc_count()
+                    self._add(block_id, block)
 
             if time.time() > self._next_purge_time:
                 self._purge_expired()
                 self._next_purge_time = time.time() + self._purge_frequency
+            self._evict()
+            self._update_gauges()
 
     @property
     def cache(self):
@@ -141,36 +186,82 @@ class BlockCache(MutableMapping):
         with self._lock:
             return self._purge_frequency
 
+    @property
+    def size(self):
+        """The total size of the blocks in the cache, as returned by the
+        cache's sizeof function.
+        """
+        with self._lock:
+            return self._size
+
+    def _add(self, block_id, block):
+        old_value = self._cache.pop(block_id, None)
+        if old_value is not None:
+            self._size -= old_value.size
+        size = 0
+        if self._sizeof is not None and block is not None:
+            size = self._sizeof(block)
+        self._cache[block_id] = self.CachedValue(block, size)
+        self._size += size
+        if block_id != NULL_BLOCK_IDENTIFIER and \
+                block.previous_block_id in self._cache:
+            self._cache[block.previous_block_id].inc_count()
+            self._cache.move_to_end(block.previous_block_id)
+
+    def _remove(self, block_id):
+        value = self._cache.pop(block_id)
+        self._size -= value.size
+        block = value.value
+        # Handle NULL_BLOCK_IDENTIFIER
+        if block is not None and block.previous_block_id in self._cache:
+            self._cache[block.previous_block_id].dec_count()
+            self._cache.move_to_end(block.previous_block_id)
+
+    def _is_pinned(self, block_id, value):
+        """Blocks which are referenced by other blocks in the cache are kept
+        until they are committed to the block store.
+        """
+        return value.count > 0 and block_id not in self._block_store
+
     def _purge_expired(self):
         """
-        Remove all expired entries from the cache that do not have a reference
-        count.
+        Remove expired entries from the front of the cache that do not have a
+        reference count.
         """
         time_horizon = time.time() - self._keep_time
-        new_cache = {}
-        dec_count_for = []
-        for (k, v) in self._cache.items():
-            if v.count > 0:
-                if k not in self._block_store:
-                    new_cache[k] = v
-                else:
-                    if v.timestamp > time_horizon:
-                        new_cache[k] = v
-                    else:
-                        block = v.value
-                        if block is not None:
-                            dec_count_for.append(block.previous_block_id)
-
-            elif v.timestamp > time_horizon:
-                new_cache[k] = v
+        # Pinned blocks are moved to the end as they are passed over, so each
+        # block is looked at no more than once
+        for _ in range(len(self._cache)):
+            block_id, value = next(iter(self._cache.items()))
+            if value.timestamp > time_horizon:
+                break
+            if self._is_pinned(block_id, value):
+                self._cache.move_to_end(block_id)
+            else:
+                self._remove(block_id)
+
+    def _over_capacity(self):
+        return (
+            (self._max_entries is not None
+             and len(self._cache) > self._max_entries)
+            or (self._max_size is not None
+                and self._size > self._max_size))
 
+    def _evict(self):
+        """
+        Remove the least recently accessed blocks that are not pinned until
+        the cache is within its capacity.
+        """
+        for _ in range(len(self._cache)):
+            if not self._over_capacity():
+                break
+            block_id, value = next(iter(self._cache.items()))
+            if self._is_pinned(block_id, value):
+                self._cache.move_to_end(block_id)
             else:
-                block = v.value
-                # Handle NULL_BLOCK_IDENTIFIER
-                if block is not None:
-                    dec_count_for.append(block.previous_block_id)
-
-        self._cache = new_cache
-        for block_id in dec_count_for:
-            if block_id in self._cache:
-                self._cache[block_id].dec_count()
+                self._remove(block_id)
+
+    def _update_gauges(self):
+        if self._entries_gauge is not None:
+            self._entries_gauge.set_value(len(self._cache))
+            self._size_gauge.set_value(self._size)
@@ -14,12 +14,28 @@
 # ------------------------------------------------------------------------------
 
 # pylint: disable=no-name-in-module
+from collections import OrderedDict
 from collections.abc import MutableMapping
+import threading
 
 from sawtooth_validator.journal.block_wrapper import BlockStatus
 from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.protobuf.batch_pb2 import Batch
 from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.transaction_pb2 import Transaction
 from sawtooth_validator.state.merkle import INIT_ROOT_KEY
+from sawtooth_validator import metrics
+
+COLLECTOR = metrics.get_collector(__name__)
+
+# The total serialized size, in bytes, of the decoded blocks kept in memory
+# by a BlockStore.
+DEFAULT_DECODED_BLOCK_CACHE_SIZE = 64 * 1024 * 1024
+
+# The field numbers of the repeated batches of a Block and transactions of a
+# Batch, as found in their serialized form.
+_BLOCK_BATCHES_FIELD = 3
+_BATCH_TRANSACTIONS_FIELD = 3
 
 
 class BlockStore(MutableMapping):
@@ -29,8 +45,16 @@ class BlockStore(MutableMapping):
     retrieved.
     """
 
-    def __init__(self, block_db):
+    def __init__(self, block_db,
+                 decoded_cache_size=DEFAULT_DECODED_BLOCK_CACHE_SIZE):
+        """
+        Args:
+            block_db (Database): The database in which blocks are stored.
+            decoded_cache_size (int): The total serialized size, in bytes,
+                of the recently read blocks kept decoded in memory.
+        """
         self._block_store = block_db
+        self._decoded_blocks = _DecodedBlockCache(decoded_cache_size)
 
     def __setitem__(self, key, value):
         if key != value.identifier:
@@ -38,12 +62,14 @@ class BlockStore(MutableMapping):
                 "Invalid key to store block under: {} expected {}".format(
                     key, value.identifier))
         self._block_store.put(key, value)
+        self._decoded_blocks.discard([key])
 
     def __getitem__(self, key):
         return self._get_block(key)
 
     def __delitem__(self, key):
         del self._block_store[key]
+        self._decoded_blocks.discard([key])
 
     def __contains__(self, x):
         return x in self._block_store
@@ -123,14 +149,34 @@ class BlockStore(MutableMapping):
 
         self._block_store.update(add_pairs, del_keys)
 
+        # Blocks of an abandoned fork must no longer be served, and the new
+        # chain's blocks, the head in particular, are likely to be read next
+        self._decoded_blocks.discard(del_keys + [k for k, _ in add_pairs])
+        generation = self._decoded_blocks.generation
+        for blkw in reversed(new_chain):
+            self._decoded_blocks.put(
+                BlockWrapper(status=BlockStatus.Valid, block=blkw.block),
+                generation)
+
     @property
     def chain_head(self):
         """
         Return the head block of the current chain.
         """
+        generation = self._decoded_blocks.generation
         with self._block_store.cursor(index='block_num') as curs:
             curs.last()
-            return curs.value()
+            block_num = curs.key()
+            if block_num is None:
+                return None
+
+            block = self._decoded_blocks.get_by_num(int(block_num, 16))
+            if block is None:
+                block = curs.value()
+                if block is not None:
+                    self._decoded_blocks.put(block, generation)
+
+            return block
 
     def chain_head_state_root(self):
         """
@@ -181,6 +227,29 @@ class BlockStore(MutableMapping):
             ValueError: If start_block or start_block_num do not specify a
                 valid block
         """
+        if reverse:
+            # Walk back through the predecessors, so that recently read
+            # blocks are served decoded
+            if start_block:
+                start_block_num = start_block.block_num
+            elif start_block_num:
+                start_block_num = int(start_block_num, 16)
+
+            if start_block_num is not None:
+                try:
+                    block = self.get_block_by_number(start_block_num)
+                except KeyError:
+                    raise ValueError(
+                        'Block number {} does not reference a valid '
+                        'block'.format(start_block_num))
+            else:
+                block = self.chain_head
+
+            while block is not None:
+                yield block
+                block = self._get_cached_or_stored(block.previous_block_id)
+            return
+
         with self._block_store.cursor(index='block_num') as curs:
             if start_block:
                 start_block_num = BlockStore.block_num_to_hex(
@@ -193,28 +262,26 @@ class BlockStore(MutableMapping):
                     raise ValueError('Block number {} does not reference a '
                                      'valid block'.format(start_block_num))
 
-            iterator = None
-            if reverse:
-                iterator = curs.iter_rev()
-            else:
-                iterator = curs.iter()
-
-            for block in iterator:
+            for block in curs.iter():
                 yield block
 
     @staticmethod
     def _batch_index_keys(block):
+        # Each batch is indexed along with its position in the block
         blkw = BlockWrapper.wrap(block)
-        return [batch.header_signature.encode()
-                for batch in blkw.batches]
+        return [(batch.header_signature.encode(), str(i).encode())
+                for i, batch in enumerate(blkw.batches)]
 
     @staticmethod
     def _transaction_index_keys(block):
+        # Each transaction is indexed along with the position of its batch
+        # in the block and its position in that batch
         blkw = BlockWrapper.wrap(block)
         keys = []
-        for batch in blkw.batches:
-            for txn in batch.transactions:
-                keys.append(txn.header_signature.encode())
+        for i, batch in enumerate(blkw.batches):
+            for j, txn in enumerate(batch.transactions):
+                keys.append((txn.header_signature.encode(),
+                             '{}:{}'.format(i, j).encode()))
         return keys
 
     @staticmethod
@@ -237,11 +304,25 @@ class BlockStore(MutableMapping):
         return "{0:#0{1}x}".format(block_num, 18)
 
     def _get_block(self, key):
-        value = self._block_store.get(key)
-        if value is None:
+        block = self._get_cached_or_stored(key)
+        if block is None:
             raise KeyError('Block "{}" not found in store'.format(key))
 
-        return BlockWrapper.wrap(value)
+        return block
+
+    def _get_cached_or_stored(self, block_id):
+        block = self._decoded_blocks.get(block_id)
+        if block is not None:
+            return block
+
+        generation = self._decoded_blocks.generation
+        value = self._block_store.get(block_id)
+        if value is None:
+            return None
+
+        block = BlockWrapper.wrap(value)
+        self._decoded_blocks.put(block, generation)
+        return block
 
     def get_blocks(self, block_ids):
         """Returns all blocks with the given set of block_ids.
@@ -254,7 +335,22 @@ class BlockStore(MutableMapping):
         Returns
             list of block wrappers found for the given block ids
         """
-        return [block for _, block in self._block_store.get_multi(block_ids)]
+        block_ids = list(block_ids)
+        found = {}
+        for block_id in block_ids:
+            block = self._decoded_blocks.get(block_id)
+            if block is not None:
+                found[block_id] = block
+
+        generation = self._decoded_blocks.generation
+        for block_id, block in self._block_store.get_multi(
+                [block_id for block_id in block_ids
+                 if block_id not in found]):
+            found[block_id] = block
+            self._decoded_blocks.put(block, generation)
+
+        return [found[block_id] for block_id in block_ids
+                if block_id in found]
 
     def get_block_by_transaction_id(self, txn_id):
         """Returns the block that contains the given transaction id.
@@ -287,12 +383,18 @@ class BlockStore(MutableMapping):
         Raises:
             KeyError if no block with the given number is found
         """
+        block = self._decoded_blocks.get_by_num(block_num)
+        if block is not None:
+            return block
+
+        generation = self._decoded_blocks.generation
         block = self._block_store.get(
             BlockStore.block_num_to_hex(block_num), index='block_num')
         if not block:
             raise KeyError(
                 'Block number "{}" not in BlockStore'.format(block_num))
 
+        self._decoded_blocks.put(block, generation)
         return block
 
     def has_transaction(self, txn_id):
@@ -355,18 +457,35 @@ class BlockStore(MutableMapping):
         """
         Check to see if the requested transaction_id is in the current chain.
         If so, find the batch that has the transaction referenced by the
-        transaction_id and return the batch. This is done by finding the block
-        and searching for the batch.
+        transaction_id and return the batch. The batch is located through the
+        position recorded in the transaction index, so only the batch is
+        decoded from the block.
 
         :param transaction_id (string): The id of the transaction that is being
             requested.
         :return:
         The batch that has the transaction.
         """
-        block = self.get_block_by_transaction_id(transaction_id)
-        if block is None:
-            return None
-        # Find batch in block
+        located = self._block_store.get_multi_located(
+            [transaction_id], index='transaction')
+        if not located:
+            raise ValueError(
+                'Transaction "{}" not in BlockStore'.format(transaction_id))
+
+        _, location, value = located[0]
+        if location is not None:
+            batch_position, _ = _parse_location(location)
+            batch = Batch.FromString(_read_field(
+                BlockStore._pack_block(value),
+                _BLOCK_BATCHES_FIELD,
+                batch_position))
+            if any(txn.header_signature == transaction_id
+                   for txn in batch.transactions):
+                return batch
+
+        # Indexed before positions were recorded, or the recorded position
+        # does not hold the transaction, so the whole block is searched
+        block = BlockStore._wrap_block(value)
         for batch in block.batches:
             for txn in batch.transactions:
                 if txn.header_signature == transaction_id:
@@ -376,33 +495,58 @@ class BlockStore(MutableMapping):
     def get_batch(self, batch_id):
         """
         Check to see if the requested batch_id is in the current chain. If so,
-        find the batch with the batch_id and return it. This is done by
-        finding the block and searching for the batch.
+        find the batch with the batch_id and return it.
 
         :param batch_id (string): The id of the batch requested.
         :return:
         The batch with the batch_id.
         """
-        block = self.get_block_by_batch_id(batch_id)
-        return BlockStore._get_batch_from_block(block, batch_id)
+        batches = self.get_batches([batch_id])
+        if not batches:
+            raise ValueError('Batch "{}" not in BlockStore'.format(batch_id))
+
+        return batches[0]
 
     def get_batches(self, batch_ids):
         """Returns a list of committed batches from a iterable of batch ids.
         Any batch id that does not exist in a committed block is ignored.
 
+        The position of each batch within its block is recorded in the batch
+        index, so only the requested batches are decoded.
+
         Args:
             batch_ids (:iterable:str): the batch ids to find
 
         Returns:
             A list of the batches found by the given batch ids
         """
-        blocks = self._block_store.get_multi(batch_ids, index='batch')
+        located = self._block_store.get_multi_located(
+            batch_ids, index='batch')
 
         return [
-            BlockStore._get_batch_from_block(block, batch_id)
-            for batch_id, block in blocks
+            BlockStore._get_located_batch(value, location, batch_id)
+            for batch_id, location, value in located
         ]
 
+    @staticmethod
+    def _get_located_batch(value, location, batch_id):
+        if location is None:
+            # Indexed before positions were recorded
+            return BlockStore._get_batch_from_block(
+                BlockStore._wrap_block(value), batch_id)
+
+        batch_position, = _parse_location(location)
+        batch = Batch.FromString(_read_field(
+            BlockStore._pack_block(value),
+            _BLOCK_BATCHES_FIELD,
+            batch_position))
+        if batch.header_signature != batch_id:
+            raise ValueError(
+                'Batch {} not at position {} of its block: possible index '
+                'mismatch'.format(batch_id, batch_position))
+
+        return batch
+
     @staticmethod
     def _get_batch_from_block(block, batch_id):
         for batch in block.batches:
@@ -425,18 +569,69 @@ class BlockStore(MutableMapping):
         Raises:
             ValueError: The transaction is not in the block store
         """
-        block = self.get_block_by_transaction_id(transaction_id)
-        return BlockStore._get_txn_from_block(block, transaction_id)
+        transactions = self.get_transactions([transaction_id])
+        if not transactions:
+            raise ValueError(
+                'Transaction "{}" not in BlockStore'.format(transaction_id))
+
+        return transactions[0]
 
     def get_transactions(self, transaction_ids):
-        blocks = self._block_store.get_multi(transaction_ids,
-                                             index='transaction')
+        """Returns a list of committed transactions from a iterable of
+        transaction ids. Any transaction id that does not exist in a committed
+        block is ignored.
+
+        The position of each transaction within its block is recorded in the
+        transaction index, so only the requested transactions are decoded.
+
+        Args:
+            transaction_ids (:iterable:str): the transaction ids to find
+
+        Returns:
+            A list of the transactions found by the given transaction ids
+        """
+        located = self._block_store.get_multi_located(
+            transaction_ids, index='transaction')
 
         return [
-            BlockStore._get_txn_from_block(block, txn_id)
-            for txn_id, block in blocks
+            BlockStore._get_located_txn(value, location, txn_id)
+            for txn_id, location, value in located
         ]
 
+    @staticmethod
+    def _get_located_txn(value, location, txn_id):
+        if location is None:
+            # Indexed before positions were recorded
+            return BlockStore._get_txn_from_block(
+                BlockStore._wrap_block(value), txn_id)
+
+        batch_position, txn_position = _parse_location(location)
+        batch = _read_field(
+            BlockStore._pack_block(value),
+            _BLOCK_BATCHES_FIELD,
+            batch_position)
+        txn = Transaction.FromString(
+            _read_field(batch, _BATCH_TRANSACTIONS_FIELD, txn_position))
+        if txn.header_signature != txn_id:
+            raise ValueError(
+                'Transaction {} not at position {} of its block: possible '
+                'index mismatch'.format(txn_id, location.decode()))
+
+        return txn
+
+    @staticmethod
+    def _pack_block(value):
+        # The DictDatabase used in tests stores blocks unserialized
+        if isinstance(value, bytes):
+            return value
+        return BlockStore.serialize_block(BlockWrapper.wrap(value))
+
+    @staticmethod
+    def _wrap_block(value):
+        if isinstance(value, bytes):
+            return BlockStore.deserialize_block(value)
+        return BlockWrapper.wrap(value)
+
     def get_transaction_count(self):
         """Returns the count of transactions in the block store.
 
@@ -471,3 +666,165 @@ class BlockStore(MutableMapping):
         raise ValueError(
             'Transaction {} not in block {}: possible index mismatch'.format(
                 txn_id, block.identifier))
+
+
+class _DecodedBlockCache(object):
+    """A least-recently-used cache of decoded blocks, bounded by the total
+    serialized size of the blocks it holds.
+
+    Blocks read from the store are looked up by id and, as the store only
+    holds a single chain, by block number.
+
+    Removing blocks advances the cache's generation; a block read from the
+    store before a removal is not added afterwards, so that a block replaced
+    by a fork is not cached again by a concurrent reader.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._lock = threading.Lock()
+        # block id -> (block, serialized size)
+        self._blocks = OrderedDict()
+        self._ids_by_num = {}
+        self._resident_bytes = 0
+        self._generation = 0
+
+        self._hit_count = COLLECTOR.counter(
+            'decoded_block_cache_hit_count', instance=self)
+        self._miss_count = COLLECTOR.counter(
+            'decoded_block_cache_miss_count', instance=self)
+        self._resident_bytes_gauge = COLLECTOR.gauge(
+            'decoded_block_cache_bytes', instance=self)
+        self._resident_bytes_gauge.set_value(0)
+
+    @property
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def get(self, block_id):
+        with self._lock:
+            return self._get(block_id)
+
+    def get_by_num(self, block_num):
+        with self._lock:
+            block_id = self._ids_by_num.get(block_num)
+            if block_id is None:
+                self._miss_count.inc()
+                return None
+            return self._get(block_id)
+
+    def _get(self, block_id):
+        entry = self._blocks.get(block_id)
+        if entry is None:
+            self._miss_count.inc()
+            return None
+
+        self._blocks.move_to_end(block_id)
+        self._hit_count.inc()
+        return entry[0]
+
+    def put(self, block, generation):
+        """Adds a block read from the store, unless blocks have been removed
+        since the given generation or the block is larger than the cache.
+        """
+        block_size = block.block.ByteSize()
+        if block_size > self._size:
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._remove(block.identifier)
+            self._blocks[block.identifier] = (block, block_size)
+            self._ids_by_num[block.block_num] = block.identifier
+            self._resident_bytes += block_size
+
+            while self._resident_bytes > self._size:
+                self._remove(next(iter(self._blocks)))
+
+            self._resident_bytes_gauge.set_value(self._resident_bytes)
+
+    def discard(self, block_ids):
+        with self._lock:
+            self._generation += 1
+            for block_id in block_ids:
+                self._remove(block_id)
+            self._resident_bytes_gauge.set_value(self._resident_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._blocks.clear()
+            self._ids_by_num.clear()
+            self._resident_bytes = 0
+            self._resident_bytes_gauge.set_value(0)
+
+    def _remove(self, block_id):
+        entry = self._blocks.pop(block_id, None)
+        if entry is None:
+            return
+
+        block, block_size = entry
+        self._resident_bytes -= block_size
+        if self._ids_by_num.get(block.block_num) == block_id:
+            del self._ids_by_num[block.block_num]
+
+
+def _parse_location(location):
+    return tuple(int(position) for position in location.split(b':'))
+
+
+def _read_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_field(buf, field_number, position):
+    """Returns the bytes of an entry of a repeated, length-delimited field in
+    a serialized protobuf message, without decoding the rest of the message.
+
+    Args:
+        buf (bytes): the serialized message
+        field_number (int): the number of the repeated field
+        position (int): the position of the entry within the field
+
+    Returns:
+        bytes: the serialized entry
+
+    Raises:
+        ValueError: if the field has no entry at the given position
+    """
+    view = memoryview(buf)
+    pos = 0
+    count = 0
+    while pos < len(view):
+        tag, pos = _read_varint(view, pos)
+        wire_type = tag & 0x7
+        if wire_type == 0:
+            _, pos = _read_varint(view, pos)
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 5:
+            pos += 4
+        elif wire_type == 2:
+            length, pos = _read_varint(view, pos)
+            if tag >> 3 == field_number:
+                if count == position:
+                    return bytes(view[pos:pos + length])
+                count += 1
+            pos += length
+        else:
+            raise ValueError(
+                'Unsupported wire type {} in message'.format(wire_type))
+
+    raise ValueError(
+        'No entry at position {} of field {}'.format(position, field_number))
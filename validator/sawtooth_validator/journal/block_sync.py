@@ -0,0 +1,367 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import logging
+import time
+from collections import deque
+from collections import namedtuple
+from threading import Event
+from threading import RLock
+
+from google.protobuf.message import DecodeError
+
+from sawtooth_validator.concurrent.thread import InstrumentedThread
+from sawtooth_validator.gossip import signature_verifier
+from sawtooth_validator.gossip import structure_verifier
+from sawtooth_validator.journal.chain import ChainObserver
+from sawtooth_validator.journal.timed_cache import TimedCache
+from sawtooth_validator.networking.dispatch import Handler
+from sawtooth_validator.networking.dispatch import HandlerResult
+from sawtooth_validator.networking.dispatch import HandlerStatus
+from sawtooth_validator.protobuf import network_pb2
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator import metrics
+
+LOGGER = logging.getLogger(__name__)
+COLLECTOR = metrics.get_collector(__name__)
+
+# The number of blocks requested from a peer in a single range request
+BLOCK_SYNC_RANGE_LENGTH = 256
+# The number of range requests which may be outstanding at once. Blocks are
+# not requested further ahead of the chain head than these requests cover,
+# so the sync does not run ahead of block validation.
+BLOCK_SYNC_RANGES = 8
+# Time in seconds to wait for a response before asking another peer
+BLOCK_SYNC_REQUEST_TIMEOUT = 30
+# Time in seconds a peer which failed to serve a range is not asked again
+BLOCK_SYNC_PEER_BACKOFF = 300
+# Time in seconds between checks for requests which have timed out
+BLOCK_SYNC_CHECK_FREQUENCY = 1
+
+_RangeRequest = namedtuple(
+    '_RangeRequest', ['connection_id', 'count', 'sent_at'])
+
+
+def _is_valid_block(block):
+    return (structure_verifier.is_valid_block(block)
+            and signature_verifier.is_valid_block(block))
+
+
+class BlockSync(ChainObserver):
+    """Fetches a long run of missing blocks from peers by block number.
+
+    The blocks following the chain head are requested in ranges, several at
+    a time and spread across peers. The blocks of each response are verified
+    in parallel and then handed to the completer in order of block number,
+    so each block arrives after its predecessor and is passed straight on to
+    the chain controller.
+
+    Requests which are not answered in time are asked of another peer.
+    They are checked for on a thread of their own, started by start(), so
+    that a sync does not wait on the next block to arrive.
+    """
+
+    def __init__(self,
+                 completer,
+                 gossip,
+                 block_store,
+                 verify_pool,
+                 range_length=BLOCK_SYNC_RANGE_LENGTH,
+                 ranges=BLOCK_SYNC_RANGES,
+                 request_timeout=BLOCK_SYNC_REQUEST_TIMEOUT,
+                 check_frequency=BLOCK_SYNC_CHECK_FREQUENCY):
+        """
+        Args:
+            completer (:obj:`Completer`): Receives the synced blocks.
+            gossip (:obj:`Gossip`): Sends range requests to peers.
+            block_store (:obj:`BlockStore`): Provides the chain head.
+            verify_pool (:obj:`Executor`): Verifies the blocks of a range in
+                parallel.
+            range_length (int): The number of blocks to request from a peer
+                at a time.
+            ranges (int): The number of range requests which may be
+                outstanding at once.
+            request_timeout (float): Time in seconds to wait for a response
+                before asking another peer.
+            check_frequency (float): Time in seconds between checks for
+                requests which have timed out.
+        """
+        self._completer = completer
+        self._gossip = gossip
+        self._block_store = block_store
+        self._verify_pool = verify_pool
+        self._range_length = range_length
+        self._ranges = ranges
+        self._request_timeout = request_timeout
+        self._check_frequency = check_frequency
+
+        self._lock = RLock()
+        # The highest block number being synced, or None when idle
+        self._target = None
+        # The next block number to request
+        self._next_block_num = None
+        # The next block number to hand to the completer
+        self._deliver_block_num = None
+        # Outstanding requests, by the number of their first block
+        self._requests = {}
+        # (start_block_num, count) of ranges which must be requested again
+        self._retry = deque()
+        # Verified blocks waiting for their predecessors to be delivered,
+        # by the number of their first block
+        self._received = {}
+        self._delivering = False
+        self._failed_peers = TimedCache(BLOCK_SYNC_PEER_BACKOFF)
+        self._next_peer = 0
+        self._stopped = Event()
+        self._thread = None
+
+        self._synced_block_count = COLLECTOR.counter(
+            'synced_block_count', instance=self)
+        self._range_requests = COLLECTOR.gauge(
+            'range_requests', instance=self)
+
+    def start(self):
+        """Starts checking for requests which have timed out."""
+        self._stopped.clear()
+        self._thread = InstrumentedThread(
+            target=self._run, name='BlockSync', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self._check_frequency):
+            try:
+                self.check_requests()
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Unhandled exception checking block range "
+                                 "requests")
+
+    def check_requests(self):
+        """Asks another peer for the ranges whose requests have timed out.
+        """
+        with self._lock:
+            if self._target is None:
+                return
+            self._expire_requests()
+            self._send_requests()
+
+    def sync_to(self, block_num):
+        """Syncs the blocks following the chain head up to block_num, or
+        extends the sync in progress to it.
+
+        Returns:
+            bool: False if no peer is able to serve the blocks.
+        """
+        with self._lock:
+            if self._target is None:
+                start_block_num = self._chain_head_num() + 1
+                if block_num < start_block_num:
+                    return False
+                LOGGER.info("Syncing blocks %s to %s from peers",
+                            start_block_num, block_num)
+                self._next_block_num = start_block_num
+                self._deliver_block_num = start_block_num
+                self._target = block_num
+            else:
+                self._target = max(self._target, block_num)
+
+            self._expire_requests()
+            self._send_requests()
+            return self._target is not None
+
+    def chain_update(self, block, receipts):
+        with self._lock:
+            if self._target is None:
+                return
+            self._expire_requests()
+            self._send_requests()
+
+    def add_response(self, connection_id, block_range_response):
+        start_block_num = block_range_response.start_block_num
+        with self._lock:
+            request = self._requests.get(start_block_num)
+            if request is None or request.connection_id != connection_id:
+                LOGGER.debug("Dropping unexpected block range response "
+                             "from %s", connection_id)
+                return
+            del self._requests[start_block_num]
+
+        blocks = self._verify_blocks(
+            start_block_num, block_range_response.blocks[:request.count])
+
+        with self._lock:
+            if self._target is None:
+                return
+            if len(blocks) < len(block_range_response.blocks):
+                LOGGER.debug("Peer %s sent invalid blocks for range "
+                             "starting at %s", connection_id, start_block_num)
+                self._failed_peers[connection_id] = None
+            elif not blocks:
+                LOGGER.debug("Peer %s does not have block %s",
+                             connection_id, start_block_num)
+                self._failed_peers[connection_id] = None
+
+            if blocks:
+                self._received[start_block_num] = blocks
+            if len(blocks) < request.count:
+                self._retry.append((start_block_num + len(blocks),
+                                    request.count - len(blocks)))
+            self._send_requests()
+
+        self._deliver()
+
+    def _verify_blocks(self, start_block_num, contents):
+        """Returns the longest run of the blocks which are valid, numbered
+        consecutively from start_block_num and each linked to the one before
+        it.
+        """
+        blocks = []
+        headers = []
+        try:
+            for content in contents:
+                block = Block()
+                block.ParseFromString(content)
+                header = BlockHeader()
+                header.ParseFromString(block.header)
+                blocks.append(block)
+                headers.append(header)
+        except DecodeError:
+            LOGGER.debug("Unable to parse block in range starting at %s",
+                         start_block_num)
+
+        valid = list(self._verify_pool.map(_is_valid_block, blocks))
+
+        for i, header in enumerate(headers):
+            if not valid[i] or header.block_num != start_block_num + i:
+                return blocks[:i]
+            if i > 0 and \
+                    header.previous_block_id != blocks[i - 1].header_signature:
+                return blocks[:i]
+        return blocks
+
+    def _deliver(self):
+        # Blocks are only handed to the completer by one thread at a time,
+        # so that they arrive in order.
+        with self._lock:
+            if self._delivering:
+                return
+            self._delivering = True
+
+        while True:
+            with self._lock:
+                blocks = None
+                if self._target is not None:
+                    blocks = self._received.pop(self._deliver_block_num, None)
+                if blocks is None:
+                    self._delivering = False
+                    self._check_complete()
+                    return
+                self._deliver_block_num += len(blocks)
+
+            try:
+                for block in blocks:
+                    self._completer.add_block(block)
+            except Exception:
+                with self._lock:
+                    self._delivering = False
+                raise
+            self._synced_block_count.inc(len(blocks))
+
+    def _check_complete(self):
+        if self._target is None or self._deliver_block_num <= self._target:
+            return
+        if self._requests or self._retry:
+            return
+        LOGGER.info("Synced blocks up to %s", self._target)
+        self._stop()
+
+    def _send_requests(self):
+        limit = min(
+            self._target,
+            self._chain_head_num() + self._range_length * self._ranges)
+        while len(self._requests) < self._ranges:
+            if self._retry:
+                start_block_num, count = self._retry.popleft()
+            elif self._next_block_num <= limit:
+                start_block_num = self._next_block_num
+                count = min(self._range_length, limit - start_block_num + 1)
+                self._next_block_num += count
+            else:
+                break
+
+            connection_id = self._choose_peer()
+            if connection_id is None:
+                self._retry.appendleft((start_block_num, count))
+                break
+
+            self._requests[start_block_num] = _RangeRequest(
+                connection_id, count, time.time())
+            self._gossip.send_block_range_request(
+                start_block_num, count, connection_id)
+
+        self._range_requests.set_value(len(self._requests))
+
+        if not self._requests and self._retry:
+            LOGGER.info("No peers are able to serve blocks from %s, "
+                        "stopping block sync", self._retry[0][0])
+            self._stop()
+
+    def _choose_peer(self):
+        peers = sorted(
+            connection_id for connection_id in self._gossip.get_peers()
+            if connection_id not in self._failed_peers)
+        if not peers:
+            return None
+        self._next_peer = (self._next_peer + 1) % len(peers)
+        return peers[self._next_peer]
+
+    def _expire_requests(self):
+        now = time.time()
+        for start_block_num, request in list(self._requests.items()):
+            if now - request.sent_at > self._request_timeout:
+                LOGGER.debug("Block range request to %s timed out",
+                             request.connection_id)
+                del self._requests[start_block_num]
+                self._failed_peers[request.connection_id] = None
+                self._retry.append((start_block_num, request.count))
+
+    def _stop(self):
+        self._target = None
+        self._requests.clear()
+        self._retry.clear()
+        self._received.clear()
+        self._range_requests.set_value(0)
+
+    def _chain_head_num(self):
+        chain_head = self._block_store.chain_head
+        return chain_head.block_num if chain_head is not None else -1
+
+
+class BlockSyncResponseHandler(Handler):
+    def __init__(self, block_sync):
+        self._block_sync = block_sync
+
+    def handle(self, connection_id, message_content):
+        block_range_response = network_pb2.GossipBlockRangeResponse()
+        block_range_response.ParseFromString(message_content)
+        self._block_sync.add_response(connection_id, block_range_response)
+
+        return HandlerResult(HandlerStatus.PASS)
@@ -14,10 +14,15 @@
 # ------------------------------------------------------------------------------
 
 import logging
+import time
+from threading import Event
 from threading import RLock
 from collections import deque
+from collections import namedtuple
 
+from sawtooth_validator.concurrent.thread import InstrumentedThread
 from sawtooth_validator.journal.block_cache import BlockCache
+from sawtooth_validator.journal.block_cache import block_size
 from sawtooth_validator.journal.block_wrapper import BlockWrapper
 from sawtooth_validator.journal.block_wrapper import NULL_BLOCK_IDENTIFIER
 from sawtooth_validator.journal.timed_cache import TimedCache
@@ -31,6 +36,41 @@ from sawtooth_validator import metrics
 LOGGER = logging.getLogger(__name__)
 COLLECTOR = metrics.get_collector(__name__)
 
+# The number of blocks requested from a single peer in one chain request
+CHAIN_REQUEST_RANGE_LENGTH = 64
+# The number of chain requests which may be outstanding at once
+CHAIN_REQUEST_RANGES = 16
+# Time in seconds to wait for the blocks of a chain request before asking
+# another peer for those which are still missing
+CHAIN_REQUEST_TIMEOUT = 10
+# Time in seconds between checks for chain requests which have timed out
+CHAIN_REQUEST_CHECK_FREQUENCY = 1
+# Gaps longer than a full set of chain requests are filled by block sync
+BLOCK_SYNC_MIN_BLOCKS = CHAIN_REQUEST_RANGE_LENGTH * CHAIN_REQUEST_RANGES
+# The maximum size in bytes of the blocks and of the batches held by the
+# completer, so a burst of gossip cannot grow them without bound
+CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+
+# A range of missing predecessors requested from a peer. The range covers
+# the chain_length blocks ending chain_offset blocks below block_id, which is
+# block number block_num, on the chain ending at head_id, the missing
+# predecessor first requested. tried holds the peers which have been asked
+# for it.
+_ChainRange = namedtuple(
+    '_ChainRange',
+    ['head_id', 'block_id', 'block_num', 'chain_offset', 'chain_length',
+     'tried', 'sent_at'])
+
+
+def _batch_size(batch):
+    return batch.ByteSize()
+
+
+def _chain_range_block_nums(chain_range):
+    newest = chain_range.block_num - chain_range.chain_offset
+    return range(newest - chain_range.chain_length + 1, newest + 1)
+
 
 class Completer(object):
     """
@@ -42,6 +82,11 @@ class Completer(object):
     is sent sent out over the gossip network. It also checks that all batches
     have their dependencies satisifed, otherwise it will request the batch that
     has the missing transaction.
+
+    Missing predecessors requested as chain ranges are checked on a thread
+    started by start(). The blocks of a range which have not arrived in time
+    are requested from another peer, and once no peer is left to ask, they
+    are requested one at a time.
     """
 
     def __init__(self,
@@ -49,7 +94,12 @@ class Completer(object):
                  gossip,
                  cache_keep_time=1200,
                  cache_purge_frequency=30,
-                 requested_keep_time=300):
+                 requested_keep_time=300,
+                 chain_request_range_length=CHAIN_REQUEST_RANGE_LENGTH,
+                 chain_request_ranges=CHAIN_REQUEST_RANGES,
+                 chain_request_timeout=CHAIN_REQUEST_TIMEOUT,
+                 chain_request_check_frequency=CHAIN_REQUEST_CHECK_FREQUENCY,
+                 cache_max_size=CACHE_MAX_SIZE):
         """
         :param block_store (dictionary) The block store shared with the journal
         :param gossip (gossip.Gossip) Broadcasts block and batch request to
@@ -63,12 +113,30 @@ class Completer(object):
             cache_keep_time or the validator can get into a state where it
             fails to make progress because it thinks it has already requested
             something that it is missing.
+        :param chain_request_range_length (int) The number of missing
+            predecessors requested from a single peer at a time.
+        :param chain_request_ranges (int) The number of ranges of missing
+            predecessors which are requested in parallel, spread across
+            peers. If 0, predecessors are requested one at a time.
+        :param chain_request_timeout (float) Time in seconds to wait for
+            the blocks of a chain range before asking another peer.
+        :param chain_request_check_frequency (float) Time in seconds between
+            checks for chain ranges which have timed out.
+        :param cache_max_size (int) The maximum size in bytes of each of the
+            block and batch caches, or None for no limit. The least recently
+            used entries are evicted once it is exceeded.
         """
         self.gossip = gossip
-        self.batch_cache = TimedCache(cache_keep_time, cache_purge_frequency)
+        self.batch_cache = TimedCache(cache_keep_time, cache_purge_frequency,
+                                      max_size=cache_max_size,
+                                      sizeof=_batch_size,
+                                      name='completer_batch_cache')
         self.block_cache = BlockCache(block_store,
                                       cache_keep_time,
-                                      cache_purge_frequency)
+                                      cache_purge_frequency,
+                                      max_size=cache_max_size,
+                                      sizeof=block_size,
+                                      name='completer_block_cache')
         self._block_store = block_store
         # avoid throwing away the genesis block
         self.block_cache[NULL_BLOCK_IDENTIFIER] = None
@@ -79,9 +147,34 @@ class Completer(object):
                                              cache_purge_frequency)
         self._requested = TimedCache(requested_keep_time,
                                      cache_purge_frequency)
+        # The (head id, block number) of the predecessors covered by
+        # outstanding chain requests which have not arrived, where the head
+        # id is that of the chain they were requested from
+        self._requested_block_nums = TimedCache(requested_keep_time,
+                                                cache_purge_frequency)
+        # The (head id, block number) of the requested predecessors whose id
+        # is known, because their successor on the chain has arrived, by id
+        self._chain_block_ids = TimedCache(requested_keep_time,
+                                           cache_purge_frequency)
+        # The blocks which arrived at a requested block number, but are not
+        # yet known to be on the chain they were requested from, by id
+        self._unlinked_chain_blocks = TimedCache(requested_keep_time,
+                                                 cache_purge_frequency)
+        self._chain_request_range_length = chain_request_range_length
+        self._chain_request_ranges = chain_request_ranges
+        self._chain_request_timeout = chain_request_timeout
+        self._chain_request_check_frequency = chain_request_check_frequency
+        # The outstanding chain ranges
+        self._chain_ranges = []
+        self._stopped = Event()
+        self._thread = None
         self._on_block_received = None
         self._on_batch_received = None
         self._has_block = None
+        self._block_sync = None
+        # False while global state is bootstrapped from a snapshot, so blocks
+        # which may not build on the snapshot are neither cached nor synced
+        self._accepting_blocks = True
         self.lock = RLock()
 
         # Tracks how many times an unsatisfied dependency is found
@@ -130,14 +223,21 @@ class Completer(object):
                         self._incomplete_blocks[block.previous_block_id]:
                     self._incomplete_blocks[block.previous_block_id] += [block]
 
+                # The block is held until its predecessor arrives, so its
+                # successors need not request it.
+                self._requested[block.header_signature] = None
+
                 # We have already requested the block, do not do so again
                 if block.previous_block_id in self._requested:
                     return None
 
-                LOGGER.debug("Request missing predecessor: %s",
-                             block.previous_block_id)
-                self._requested[block.previous_block_id] = None
-                self.gossip.broadcast_block_request(block.previous_block_id)
+                # The block is part of a chain which is already on its way
+                if block.previous_block_id in self._chain_block_ids or \
+                        block.header_signature in \
+                        self._unlinked_chain_blocks:
+                    return None
+
+                self._request_predecessor(block)
                 return None
 
         # Check for same number of batch_ids and batches
@@ -211,6 +311,190 @@ class Completer(object):
                              "batches in block.batches Dropping %s", block)
                 return None
 
+    def _request_predecessor(self, block):
+        LOGGER.debug("Request missing predecessor: %s",
+                     block.previous_block_id)
+        self._requested[block.previous_block_id] = None
+        if not self._sync_blocks(block) and \
+                not self._request_chain(block):
+            self.gossip.broadcast_block_request(block.previous_block_id)
+
+    def _count_missing_predecessors(self, block):
+        chain_head = self._block_store.chain_head
+        head_num = chain_head.block_num if chain_head is not None else -1
+        return block.block_num - head_num - 1
+
+    def _sync_blocks(self, block):
+        """Hands a long run of missing predecessors to block sync, which
+        fetches them from peers by block number.
+
+        Returns:
+            bool: False if the predecessors are not being synced.
+        """
+        if self._block_sync is None:
+            return False
+        if self._count_missing_predecessors(block) < BLOCK_SYNC_MIN_BLOCKS:
+            return False
+        return self._block_sync.sync_to(block.block_num - 1)
+
+    def _request_chain(self, block):
+        """Requests the predecessors missing between the chain head and
+        block as ranges spread across peers, so they arrive in parallel
+        rather than one round trip at a time.
+
+        Returns:
+            bool: False if the predecessors were not requested.
+        """
+        chain_length = min(
+            self._count_missing_predecessors(block),
+            self._chain_request_range_length * self._chain_request_ranges)
+        if chain_length < 2:
+            return False
+
+        requested = self.gossip.send_block_chain_requests(
+            block.previous_block_id,
+            chain_length,
+            self._chain_request_range_length)
+        if not requested:
+            return False
+
+        LOGGER.debug("Requested %s predecessors of block %s",
+                     chain_length, block.header_signature)
+        head_id = block.previous_block_id
+        self._chain_block_ids[head_id] = (head_id, block.block_num - 1)
+        self._add_chain_ranges(
+            head_id, head_id, block.block_num - 1, requested, ())
+        return True
+
+    def _add_chain_ranges(self, head_id, block_id, block_num, requested,
+                          tried):
+        now = time.time()
+        for chain_offset, chain_length, connection_id in requested:
+            chain_range = _ChainRange(
+                head_id, block_id, block_num, chain_offset, chain_length,
+                tuple(tried) + (connection_id,), now)
+            self._chain_ranges.append(chain_range)
+            for num in _chain_range_block_nums(chain_range):
+                self._requested_block_nums[(head_id, num)] = None
+
+    def _is_requested_block_num(self, block_num):
+        return any(
+            (chain_range.head_id, block_num) in self._requested_block_nums
+            for chain_range in self._chain_ranges)
+
+    def _receive_chain_block(self, block):
+        """Marks a block which arrived as no longer missing from the chain it
+        was requested from. A block whose successor on that chain has not
+        arrived yet is held as unlinked until it does, and the blocks held
+        below it are linked along with it.
+        """
+        key = self._chain_block_ids.pop(block.header_signature, None)
+        if key is None:
+            if self._is_requested_block_num(block.block_num):
+                self._unlinked_chain_blocks[block.header_signature] = block
+            return
+
+        head_id, _ = key
+        while True:
+            self._requested_block_nums.pop((head_id, block.block_num), None)
+            predecessor = self._unlinked_chain_blocks.pop(
+                block.previous_block_id, None)
+            if predecessor is None:
+                break
+            block = predecessor
+
+        if (head_id, block.block_num - 1) in self._requested_block_nums:
+            self._chain_block_ids[block.previous_block_id] = \
+                (head_id, block.block_num - 1)
+        self._release_unlinked_chain_blocks()
+
+    def _release_unlinked_chain_blocks(self):
+        """Requests the missing predecessors of the unlinked blocks whose
+        block numbers are no longer requested, as they are not on the chain
+        requested.
+        """
+        for block_id in self._unlinked_chain_blocks:
+            block = self._unlinked_chain_blocks[block_id]
+            if self._is_requested_block_num(block.block_num):
+                continue
+            del self._unlinked_chain_blocks[block_id]
+            if block.previous_block_id not in self.block_cache and \
+                    block.previous_block_id not in self._requested and \
+                    block.previous_block_id not in self._chain_block_ids:
+                self._request_predecessor(block)
+
+    def check_chain_requests(self):
+        """Requests the blocks of the chain ranges which have timed out and
+        are still missing, from a peer which has not been asked for them.
+        Once every peer has been asked, the missing blocks are requested one
+        at a time, as when they are not part of a chain.
+        """
+        with self.lock:
+            now = time.time()
+            timed_out = [
+                chain_range for chain_range in self._chain_ranges
+                if now - chain_range.sent_at > self._chain_request_timeout
+            ]
+            if not timed_out:
+                return
+
+            self._chain_ranges = [
+                chain_range for chain_range in self._chain_ranges
+                if chain_range not in timed_out
+            ]
+            waiting = self._get_waiting_predecessors()
+            for chain_range in timed_out:
+                self._retry_chain_range(chain_range, waiting)
+            self._release_unlinked_chain_blocks()
+
+    def _get_waiting_predecessors(self):
+        """Returns the ids of the missing predecessors which blocks of a
+        requested chain are held waiting for, by head id and block number.
+        """
+        return {
+            self._chain_block_ids[block_id]: block_id
+            for block_id in self._chain_block_ids
+        }
+
+    def _retry_chain_range(self, chain_range, waiting):
+        head_id = chain_range.head_id
+        missing = [
+            block_num for block_num in _chain_range_block_nums(chain_range)
+            if (head_id, block_num) in self._requested_block_nums
+        ]
+        if not missing:
+            return
+
+        newest, oldest = max(missing), min(missing)
+        if (head_id, newest) in waiting:
+            # A block of the chain is held waiting for the newest missing
+            # block, so the rest of the range is requested by its id.
+            block_id, block_num = waiting[(head_id, newest)], newest
+        else:
+            block_id, block_num = chain_range.block_id, chain_range.block_num
+
+        LOGGER.debug("Chain request for blocks %s to %s timed out",
+                     oldest, newest)
+        requested = self.gossip.send_block_chain_requests(
+            block_id,
+            newest - oldest + 1,
+            self._chain_request_range_length,
+            chain_offset=block_num - newest,
+            exclude=chain_range.tried)
+        if requested:
+            self._add_chain_ranges(
+                head_id, block_id, block_num, requested, chain_range.tried)
+            return
+
+        for block_num in missing:
+            del self._requested_block_nums[(head_id, block_num)]
+            if (head_id, block_num) in waiting:
+                block_id = waiting[(head_id, block_num)]
+                del self._chain_block_ids[block_id]
+                LOGGER.debug("Request missing predecessor: %s", block_id)
+                self._requested[block_id] = None
+                self.gossip.broadcast_block_request(block_id)
+
     def _finalize_batch_list(self, block, temp_batches):
         batches = []
         for batch_id in block.header.batch_ids:
@@ -293,9 +577,47 @@ class Completer(object):
     def set_chain_has_block(self, set_chain_has_block):
         self._has_block = set_chain_has_block
 
+    def set_block_sync(self, block_sync):
+        self._block_sync = block_sync
+
+    def start(self):
+        """Starts checking for chain requests which have timed out."""
+        self._stopped.clear()
+        self._thread = InstrumentedThread(
+            target=self._run, name='Completer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self._chain_request_check_frequency):
+            try:
+                self.check_chain_requests()
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Unhandled exception checking chain "
+                                 "requests")
+
+    def pause_blocks(self):
+        """Drops blocks received until resume_blocks is called."""
+        with self.lock:
+            self._accepting_blocks = False
+
+    def resume_blocks(self):
+        with self.lock:
+            self._accepting_blocks = True
+
     def add_block(self, block):
         with self.lock:
+            if not self._accepting_blocks:
+                LOGGER.debug("Dropping block %s received during state "
+                             "bootstrap", block.header_signature[:8])
+                return
             blkw = BlockWrapper(block)
+            self._receive_chain_block(blkw)
             block = self._complete_block(blkw)
             if block is not None:
                 self.block_cache[block.header_signature] = blkw
@@ -340,6 +662,15 @@ class Completer(object):
                 return self.block_cache[block_id]
             return None
 
+    def get_block_by_num(self, block_num):
+        """Returns the block with the given number on the current chain,
+        or None if the chain is not that long.
+        """
+        try:
+            return self._block_store.get_block_by_number(block_num)
+        except KeyError:
+            return None
+
     def get_batch(self, batch_id):
         with self.lock:
             if batch_id in self.batch_cache:
@@ -27,6 +27,17 @@ LOGGER = logging.getLogger(__name__)
 
 CACHE_KEEP_TIME = 300
 
+# The most blocks sent in response to a single chain request
+CHAIN_RESPONSE_MAX_LENGTH = 128
+# The deepest a chain request may reach below the requested block
+CHAIN_REQUEST_MAX_DEPTH = 4096
+
+# The most blocks sent in response to a single block range request
+BLOCK_RANGE_RESPONSE_MAX_LENGTH = 256
+# No more blocks are added to a block range response once it reaches this
+# size in bytes
+BLOCK_RANGE_RESPONSE_MAX_SIZE = 4 * 1024 * 1024
+
 
 class Responder(object):
     def __init__(self,
@@ -46,6 +57,42 @@ class Responder(object):
             block = self.completer.get_block(block_id)
         return block
 
+    def check_for_chain(self, block, offset, length):
+        """Returns up to length blocks of the chain ending at block, newest
+        first, after skipping the offset newest of them. The chain is cut
+        short at the first predecessor which is not available.
+        """
+        if offset > CHAIN_REQUEST_MAX_DEPTH:
+            return []
+        length = min(length, CHAIN_RESPONSE_MAX_LENGTH)
+        chain = []
+        depth = 0
+        while block is not None and len(chain) < length:
+            if depth >= offset:
+                chain.append(block)
+            depth += 1
+            block = self.completer.get_block(block.previous_block_id)
+        return chain
+
+    def check_for_block_range(self, start_block_num, count):
+        """Returns the serialized blocks of the current chain numbered from
+        start_block_num, up to count of them. The range is cut short at the
+        end of the chain, or once the blocks reach the response size limit.
+        """
+        count = min(count, BLOCK_RANGE_RESPONSE_MAX_LENGTH)
+        blocks = []
+        size = 0
+        for block_num in range(start_block_num, start_block_num + count):
+            block = self.completer.get_block_by_num(block_num)
+            if block is None:
+                break
+            content = block.get_block().SerializeToString()
+            blocks.append(content)
+            size += len(content)
+            if size >= BLOCK_RANGE_RESPONSE_MAX_SIZE:
+                break
+        return blocks
+
     def check_for_batch(self, batch_id):
         batch = self.completer.get_batch(batch_id)
         return batch
@@ -125,12 +172,50 @@ class BlockResponderHandler(Handler):
             LOGGER.debug("Responding to block requests: %s",
                          block.get_block().header_signature)
 
-            block_response = network_pb2.GossipBlockResponse(
-                content=block.get_block().SerializeToString())
+            if block_request_message.chain_length > 0:
+                blocks = self._responder.check_for_chain(
+                    block,
+                    block_request_message.chain_offset,
+                    block_request_message.chain_length)
+            else:
+                blocks = [block]
 
-            self._gossip.send(validator_pb2.Message.GOSSIP_BLOCK_RESPONSE,
-                              block_response.SerializeToString(),
-                              connection_id)
+            for response_block in blocks:
+                block_response = network_pb2.GossipBlockResponse(
+                    content=response_block.get_block().SerializeToString())
+
+                self._gossip.send(
+                    validator_pb2.Message.GOSSIP_BLOCK_RESPONSE,
+                    block_response.SerializeToString(),
+                    connection_id)
+
+        return HandlerResult(HandlerStatus.PASS)
+
+
+class BlockRangeResponderHandler(Handler):
+    def __init__(self, responder, gossip):
+        self._responder = responder
+        self._gossip = gossip
+
+    def handle(self, connection_id, message_content):
+        block_range_request = network_pb2.GossipBlockRangeRequest()
+        block_range_request.ParseFromString(message_content)
+
+        # An empty response tells the peer that this validator does not
+        # have the blocks, so it is sent as well.
+        blocks = self._responder.check_for_block_range(
+            block_range_request.start_block_num, block_range_request.count)
+
+        LOGGER.debug("Responding to block range request: %s blocks from %s",
+                     len(blocks), block_range_request.start_block_num)
+
+        block_range_response = network_pb2.GossipBlockRangeResponse(
+            start_block_num=block_range_request.start_block_num,
+            blocks=blocks)
+
+        self._gossip.send(validator_pb2.Message.GOSSIP_BLOCK_RANGE_RESPONSE,
+                          block_range_response.SerializeToString(),
+                          connection_id)
 
         return HandlerResult(HandlerStatus.PASS)
 
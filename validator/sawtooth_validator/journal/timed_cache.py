@@ -13,24 +13,41 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 # pylint: disable=no-name-in-module
+from collections import OrderedDict
 from collections.abc import MutableMapping
 from threading import RLock
 import time
 
+from sawtooth_validator import metrics
+
+COLLECTOR = metrics.get_collector(__name__)
+
 
 class TimedCache(MutableMapping):
     """
     A dict like interface that removes entries after sometime of no access.
 
+    Entries are kept in order of last access, so expired entries are purged
+    from the front of the cache without scanning the rest of it. If the cache
+    is given a capacity, the least recently accessed entries are evicted
+    once it is exceeded.
+
     Accesses are Thread safe.
 
     Args:
         keep_time (float): How long in seconds to hold a value for
         purge_frequency (float): How often to look for old values to purge
+        max_entries (int): The maximum number of entries to hold, or None
+        max_size (int): The maximum total size of the values to hold, as
+            returned by sizeof, or None
+        sizeof (function): Returns the size of a value, e.g. in bytes
+        name (str): The name to report the cache's resident entries and size
+            under, or None to not report them
     """
     class CachedValue(object):
-        def __init__(self, value):
+        def __init__(self, value, size=0):
             self.value = value
+            self.size = size
             self.timestamp = time.time()  # the time this State was created,
             # used for house keeping, ie when to flush this from the cache.
 
@@ -40,34 +57,57 @@ class TimedCache(MutableMapping):
             """
             self.timestamp = time.time()
 
-    def __init__(self, keep_time=30, purge_frequency=30):
+    def __init__(self, keep_time=30, purge_frequency=30, max_entries=None,
+                 max_size=None, sizeof=None, name=None):
         super(TimedCache, self).__init__()
         self._lock = RLock()
-        self._cache = {}
+        self._cache = OrderedDict()
         self._keep_time = keep_time
         self._purge_frequency = purge_frequency
         self._next_purge_time = time.time() + purge_frequency
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._sizeof = sizeof
+        self._size = 0
+
+        self._entries_gauge = None
+        self._size_gauge = None
+        if name is not None:
+            self._entries_gauge = COLLECTOR.gauge(
+                'entries', instance=self, tags={'name': name})
+            self._size_gauge = COLLECTOR.gauge(
+                'size', instance=self, tags={'name': name})
 
     def __setitem__(self, key, value):
         with self._lock:
             if time.time() > self._next_purge_time:
                 self._purge_expired()
                 self._next_purge_time = time.time() + self._purge_frequency
-            self._cache[key] = self.CachedValue(value)
+            size = self._sizeof(value) if self._sizeof is not None else 0
+            self._pop(key)
+            self._cache[key] = self.CachedValue(value, size)
+            self._size += size
+            self._evict()
+            self._update_gauges()
 
     def __getitem__(self, key):
         with self._lock:
             value = self._cache[key]
             value.touch()
+            self._cache.move_to_end(key)
             return value.value
 
     def __delitem__(self, key):
         with self._lock:
-            del self._cache[key]
+            if self._pop(key) is None:
+                raise KeyError(key)
+            self._update_gauges()
 
     def __iter__(self):
+        # Reading an entry moves it to the end of the cache, so iteration
+        # is over a copy of the keys
         with self._lock:
-            return iter(self._cache)
+            return iter(list(self._cache))
 
     def __len__(self):
         with self._lock:
@@ -92,13 +132,45 @@ class TimedCache(MutableMapping):
     def purge_frequency(self):
         return self._purge_frequency
 
+    @property
+    def size(self):
+        """The total size of the values in the cache, as returned by the
+        cache's sizeof function.
+        """
+        with self._lock:
+            return self._size
+
+    def _pop(self, key):
+        value = self._cache.pop(key, None)
+        if value is not None:
+            self._size -= value.size
+        return value
+
     def _purge_expired(self):
         """
         Remove all expired entries from the cache.
         """
         time_horizon = time.time() - self._keep_time
-        new_cache = {}
-        for (k, v) in self._cache.items():
-            if v.timestamp > time_horizon:
-                new_cache[k] = v
-        self._cache = new_cache
+        while self._cache:
+            key, value = next(iter(self._cache.items()))
+            if value.timestamp > time_horizon:
+                break
+            self._pop(key)
+
+    def _evict(self):
+        """
+        Remove the least recently accessed entries until the cache is within
+        its capacity.
+        """
+        while self._cache and (
+                (self._max_entries is not None
+                 and len(self._cache) > self._max_entries)
+                or (self._max_size is not None
+                    and self._size > self._max_size)):
+            _, value = self._cache.popitem(last=False)
+            self._size -= value.size
+
+    def _update_gauges(self):
+        if self._entries_gauge is not None:
+            self._entries_gauge.set_value(len(self._cache))
+            self._size_gauge.set_value(self._size)
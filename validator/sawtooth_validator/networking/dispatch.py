@@ -16,8 +16,9 @@ import abc
 import enum
 import logging
 from threading import Condition
-import queue
+from threading import Lock
 import uuid
+from collections import deque
 from collections import namedtuple
 
 # pylint: disable=import-error,no-name-in-module
@@ -39,6 +40,20 @@ class Priority(enum.IntEnum):
     LOW = 2
 
 
+# The relative share of dispatch turns each priority receives when messages
+# of every priority are waiting.
+PRIORITY_WEIGHTS = {
+    Priority.HIGH: 4,
+    Priority.MEDIUM: 2,
+    Priority.LOW: 1,
+}
+
+
+class QueuePolicy(enum.Enum):
+    DROP = 1  # Discard the message when its queue is full
+    REJECT = 2  # Reply with a rejection message when its queue is full
+
+
 def _gen_message_id():
     return uuid.uuid4().hex.encode()
 
@@ -49,15 +64,37 @@ _MessageInformation = namedtuple('_MessageInformation', (
     'content',
     'correlation_id',
     'collection',
-    'message_type'))
+    'message_type',
+    'priority'))
 
 
 class Dispatcher(InstrumentedThread):
-    def __init__(self, timeout=10):
+    """Routes incoming messages to the handlers registered for their type.
+
+    Messages wait in a queue per priority, and are taken from those queues by
+    weighted round robin, so that lower priority traffic cannot starve higher
+    priority traffic, nor the reverse.
+
+    Args:
+        timeout (int): unused
+        max_queue_size (dict of Priority: int): the maximum number of
+            messages waiting in each priority queue. When a queue is full,
+            messages are dropped or rejected according to the policy for
+            their type. Priorities that are not included are unbounded.
+        max_in_flight (dict of Priority: int): the maximum number of messages
+            of each priority being handled at once. Messages beyond this
+            wait in their queue, rather than in an executor's queue, so that
+            other priorities are not held up behind them. Priorities that
+            are not included are unbounded.
+    """
+
+    def __init__(self, timeout=10, max_queue_size=None, max_in_flight=None):
         super().__init__(name='Dispatcher')
         self._timeout = timeout
         self._msg_type_handlers = {}
-        self._in_queue = queue.PriorityQueue()
+        self._in_queue = _DispatchQueue(
+            max_size=max_queue_size,
+            max_in_flight=max_in_flight)
         self._send_message = {}
         self._send_last_message = {}
         self._message_information = {}
@@ -65,6 +102,11 @@ class Dispatcher(InstrumentedThread):
         self._dispatch_timers = {}
         self._priority = {}
         self._preprocessors = {}
+        self._queue_policies = {}
+
+        self._queue_depth_gauges = {}
+        self._queue_wait_timers = {}
+        self._queue_full_counters = {}
 
     def _get_dispatch_timer(self, tag):
         if tag not in self._dispatch_timers:
@@ -73,6 +115,30 @@ class Dispatcher(InstrumentedThread):
                 instance=self)
         return self._dispatch_timers[tag]
 
+    def _get_queue_depth_gauge(self, message_type):
+        if message_type not in self._queue_depth_gauges:
+            self._queue_depth_gauges[message_type] = COLLECTOR.gauge(
+                'dispatch_queue_depth',
+                tags={"message_type": get_enum_name(message_type)},
+                instance=self)
+        return self._queue_depth_gauges[message_type]
+
+    def _get_queue_wait_timer(self, message_type):
+        if message_type not in self._queue_wait_timers:
+            self._queue_wait_timers[message_type] = COLLECTOR.timer(
+                'dispatch_queue_wait_time',
+                tags={"message_type": get_enum_name(message_type)},
+                instance=self)
+        return self._queue_wait_timers[message_type]
+
+    def _get_queue_full_counter(self, message_type):
+        if message_type not in self._queue_full_counters:
+            self._queue_full_counters[message_type] = COLLECTOR.counter(
+                'dispatch_queue_full_count',
+                tags={"message_type": get_enum_name(message_type)},
+                instance=self)
+        return self._queue_full_counters[message_type]
+
     def add_send_message(self, connection, send_message):
         """Adds a send_message function to the Dispatcher's
         dictionary of functions indexed by connection.
@@ -153,9 +219,22 @@ class Dispatcher(InstrumentedThread):
                     correlation_id=message.correlation_id,
                     message_type=message.message_type,
                     collection=_ManagerCollection(
-                        self._msg_type_handlers[message.message_type]))
+                        self._msg_type_handlers[message.message_type]),
+                    priority=priority)
+
+            queued = self._in_queue.put(
+                priority,
+                message.message_type,
+                (message_id,
+                 self._get_queue_wait_timer(message.message_type).time()))
 
-            self._in_queue.put_nowait((priority, message_id))
+            if not queued:
+                del self._message_information[message_id]
+                self._handle_full_queue(connection, message, connection_id)
+                return
+
+            self._get_queue_depth_gauge(message.message_type).set_value(
+                self._in_queue.depth(message.message_type))
 
             queue_size = self._in_queue.qsize()
             if queue_size > 10:
@@ -193,6 +272,68 @@ class Dispatcher(InstrumentedThread):
     def set_message_priority(self, message_type, priority):
         self._priority[message_type] = priority
 
+    def set_message_queue_policy(self, message_type, policy,
+                                 reject_result=None):
+        """Sets how messages of the given type are handled when the queue
+        for their priority is full. Messages with no policy set are dropped.
+
+        Args:
+            message_type (validator_pb2.Message.*): the message type
+            policy (QueuePolicy): whether to drop or reject the message
+            reject_result (HandlerResult): for the REJECT policy, the result
+                whose message_out and message_type are sent to the sender
+        """
+        if policy == QueuePolicy.REJECT and (
+                reject_result is None
+                or not reject_result.message_out
+                or not reject_result.message_type):
+            raise ValueError(
+                "A REJECT policy requires a result with message_out and "
+                "message_type")
+
+        self._queue_policies[message_type] = (policy, reject_result)
+
+    def _handle_full_queue(self, connection, message, connection_id):
+        self._get_queue_full_counter(message.message_type).inc()
+
+        policy, reject_result = self._queue_policies.get(
+            message.message_type, (QueuePolicy.DROP, None))
+
+        if policy == QueuePolicy.DROP:
+            LOGGER.debug(
+                "Dropping %s from %s: dispatch queue is full",
+                get_enum_name(message.message_type),
+                connection_id)
+            return
+
+        LOGGER.debug(
+            "Rejecting %s from %s: dispatch queue is full",
+            get_enum_name(message.message_type),
+            connection_id)
+
+        reply = validator_pb2.Message(
+            content=reject_result.message_out.SerializeToString(),
+            correlation_id=message.correlation_id,
+            message_type=reject_result.message_type)
+        try:
+            self._send_message[connection](
+                msg=reply,
+                connection_id=connection_id)
+        except KeyError:
+            LOGGER.warning(
+                "Can't send message %s back to "
+                "%s because connection %s not in dispatcher",
+                get_enum_name(reply.message_type),
+                connection_id,
+                connection)
+
+    def _finish(self, message_id):
+        """Releases a message once no further handling will be done for it.
+        """
+        message_info = self._message_information.pop(message_id, None)
+        if message_info is not None:
+            self._in_queue.task_done(message_info.priority)
+
     def _process(self, message_id):
         message_info = self._message_information[message_id]
 
@@ -212,15 +353,16 @@ class Dispatcher(InstrumentedThread):
                         "%s preprocessor returned None result for messsage %s",
                         preprocessor,
                         message_id)
+                    self._finish(message_id)
                     return
 
                 # check for result status
                 if result.status == HandlerStatus.DROP:
-                    del self._message_information[message_id]
+                    self._finish(message_id)
                     return
 
                 if result.status == HandlerStatus.RETURN:
-                    del self._message_information[message_id]
+                    self._finish(message_id)
 
                     message = validator_pb2.Message(
                         content=result.message_out.SerializeToString(),
@@ -249,13 +391,15 @@ class Dispatcher(InstrumentedThread):
                         content=result.content,
                         correlation_id=message_info.correlation_id,
                         collection=message_info.collection,
-                        message_type=message_info.message_type)
+                        message_type=message_info.message_type,
+                        priority=message_info.priority)
 
                 self._process_next(message_id)
 
             except Exception:  # pylint: disable=broad-except
                 LOGGER.exception(
                     "Unhandled exception after preprocessing")
+                self._finish(message_id)
 
         preprocessor.execute(
             connection_id=message_info.connection_id,
@@ -269,7 +413,7 @@ class Dispatcher(InstrumentedThread):
             handler_manager = next(message_info.collection)
         except IndexError:
             # IndexError is raised if done with handlers
-            del self._message_information[message_id]
+            self._finish(message_id)
             return
 
         timer_tag = type(handler_manager.handler).__name__
@@ -282,6 +426,7 @@ class Dispatcher(InstrumentedThread):
             except Exception:  # pylint: disable=broad-except
                 LOGGER.exception(
                     "Unhandled exception while determining next")
+                self._finish(message_id)
 
         handler_manager.execute(
             message_info.connection_id,
@@ -292,10 +437,11 @@ class Dispatcher(InstrumentedThread):
         if result is None:
             LOGGER.debug('Ignoring None handler result, likely due to an '
                          'unhandled error while executing the handler')
+            self._finish(message_id)
             return
 
         if result.status == HandlerStatus.DROP:
-            del self._message_information[message_id]
+            self._finish(message_id)
 
         elif result.status == HandlerStatus.PASS:
             self._process_next(message_id)
@@ -324,11 +470,12 @@ class Dispatcher(InstrumentedThread):
             else:
                 LOGGER.error("HandlerResult with status of RETURN_AND_PASS "
                              "is missing message_out or message_type")
+                self._finish(message_id)
 
         elif result.status == HandlerStatus.RETURN:
             message_info = self._message_information[message_id]
 
-            del self._message_information[message_id]
+            self._finish(message_id)
 
             if result.message_out and result.message_type:
                 message = validator_pb2.Message(
@@ -353,7 +500,7 @@ class Dispatcher(InstrumentedThread):
         elif result.status == HandlerStatus.RETURN_AND_CLOSE:
             message_info = self._message_information[message_id]
 
-            del self._message_information[message_id]
+            self._finish(message_id)
 
             if result.message_out and result.message_type:
                 message = validator_pb2.Message(
@@ -378,22 +525,73 @@ class Dispatcher(InstrumentedThread):
             else:
                 LOGGER.error("HandlerResult with status of RETURN_AND_CLOSE "
                              "is missing message_out or message_type")
+
+        elif result.status == HandlerStatus.DEFER:
+            message_info = self._message_information[message_id]
+
+            # The message is released now, so that it holds no thread or
+            # in-flight slot while its reply is pending
+            self._finish(message_id)
+
+            result.future.add_done_callback(
+                lambda future: self._send_deferred_result(
+                    message_info, future))
         with self._condition:
             if not self._message_information:
                 self._condition.notify()
 
+    def _send_deferred_result(self, message_info, future):
+        """Sends the reply to a message whose handler deferred its result,
+        once the result is ready.
+        """
+        try:
+            result = future.result()
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception(
+                "Unhandled exception in deferred result for %s",
+                get_enum_name(message_info.message_type))
+            return
+
+        if result.status != HandlerStatus.RETURN \
+                or not result.message_out or not result.message_type:
+            LOGGER.error("Deferred HandlerResult must have a status of RETURN "
+                         "with message_out and message_type")
+            return
+
+        message = validator_pb2.Message(
+            content=result.message_out.SerializeToString(),
+            correlation_id=message_info.correlation_id,
+            message_type=result.message_type)
+        try:
+            self._send_message[message_info.connection](
+                msg=message,
+                connection_id=message_info.connection_id)
+        except KeyError:
+            LOGGER.warning(
+                "Can't send message %s back to "
+                "%s because connection %s not in dispatcher",
+                get_enum_name(message.message_type),
+                message_info.connection_id,
+                message_info.connection)
+
     def run(self):
         while True:
             try:
-                _, msg_id = self._in_queue.get()
-                if msg_id == -1:
+                item = self._in_queue.get()
+                if item is None:
                     break
+
+                message_type, (msg_id, wait_timer_ctx) = item
+                wait_timer_ctx.stop()
+                self._get_queue_depth_gauge(message_type).set_value(
+                    self._in_queue.depth(message_type))
+
                 self._process(msg_id)
             except Exception:  # pylint: disable=broad-except
                 LOGGER.exception("Unhandled exception while dispatching")
 
     def stop(self):
-        self._in_queue.put_nowait((Priority.HIGH, -1))
+        self._in_queue.close()
 
     def block_until_complete(self):
         """Blocks until no more messages are in flight,
@@ -404,6 +602,122 @@ class Dispatcher(InstrumentedThread):
                 self._condition.wait()
 
 
+class _DispatchQueue(object):
+    """A queue per priority, served by weighted round robin.
+
+    Each priority is given turns in proportion to its weight while messages
+    of several priorities are waiting; a priority with nothing waiting, or
+    with its in-flight limit reached, gives up its turns to the others. Items
+    of the same priority are served in the order they were queued.
+
+    Args:
+        max_size (dict of Priority: int): the maximum number of items
+            waiting per priority
+        max_in_flight (dict of Priority: int): the maximum number of items
+            per priority that may be taken, but not yet marked done
+        weights (dict of Priority: int): the relative share of turns of each
+            priority
+    """
+
+    def __init__(self, max_size=None, max_in_flight=None, weights=None):
+        self._max_size = max_size or {}
+        self._max_in_flight = max_in_flight or {}
+        self._weights = weights or PRIORITY_WEIGHTS
+
+        self._queues = {priority: deque() for priority in Priority}
+        self._in_flight = {priority: 0 for priority in Priority}
+        self._credits = dict(self._weights)
+        self._depths = {}
+        self._closed = False
+
+        self._condition = Condition(Lock())
+
+    def put(self, priority, key, item):
+        """Adds an item to the queue for the given priority.
+
+        Args:
+            priority (Priority): the priority of the item
+            key: the type of the item, whose depth is tracked
+            item: the item to queue
+
+        Returns:
+            bool: False if the queue for the priority was full
+        """
+        with self._condition:
+            queue = self._queues[priority]
+            max_size = self._max_size.get(priority)
+            if max_size is not None and len(queue) >= max_size:
+                return False
+
+            queue.append((key, item))
+            self._depths[key] = self._depths.get(key, 0) + 1
+            self._condition.notify()
+
+        return True
+
+    def get(self):
+        """Removes and returns the next (key, item) to be dispatched, blocking
+        until one is available. Returns None once the queue is closed.
+        """
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+
+                priority = self._next_priority()
+                if priority is not None:
+                    break
+
+                self._condition.wait()
+
+            key, item = self._queues[priority].popleft()
+            self._depths[key] -= 1
+            self._in_flight[priority] += 1
+            self._credits[priority] -= 1
+
+            return key, item
+
+    def task_done(self, priority):
+        """Marks an item of the given priority, previously returned by get,
+        as done, freeing its in-flight slot.
+        """
+        with self._condition:
+            self._in_flight[priority] -= 1
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def depth(self, key):
+        with self._condition:
+            return self._depths.get(key, 0)
+
+    def qsize(self):
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _next_priority(self):
+        ready = [
+            priority for priority in Priority
+            if self._queues[priority] and (
+                priority not in self._max_in_flight
+                or self._in_flight[priority] < self._max_in_flight[priority])
+        ]
+
+        if not ready:
+            return None
+
+        for priority in ready:
+            if self._credits[priority] > 0:
+                return priority
+
+        # Every ready priority has used its turns; start a new round
+        self._credits = dict(self._weights)
+        return ready[0]
+
+
 class _PreprocessorManager:
     def __init__(self, executor, preprocessor):
         self._executor = executor
@@ -479,6 +793,19 @@ class HandlerStatus(enum.Enum):
     RETURN_AND_PASS = 3  # Send a message out and process the next handler
     PASS = 4  # Send the message to the next handler
     RETURN_AND_CLOSE = 5  # Send the message out and close connection
+    DEFER = 6  # Send the result of a future out once it is done
+
+
+class DeferredHandlerResult(HandlerResult):
+    def __init__(self, future):
+        """A result for a handler which replies later, without holding a
+        thread. No further handlers are run for the message.
+
+        :param future concurrent.futures.Future: completed with the
+            HandlerResult, with a status of RETURN, to send in reply
+        """
+        self.future = future
+        super().__init__(HandlerStatus.DEFER)
 
 
 class PreprocessorResult(HandlerResult):
@@ -13,6 +13,7 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+import concurrent.futures
 import logging
 from threading import Condition
 from threading import RLock
@@ -44,6 +45,7 @@ class Future(object):
         self._callback_func = callback
         self._reconcile_time = None
         self._timer_ctx = timer_ctx
+        self._send_future = None
 
     def done(self):
         return self._result is not None
@@ -59,6 +61,26 @@ class Future(object):
                     raise FutureTimeoutError('Future timed out')
         return self._result
 
+    def set_send_future(self, send_future):
+        """Sets the concurrent.futures.Future which is done once the request
+        has been handed to the socket, or None if it will never be sent.
+        """
+        self._send_future = send_future
+
+    def wait_sent(self, timeout=None):
+        """Blocks until the request has been handed to the socket. Returns
+        straight away if it will never be sent.
+
+        Raises:
+            FutureTimeoutError: The request was not sent within the timeout
+        """
+        if self._send_future is None:
+            return
+        try:
+            self._send_future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise FutureTimeoutError('Future timed out')
+
     def set_result(self, result):
         with self._condition:
             self._reconcile_time = time.time()
@@ -371,6 +371,8 @@ class _SendReceive(object):
     def send_message(self, msg, connection_id=None):
         """
         :param msg: protobuf validator_pb2.Message
+        :return: concurrent.futures.Future, done once the message has been
+            handed to the socket, or None if the event loop is closed
         """
         zmq_identity = None
         if connection_id is not None and self._connections is not None:
@@ -392,13 +394,13 @@ class _SendReceive(object):
                               msg.SerializeToString()]
 
         try:
-            asyncio.run_coroutine_threadsafe(
+            return asyncio.run_coroutine_threadsafe(
                 self._send_message_frame(message_bundle),
                 self._event_loop)
         except RuntimeError:
             # run_coroutine_threadsafe will throw a RuntimeError if
             # the eventloop is closed. This occurs on shutdown.
-            pass
+            return None
 
     @asyncio.coroutine
     def _send_last_message(self, identity, msg):
@@ -1035,8 +1037,8 @@ class Interconnect(object):
             if not one_way:
                 self._futures.put(fut)
 
-            self._send_receive_thread.send_message(msg=message,
-                                                   connection_id=connection_id)
+            fut.set_send_future(self._send_receive_thread.send_message(
+                msg=message, connection_id=connection_id))
             return fut
 
         return connection_info.connection.send(
@@ -1313,7 +1315,7 @@ class OutboundConnection(object):
         if not one_way:
             self._futures.put(fut)
 
-        self._send_receive_thread.send_message(message)
+        fut.set_send_future(self._send_receive_thread.send_message(message))
         return fut
 
     def send_last_message(self, message_type, data, callback=None,
@@ -267,7 +267,11 @@ def main(args):
         validator_config.state_pruning_block_depth,
         validator_config.network_public_key,
         validator_config.network_private_key,
-        roles=validator_config.roles)
+        roles=validator_config.roles,
+        state_snapshot_interval=validator_config.state_snapshot_interval,
+        state_snapshot_bootstrap=validator_config.state_snapshot_bootstrap,
+        state_snapshot_trusted_block_id=(
+            validator_config.state_snapshot_trusted_block_id))
 
     # pylint: disable=broad-except
     try:
@@ -15,8 +15,15 @@
 import logging
 
 from sawtooth_validator.protobuf import validator_pb2
+from sawtooth_validator.protobuf.client_batch_submit_pb2 \
+    import ClientBatchSubmitResponse
 from sawtooth_validator.execution import tp_state_handlers
 
+from sawtooth_validator.networking.dispatch import HandlerResult
+from sawtooth_validator.networking.dispatch import HandlerStatus
+from sawtooth_validator.networking.dispatch import Priority
+from sawtooth_validator.networking.dispatch import QueuePolicy
+
 from sawtooth_validator.journal.completer import \
     CompleterBatchListBroadcastHandler
 from sawtooth_validator.journal.back_pressure_handlers import \
@@ -63,6 +70,7 @@ def add(
         thread_pool,
         client_thread_pool,
         sig_pool,
+        signature_verification_engine,
         block_publisher,
 ):
 
@@ -70,41 +78,60 @@ def add(
     dispatcher.add_handler(
         validator_pb2.Message.TP_RECEIPT_ADD_DATA_REQUEST,
         tp_state_handlers.TpReceiptAddDataHandler(context_manager),
-        thread_pool)
+        thread_pool,
+        priority=Priority.HIGH)
 
     dispatcher.add_handler(
         validator_pb2.Message.TP_EVENT_ADD_REQUEST,
         tp_state_handlers.TpEventAddHandler(context_manager),
-        thread_pool)
+        thread_pool,
+        priority=Priority.HIGH)
 
     dispatcher.add_handler(
         validator_pb2.Message.TP_STATE_DELETE_REQUEST,
         tp_state_handlers.TpStateDeleteHandler(context_manager),
-        thread_pool)
+        thread_pool,
+        priority=Priority.HIGH)
 
     dispatcher.add_handler(
         validator_pb2.Message.TP_STATE_GET_REQUEST,
         tp_state_handlers.TpStateGetHandler(context_manager),
-        thread_pool)
+        thread_pool,
+        priority=Priority.HIGH)
 
     dispatcher.add_handler(
         validator_pb2.Message.TP_STATE_SET_REQUEST,
         tp_state_handlers.TpStateSetHandler(context_manager),
-        thread_pool)
+        thread_pool,
+        priority=Priority.HIGH)
 
     dispatcher.add_handler(
         validator_pb2.Message.TP_REGISTER_REQUEST,
         processor_handlers.ProcessorRegisterHandler(
             executor.processor_manager),
-        thread_pool)
+        thread_pool,
+        priority=Priority.MEDIUM)
 
     dispatcher.add_handler(
         validator_pb2.Message.TP_UNREGISTER_REQUEST,
         processor_handlers.ProcessorUnRegisterHandler(
             executor.processor_manager),
-        thread_pool)
+        thread_pool,
+        priority=Priority.MEDIUM)
 
     # -- Client -- #
+    # Transaction processor messages are prioritized over client requests,
+    # so that a flood of client requests cannot stall block validation. A
+    # client submit that finds the queue full is told to retry later.
+    dispatcher.set_message_queue_policy(
+        validator_pb2.Message.CLIENT_BATCH_SUBMIT_REQUEST,
+        QueuePolicy.REJECT,
+        reject_result=HandlerResult(
+            status=HandlerStatus.RETURN,
+            message_out=ClientBatchSubmitResponse(
+                status=ClientBatchSubmitResponse.QUEUE_FULL),
+            message_type=validator_pb2.Message.CLIENT_BATCH_SUBMIT_RESPONSE))
+
     dispatcher.add_handler(
         validator_pb2.Message.CLIENT_BATCH_SUBMIT_REQUEST,
         BatchListPermissionVerifier(
@@ -126,7 +153,8 @@ def add(
 
     dispatcher.add_handler(
         validator_pb2.Message.CLIENT_BATCH_SUBMIT_REQUEST,
-        signature_verifier.BatchListSignatureVerifier(),
+        signature_verifier.BatchListSignatureVerifier(
+            signature_verification_engine),
         sig_pool)
 
     dispatcher.add_handler(
@@ -36,11 +36,14 @@ from sawtooth_validator.journal.batch_sender import BroadcastBatchSender
 from sawtooth_validator.journal.block_sender import BroadcastBlockSender
 from sawtooth_validator.journal.block_store import BlockStore
 from sawtooth_validator.journal.block_cache import BlockCache
+from sawtooth_validator.journal.block_cache import block_size
+from sawtooth_validator.journal.block_sync import BlockSync
 from sawtooth_validator.journal.completer import Completer
 from sawtooth_validator.journal.responder import Responder
 from sawtooth_validator.journal.batch_injector import \
     DefaultBatchInjectorFactory
 from sawtooth_validator.networking.dispatch import Dispatcher
+from sawtooth_validator.networking.dispatch import Priority
 from sawtooth_validator.journal.chain_id_manager import ChainIdManager
 from sawtooth_validator.execution.executor import TransactionExecutor
 from sawtooth_validator.state.batch_tracker import BatchTracker
@@ -50,11 +53,17 @@ from sawtooth_validator.state.settings_cache import SettingsObserver
 from sawtooth_validator.state.settings_cache import SettingsCache
 from sawtooth_validator.state.identity_view import IdentityViewFactory
 from sawtooth_validator.state.state_view import StateViewFactory
+from sawtooth_validator.state.snapshot import StateSnapshotExporter
+from sawtooth_validator.state.snapshot import StateSnapshotStore
+from sawtooth_validator.state.snapshot_bootstrap import \
+    StateSnapshotBootstrap
 from sawtooth_validator.gossip.permission_verifier import PermissionVerifier
 from sawtooth_validator.gossip.permission_verifier import IdentityCache
 from sawtooth_validator.gossip.identity_observer import IdentityObserver
 from sawtooth_validator.networking.interconnect import Interconnect
 from sawtooth_validator.gossip.gossip import Gossip
+from sawtooth_validator.gossip.signature_verifier import \
+    SignatureVerificationEngine
 
 from sawtooth_validator.server.events.broadcaster import EventBroadcaster
 
@@ -86,7 +95,10 @@ class Validator(object):
                  state_pruning_block_depth,
                  network_public_key=None,
                  network_private_key=None,
-                 roles=None):
+                 roles=None,
+                 state_snapshot_interval=0,
+                 state_snapshot_bootstrap=False,
+                 state_snapshot_trusted_block_id=None):
         """Constructs a validator instance.
 
         Args:
@@ -111,6 +123,13 @@ class Validator(object):
             config_dir (str): path to the config directory
             identity_signer (str): cryptographic signer the validator uses for
                 signing
+            state_snapshot_interval (int): the number of blocks between
+                exported snapshots of global state, or 0 to export none
+            state_snapshot_bootstrap (bool): whether a validator with no
+                chain should bootstrap global state from a peer's snapshot
+            state_snapshot_trusted_block_id (str): the id of the block whose
+                snapshot to bootstrap from, or None to bootstrap from the
+                newest snapshot whose block most peers have on their chain
         """
         # -- Setup Global State Database and Factory -- #
         global_state_db_filename = os.path.join(
@@ -121,6 +140,8 @@ class Validator(object):
             global_state_db_filename,
             indexes=MerkleDatabase.create_index_configuration())
         state_view_factory = StateViewFactory(global_state_db)
+        snapshot_store = StateSnapshotStore(
+            os.path.join(data_dir, 'snapshots-{}'.format(bind_network[-2:])))
 
         # -- Setup Receipt Store -- #
         receipt_db_filename = os.path.join(
@@ -146,7 +167,9 @@ class Validator(object):
         block_cache = BlockCache(
             block_store,
             keep_time=int(base_keep_time * 9 / 8),
-            purge_frequency=30)
+            purge_frequency=30,
+            sizeof=block_size,
+            name='block_cache')
 
         # -- Setup Thread Pools -- #
         component_thread_pool = InstrumentedThreadPoolExecutor(
@@ -161,9 +184,21 @@ class Validator(object):
         sig_pool = InstrumentedThreadPoolExecutor(
             max_workers=3,
             name='Signature')
+        event_catchup_pool = InstrumentedThreadPoolExecutor(
+            max_workers=3,
+            name='EventCatchup')
+        snapshot_pool = InstrumentedThreadPoolExecutor(
+            max_workers=1,
+            name='StateSnapshot')
+        signature_verification_engine = SignatureVerificationEngine()
 
         # -- Setup Dispatchers -- #
-        component_dispatcher = Dispatcher()
+        # Client requests are held in the dispatcher once the client thread
+        # pool is busy, rather than queueing ahead of transaction processor
+        # messages in the shared pools.
+        component_dispatcher = Dispatcher(
+            max_queue_size={Priority.LOW: 1000},
+            max_in_flight={Priority.LOW: 10})
         network_dispatcher = Dispatcher()
 
         # -- Setup Services -- #
@@ -219,7 +254,8 @@ class Validator(object):
             transaction_executor.check_connections)
 
         event_broadcaster = EventBroadcaster(
-            component_service, block_store, receipt_store)
+            component_service, block_store, receipt_store,
+            catchup_thread_pool=event_catchup_pool)
 
         # -- Setup P2P Networking -- #
         gossip = Gossip(
@@ -243,6 +279,13 @@ class Validator(object):
             cache_purge_frequency=30,
             requested_keep_time=300)
 
+        block_sync = BlockSync(completer, gossip, block_store, sig_pool)
+        completer.set_block_sync(block_sync)
+
+        snapshot_bootstrap = StateSnapshotBootstrap(
+            gossip, global_state_db, block_store,
+            trusted_block_id=state_snapshot_trusted_block_id)
+
         block_sender = BroadcastBlockSender(completer, gossip)
         batch_sender = BroadcastBatchSender(completer, gossip)
         chain_id_manager = ChainIdManager(data_dir)
@@ -315,6 +358,19 @@ class Validator(object):
             config_dir=config_dir,
             permission_verifier=permission_verifier)
 
+        chain_observers = [
+            event_broadcaster,
+            receipt_store,
+            batch_tracker,
+            identity_observer,
+            settings_observer,
+            block_sync
+        ]
+        if state_snapshot_interval > 0:
+            chain_observers.append(StateSnapshotExporter(
+                snapshot_store, global_state_db, state_snapshot_interval,
+                snapshot_pool))
+
         chain_controller = ChainController(
             block_store=block_store,
             block_cache=block_cache,
@@ -323,13 +379,7 @@ class Validator(object):
             chain_head_lock=block_publisher.chain_head_lock,
             state_pruning_block_depth=state_pruning_block_depth,
             data_dir=data_dir,
-            observers=[
-                event_broadcaster,
-                receipt_store,
-                batch_tracker,
-                identity_observer,
-                settings_observer
-            ])
+            observers=chain_observers)
 
         genesis_controller = GenesisController(
             context_manager=context_manager,
@@ -353,8 +403,10 @@ class Validator(object):
         network_handlers.add(
             network_dispatcher, network_service, gossip, completer,
             responder, network_thread_pool, sig_pool,
-            chain_controller.has_block, block_publisher.has_batch,
-            permission_verifier, block_publisher, consensus_notifier)
+            signature_verification_engine, chain_controller.has_block,
+            block_publisher.has_batch,
+            permission_verifier, block_publisher, consensus_notifier,
+            block_sync, snapshot_store, snapshot_bootstrap)
 
         component_handlers.add(
             component_dispatcher, gossip, context_manager,
@@ -362,7 +414,7 @@ class Validator(object):
             global_state_db, self.get_chain_head_state_root_hash,
             receipt_store, event_broadcaster, permission_verifier,
             component_thread_pool, client_thread_pool,
-            sig_pool, block_publisher)
+            sig_pool, signature_verification_engine, block_publisher)
 
         # -- Store Object References -- #
         self._component_dispatcher = component_dispatcher
@@ -391,11 +443,20 @@ class Validator(object):
 
         self._client_thread_pool = client_thread_pool
         self._sig_pool = sig_pool
+        self._event_catchup_pool = event_catchup_pool
+        self._snapshot_pool = snapshot_pool
+        self._signature_verification_engine = signature_verification_engine
 
         self._context_manager = context_manager
         self._transaction_executor = transaction_executor
         self._genesis_controller = genesis_controller
         self._gossip = gossip
+        self._completer = completer
+        self._block_sync = block_sync
+
+        self._snapshot_bootstrap = None
+        if state_snapshot_bootstrap:
+            self._snapshot_bootstrap = snapshot_bootstrap
 
         self._block_publisher = block_publisher
         self._chain_controller = chain_controller
@@ -416,6 +477,19 @@ class Validator(object):
         self._network_service.start()
 
         self._gossip.start()
+        self._completer.start()
+        self._block_sync.start()
+
+        # The chain controller takes its chain head from the block store
+        # when it starts, so the state is bootstrapped before that.
+        if self._snapshot_bootstrap is not None \
+                and self._chain_controller.chain_head is None:
+            self._completer.pause_blocks()
+            try:
+                self._snapshot_bootstrap.run()
+            finally:
+                self._completer.resume_blocks()
+
         self._block_publisher.start()
         self._chain_controller.start()
 
@@ -429,6 +503,8 @@ class Validator(object):
             signal_event.wait(timeout=20)
 
     def stop(self):
+        self._block_sync.stop()
+        self._completer.stop()
         self._gossip.stop()
         self._component_dispatcher.stop()
         self._network_dispatcher.stop()
@@ -443,6 +519,9 @@ class Validator(object):
         self._component_thread_pool.shutdown(wait=True)
         self._client_thread_pool.shutdown(wait=True)
         self._sig_pool.shutdown(wait=True)
+        self._event_catchup_pool.shutdown(wait=True)
+        self._snapshot_pool.shutdown(wait=True)
+        self._signature_verification_engine.stop()
 
         self._transaction_executor.stop()
         self._context_manager.stop()
@@ -13,6 +13,8 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from collections import deque
+from concurrent.futures import Future
 import logging
 from threading import Condition
 
@@ -25,21 +27,48 @@ from sawtooth_validator.journal.event_extractors \
 from sawtooth_validator.journal.event_extractors \
     import ReceiptEventExtractor
 from sawtooth_validator.journal.block_wrapper import NULL_BLOCK_IDENTIFIER
+from sawtooth_validator.networking.future import FutureTimeoutError
+from sawtooth_validator.server.events.subscription import SubscriptionIndex
 
 LOGGER = logging.getLogger(__name__)
 
+# The serialized size up to which the events of consecutive blocks are
+# combined into one EventList while catching up a subscriber. The events of
+# a single block are never split.
+CATCHUP_EVENT_LIST_MAX_SIZE = 1024 * 1024
+# The number of blocks whose events are extracted ahead of those being sent
+# while catching up a subscriber.
+CATCHUP_BLOCKS_AHEAD = 32
+# The time to wait for an EventList to be handed to a subscriber's socket
+# before the next is sent, while catching up the subscriber
+CATCHUP_SEND_TIMEOUT = 10
+
 
 class NoKnownBlockError(Exception):
     pass
 
 
 class EventBroadcaster(ChainObserver):
-    def __init__(self, service, block_store, receipt_store):
+    def __init__(self, service, block_store, receipt_store,
+                 catchup_thread_pool=None):
+        """
+        Args:
+            service (Interconnect): The connection to subscribers
+            block_store (BlockStore): The blocks of the current chain
+            receipt_store (TransactionReceiptStore): The receipts of the
+                transactions in the current chain
+            catchup_thread_pool (Executor): Extracts the events of blocks
+                while catching up subscribers. Events are extracted on the
+                calling thread if not given.
+        """
         self._subscribers = {}
         self._subscribers_cv = Condition()
+        # Rebuilt from the subscribers when next needed, after they change
+        self._subscription_index = None
         self._service = service
         self._block_store = block_store
         self._receipt_store = receipt_store
+        self._catchup_thread_pool = catchup_thread_pool
 
     def add_subscriber(self, connection_id, subscriptions,
                        last_known_block_id):
@@ -53,6 +82,7 @@ class EventBroadcaster(ChainObserver):
             self._subscribers[connection_id] = \
                 EventSubscriber(
                     connection_id, subscriptions, last_known_block_id)
+            self._subscription_index = None
 
         LOGGER.debug(
             'Added Subscriber %s for %s', connection_id, subscriptions)
@@ -68,7 +98,8 @@ class EventBroadcaster(ChainObserver):
             NoKnownBlockError
                 None of the last known blocks were in the current chain
             KeyError
-                Unknown connection_id
+                Unknown connection_id, or the last known block is no longer
+                in the current chain
         """
         with self._subscribers_cv:
             subscriber = self._subscribers[connection_id]
@@ -80,11 +111,88 @@ class EventBroadcaster(ChainObserver):
                 'Catching up Subscriber %s from %s',
                 connection_id, last_known_block_id)
 
-            # Send catchup events one block at a time
-            for block_id in self.get_catchup_block_ids(last_known_block_id):
-                events = self.get_events_for_block_id(block_id, subscriptions)
-                event_list = EventList(events=events)
-                self._send(connection_id, event_list.SerializeToString())
+            self._send_catchup_events(
+                connection_id,
+                subscriptions,
+                self._get_catchup_blocks(last_known_block_id))
+
+    def _send_catchup_events(self, connection_id, subscriptions, blocks):
+        """Sends the events of the given blocks, in order, combining the
+        events of consecutive blocks into EventLists of up to
+        CATCHUP_EVENT_LIST_MAX_SIZE bytes.
+
+        Events are extracted a bounded number of blocks ahead of the one
+        being sent, and each EventList is sent once the previous one has
+        been handed to the subscriber's socket, so that they do not pile up
+        waiting to be sent. Catching up stops if the subscriber is removed,
+        its connection is closed or an EventList is not sent in time.
+        """
+        pending = deque()
+        sending = None
+
+        def extract_next():
+            block = next(blocks, None)
+            if block is None:
+                return
+            if self._catchup_thread_pool is None:
+                future = Future()
+                future.set_result(
+                    self.get_events_for_block(block, subscriptions))
+            else:
+                future = self._catchup_thread_pool.submit(
+                    self.get_events_for_block, block, subscriptions)
+            pending.append(future)
+
+        for _ in range(CATCHUP_BLOCKS_AHEAD):
+            extract_next()
+
+        event_list = EventList()
+        event_list_size = 0
+        try:
+            while pending:
+                events = pending.popleft().result()
+                extract_next()
+
+                events_size = sum(event.ByteSize() for event in events)
+                if event_list.events and event_list_size + events_size > \
+                        CATCHUP_EVENT_LIST_MAX_SIZE:
+                    sending = self._send_catchup_event_list(
+                        connection_id, event_list, sending)
+                    event_list = EventList()
+                    event_list_size = 0
+
+                event_list.events.extend(events)
+                event_list_size += events_size
+
+            if event_list.events:
+                self._send_catchup_event_list(
+                    connection_id, event_list, sending)
+        except _SubscriberGoneError:
+            LOGGER.debug(
+                'Stopped catching up Subscriber %s, which is no longer '
+                'connected', connection_id)
+        except FutureTimeoutError:
+            LOGGER.warning(
+                'Stopped catching up Subscriber %s, whose events could not '
+                'be sent in time', connection_id)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _send_catchup_event_list(self, connection_id, event_list, sending):
+        """Sends the event list once the previous one, whose send future is
+        `sending`, has been sent, and returns its own send future.
+        """
+        if sending is not None:
+            sending.wait_sent(CATCHUP_SEND_TIMEOUT)
+        with self._subscribers_cv:
+            if connection_id not in self._subscribers:
+                raise _SubscriberGoneError()
+        try:
+            return self._send(connection_id, event_list.SerializeToString())
+        except ValueError:
+            # The connection has been closed
+            raise _SubscriberGoneError()
 
     def enable_subscriber(self, connection_id):
         """Start sending events to the subscriber.
@@ -96,34 +204,66 @@ class EventBroadcaster(ChainObserver):
         """
         with self._subscribers_cv:
             self._subscribers[connection_id].start_listening()
+            self._subscription_index = None
 
     def disable_subscriber(self, connection_id):
         with self._subscribers_cv:
             self._subscribers[connection_id].stop_listening()
+            self._subscription_index = None
 
     def remove_subscriber(self, connection_id):
         with self._subscribers_cv:
             if connection_id in self._subscribers:
                 del self._subscribers[connection_id]
+                self._subscription_index = None
+
+    def _get_subscription_index(self):
+        with self._subscribers_cv:
+            if self._subscription_index is None:
+                self._subscription_index = SubscriptionIndex(
+                    {conn: sub.subscriptions
+                     for conn, sub in self._subscribers.items()},
+                    {conn for conn, sub in self._subscribers.items()
+                     if sub.is_listening()})
+            return self._subscription_index
 
     def get_catchup_block_ids(self, last_known_block_id):
         '''
         Raises:
-            PossibleForkDetectedError
+            KeyError
+                The last known block is not in the current chain
         '''
-        # If latest known block is not the current chain head, catch up
-        catchup_up_blocks = []
-        if last_known_block_id != self._block_store.chain_head.identifier:
-            # Start from the chain head and get blocks until we reach the
-            # known block
-            for block in self._block_store.get_predecessor_iter():
-                # All the blocks if NULL_BLOCK_IDENTIFIER
-                if last_known_block_id != NULL_BLOCK_IDENTIFIER:
-                    if block.identifier == last_known_block_id:
-                        break
-                catchup_up_blocks.append(block.identifier)
-
-        return list(reversed(catchup_up_blocks))
+        return [
+            block.identifier
+            for block in self._get_catchup_blocks(last_known_block_id)
+        ]
+
+    def _get_catchup_blocks(self, last_known_block_id):
+        """Returns an iterator over the blocks of the current chain after the
+        last known block, found by block number so that the chain is read
+        from the last known block forward.
+
+        Blocks committed while the iterator is consumed are included.
+
+        Raises:
+            KeyError
+                The last known block is not in the current chain
+        """
+        # All the blocks if NULL_BLOCK_IDENTIFIER
+        if last_known_block_id == NULL_BLOCK_IDENTIFIER:
+            block_num = 0
+        else:
+            block_num = self._block_store[last_known_block_id].block_num + 1
+
+        def blocks_from(block_num):
+            while True:
+                try:
+                    yield self._block_store.get_block_by_number(block_num)
+                except KeyError:
+                    return
+                block_num += 1
+
+        return blocks_from(block_num)
 
     def get_latest_known_block_id(self, last_known_block_ids):
         '''
@@ -228,11 +368,7 @@ class EventBroadcaster(ChainObserver):
             ReceiptEventExtractor(receipts),
         ]
 
-        subscriptions = []
-        for subscriber in self._subscribers.values():
-            for subscription in subscriber.subscriptions:
-                if subscription not in subscriptions:
-                    subscriptions.append(subscription)
+        subscriptions = self._get_subscription_index().subscriptions
 
         events = []
         for extractor in extractors:
@@ -245,31 +381,27 @@ class EventBroadcaster(ChainObserver):
 
     def broadcast_events(self, events):
         LOGGER.debug("Broadcasting events: %s", events)
-        with self._subscribers_cv:
-            # Copy the subscribers
-            subscribers = {
-                conn: sub.copy()
-                for conn, sub in self._subscribers.items()
-            }
-
-        if subscribers:
-            for connection_id, subscriber in subscribers.items():
-                if subscriber.is_listening():
-                    subscriber_events = [
-                        event for event in events
-                        if subscriber.is_subscribed(event)
-                    ]
-                    event_list = EventList(events=subscriber_events)
-                    self._send(connection_id, event_list.SerializeToString())
+        # Subscribers with identical subscriptions share the serialized
+        # event list
+        for connection_ids, subscriber_events in \
+                self._get_subscription_index().match(events):
+            event_list = EventList(events=subscriber_events)
+            event_list_bytes = event_list.SerializeToString()
+            for connection_id in connection_ids:
+                self._send(connection_id, event_list_bytes)
 
     def _send(self, connection_id, message_bytes):
-        self._service.send(
+        return self._service.send(
             validator_pb2.Message.CLIENT_EVENTS,
             message_bytes,
             connection_id=connection_id,
             one_way=True)
 
 
+class _SubscriberGoneError(Exception):
+    pass
+
+
 class EventSubscriber:
     def __init__(self, connection_id, subscriptions, last_known_block,
                  listening=False):
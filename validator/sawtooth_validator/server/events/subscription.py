@@ -15,6 +15,7 @@
 
 from abc import ABCMeta
 from abc import abstractmethod
+from collections import defaultdict
 import re
 
 from sawtooth_validator.protobuf import events_pb2
@@ -54,6 +55,216 @@ class EventSubscription:
         return False
 
 
+def _filter_key(event_filter):
+    return (event_filter.__class__,
+            event_filter.key,
+            event_filter.match_string)
+
+
+def _subscription_key(subscription):
+    return (subscription.event_type,
+            frozenset(_filter_key(f) for f in subscription.filters))
+
+
+# A regular expression which only matches values starting with a literal
+# string, such as an address prefix.
+_LITERAL_PREFIX_PATTERN = re.compile(r'\^([0-9A-Za-z_]*)(\.\*)?')
+
+
+class SubscriptionIndex:
+    """Matches events against the subscriptions of many subscribers at once.
+
+    Subscriptions are hashed by event type, and subscribers with identical
+    subscriptions are grouped so that the events matching them are collected
+    once per group. While matching an event, each distinct filter is
+    evaluated once, no matter how many subscriptions include it:
+
+        - SIMPLE_ANY and SIMPLE_ALL filters are set lookups against the
+          event's attributes.
+        - REGEX_ANY filters of the form "^prefix" are found by walking a trie
+          of the prefixes with each attribute value.
+        - Other REGEX_ANY filters on the same key are first tried as a single
+          combined regular expression, so that none is evaluated when no
+          attribute matches any of them.
+
+    Args:
+        subscribers (dict): Lists of EventSubscriptions, by connection id
+        listening (set): The connection ids to which events are sent
+    """
+
+    def __init__(self, subscribers, listening):
+        self._subscriptions = {}
+        self._filters = {}
+        self._filters_by_type = defaultdict(dict)
+        groups = {}
+        for connection_id, subscriptions in subscribers.items():
+            sub_keys = []
+            for sub in subscriptions:
+                sub_key = _subscription_key(sub)
+                sub_keys.append(sub_key)
+                self._subscriptions.setdefault(sub_key, sub)
+                self._filters_by_type[sub.event_type][sub_key] = sub_key[1]
+                for sub_filter in sub.filters:
+                    self._filters.setdefault(
+                        _filter_key(sub_filter), sub_filter)
+
+            if connection_id in listening:
+                groups.setdefault(frozenset(sub_keys), []).append(
+                    connection_id)
+
+        # The groups of connections each subscription belongs to
+        self._groups = list(groups.items())
+        self._groups_by_subscription = defaultdict(list)
+        for i, (sub_keys, _) in enumerate(self._groups):
+            for sub_key in sub_keys:
+                self._groups_by_subscription[sub_key].append(i)
+
+        self._prefix_tries = defaultdict(dict)
+        self._prefix_filters = set()
+        combinable = defaultdict(list)
+        for filter_key in self._filters:
+            self._index_regex_any_filter(filter_key, combinable)
+
+        self._combined_regexes = {}
+        self._combined_filters = set()
+        for key, filter_keys in combinable.items():
+            try:
+                self._combined_regexes[key] = re.compile('|'.join(
+                    '(?:{})'.format(match_string)
+                    for _, _, match_string in filter_keys))
+            except re.error:
+                continue
+            self._combined_filters.update(filter_keys)
+
+    def _index_regex_any_filter(self, filter_key, combinable):
+        filter_class, key, match_string = filter_key
+        if filter_class is not RegexAnyFilter:
+            return
+
+        prefix = _LITERAL_PREFIX_PATTERN.fullmatch(match_string)
+        if prefix is not None:
+            node = self._prefix_tries[key]
+            for char in prefix.group(1):
+                node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(filter_key)
+            self._prefix_filters.add(filter_key)
+        # Only patterns without groups or inline flags keep their meaning
+        # as part of a larger expression
+        elif '(?' not in match_string and \
+                self._filters[filter_key].regex.groups == 0:
+            combinable[key].append(filter_key)
+
+    @property
+    def subscriptions(self):
+        """The distinct subscriptions of all subscribers."""
+        return list(self._subscriptions.values())
+
+    def match(self, events):
+        """Returns the events which each group of listening subscribers with
+        identical subscriptions is subscribed to.
+
+        Args:
+            events (list of Event): The events to match, in order
+
+        Returns:
+            list: (connection ids, events) pairs for every group, where the
+                events are in their original order
+        """
+        matched = [[] for _ in self._groups]
+        for event in events:
+            filters = self._filters_by_type.get(event.event_type)
+            if not filters:
+                continue
+
+            event_match = _EventMatch(event)
+            groups = set()
+            for sub_key, filter_keys in filters.items():
+                if all(self._passes(event_match, f) for f in filter_keys):
+                    groups.update(self._groups_by_subscription[sub_key])
+
+            for i in sorted(groups):
+                matched[i].append(event)
+
+        return [
+            (connection_ids, matched[i])
+            for i, (_, connection_ids) in enumerate(self._groups)
+        ]
+
+    def _passes(self, event_match, filter_key):
+        """Returns whether the event passes the filter, evaluating the filter
+        only the first time it is needed for the event.
+        """
+        try:
+            return event_match.results[filter_key]
+        except KeyError:
+            pass
+
+        filter_class, key, match_string = filter_key
+        values = event_match.values.get(key, [])
+        if filter_class is SimpleAnyFilter:
+            result = match_string in values
+        elif filter_class is SimpleAllFilter:
+            result = all(value == match_string for value in values)
+        elif filter_class is RegexAnyFilter:
+            result = self._regex_any(event_match, filter_key, values)
+        else:
+            result = self._filters[filter_key].matches(event_match.event)
+
+        event_match.results[filter_key] = result
+        return result
+
+    def _regex_any(self, event_match, filter_key, values):
+        key = filter_key[1]
+        if filter_key in self._prefix_filters:
+            if key not in event_match.prefix_matches:
+                event_match.prefix_matches[key] = self._walk_prefix_trie(
+                    self._prefix_tries[key], values)
+            return filter_key in event_match.prefix_matches[key]
+
+        if filter_key in self._combined_filters:
+            if key not in event_match.combined_matches:
+                regex = self._combined_regexes[key]
+                event_match.combined_matches[key] = any(
+                    regex.search(value) for value in values)
+            if not event_match.combined_matches[key]:
+                return False
+
+        regex = self._filters[filter_key].regex
+        return any(regex.search(value) for value in values)
+
+    @staticmethod
+    def _walk_prefix_trie(trie, values):
+        matches = set()
+        for value in values:
+            node = trie
+            matches.update(node.get(None, ()))
+            for char in value:
+                node = node.get(char)
+                if node is None:
+                    break
+                matches.update(node.get(None, ()))
+        return matches
+
+
+class _EventMatch:
+    """The attribute values of a single event, and the results of the
+    filters of a SubscriptionIndex for it, recorded as they are evaluated.
+    """
+
+    def __init__(self, event):
+        self.event = event
+        self.values = defaultdict(list)
+        for attribute in event.attributes:
+            self.values[attribute.key].append(attribute.value)
+
+        # Results by filter key
+        self.results = {}
+        # Prefix filter keys matched, and whether any combined regex
+        # matched, by attribute key
+        self.prefix_matches = {}
+        self.combined_matches = {}
+
+
 class InvalidFilterError(Exception):
     pass
 
@@ -23,12 +23,24 @@ from sawtooth_validator.journal.completer import \
     CompleterGossipBatchResponseHandler
 from sawtooth_validator.gossip import structure_verifier
 
+from sawtooth_validator.journal.block_sync import BlockSyncResponseHandler
 from sawtooth_validator.journal.responder import BlockResponderHandler
+from sawtooth_validator.journal.responder import BlockRangeResponderHandler
 from sawtooth_validator.journal.responder import ResponderBlockResponseHandler
 from sawtooth_validator.journal.responder import BatchByBatchIdResponderHandler
 from sawtooth_validator.journal.responder import ResponderBatchResponseHandler
 from sawtooth_validator.journal.responder import \
     BatchByTransactionIdResponderHandler
+from sawtooth_validator.state.snapshot import \
+    StateSnapshotChunkRequestHandler
+from sawtooth_validator.state.snapshot import \
+    StateSnapshotManifestRequestHandler
+from sawtooth_validator.state.snapshot_bootstrap import \
+    StateSnapshotBlockRangeResponseHandler
+from sawtooth_validator.state.snapshot_bootstrap import \
+    StateSnapshotChunkResponseHandler
+from sawtooth_validator.state.snapshot_bootstrap import \
+    StateSnapshotManifestResponseHandler
 
 from sawtooth_validator.gossip import signature_verifier
 
@@ -80,11 +92,15 @@ def add(
         responder,
         thread_pool,
         sig_pool,
+        signature_verification_engine,
         has_block,
         has_batch,
         permission_verifier,
         block_publisher,
         consensus_notifier,
+        block_sync,
+        snapshot_store,
+        snapshot_bootstrap,
 ):
 
     # -- Basic Networking -- #
@@ -224,7 +240,8 @@ def add(
     # GOSSIP_MESSAGE ) Verifies signature
     dispatcher.add_handler(
         validator_pb2.Message.GOSSIP_MESSAGE,
-        signature_verifier.GossipMessageSignatureVerifier(),
+        signature_verifier.GossipMessageSignatureVerifier(
+            signature_verification_engine),
         sig_pool)
 
     # GOSSIP_MESSAGE ) Verifies batch structure
@@ -278,6 +295,99 @@ def add(
         BlockResponderHandler(responder, gossip),
         thread_pool)
 
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_BLOCK_RANGE_REQUEST,
+        NetworkPermissionHandler(
+            network=interconnect,
+            permission_verifier=permission_verifier,
+            gossip=gossip
+        ),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_BLOCK_RANGE_REQUEST,
+        BlockRangeResponderHandler(responder, gossip),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_BLOCK_RANGE_RESPONSE,
+        NetworkPermissionHandler(
+            network=interconnect,
+            permission_verifier=permission_verifier,
+            gossip=gossip
+        ),
+        thread_pool)
+
+    # GOSSIP_BLOCK_RANGE_RESPONSE) The blocks are verified by block sync,
+    # which hands them to the completer in order
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_BLOCK_RANGE_RESPONSE,
+        BlockSyncResponseHandler(block_sync),
+        thread_pool)
+
+    # GOSSIP_BLOCK_RANGE_RESPONSE) The blocks on peers' chains confirm the
+    # block of a state snapshot being bootstrapped from
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_BLOCK_RANGE_RESPONSE,
+        StateSnapshotBlockRangeResponseHandler(snapshot_bootstrap),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_MANIFEST_REQUEST,
+        NetworkPermissionHandler(
+            network=interconnect,
+            permission_verifier=permission_verifier,
+            gossip=gossip
+        ),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_MANIFEST_REQUEST,
+        StateSnapshotManifestRequestHandler(snapshot_store, gossip),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_MANIFEST_RESPONSE,
+        NetworkPermissionHandler(
+            network=interconnect,
+            permission_verifier=permission_verifier,
+            gossip=gossip
+        ),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_MANIFEST_RESPONSE,
+        StateSnapshotManifestResponseHandler(snapshot_bootstrap),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_CHUNK_REQUEST,
+        NetworkPermissionHandler(
+            network=interconnect,
+            permission_verifier=permission_verifier,
+            gossip=gossip
+        ),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_CHUNK_REQUEST,
+        StateSnapshotChunkRequestHandler(snapshot_store, gossip),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_CHUNK_RESPONSE,
+        NetworkPermissionHandler(
+            network=interconnect,
+            permission_verifier=permission_verifier,
+            gossip=gossip
+        ),
+        thread_pool)
+
+    dispatcher.add_handler(
+        validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_CHUNK_RESPONSE,
+        StateSnapshotChunkResponseHandler(snapshot_bootstrap),
+        thread_pool)
+
     dispatcher.set_preprocessor(
         validator_pb2.Message.GOSSIP_BLOCK_RESPONSE,
         gossip_block_response_preprocessor,
@@ -15,13 +15,18 @@
 
 import logging
 import os
+import queue
+import threading
+import time
 
 from sawtooth_validator.protobuf import validator_pb2
+from sawtooth_validator.protobuf.transaction_pb2 import TransactionHeader
 from sawtooth_validator.state.merkle import INIT_ROOT_KEY
 
 from sawtooth_validator.execution import tp_state_handlers
 from sawtooth_validator.execution import processor_handlers
 
+from sawtooth_validator.concurrent.thread import InstrumentedThread
 from sawtooth_validator.concurrent.threadpool import \
     InstrumentedThreadPoolExecutor
 from sawtooth_validator.execution.context_manager import ContextManager
@@ -32,6 +37,8 @@ from sawtooth_validator.database.native_lmdb import NativeLmdbDatabase
 from sawtooth_validator.journal.block_store import BlockStore
 from sawtooth_validator.networking.dispatch import Dispatcher
 from sawtooth_validator.execution.executor import TransactionExecutor
+from sawtooth_validator.gossip.signature_verifier import \
+    SignatureVerificationEngine
 from sawtooth_validator.state.merkle import MerkleDatabase
 from sawtooth_validator.state.settings_view import SettingsViewFactory
 from sawtooth_validator.state.state_view import StateViewFactory
@@ -40,6 +47,12 @@ from sawtooth_validator.networking.interconnect import Interconnect
 
 LOGGER = logging.getLogger(__name__)
 
+# The number of blocks read, verified and prefetched ahead of the block
+# being executed
+REPLAY_LOOKAHEAD = 8
+# Time in seconds between replay progress reports
+REPLAY_REPORT_INTERVAL = 10
+
 
 class InvalidChainError(Exception):
     pass
@@ -77,11 +90,9 @@ def get_databases(bind_network, data_dir):
 def verify_state(global_state_db, blockstore, bind_component, scheduler_type):
     """
     Verify the state root hash of all blocks is in state and if not,
-    reconstruct the missing state. Assumes that there are no "holes" in
-    state, ie starting from genesis, state is present for all blocks up to some
-    point and then not at all. If persist is False, this recomputes state in
-    memory for all blocks in the blockstore and verifies the state root
-    hashes.
+    reconstruct the missing state. The missing state is recomputed from the
+    last block whose state root is present, so a replay which was interrupted
+    resumes from the last block it verified.
 
     Raises:
         InvalidChainError: The chain in the blockstore is not valid.
@@ -102,6 +113,7 @@ def verify_state(global_state_db, blockstore, bind_component, scheduler_type):
     LOGGER.info(
         "Recomputing missing state from block %s with %s scheduler",
         start_block, scheduler_type)
+    total_blocks = blockstore.chain_head.block_num - start_block.block_num + 1
 
     component_thread_pool = InstrumentedThreadPoolExecutor(
         max_workers=10,
@@ -169,26 +181,35 @@ def verify_state(global_state_db, blockstore, bind_component, scheduler_type):
     component_dispatcher.start()
     component_service.start()
 
-    process_blocks(
-        initial_state_root=prev_state_root,
-        blocks=blockstore.get_block_iter(
-            start_block=start_block, reverse=False),
-        transaction_executor=transaction_executor,
-        context_manager=context_manager,
-        state_view_factory=state_view_factory)
+    signature_verification_engine = SignatureVerificationEngine()
 
-    component_dispatcher.stop()
-    component_service.stop()
-    component_thread_pool.shutdown(wait=True)
-    transaction_executor.stop()
-    context_manager.stop()
+    try:
+        process_blocks(
+            initial_state_root=prev_state_root,
+            blocks=blockstore.get_block_iter(
+                start_block=start_block, reverse=False),
+            transaction_executor=transaction_executor,
+            context_manager=context_manager,
+            state_view_factory=state_view_factory,
+            signature_verification_engine=signature_verification_engine,
+            total_blocks=total_blocks)
+    finally:
+        signature_verification_engine.stop()
+        component_dispatcher.stop()
+        component_service.stop()
+        component_thread_pool.shutdown(wait=True)
+        transaction_executor.stop()
+        context_manager.stop()
 
 
 def search_for_present_state_root(blockstore, state_view_factory):
     """
     Search through the blockstore and return a tuple containing:
-        - the first block with a missing state root
+        - the first block after the last block whose state root is present
         - the state root of that blocks predecessor
+
+    The search walks back from the chain head, so state roots of older blocks
+    which have been pruned are not mistaken for missing state.
     """
     # If there is no chain to process, then we are done.
     block = blockstore.chain_head
@@ -199,16 +220,14 @@ def search_for_present_state_root(blockstore, state_view_factory):
     if state_db_has_root(state_view_factory, block.state_root_hash):
         return None, None
 
-    prev_state_root = INIT_ROOT_KEY
-    for block in blockstore.get_block_iter(reverse=False):
-        if not state_db_has_root(state_view_factory, block.state_root_hash):
-            return block, prev_state_root
-        prev_state_root = block.state_root_hash
+    missing_block = None
+    for block in blockstore.get_block_iter(reverse=True):
+        if state_db_has_root(state_view_factory, block.state_root_hash):
+            return missing_block, block.state_root_hash
+        missing_block = block
 
-    # This should never happen, since we already checked that the chain head
-    # didn't have a state root
-    raise ExecutionError(
-        "Chain head state both missing but all blocks had state root present")
+    # No state is present, so all of it is recomputed from genesis
+    return missing_block, INIT_ROOT_KEY
 
 
 def state_db_has_root(state_view_factory, root):
@@ -225,29 +244,174 @@ def process_blocks(
     transaction_executor,
     context_manager,
     state_view_factory,
+    signature_verification_engine=None,
+    total_blocks=None,
+    lookahead=REPLAY_LOOKAHEAD,
+    report_interval=REPLAY_REPORT_INTERVAL,
 ):
+    """Executes the blocks in order, verifying that each produces the state
+    root in its header. While a block executes, the following blocks are read,
+    their signatures are verified and their inputs are prefetched from state
+    on another thread.
+    """
+    preparer = _BlockPreparer(
+        blocks, state_view_factory, initial_state_root,
+        signature_verification_engine, lookahead)
+    progress = _ReplayProgress(total_blocks, report_interval)
+    preparer.start()
+
     prev_state_root = initial_state_root
-    for block in blocks:
-        LOGGER.info("Verifying state for block %s", block)
+    try:
+        for block in preparer:
+            LOGGER.debug("Verifying state for block %s", block)
+            try:
+                # If we can create the view, all is good, move on to next
+                # block
+                state_view_factory.create_view(block.state_root_hash)
+
+            except KeyError:
+                # If creating the view fails, the root is missing so we
+                # should recompute it and verify it
+                new_root = execute_batches(
+                    previous_state_root=prev_state_root,
+                    transaction_executor=transaction_executor,
+                    context_manager=context_manager,
+                    batches=block.batches)
+
+                if new_root != block.state_root_hash:
+                    raise InvalidChainError(
+                        "Computed state root {} does not match state root in"
+                        " block {}".format(new_root, block.state_root_hash))
+
+            prev_state_root = block.state_root_hash
+            preparer.set_state_root(prev_state_root)
+            progress.add_block(block)
+    finally:
+        preparer.stop()
+
+    progress.report()
+
+
+class _BlockPreparer(InstrumentedThread):
+    """Reads the blocks to replay, verifies their signatures and prefetches
+    their inputs from state, staying up to `lookahead` blocks ahead of the
+    block being executed.
+    """
+
+    def __init__(self, blocks, state_view_factory, state_root,
+                 signature_verification_engine, lookahead):
+        super().__init__(name='_BlockPreparer', daemon=True)
+        self._blocks = blocks
+        self._state_view_factory = state_view_factory
+        self._signature_verification_engine = signature_verification_engine
+        # The most recent state root present in state, which inputs are
+        # prefetched from
+        self._state_root = state_root
+        self._queue = queue.Queue(maxsize=lookahead)
+        self._stopped = threading.Event()
+
+    def set_state_root(self, state_root):
+        self._state_root = state_root
+
+    def stop(self):
+        self._stopped.set()
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def run(self):
         try:
-            # If we can create the view, all is good, move on to next block
-            state_view_factory.create_view(block.state_root_hash)
+            for block in self._blocks:
+                self._prepare(block)
+                if not self._put(block):
+                    return
+        # pylint: disable=broad-except
+        except Exception as err:
+            self._put(err)
+            return
+        self._put(None)
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                pass
+        return False
 
+    def _prepare(self, block):
+        if self._signature_verification_engine is not None and \
+                not self._signature_verification_engine.verify_block(
+                    block.get_block()):
+            raise InvalidChainError(
+                "Block {} has an invalid signature".format(block))
+
+        state_root = self._state_root
+        if state_root == INIT_ROOT_KEY:
+            return
+
+        # Reading the inputs brings their trie nodes into memory, so that
+        # executing the block does not wait on the disk for them.
+        addresses = set()
+        for batch in block.batches:
+            for txn in batch.transactions:
+                header = TransactionHeader()
+                header.ParseFromString(txn.header)
+                addresses.update(
+                    address for address in header.inputs
+                    if len(address) == 70)
+        if not addresses:
+            return
+        try:
+            self._state_view_factory.create_view(state_root).get_multi(
+                list(addresses))
         except KeyError:
-            # If creating the view fails, the root is missing so we should
-            # recompute it and verify it
-            new_root = execute_batches(
-                previous_state_root=prev_state_root,
-                transaction_executor=transaction_executor,
-                context_manager=context_manager,
-                batches=block.batches)
-
-            if new_root != block.state_root_hash:
-                raise InvalidChainError(
-                    "Computed state root {} does not match state root in block"
-                    " {}".format(new_root, block.state_root_hash))
-
-        prev_state_root = block.state_root_hash
+            # The state root was pruned, or an input is not a valid address
+            pass
+
+
+class _ReplayProgress(object):
+    """Reports the progress and throughput of a replay."""
+
+    def __init__(self, total_blocks, report_interval):
+        self._total_blocks = total_blocks
+        self._report_interval = report_interval
+        self._start = time.time()
+        self._last_report = self._start
+        self._block_count = 0
+        self._transaction_count = 0
+        self._last_block = None
+
+    def add_block(self, block):
+        self._block_count += 1
+        self._transaction_count += sum(
+            len(batch.transactions) for batch in block.batches)
+        self._last_block = block
+
+        now = time.time()
+        if now - self._last_report >= self._report_interval:
+            self._last_report = now
+            self.report()
+
+    def report(self):
+        if self._last_block is None:
+            return
+        elapsed = max(time.time() - self._start, 0.001)
+        LOGGER.info(
+            "Verified state for %s of %s blocks, up to block %s "
+            "(%.1f blocks/s, %.1f transactions/s)",
+            self._block_count,
+            self._total_blocks if self._total_blocks is not None else '?',
+            self._last_block,
+            self._block_count / elapsed,
+            self._transaction_count / elapsed)
 
 
 def execute_batches(
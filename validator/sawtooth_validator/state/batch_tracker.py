@@ -50,23 +50,31 @@ class BatchTracker(ChainObserver,
                  cache_keep_time=600,
                  cache_purge_frequency=30):
         self._block_store = block_store
-        self._batch_info = TimedCache(cache_keep_time, cache_purge_frequency)
+        # The id of the batch containing each pending transaction
+        self._batch_ids_by_txn = TimedCache(
+            cache_keep_time, cache_purge_frequency)
         self._invalid = TimedCache(cache_keep_time, cache_purge_frequency)
         self._pending = set()
+        # The ids of the blocks which committed tracked batches. A batch
+        # committed in a block which is no longer in the chain because of a
+        # fork is pending again.
+        self._committed = TimedCache(cache_keep_time, cache_purge_frequency)
 
         self._lock = RLock()
         self._observers = {}
+        # The observers watching each batch
+        self._observers_by_batch = {}
 
     def chain_update(self, block, receipts):
-        """Removes batches from the pending cache if found in the block store,
-        and notifies any observers.
+        """Moves the batches in a newly committed block from the pending set
+        to the committed cache, and notifies any observers.
         """
         with self._lock:
-            for batch_id in self._pending.copy():
-                if self._block_store.has_batch(batch_id):
-                    self._pending.remove(batch_id)
-                    self._update_observers(batch_id,
-                                           ClientBatchStatus.COMMITTED)
+            for batch_id in block.header.batch_ids:
+                if batch_id in self._pending or batch_id in self._committed:
+                    self._pending.discard(batch_id)
+                    self._committed[batch_id] = block.header_signature
+                self._update_observers(batch_id, ClientBatchStatus.COMMITTED)
 
     def notify_txn_invalid(self, txn_id, message=None, extended_data=None):
         """Adds a batch id to the invalid cache along with the id of the
@@ -86,26 +94,28 @@ class BatchTracker(ChainObserver,
             invalid_txn_info['extended_data'] = extended_data
 
         with self._lock:
-            for batch_id, txn_ids in self._batch_info.items():
-                if txn_id in txn_ids:
-                    if batch_id not in self._invalid:
-                        self._invalid[batch_id] = [invalid_txn_info]
-                    else:
-                        self._invalid[batch_id].append(invalid_txn_info)
-                    self._pending.discard(batch_id)
-                    self._update_observers(batch_id, ClientBatchStatus.INVALID)
-                    return
+            batch_id = self._batch_ids_by_txn.get(txn_id)
+            if batch_id is None:
+                return
+            if batch_id not in self._invalid:
+                self._invalid[batch_id] = [invalid_txn_info]
+            else:
+                self._invalid[batch_id].append(invalid_txn_info)
+            self._pending.discard(batch_id)
+            self._update_observers(batch_id, ClientBatchStatus.INVALID)
 
     def notify_batch_pending(self, batch):
-        """Adds a Batch id to the pending cache, with its transaction ids.
+        """Adds a Batch id to the pending set, and indexes it by its
+        transaction ids.
 
         Args:
             batch (str): The id of the pending batch
         """
-        txn_ids = {t.header_signature for t in batch.transactions}
         with self._lock:
             self._pending.add(batch.header_signature)
-            self._batch_info[batch.header_signature] = txn_ids
+            for txn in batch.transactions:
+                self._batch_ids_by_txn[txn.header_signature] = \
+                    batch.header_signature
             self._update_observers(batch.header_signature,
                                    ClientBatchStatus.PENDING)
 
@@ -123,7 +133,7 @@ class BatchTracker(ChainObserver,
                 return ClientBatchStatus.COMMITTED
             if batch_id in self._invalid:
                 return ClientBatchStatus.INVALID
-            if batch_id in self._pending:
+            if batch_id in self._pending or batch_id in self._committed:
                 return ClientBatchStatus.PENDING
             return ClientBatchStatus.UNKNOWN
 
@@ -171,18 +181,45 @@ class BatchTracker(ChainObserver,
                 observer.notify_batches_finished(statuses)
             else:
                 self._observers[observer] = statuses
+                for batch_id in statuses:
+                    self._observers_by_batch.setdefault(
+                        batch_id, set()).add(observer)
+
+    def unwatch_statuses(self, observer):
+        """Stops notifying a component registered with watch_statuses, if it
+        has not been notified yet.
+
+        Args:
+            observer (object): The registered component
+        """
+        with self._lock:
+            if observer in self._observers:
+                self._remove_observer(observer)
 
     def _update_observers(self, batch_id, status):
         """Updates each observer tracking a particular batch with its new
         status. If all statuses are no longer pending, notifies the observer
         and removes it from the list.
         """
-        for observer, statuses in self._observers.copy().items():
-            if batch_id in statuses:
-                statuses[batch_id] = status
-                if self._has_no_pendings(statuses):
-                    observer.notify_batches_finished(statuses)
-                    self._observers.pop(observer)
+        if status == ClientBatchStatus.PENDING:
+            observers = self._observers_by_batch.get(batch_id, ())
+        else:
+            observers = self._observers_by_batch.pop(batch_id, ())
+        for observer in list(observers):
+            statuses = self._observers[observer]
+            statuses[batch_id] = status
+            if self._has_no_pendings(statuses):
+                observer.notify_batches_finished(statuses)
+                self._remove_observer(observer)
+
+    def _remove_observer(self, observer):
+        statuses = self._observers.pop(observer)
+        for batch_id in statuses:
+            observers = self._observers_by_batch.get(batch_id)
+            if observers is not None:
+                observers.discard(observer)
+                if not observers:
+                    del self._observers_by_batch[batch_id]
 
     def _has_no_pendings(self, statuses):
         """Returns True if a statuses dict has no PENDING statuses.
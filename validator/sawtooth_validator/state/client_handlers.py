@@ -17,19 +17,26 @@
 # Until this module can be sensibly broken up
 
 import abc
+from collections import deque
+from concurrent.futures import Future
+import heapq
 import logging
 from time import time
 import itertools
 from functools import cmp_to_key
+from functools import partial
 import re
 from threading import Condition
+from threading import Lock
 # pylint: disable=import-error,no-name-in-module
 # needed for google.protobuf import
 from google.protobuf.message import DecodeError
 
+from sawtooth_validator.concurrent.thread import InstrumentedThread
 from sawtooth_validator.journal.block_store import BlockStore
 from sawtooth_validator.state.merkle import MerkleDatabase
 from sawtooth_validator.state.batch_tracker import BatchFinishObserver
+from sawtooth_validator.networking.dispatch import DeferredHandlerResult
 from sawtooth_validator.networking.dispatch import Handler
 from sawtooth_validator.networking.dispatch import HandlerResult
 from sawtooth_validator.networking.dispatch import HandlerStatus
@@ -43,7 +50,6 @@ from sawtooth_validator.protobuf import client_batch_submit_pb2
 from sawtooth_validator.protobuf import client_list_control_pb2
 from sawtooth_validator.protobuf import client_peers_pb2
 from sawtooth_validator.protobuf import client_status_pb2
-from sawtooth_validator.protobuf.block_pb2 import BlockHeader
 from sawtooth_validator.protobuf import validator_pb2
 from sawtooth_validator.protobuf.client_batch_submit_pb2 \
     import ClientBatchSubmitResponse
@@ -125,6 +131,9 @@ class _ClientRequestHandler(Handler, metaclass=abc.ABCMeta):
         except _ResponseFailed as e:
             response = e.status
 
+        if isinstance(response, Future):
+            return self._defer_result(response)
+
         return self._wrap_result(response)
 
     @abc.abstractmethod
@@ -136,7 +145,9 @@ class _ClientRequestHandler(Handler, metaclass=abc.ABCMeta):
 
         Returns:
             enum: An enum status, or...
-            dict: A dict of attributes for the response protobuf
+            dict: A dict of attributes for the response protobuf, or...
+            Future: A future completed later with either of the above, for
+                responses which must wait on other components
         """
         raise NotImplementedError('Client Handler must have _respond method')
 
@@ -155,6 +166,27 @@ class _ClientRequestHandler(Handler, metaclass=abc.ABCMeta):
             message_out=self._response_proto(**response),
             message_type=self._response_type)
 
+    def _defer_result(self, response):
+        """Wraps a child's future response in a DeferredHandlerResult, so that
+        it is sent back to the client once done, without holding a thread.
+
+        Args:
+            response (Future): completed with a response as returned by
+                _respond
+        """
+        result = Future()
+
+        def wrap(future):
+            try:
+                result.set_result(self._wrap_result(future.result()))
+            except _ResponseFailed as e:
+                result.set_result(self._wrap_result(e.status))
+            except Exception as e:  # pylint: disable=broad-except
+                result.set_exception(e)
+
+        response.add_done_callback(wrap)
+        return DeferredHandlerResult(result)
+
     def _wrap_response(self, status=None, **kwargs):
         """Convenience method to wrap a status with any key word args.
 
@@ -231,69 +263,149 @@ class _ClientRequestHandler(Handler, metaclass=abc.ABCMeta):
 
         return root
 
-    def _list_store_resources(self, request, head_id, filter_ids,
-                              resource_fetcher, block_xform):
-        """Builds a list of blocks or resources derived from blocks,
-        handling multiple possible filter requests:
-            - filtered by a set of ids
-            - filtered by head block
-            - filtered by both id and head block
-            - not filtered (all current resources)
+    def _list_store_resources(self, request, head_block, filter_ids,
+                              block_fetcher, block_xform):
+        """Builds a list of resources derived from blocks, filtered by a set
+        of ids, and optionally by a head block.
+
+        Each resource is located with a single lookup in the block store's id
+        indexes, rather than by traversing the chain, so the cost scales with
+        the number of ids requested, not with the length of the chain.
 
         Note:
             This method will fail if `_block_store` has not been set
 
         Args:
             request (object): The parsed protobuf request object
-            head_id (str): Either request.head_id, or the current chain head
-            filter_ids (list of str): the resource ids (if any) to filter by
-            resource_fetcher (function): Fetches a resource by its id
+            head_block (BlockWrapper): Either the requested head block, or the
+                current chain head
+            filter_ids (list of str): the resource ids to filter by
+            block_fetcher (function): Fetches the block containing a resource
                 Expected args:
-                    resource_id: The id of the resource to be fetched
+                    resource_id: The id of the resource
                 Expected return:
-                    object: The resource to be appended to the results
+                    BlockWrapper: The block the resource was committed in
             block_xform (function): Transforms a block into a list of resources
                 Expected args:
                     block: A block object from the block store
                 Expected return:
-                    list: To be concatenated to the end of the results
+                    list: The resources contained in the block
 
         Returns:
-            list: List of blocks or data from blocks. If filtered by ids,
-                they will be listed in the same order as the id filters,
-                otherwise they will be ordered from newest to oldest
+            list: List of resources, in the same order as the id filters
         """
         resources = []
 
-        # Simply fetch by id if filtered by id but not by head block
-        if filter_ids and not request.head_id:
-            for resource_id in filter_ids:
-                try:
-                    resources.append(resource_fetcher(resource_id))
-                except (KeyError, ValueError, TypeError):
-                    # Invalid ids should be omitted, not raise an exception
-                    pass
+        for resource_id in filter_ids:
+            try:
+                block = block_fetcher(resource_id)
+            except (KeyError, ValueError, TypeError):
+                # Invalid ids should be omitted, not raise an exception
+                continue
 
-        # Traverse block chain to build results for most scenarios
-        else:
-            current_id = head_id
-            while current_id in self._block_store:
-                block = self._block_store[current_id].block
-                resources += block_xform(block)
-                header = BlockHeader()
-                header.ParseFromString(block.header)
-                current_id = header.previous_block_id
-
-        # If filtering by head AND ids, the traverse results must be winnowed
-        if request.head_id and filter_ids:
-            matches = {
-                r.header_signature: r
-                for r in resources if r.header_signature in filter_ids
-            }
-            resources = [matches[i] for i in filter_ids if i in matches]
+            # Resources committed after the requested head are not part of
+            # the chain it describes
+            if request.head_id and block.block_num > head_block.block_num:
+                continue
+
+            for resource in block_xform(block.block):
+                if resource.header_signature == resource_id:
+                    resources.append(resource)
+                    break
 
         return resources
 
+    def _page_store_resources(self, request, head_block, block_fetcher,
+                              block_xform, reverse):
+        """Fetches a single page of resources derived from blocks, ordered
+        from newest to oldest (or oldest to newest if reversed).
+
+        Rather than building the full list of resources in the chain, the
+        block containing the paging start is found with the block store's id
+        index, and the chain is walked using the block number index from
+        there, stopping as soon as the page is full. Each page therefore
+        costs O(limit), regardless of the length of the chain.
+
+        Note:
+            This method will fail if `_block_store` has not been set
+
+        Args:
+            request (object): The parsed protobuf request object
+            head_block (BlockWrapper): Either the requested head block, or the
+                current chain head
+            block_fetcher (function): Fetches the block containing a resource
+                Expected args:
+                    resource_id: The id of the resource
+                Expected return:
+                    BlockWrapper: The block the resource was committed in
+            block_xform (function): Transforms a block into a list of resources
+                Expected args:
+                    block: A block object from the block store
+                Expected return:
+                    list: The resources contained in the block
+            reverse (bool): Whether to list resources from oldest to newest
+
+        Returns:
+            list: The paginated list of resources
+            object: The ClientPagingResponse to be sent back to the client
+
+        Raises:
+            ResponseFailed: The paging start was not found in the chain
+        """
+        paging = request.paging
+        limit = min(paging.limit, MAX_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+
+        if paging.start:
+            try:
+                start_block = block_fetcher(paging.start)
+            except (KeyError, ValueError, TypeError):
+                raise _ResponseFailed(self._status.INVALID_PAGING)
+
+            if start_block.block_num > head_block.block_num:
+                raise _ResponseFailed(self._status.INVALID_PAGING)
+        elif reverse:
+            # Iterating forward with no start block begins at genesis
+            start_block = None
+        else:
+            start_block = head_block
+
+        blocks = self._block_store.get_block_iter(
+            start_block=start_block, reverse=not reverse)
+        if reverse:
+            blocks = itertools.takewhile(
+                lambda blkw: blkw.block_num <= head_block.block_num,
+                blocks)
+
+        def resource_iter():
+            for blkw in blocks:
+                block_resources = block_xform(blkw.block)
+                if reverse:
+                    block_resources = reversed(block_resources)
+                yield from block_resources
+
+        resources = resource_iter()
+        if paging.start:
+            resources = itertools.dropwhile(
+                lambda r: r.header_signature != paging.start,
+                resources)
+
+        # Fetch one extra resource to determine the start of the next page
+        resources = list(itertools.islice(resources, limit + 1))
+        if not resources:
+            return (resources, client_list_control_pb2.ClientPagingResponse())
+
+        if len(resources) > limit:
+            next_id = resources.pop().header_signature
+        else:
+            next_id = None
+
+        paging_response = client_list_control_pb2.ClientPagingResponse(
+            next=next_id,
+            start=resources[0].header_signature,
+            limit=limit)
+
+        return resources, paging_response
+
     def _validate_ids(self, resource_ids):
         """Validates a list of ids, raising a ResponseFailed error if invalid.
 
@@ -568,60 +680,141 @@ def _format_batch_statuses(statuses, batch_ids, tracker):
 
 
 class _BatchWaiter(BatchFinishObserver):
-    """An observer which provides a method which locks until every batch in a
-    set of ids is committed.
+    """An observer which calls back once every batch in a set of ids is no
+    longer PENDING, or once it times out, without holding a thread while it
+    waits.
 
     Args:
         batch_tracker (BatchTracker): The BatchTracker that will notify the
             BatchWaiter that all of the batches it is interested in are no
             longer PENDING.
+        batch_ids (list of str): The ids of the batches to wait for
+        callback (function): Called once with the list of BatchStatuses to
+            send back to the client
+        timeouts (_BatchWaitTimeouts): Times out the waiter, and calls back
+            once it has finished
     """
 
-    def __init__(self, batch_tracker):
+    def __init__(self, batch_tracker, batch_ids, callback, timeouts):
         self._batch_tracker = batch_tracker
-        self._wait_condition = Condition()
-        self._statuses = None
+        self._batch_ids = batch_ids
+        self._callback = callback
+        self._timeouts = timeouts
+        self._lock = Lock()
+        self._finished = False
+
+    def watch(self, timeout):
+        """Registers the waiter with the BatchTracker, which may notify it
+        immediately if none of the batches are PENDING, and times it out
+        after the given number of seconds.
+        """
+        self._timeouts.add(self, timeout)
+        self._batch_tracker.watch_statuses(self, self._batch_ids)
 
     def notify_batches_finished(self, statuses):
         """Called by the BatchTracker the _BatchWaiter is observing. Should not
         be called by handlers.
 
+        The BatchTracker holds its lock while notifying, so the callback is
+        left to the _BatchWaitTimeouts thread.
+
         Args:
             statuses (dict of int): A dict with keys of batch ids, and values
                 of status enums
         """
-        with self._wait_condition:
-            self._statuses = statuses
-            self._wait_condition.notify()
-
-    # pylint: disable=inconsistent-return-statements
-    def wait_for_batches(self, batch_ids, timeout=None):
-        """Locks until a list of batch ids is committed to the block chain
-        or a timeout is exceeded. Returns the statuses of those batches.
+        if self._set_finished():
+            self._timeouts.finish(self, statuses)
 
-        Args:
-            batch_ids (list of str): The ids of the batches to wait for
-            timeout(int): Maximum time in seconds to wait for
-
-        Returns:
-            list of BatchStatus: BatchStatuses to send back to client
+    def time_out(self):
+        """Stops waiting, and calls back with the current statuses of the
+        batches, unless the waiter has already finished.
+        """
+        if self._finished:
+            return
+        self._batch_tracker.unwatch_statuses(self)
+        statuses = self._batch_tracker.get_statuses(self._batch_ids)
+        if self._set_finished():
+            self.call_back(statuses)
+
+    def call_back(self, statuses):
+        self._callback(_format_batch_statuses(
+            statuses, self._batch_ids, self._batch_tracker))
+
+    def _set_finished(self):
+        """Marks the waiter finished, returning False if it already was.
         """
-        self._batch_tracker.watch_statuses(self, batch_ids)
-        timeout = timeout or DEFAULT_TIMEOUT
-        start_time = time()
+        with self._lock:
+            if self._finished:
+                return False
+            self._finished = True
+            return True
 
-        with self._wait_condition:
-            while True:
-                if self._statuses is not None:
-                    return _format_batch_statuses(
-                        self._statuses, batch_ids, self._batch_tracker)
 
-                if time() - start_time > timeout:
-                    statuses = self._batch_tracker.get_statuses(batch_ids)
-                    return _format_batch_statuses(
-                        statuses, batch_ids, self._batch_tracker)
+class _BatchWaitTimeouts(InstrumentedThread):
+    """Times out every waiting _BatchWaiter, and calls back those which
+    finish, from a single thread.
+    """
 
-                self._wait_condition.wait(timeout - (time() - start_time))
+    def __init__(self):
+        super().__init__(name='_BatchWaitTimeouts', daemon=True)
+        self._condition = Condition()
+        # A heap of [deadline, sequence number, waiter], whose waiter is set
+        # to None once it finishes
+        self._deadlines = []
+        self._entries = {}
+        self._sequence = itertools.count()
+        # The waiters which have finished, with their statuses
+        self._finished = deque()
+
+    def add(self, waiter, timeout):
+        """Times out a waiter after the given number of seconds, unless it
+        has finished by then.
+        """
+        entry = [time() + timeout, next(self._sequence), waiter]
+        with self._condition:
+            heapq.heappush(self._deadlines, entry)
+            self._entries[waiter] = entry
+            self._condition.notify()
+
+    def finish(self, waiter, statuses):
+        """Stops timing out a waiter, and calls it back with the statuses.
+        """
+        with self._condition:
+            entry = self._entries.pop(waiter, None)
+            if entry is not None:
+                entry[2] = None
+                # Drop the finished entries once they are most of the heap
+                if len(self._deadlines) > 2 * len(self._entries) + 64:
+                    self._deadlines = [
+                        e for e in self._deadlines if e[2] is not None]
+                    heapq.heapify(self._deadlines)
+            self._finished.append((waiter, statuses))
+            self._condition.notify()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._finished:
+                        waiter, statuses = self._finished.popleft()
+                        action = partial(waiter.call_back, statuses)
+                        break
+                    now = time()
+                    while self._deadlines and self._deadlines[0][2] is None:
+                        heapq.heappop(self._deadlines)
+                    if self._deadlines and self._deadlines[0][0] <= now:
+                        _, _, waiter = heapq.heappop(self._deadlines)
+                        del self._entries[waiter]
+                        action = waiter.time_out
+                        break
+                    self._condition.wait(
+                        self._deadlines[0][0] - now if self._deadlines
+                        else None)
+
+            try:
+                action()
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Unable to answer batch status request")
 
 
 class BatchSubmitFinisher(_ClientRequestHandler):
@@ -652,6 +845,8 @@ class BatchSubmitFinisher(_ClientRequestHandler):
 class BatchStatusRequest(_ClientRequestHandler):
     def __init__(self, batch_tracker):
         self._batch_tracker = batch_tracker
+        self._timeouts = None
+        self._timeouts_lock = Lock()
         super().__init__(
             client_batch_submit_pb2.ClientBatchStatusRequest,
             client_batch_submit_pb2.ClientBatchStatusResponse,
@@ -661,20 +856,35 @@ class BatchStatusRequest(_ClientRequestHandler):
         self._validate_ids(request.batch_ids)
 
         if request.wait:
-            waiter = _BatchWaiter(self._batch_tracker)
-            statuses = waiter.wait_for_batches(
+            # The request is parked with the BatchTracker, and answered when
+            # its batches finish or it times out
+            response = Future()
+            waiter = _BatchWaiter(
+                self._batch_tracker,
                 request.batch_ids,
-                request.timeout)
-        else:
-            statuses_dict = self._batch_tracker.get_statuses(request.batch_ids)
-            statuses = _format_batch_statuses(
-                statuses_dict, request.batch_ids, self._batch_tracker)
+                lambda statuses: response.set_result(
+                    self._statuses_response(statuses)),
+                self._get_timeouts())
+            waiter.watch(request.timeout or DEFAULT_TIMEOUT)
+            return response
 
+        statuses_dict = self._batch_tracker.get_statuses(request.batch_ids)
+        return self._statuses_response(_format_batch_statuses(
+            statuses_dict, request.batch_ids, self._batch_tracker))
+
+    def _statuses_response(self, statuses):
         if not statuses:
             return self._status.NO_RESOURCE
 
         return self._wrap_response(batch_statuses=statuses)
 
+    def _get_timeouts(self):
+        with self._timeouts_lock:
+            if self._timeouts is None:
+                self._timeouts = _BatchWaitTimeouts()
+                self._timeouts.start()
+            return self._timeouts
+
 
 class StateListRequest(_ClientRequestHandler):
     def __init__(self, database, block_store):
@@ -690,22 +900,10 @@ class StateListRequest(_ClientRequestHandler):
             self._validate_state_root(request.state_root)
         state_root = self._set_root(request)
 
-        # Fetch entries and encode as protobuf
         self._validate_namespace(request.address)
-        entries = [
-            client_state_pb2.ClientStateListResponse.Entry(address=a, data=v)
-            for a, v in self._tree.leaves(request.address or '')]
-
-        # Order entries, remove if tree.entries refactored to be ordered
-        entries.sort(key=lambda l: l.address)
+        reverse = self.is_reverse(request.sorting, self._status.INVALID_SORT)
 
-        if self.is_reverse(request.sorting, self._status.INVALID_SORT):
-            entries.reverse()
-
-        entries, paging = _Pager.paginate_resources(
-            request,
-            entries,
-            self._status.INVALID_PAGING)
+        entries, paging = self._page_leaves(request, reverse)
 
         if not entries:
             return self._wrap_response(
@@ -718,6 +916,61 @@ class StateListRequest(_ClientRequestHandler):
             paging=paging,
             entries=entries)
 
+    def _page_leaves(self, request, reverse):
+        """Fetches a single page of entries from the merkle tree.
+
+        The tree's leaves are iterated in address order starting from the
+        paging start, so only one page of entries is ever read and decoded,
+        regardless of how many leaves are under the requested address.
+
+        Args:
+            request (object): The parsed protobuf request object
+            reverse (bool): Whether to list entries in reverse address order
+
+        Returns:
+            list: The paginated list of entries
+            object: The ClientPagingResponse to be sent back to the client
+
+        Raises:
+            ResponseFailed: The paging start is not an address in the tree
+        """
+        paging = request.paging
+        limit = min(paging.limit, MAX_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+        address = request.address or ''
+
+        if paging.start and \
+                self._namespace_regex.fullmatch(paging.start) is None:
+            raise _ResponseFailed(self._status.INVALID_PAGING)
+
+        # Fetch one extra entry to determine the start of the next page
+        leaves = self._tree.leaves(
+            address, start=paging.start or None, reverse=reverse)
+        entries = [
+            client_state_pb2.ClientStateListResponse.Entry(address=a, data=v)
+            for a, v in itertools.islice(leaves, limit + 1)]
+
+        if paging.start and \
+                (not entries or entries[0].address != paging.start):
+            if next(iter(self._tree.leaves(address)), None) is None:
+                # Nothing to page through, so the start is moot
+                return ([], client_list_control_pb2.ClientPagingResponse())
+            raise _ResponseFailed(self._status.INVALID_PAGING)
+
+        if not entries:
+            return (entries, client_list_control_pb2.ClientPagingResponse())
+
+        if len(entries) > limit:
+            next_address = entries.pop().address
+        else:
+            next_address = None
+
+        paging_response = client_list_control_pb2.ClientPagingResponse(
+            next=next_address,
+            start=entries[0].address,
+            limit=limit)
+
+        return entries, paging_response
+
     @staticmethod
     def is_reverse(sorting, fail_status):
         if not sorting:
@@ -936,6 +1189,10 @@ class BlockGetByBatchRequest(_ClientRequestHandler):
         return self._wrap_response(block=block)
 
 
+def _batch_xform(block):
+    return list(block.batches)
+
+
 class BatchListRequest(_ClientRequestHandler):
     def __init__(self, block_store):
         super().__init__(
@@ -945,23 +1202,33 @@ class BatchListRequest(_ClientRequestHandler):
             block_store=block_store)
 
     def _respond(self, request):
-        head_id = self._get_head_block(request).header_signature
+        head_block = self._get_head_block(request)
+        head_id = head_block.header_signature
         self._validate_ids(request.batch_ids)
+        reverse = self.is_reverse(request.sorting, self._status.INVALID_SORT)
 
-        batches = self._list_store_resources(
-            request,
-            head_id,
-            request.batch_ids,
-            self._block_store.get_batch,
-            lambda block: [a for a in block.batches])
+        if request.batch_ids:
+            batches = self._list_store_resources(
+                request,
+                head_block,
+                request.batch_ids,
+                self._block_store.get_block_by_batch_id,
+                _batch_xform)
 
-        if self.is_reverse(request.sorting, self._status.INVALID_SORT):
-            batches.reverse()
+            if reverse:
+                batches.reverse()
 
-        batches, paging = _Pager.paginate_resources(
-            request,
-            batches,
-            self._status.INVALID_PAGING)
+            batches, paging = _Pager.paginate_resources(
+                request,
+                batches,
+                self._status.INVALID_PAGING)
+        else:
+            batches, paging = self._page_store_resources(
+                request,
+                head_block,
+                self._block_store.get_block_by_batch_id,
+                _batch_xform,
+                reverse)
 
         if not batches:
             return self._wrap_response(
@@ -1005,6 +1272,10 @@ class BatchGetRequest(_ClientRequestHandler):
         return self._wrap_response(batch=batch)
 
 
+def _transaction_xform(block):
+    return [t for a in block.batches for t in a.transactions]
+
+
 class TransactionListRequest(_ClientRequestHandler):
     def __init__(self, block_store):
         super().__init__(
@@ -1014,23 +1285,33 @@ class TransactionListRequest(_ClientRequestHandler):
             block_store=block_store)
 
     def _respond(self, request):
-        head_id = self._get_head_block(request).header_signature
+        head_block = self._get_head_block(request)
+        head_id = head_block.header_signature
         self._validate_ids(request.transaction_ids)
-
-        transactions = self._list_store_resources(
-            request,
-            head_id,
-            request.transaction_ids,
-            self._block_store.get_transaction,
-            lambda block: [t for a in block.batches for t in a.transactions])
-
-        if self.is_reverse(request.sorting, self._status.INVALID_SORT):
-            transactions.reverse()
-
-        transactions, paging = _Pager.paginate_resources(
-            request,
-            transactions,
-            self._status.INVALID_PAGING)
+        reverse = self.is_reverse(request.sorting, self._status.INVALID_SORT)
+
+        if request.transaction_ids:
+            transactions = self._list_store_resources(
+                request,
+                head_block,
+                request.transaction_ids,
+                self._block_store.get_block_by_transaction_id,
+                _transaction_xform)
+
+            if reverse:
+                transactions.reverse()
+
+            transactions, paging = _Pager.paginate_resources(
+                request,
+                transactions,
+                self._status.INVALID_PAGING)
+        else:
+            transactions, paging = self._page_store_resources(
+                request,
+                head_block,
+                self._block_store.get_block_by_transaction_id,
+                _transaction_xform,
+                reverse)
 
         if not transactions:
             return self._wrap_response(
@@ -103,6 +103,31 @@ class MerkleDatabase(ffi.OwnedPointer):
 
         return _decode(ffi.from_c_bytes(c_data, c_data_len))
 
+    def get_multi(self, addresses):
+        """Fetches the values at several addresses with a single call into
+        the state database.
+
+        Args:
+            addresses (list of str): the addresses to fetch
+
+        Returns:
+            list of (str, object): (address, value) pairs, in the order of
+                the given addresses; addresses without a value are omitted
+        """
+        c_addresses = (ctypes.c_char_p * len(addresses))()
+        for (i, address) in enumerate(addresses):
+            c_addresses[i] = ctypes.c_char_p(address.encode())
+
+        (c_data, c_data_len) = ffi.prepare_byte_result()
+        _libexec('merkle_db_get_multi', self.pointer,
+                 c_addresses, ctypes.c_size_t(len(addresses)),
+                 ctypes.byref(c_data), ctypes.byref(c_data_len))
+
+        values = _decode(ffi.from_c_bytes(c_data, c_data_len))
+
+        return [(address, _decode(values[address]))
+                for address in addresses if address in values]
+
     def __setitem__(self, address, value):
         return self.set(address, value)
 
@@ -170,11 +195,18 @@ class MerkleDatabase(ffi.OwnedPointer):
 
         return addresses
 
-    def leaves(self, prefix=None):
-        """Returns an iterator which returns tuples of (address, data) values
+    def leaves(self, prefix=None, start=None, reverse=False):
+        """Returns an iterator which returns tuples of (address, data) values,
+        ordered by address.
+
+        Args:
+            prefix (str): only return leaves whose address starts with this
+            start (str): begin at the first address at or after this one (or
+                at or before it, if reversed)
+            reverse (bool): return leaves in reverse address order
         """
         try:
-            return _LeafIterator(self.pointer, prefix)
+            return _LeafIterator(self.pointer, prefix, start, reverse)
         except KeyError:
             # The prefix doesn't exist
             return iter([])
@@ -210,16 +242,21 @@ def _libexec(name, *args):
 
 
 class _LeafIterator:
-    def __init__(self, merkle_db_ptr, prefix=None):
+    def __init__(self, merkle_db_ptr, prefix=None, start=None, reverse=False):
         if prefix is None:
             prefix = ''
 
+        if start is None:
+            start = ''
+
         c_prefix = ctypes.c_char_p(prefix.encode())
+        c_start = ctypes.c_char_p(start.encode())
 
         self._c_iter_ptr = ctypes.c_void_p()
 
         _libexec('merkle_db_leaf_iterator_new',
-                 merkle_db_ptr, c_prefix, ctypes.byref(self._c_iter_ptr))
+                 merkle_db_ptr, c_prefix, c_start, ctypes.c_bool(reverse),
+                 ctypes.byref(self._c_iter_ptr))
 
     def __del__(self):
         if self._c_iter_ptr:
@@ -0,0 +1,374 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+
+import cbor
+from google.protobuf.message import DecodeError
+
+from sawtooth_validator.gossip import signature_verifier
+from sawtooth_validator.journal.chain import ChainObserver
+from sawtooth_validator.networking.dispatch import Handler
+from sawtooth_validator.networking.dispatch import HandlerResult
+from sawtooth_validator.networking.dispatch import HandlerStatus
+from sawtooth_validator.protobuf import network_pb2
+from sawtooth_validator.protobuf import validator_pb2
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.state.merkle import MerkleDatabase
+from sawtooth_validator.state.settings_view import SettingsViewFactory
+from sawtooth_validator.state.state_view import StateViewFactory
+
+LOGGER = logging.getLogger(__name__)
+
+# The number of state entries in each chunk of a snapshot
+SNAPSHOT_CHUNK_SIZE = 1000
+# The number of snapshots kept on disk, so that a peer fetching the previous
+# snapshot can finish while a new one is written
+SNAPSHOTS_KEPT = 2
+
+_MANIFEST_FILE = 'manifest'
+_CHUNK_FILE = 'chunk-{:06d}'
+_TEMP_SUFFIX = '.tmp'
+
+
+class SnapshotError(Exception):
+    """Raised when a state snapshot is invalid or does not produce the state
+    root of its block.
+    """
+
+
+def _chunk_hash(content):
+    return hashlib.sha256(content).digest()
+
+
+class StateSnapshotStore(object):
+    """Writes snapshots of global state to a directory and reads them back.
+
+    Each snapshot is a subdirectory named by the block number and state root
+    of the block it was taken at. It holds the snapshot's manifest, which
+    contains the block and the hash of each chunk, and the chunk files, which
+    each contain a run of state entries ordered by address.
+    """
+
+    def __init__(self, directory, keep=SNAPSHOTS_KEPT):
+        """
+        Args:
+            directory (str): The directory to keep snapshots in.
+            keep (int): The number of snapshots to keep.
+        """
+        self._directory = directory
+        self._keep = keep
+        self._lock = threading.Lock()
+
+    def export(self, state_database, block, chunk_size=SNAPSHOT_CHUNK_SIZE):
+        """Writes a snapshot of the state at the given block.
+
+        Args:
+            state_database (:obj:`NativeLmdbDatabase`): The state database.
+            block (:obj:`BlockWrapper`): A committed block whose state root
+                has not been pruned.
+            chunk_size (int): The number of state entries in each chunk.
+
+        Returns:
+            :obj:`StateSnapshotManifest`: The manifest of the snapshot.
+
+        Raises:
+            KeyError: The block's state root is not in the state database.
+        """
+        name = '{:020d}-{}'.format(block.block_num, block.state_root_hash)
+        path = os.path.join(self._directory, name)
+        temp_path = path + _TEMP_SUFFIX
+
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        chunk_hashes = []
+
+        def write_chunk(chunk):
+            content = chunk.SerializeToString()
+            file_name = _CHUNK_FILE.format(len(chunk_hashes))
+            with open(os.path.join(temp_path, file_name), 'wb') as out:
+                out.write(content)
+            chunk_hashes.append(_chunk_hash(content))
+
+        try:
+            merkle_db = MerkleDatabase(state_database, block.state_root_hash)
+            chunk = network_pb2.StateSnapshotChunk()
+            for address, value in merkle_db.leaves():
+                chunk.entries.add(
+                    address=address, data=cbor.dumps(value, sort_keys=True))
+                if len(chunk.entries) >= chunk_size:
+                    write_chunk(chunk)
+                    chunk = network_pb2.StateSnapshotChunk()
+            if chunk.entries:
+                write_chunk(chunk)
+
+            manifest = network_pb2.StateSnapshotManifest(
+                block=block.get_block().SerializeToString(),
+                chunk_hashes=chunk_hashes)
+            with open(os.path.join(temp_path, _MANIFEST_FILE), 'wb') as out:
+                out.write(manifest.SerializeToString())
+        except Exception:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+
+        with self._lock:
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(temp_path, path)
+            for old_name in self._snapshot_names()[:-self._keep]:
+                shutil.rmtree(os.path.join(self._directory, old_name),
+                              ignore_errors=True)
+
+        return manifest
+
+    def get_manifest(self):
+        """Returns the manifest of the newest snapshot, or None if there are
+        no snapshots.
+        """
+        with self._lock:
+            names = self._snapshot_names()
+            if not names:
+                return None
+            content = self._read(names[-1], _MANIFEST_FILE)
+
+        if content is None:
+            return None
+        manifest = network_pb2.StateSnapshotManifest()
+        manifest.ParseFromString(content)
+        return manifest
+
+    def get_chunk(self, state_root_hash, chunk_index):
+        """Returns the serialized chunk with the given index of the snapshot
+        of the given state root, or None if there is no such chunk.
+        """
+        suffix = '-' + state_root_hash
+        with self._lock:
+            for name in self._snapshot_names():
+                if name.endswith(suffix):
+                    return self._read(name, _CHUNK_FILE.format(chunk_index))
+        return None
+
+    def _snapshot_names(self):
+        try:
+            names = os.listdir(self._directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            name for name in names if not name.endswith(_TEMP_SUFFIX))
+
+    def _read(self, name, file_name):
+        try:
+            with open(os.path.join(self._directory, name, file_name),
+                      'rb') as infile:
+                return infile.read()
+        except FileNotFoundError:
+            return None
+
+
+class StateSnapshotExporter(ChainObserver):
+    """Exports a snapshot of global state every interval blocks, so that new
+    validators can fetch the state instead of replaying the whole chain.
+    """
+
+    def __init__(self, snapshot_store, state_database, interval, executor):
+        """
+        Args:
+            snapshot_store (:obj:`StateSnapshotStore`): Stores the snapshots.
+            state_database (:obj:`NativeLmdbDatabase`): The state database.
+            interval (int): The number of blocks between snapshots.
+            executor (:obj:`Executor`): Runs the exports, off the thread
+                which commits blocks.
+        """
+        self._snapshot_store = snapshot_store
+        self._state_database = state_database
+        self._interval = interval
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._exporting = False
+
+    def chain_update(self, block, receipts):
+        if block.block_num == 0 or block.block_num % self._interval != 0:
+            return
+
+        with self._lock:
+            if self._exporting:
+                LOGGER.debug("Skipping state snapshot at block %s, the "
+                             "previous snapshot is still being exported",
+                             block.block_num)
+                return
+            self._exporting = True
+
+        self._executor.submit(self._export, block)
+
+    def _export(self, block):
+        try:
+            manifest = self._snapshot_store.export(
+                self._state_database, block)
+            LOGGER.info("Exported state snapshot at block %s in %s chunks",
+                        block, len(manifest.chunk_hashes))
+        except KeyError:
+            # The state root was pruned before the export finished
+            LOGGER.warning("Unable to export state snapshot, state root %s "
+                           "is no longer available", block.state_root_hash)
+        except OSError as err:
+            LOGGER.warning("Unable to export state snapshot at block %s: %s",
+                           block, err)
+        finally:
+            with self._lock:
+                self._exporting = False
+
+
+def verify_manifest(manifest):
+    """Returns the block and block header of a snapshot manifest.
+
+    Raises:
+        SnapshotError: The block cannot be parsed or is not signed correctly.
+    """
+    try:
+        block = Block()
+        block.ParseFromString(manifest.block)
+        header = BlockHeader()
+        header.ParseFromString(block.header)
+    except DecodeError:
+        raise SnapshotError("Unable to parse snapshot block")
+
+    if not signature_verifier.is_valid_block(block):
+        raise SnapshotError(
+            "Snapshot block {} has an invalid signature".format(
+                block.header_signature[:8]))
+
+    return block, header
+
+
+def verify_block_publisher(state_database, header):
+    """Checks that the signer of a snapshot's block is one of the valid
+    block publishers set in the snapshot's state, if any are set.
+
+    Raises:
+        SnapshotError: The block was not signed by a valid block publisher.
+    """
+    settings_view = SettingsViewFactory(
+        StateViewFactory(state_database)).create_settings_view(
+            header.state_root_hash)
+    valid_block_publishers = settings_view.get_setting_list(
+        'sawtooth.consensus.valid_block_publishers')
+    if valid_block_publishers and \
+            header.signer_public_key not in valid_block_publishers:
+        raise SnapshotError(
+            "Snapshot block was signed by {}, which is not a valid block "
+            "publisher".format(header.signer_public_key[:8]))
+
+
+def read_chunk(manifest, chunk_index, content):
+    """Returns the state entries of a snapshot chunk as a dict of address to
+    value.
+
+    Raises:
+        SnapshotError: The chunk does not match its hash in the manifest, or
+            cannot be parsed.
+    """
+    if chunk_index >= len(manifest.chunk_hashes) \
+            or _chunk_hash(content) != manifest.chunk_hashes[chunk_index]:
+        raise SnapshotError(
+            "Chunk {} does not match the snapshot manifest".format(
+                chunk_index))
+
+    chunk = network_pb2.StateSnapshotChunk()
+    try:
+        chunk.ParseFromString(content)
+        return {entry.address: cbor.loads(entry.data)
+                for entry in chunk.entries}
+    except (DecodeError, ValueError):
+        raise SnapshotError("Unable to parse chunk {}".format(chunk_index))
+
+
+class StateSnapshotImporter(object):
+    """Builds global state from the chunks of a snapshot, committing each
+    chunk to the state database as it is added.
+    """
+
+    def __init__(self, state_database):
+        self._merkle_db = MerkleDatabase(state_database)
+
+    def add_chunk(self, entries):
+        """Adds the state entries returned by read_chunk.
+
+        Raises:
+            SnapshotError: An entry has an invalid address.
+        """
+        try:
+            state_root_hash = self._merkle_db.update(entries, virtual=False)
+        except KeyError as err:
+            raise SnapshotError("Unable to add chunk: {}".format(err))
+        self._merkle_db.set_merkle_root(state_root_hash)
+
+    @property
+    def state_root_hash(self):
+        return self._merkle_db.get_merkle_root()
+
+
+class StateSnapshotManifestRequestHandler(Handler):
+    def __init__(self, snapshot_store, gossip):
+        self._snapshot_store = snapshot_store
+        self._gossip = gossip
+
+    def handle(self, connection_id, message_content):
+        # A response without a manifest tells the peer that this validator
+        # has no snapshot to serve.
+        manifest = self._snapshot_store.get_manifest()
+        manifest_response = \
+            network_pb2.GossipStateSnapshotManifestResponse(manifest=manifest)
+
+        self._gossip.send(
+            validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_MANIFEST_RESPONSE,
+            manifest_response.SerializeToString(),
+            connection_id)
+
+        return HandlerResult(HandlerStatus.PASS)
+
+
+class StateSnapshotChunkRequestHandler(Handler):
+    def __init__(self, snapshot_store, gossip):
+        self._snapshot_store = snapshot_store
+        self._gossip = gossip
+
+    def handle(self, connection_id, message_content):
+        chunk_request = network_pb2.GossipStateSnapshotChunkRequest()
+        chunk_request.ParseFromString(message_content)
+
+        content = self._snapshot_store.get_chunk(
+            chunk_request.state_root_hash, chunk_request.chunk_index)
+        if content is None:
+            LOGGER.debug("No chunk %s of state snapshot %s",
+                         chunk_request.chunk_index,
+                         chunk_request.state_root_hash[:8])
+            content = b''
+
+        chunk_response = network_pb2.GossipStateSnapshotChunkResponse(
+            state_root_hash=chunk_request.state_root_hash,
+            chunk_index=chunk_request.chunk_index,
+            content=content)
+
+        self._gossip.send(
+            validator_pb2.Message.GOSSIP_STATE_SNAPSHOT_CHUNK_RESPONSE,
+            chunk_response.SerializeToString(),
+            connection_id)
+
+        return HandlerResult(HandlerStatus.PASS)
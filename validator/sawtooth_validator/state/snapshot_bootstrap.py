@@ -0,0 +1,399 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import logging
+import threading
+import time
+from collections import deque
+
+from google.protobuf.message import DecodeError
+
+from sawtooth_validator.journal.block_wrapper import BlockStatus
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.networking.dispatch import Handler
+from sawtooth_validator.networking.dispatch import HandlerResult
+from sawtooth_validator.networking.dispatch import HandlerStatus
+from sawtooth_validator.protobuf import network_pb2
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.state.snapshot import SnapshotError
+from sawtooth_validator.state.snapshot import StateSnapshotImporter
+from sawtooth_validator.state.snapshot import read_chunk
+from sawtooth_validator.state.snapshot import verify_block_publisher
+from sawtooth_validator.state.snapshot import verify_manifest
+
+LOGGER = logging.getLogger(__name__)
+
+# Time in seconds to wait for the first peer to connect
+PEER_WAIT_TIME = 60
+# Time in seconds to collect snapshot manifests from peers, and then the
+# blocks peers have on their chains at the snapshots' block numbers
+MANIFEST_WAIT_TIME = 10
+# The fewest peers which must have a snapshot's block on their chain for the
+# snapshot to be used, unless its block is trusted
+MIN_CONFIRMING_PEERS = 2
+# Time in seconds to wait for a chunk before asking another peer
+CHUNK_REQUEST_TIMEOUT = 30
+# The number of chunk requests which may be outstanding to each peer
+CHUNK_REQUESTS_PER_PEER = 4
+
+
+class StateSnapshotBootstrap(object):
+    """Bootstraps a validator with no chain from a snapshot of global state
+    served by its peers.
+
+    A snapshot's block is only trusted if it is the configured trusted
+    block, or if a majority of the peers, and at least min_peers of them,
+    have it on their current chain. The newest such snapshot is chosen, its
+    chunks are fetched in parallel from every peer offering it and committed
+    to the state database, and the resulting state root is checked against
+    the block the snapshot was taken at. The block's signer must be a valid
+    block publisher in the resulting state. That block then becomes the
+    chain head, and only the blocks after it are synced.
+    """
+
+    def __init__(self,
+                 gossip,
+                 state_database,
+                 block_store,
+                 trusted_block_id=None,
+                 min_peers=MIN_CONFIRMING_PEERS,
+                 peer_wait_time=PEER_WAIT_TIME,
+                 manifest_wait_time=MANIFEST_WAIT_TIME,
+                 chunk_request_timeout=CHUNK_REQUEST_TIMEOUT,
+                 chunk_requests_per_peer=CHUNK_REQUESTS_PER_PEER):
+        """
+        Args:
+            gossip (:obj:`Gossip`): Sends requests to peers.
+            state_database (:obj:`NativeLmdbDatabase`): The state database
+                to import the snapshot into.
+            block_store (:obj:`BlockStore`): Receives the snapshot's block.
+            trusted_block_id (str): The id of the block whose snapshot to
+                use, or None to use the newest snapshot whose block enough
+                peers have on their chain.
+            min_peers (int): The fewest peers which must have a snapshot's
+                block on their chain, unless the block is trusted.
+            peer_wait_time (float): Time in seconds to wait for a peer.
+            manifest_wait_time (float): Time in seconds to collect manifests,
+                and then to collect the blocks on the peers' chains.
+            chunk_request_timeout (float): Time in seconds to wait for a
+                chunk before asking another peer.
+            chunk_requests_per_peer (int): The number of chunk requests which
+                may be outstanding to each peer.
+        """
+        self._gossip = gossip
+        self._state_database = state_database
+        self._block_store = block_store
+        self._trusted_block_id = trusted_block_id
+        self._min_peers = min_peers
+        self._peer_wait_time = peer_wait_time
+        self._manifest_wait_time = manifest_wait_time
+        self._chunk_request_timeout = chunk_request_timeout
+        self._chunk_requests_per_peer = chunk_requests_per_peer
+
+        self._condition = threading.Condition()
+        # Manifests by connection id, or None when not collecting them
+        self._manifests = None
+        # The ids of the blocks on peers' chains, by connection id and block
+        # number, or None when not collecting them. Requests which have not
+        # been answered yet have an id of None.
+        self._chain_block_ids = None
+        # The state root of the snapshot being fetched
+        self._state_root_hash = None
+        # (connection_id, content) of received chunks, by chunk index
+        self._chunks = {}
+
+    def run(self):
+        """Imports the state and block of the newest snapshot offered by a
+        peer whose block is trusted.
+
+        Returns:
+            bool: True if the snapshot was imported, False if the validator
+                must sync the chain from the genesis block instead.
+        """
+        peers = self._wait_for_peers()
+        if not peers:
+            LOGGER.warning("No peers connected, unable to bootstrap state "
+                           "from a snapshot")
+            return False
+
+        block, header, manifest, sources = self._choose_snapshot(peers)
+        if block is None:
+            LOGGER.info("No peer has a trusted state snapshot, syncing from "
+                        "the genesis block")
+            return False
+
+        LOGGER.info("Bootstrapping state from snapshot at block %s (%s) "
+                    "with %s chunks from %s peers", header.block_num,
+                    block.header_signature[:8], len(manifest.chunk_hashes),
+                    len(sources))
+        try:
+            self._import(header, manifest, sources)
+            verify_block_publisher(self._state_database, header)
+        except SnapshotError as err:
+            LOGGER.warning("Unable to bootstrap state from snapshot, syncing "
+                           "from the genesis block: %s", err)
+            return False
+        finally:
+            with self._condition:
+                self._state_root_hash = None
+                self._chunks = {}
+
+        self._block_store.update_chain(
+            [BlockWrapper(block, status=BlockStatus.Valid)])
+        LOGGER.info("Bootstrapped state from snapshot at block %s",
+                    header.block_num)
+        return True
+
+    def add_manifest(self, connection_id, manifest):
+        with self._condition:
+            if self._manifests is not None:
+                self._manifests[connection_id] = manifest
+
+    def add_block_range(self, connection_id, block_range_response):
+        with self._condition:
+            if self._chain_block_ids is None or \
+                    not block_range_response.blocks:
+                return
+            # Only the first answer to a request is counted, so that a peer
+            # confirms a block at most once
+            key = (connection_id, block_range_response.start_block_num)
+            if key not in self._chain_block_ids or \
+                    self._chain_block_ids[key] is not None:
+                return
+            block = Block()
+            header = BlockHeader()
+            try:
+                block.ParseFromString(block_range_response.blocks[0])
+                header.ParseFromString(block.header)
+            except DecodeError:
+                return
+            if header.block_num != block_range_response.start_block_num:
+                return
+            self._chain_block_ids[key] = block.header_signature
+
+    def add_chunk(self, connection_id, chunk_response):
+        with self._condition:
+            if chunk_response.state_root_hash != self._state_root_hash:
+                return
+            self._chunks[chunk_response.chunk_index] = \
+                (connection_id, chunk_response.content)
+            self._condition.notify()
+
+    def _wait_for_peers(self):
+        deadline = time.time() + self._peer_wait_time
+        while True:
+            peers = list(self._gossip.get_peers())
+            if peers or time.time() > deadline:
+                return peers
+            time.sleep(1)
+
+    def _choose_snapshot(self, peers):
+        """Returns the block, block header and manifest of the newest
+        snapshot offered by a peer whose block is trusted, and the peers
+        offering it.
+        """
+        with self._condition:
+            self._manifests = {}
+        for connection_id in peers:
+            self._gossip.send_state_snapshot_manifest_request(connection_id)
+        time.sleep(self._manifest_wait_time)
+        with self._condition:
+            manifests = self._manifests
+            self._manifests = None
+
+        snapshots = {}
+        for connection_id, manifest in manifests.items():
+            if not manifest.block:
+                continue
+            try:
+                block, header = verify_manifest(manifest)
+            except SnapshotError as err:
+                LOGGER.debug("Ignoring snapshot from %s: %s",
+                             connection_id, err)
+                continue
+            key = (block.header_signature, tuple(manifest.chunk_hashes))
+            if key not in snapshots:
+                snapshots[key] = (block, header, manifest, [])
+            snapshots[key][3].append(connection_id)
+
+        if self._trusted_block_id is not None:
+            trusted = [
+                snapshot for snapshot in snapshots.values()
+                if snapshot[0].header_signature == self._trusted_block_id
+            ]
+            if not trusted:
+                LOGGER.warning("No peer has a state snapshot at trusted "
+                               "block %s", self._trusted_block_id[:8])
+                return None, None, None, []
+            return max(trusted, key=lambda s: len(s[3]))
+
+        confirmations = self._confirm_blocks(
+            peers, {snapshot[1].block_num for snapshot in snapshots.values()})
+        quorum = max(self._min_peers, len(peers) // 2 + 1)
+        for snapshot in sorted(snapshots.values(),
+                               key=lambda s: s[1].block_num, reverse=True):
+            block, header = snapshot[0], snapshot[1]
+            confirming = confirmations.get(
+                (header.block_num, block.header_signature), 0)
+            if confirming >= quorum:
+                return snapshot
+            LOGGER.debug("Ignoring snapshot at block %s, %s of %s peers "
+                         "have the block on their chain",
+                         block.header_signature[:8], confirming, len(peers))
+
+        return None, None, None, []
+
+    def _confirm_blocks(self, peers, block_nums):
+        """Asks every peer for the block on its current chain at each of
+        the given block numbers.
+
+        Returns:
+            dict: The number of peers with each block on their chain, by
+                (block_num, block_id).
+        """
+        if not block_nums:
+            return {}
+
+        peers = set(peers)
+        with self._condition:
+            self._chain_block_ids = {
+                (connection_id, block_num): None
+                for connection_id in peers
+                for block_num in block_nums
+            }
+        for connection_id in peers:
+            for block_num in block_nums:
+                self._gossip.send_block_range_request(
+                    block_num, 1, connection_id)
+        time.sleep(self._manifest_wait_time)
+        with self._condition:
+            chain_block_ids = self._chain_block_ids
+            self._chain_block_ids = None
+
+        confirmations = {}
+        for (_, block_num), block_id in chain_block_ids.items():
+            if block_id is None:
+                continue
+            key = (block_num, block_id)
+            confirmations[key] = confirmations.get(key, 0) + 1
+        return confirmations
+
+    def _import(self, header, manifest, sources):
+        importer = StateSnapshotImporter(self._state_database)
+        with self._condition:
+            self._state_root_hash = header.state_root_hash
+            self._chunks = {}
+
+        chunk_count = len(manifest.chunk_hashes)
+        remaining = deque(range(chunk_count))
+        # (connection_id, sent_at) of outstanding requests, by chunk index
+        requests = {}
+        failed = set()
+        imported = 0
+        next_source = 0
+
+        while remaining or requests:
+            peers = [peer for peer in sources if peer not in failed]
+            if not peers:
+                raise SnapshotError("No peer is able to serve the snapshot")
+
+            while remaining and \
+                    len(requests) < len(peers) * self._chunk_requests_per_peer:
+                chunk_index = remaining.popleft()
+                next_source = (next_source + 1) % len(peers)
+                connection_id = peers[next_source]
+                requests[chunk_index] = (connection_id, time.time())
+                self._gossip.send_state_snapshot_chunk_request(
+                    header.state_root_hash, chunk_index, connection_id)
+
+            with self._condition:
+                if not self._chunks:
+                    self._condition.wait(1)
+                chunks = self._chunks
+                self._chunks = {}
+
+            for chunk_index, (connection_id, content) in chunks.items():
+                request = requests.get(chunk_index)
+                if request is None or request[0] != connection_id:
+                    continue
+                del requests[chunk_index]
+                try:
+                    importer.add_chunk(
+                        read_chunk(manifest, chunk_index, content))
+                except SnapshotError as err:
+                    LOGGER.debug("Peer %s sent an invalid chunk: %s",
+                                 connection_id, err)
+                    failed.add(connection_id)
+                    remaining.append(chunk_index)
+                    continue
+                imported += 1
+                if imported % 100 == 0:
+                    LOGGER.info("Imported %s of %s state snapshot chunks",
+                                imported, chunk_count)
+
+            now = time.time()
+            for chunk_index, (connection_id, sent_at) in \
+                    list(requests.items()):
+                if now - sent_at > self._chunk_request_timeout:
+                    LOGGER.debug("Chunk request to %s timed out",
+                                 connection_id)
+                    failed.add(connection_id)
+                    del requests[chunk_index]
+                    remaining.append(chunk_index)
+
+        if importer.state_root_hash != header.state_root_hash:
+            raise SnapshotError(
+                "Snapshot produced state root {} instead of {}".format(
+                    importer.state_root_hash[:8],
+                    header.state_root_hash[:8]))
+
+
+class StateSnapshotManifestResponseHandler(Handler):
+    def __init__(self, snapshot_bootstrap):
+        self._snapshot_bootstrap = snapshot_bootstrap
+
+    def handle(self, connection_id, message_content):
+        manifest_response = network_pb2.GossipStateSnapshotManifestResponse()
+        manifest_response.ParseFromString(message_content)
+        self._snapshot_bootstrap.add_manifest(
+            connection_id, manifest_response.manifest)
+
+        return HandlerResult(HandlerStatus.PASS)
+
+
+class StateSnapshotBlockRangeResponseHandler(Handler):
+    def __init__(self, snapshot_bootstrap):
+        self._snapshot_bootstrap = snapshot_bootstrap
+
+    def handle(self, connection_id, message_content):
+        block_range_response = network_pb2.GossipBlockRangeResponse()
+        block_range_response.ParseFromString(message_content)
+        self._snapshot_bootstrap.add_block_range(
+            connection_id, block_range_response)
+
+        return HandlerResult(HandlerStatus.PASS)
+
+
+class StateSnapshotChunkResponseHandler(Handler):
+    def __init__(self, snapshot_bootstrap):
+        self._snapshot_bootstrap = snapshot_bootstrap
+
+    def handle(self, connection_id, message_content):
+        chunk_response = network_pb2.GossipStateSnapshotChunkResponse()
+        chunk_response.ParseFromString(message_content)
+        self._snapshot_bootstrap.add_chunk(connection_id, chunk_response)
+
+        return HandlerResult(HandlerStatus.PASS)
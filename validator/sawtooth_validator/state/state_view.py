@@ -78,6 +78,14 @@ class StateView(object):
         """
         return self._tree.get(address)
 
+    def get_multi(self, addresses):
+        """
+        Returns:
+            list of (str, bytes): the state entries at the given addresses,
+                omitting addresses without a value
+        """
+        return self._tree.get_multi(addresses)
+
     def addresses(self):
         """
         Returns:
@@ -356,7 +356,8 @@ impl<BC: BlockCache + 'static, BV: BlockValidator + 'static, CW: ChainWriter + '
                     Err(err) => error!("Unable to fetch block at height {}: {:?}", prune_at, err),
                 }
 
-                // Execute pruning:
+                // Allow pruning up to this depth; the state roots are pruned
+                // on the pruning manager's thread
                 state.state_pruning_manager.execute(prune_at)
             }
         } else {
@@ -78,6 +78,32 @@ impl MerkleDatabase {
     /// Prunes nodes that are no longer needed under a given state root
     /// Returns a list of addresses that were deleted
     pub fn prune(db: &LmdbDatabase, merkle_root: &str) -> Result<Vec<String>, StateDatabaseError> {
+        MerkleDatabase::prune_with_size(db, merkle_root)
+            .map(|(removed_addresses, _)| removed_addresses)
+    }
+
+    /// Prunes nodes that are no longer needed under a given state root
+    /// Returns a list of addresses that were deleted, and the total size in
+    /// bytes of the deleted nodes
+    pub fn prune_with_size(
+        db: &LmdbDatabase,
+        merkle_root: &str,
+    ) -> Result<(Vec<String>, usize), StateDatabaseError> {
+        MerkleDatabase::prune_with_size_if(db, merkle_root, || true)
+    }
+
+    /// Prunes nodes that are no longer needed under a given state root, as
+    /// prune_with_size does, but calls may_commit just before the deletions
+    /// are committed. If it returns false, nothing is deleted, and no
+    /// addresses are returned.
+    pub fn prune_with_size_if<F>(
+        db: &LmdbDatabase,
+        merkle_root: &str,
+        may_commit: F,
+    ) -> Result<(Vec<String>, usize), StateDatabaseError>
+    where
+        F: FnOnce() -> bool,
+    {
         let root_bytes = ::hex::decode(merkle_root).map_err(|_| {
             StateDatabaseError::InvalidHash(format!("{} is not a valid hash", merkle_root))
         })?;
@@ -86,10 +112,11 @@ impl MerkleDatabase {
 
         if change_log.is_none() {
             // There's no change log for this entry
-            return Ok(vec![]);
+            return Ok((vec![], 0));
         }
 
         let mut change_log = change_log.unwrap();
+        let mut removed_bytes = 0;
         let removed_addresses = if change_log.get_successors().len() > 1 {
             // Currently, we don't clean up a parent with multiple successors
             vec![]
@@ -104,7 +131,7 @@ impl MerkleDatabase {
 
             for hash in deletion_candidates.iter() {
                 let hash_hex = ::hex::encode(hash);
-                delete_ignore_missing(&mut db_writer, hash_hex.as_bytes())?
+                removed_bytes += delete_ignore_missing(&mut db_writer, hash_hex.as_bytes())?;
             }
 
             for hash in duplicates.iter() {
@@ -140,7 +167,7 @@ impl MerkleDatabase {
 
             for hash in deletion_candidates.iter() {
                 let hash_hex = ::hex::encode(hash);
-                delete_ignore_missing(&mut db_writer, hash_hex.as_bytes())?
+                removed_bytes += delete_ignore_missing(&mut db_writer, hash_hex.as_bytes())?;
             }
 
             for hash in duplicates.iter() {
@@ -152,8 +179,16 @@ impl MerkleDatabase {
             deletion_candidates.into_iter().collect()
         };
 
+        if !may_commit() {
+            // Dropping the writer aborts the deletions
+            return Ok((vec![], 0));
+        }
+
         db_writer.commit()?;
-        Ok(removed_addresses.iter().map(::hex::encode).collect())
+        Ok((
+            removed_addresses.iter().map(::hex::encode).collect(),
+            removed_bytes,
+        ))
     }
 
     fn remove_duplicate_hashes(
@@ -188,6 +223,68 @@ impl MerkleDatabase {
         Ok(())
     }
 
+    /// Returns an iterator over the leaves under the given prefix, in address
+    /// order, beginning at the first address at or after `start`.
+    ///
+    /// If `reverse` is true, the leaves are returned in reverse address
+    /// order, beginning at the last address at or before `start`.
+    pub fn leaves_from(
+        &self,
+        prefix: Option<&str>,
+        start: Option<&str>,
+        reverse: bool,
+    ) -> Result<MerkleLeafIterator, StateDatabaseError> {
+        MerkleLeafIterator::with_start(self.clone(), prefix, start, reverse)
+    }
+
+    /// Returns the data for each of the given addresses that has a value.
+    /// Addresses that are not in the tree, or that have no data, are
+    /// omitted from the result.
+    ///
+    /// Nodes on paths shared by several addresses are only read from the
+    /// database once.
+    pub fn get_multi(
+        &self,
+        addresses: &[&str],
+    ) -> Result<HashMap<String, Vec<u8>>, StateDatabaseError> {
+        let mut nodes: HashMap<String, Node> = HashMap::new();
+        let mut values = HashMap::with_capacity(addresses.len());
+
+        'addresses: for address in addresses {
+            // The hash of the current node, or None for the root node
+            let mut node_hash: Option<String> = None;
+
+            for token in tokenize_address(address).iter() {
+                let child_hash = {
+                    let node = match node_hash {
+                        Some(ref hash) => &nodes[hash],
+                        None => &self.root_node,
+                    };
+                    match node.children.get(*token) {
+                        Some(child_hash) => child_hash.clone(),
+                        None => continue 'addresses,
+                    }
+                };
+
+                if !nodes.contains_key(&child_hash) {
+                    let child = get_node_by_hash(&self.db, &child_hash)?;
+                    nodes.insert(child_hash.clone(), child);
+                }
+                node_hash = Some(child_hash);
+            }
+
+            let node = match node_hash {
+                Some(ref hash) => &nodes[hash],
+                None => &self.root_node,
+            };
+            if let Some(ref value) = node.value {
+                values.insert(address.to_string(), value.clone());
+            }
+        }
+
+        Ok(values)
+    }
+
     /// Sets the given data at the given address.
     ///
     /// Returns a Result with the new merkle root hash, or an error if the
@@ -474,20 +571,64 @@ impl StateReader for MerkleDatabase {
 
 /// A MerkleLeafIterator is fixed to iterate over the state address/value pairs
 /// the merkle root hash at the time of its creation.
+///
+/// Leaves are returned in address order (or reverse address order), as the
+/// children of each node are kept sorted by their path token. An optional
+/// start address allows iteration to begin part way through the tree;
+/// subtrees that fall entirely before the start are skipped without being
+/// read.
 pub struct MerkleLeafIterator {
     merkle_db: MerkleDatabase,
     visited: VecDeque<(String, Node)>,
+    start: Option<String>,
+    reverse: bool,
 }
 
 impl MerkleLeafIterator {
     fn new(merkle_db: MerkleDatabase, prefix: Option<&str>) -> Result<Self, StateDatabaseError> {
+        MerkleLeafIterator::with_start(merkle_db, prefix, None, false)
+    }
+
+    fn with_start(
+        merkle_db: MerkleDatabase,
+        prefix: Option<&str>,
+        start: Option<&str>,
+        reverse: bool,
+    ) -> Result<Self, StateDatabaseError> {
         let path = prefix.unwrap_or("");
 
-        let mut visited = VecDeque::new();
-        let initial_node = merkle_db.get_by_address(path)?;
-        visited.push_front((path.to_string(), initial_node));
+        let mut leaf_iter = MerkleLeafIterator {
+            merkle_db,
+            visited: VecDeque::new(),
+            start: start.map(String::from),
+            reverse,
+        };
 
-        Ok(MerkleLeafIterator { merkle_db, visited })
+        let initial_node = leaf_iter.merkle_db.get_by_address(path)?;
+        if !leaf_iter.is_before_start(path) {
+            leaf_iter
+                .visited
+                .push_front((path.to_string(), initial_node));
+        }
+
+        Ok(leaf_iter)
+    }
+
+    /// Returns true if every address under the given path comes before the
+    /// start address, in iteration order.
+    fn is_before_start(&self, path: &str) -> bool {
+        match self.start {
+            Some(ref start) => {
+                let len = ::std::cmp::min(path.len(), start.len());
+                let (path, start) = (&path.as_bytes()[..len], &start.as_bytes()[..len]);
+                if self.reverse {
+                    path > start
+                } else {
+                    path < start
+                }
+            }
+            None => false,
+        }
     }
 }
 
@@ -505,15 +646,25 @@ impl Iterator for MerkleLeafIterator {
                     return Some(Ok((path, node.value.unwrap())));
                 }
 
-                // Reverse the list, such that we have an in-order traversal of the
-                // children, based on the natural path order.
-                for (child_path, hash_key) in node.children.iter().rev() {
+                // Push the children such that they are popped in the natural
+                // path order (or its reverse), giving an in-order traversal.
+                let children: Box<Iterator<Item = (&String, &String)>> = if self.reverse {
+                    Box::new(node.children.iter())
+                } else {
+                    Box::new(node.children.iter().rev())
+                };
+
+                for (child_path, hash_key) in children {
+                    let mut child_address = path.clone();
+                    child_address.push_str(child_path);
+                    if self.is_before_start(&child_address) {
+                        continue;
+                    }
+
                     let child = match get_node_by_hash(&self.merkle_db.db, hash_key) {
                         Ok(node) => node,
                         Err(err) => return Some(Err(err)),
                     };
-                    let mut child_address = path.clone();
-                    child_address.push_str(child_path);
                     self.visited.push_front((child_address, child));
                 }
             } else {
@@ -610,10 +761,12 @@ fn from_bytes(bytes: Vec<u8>) -> u64 {
 }
 
 /// This delete ignores any MDB_NOTFOUND errors
+/// Returns the size in bytes of the deleted value
 fn delete_ignore_missing(
     db_writer: &mut LmdbDatabaseWriter,
     key: &[u8],
-) -> Result<(), StateDatabaseError> {
+) -> Result<usize, StateDatabaseError> {
+    let size = db_writer.get(key).map(|value| value.len()).unwrap_or(0);
     match db_writer.delete(key) {
         Err(DatabaseError::WriterError(ref s))
             if s == "MDB_NOTFOUND: No matching key/data pair found" =>
@@ -623,10 +776,10 @@ fn delete_ignore_missing(
                 "Attempting to delete a missing entry: {}",
                 ::hex::encode(key)
             );
-            Ok(())
+            Ok(0)
         }
         Err(err) => Err(StateDatabaseError::DatabaseError(err)),
-        Ok(_) => Ok(()),
+        Ok(_) => Ok(size),
     }
 }
 /// Encodes the given node, and returns the hash of the bytes.
@@ -1426,6 +1579,65 @@ mod tests {
                 leaf_iter.next().unwrap().unwrap()
             );
             assert!(leaf_iter.next().is_none(), "Iterator should be Exhausted");
+
+            // test that we can start from an address:
+            let mut leaf_iter = merkle_db
+                .leaves_from(Some("ab"), Some("aba001"), false)
+                .unwrap();
+            assert_eq!(
+                ("aba001".into(), "000a".as_bytes().to_vec()),
+                leaf_iter.next().unwrap().unwrap()
+            );
+            assert_eq!(
+                ("abff02".into(), "0014".as_bytes().to_vec()),
+                leaf_iter.next().unwrap().unwrap()
+            );
+            assert!(leaf_iter.next().is_none(), "Iterator should be Exhausted");
+
+            // test that we can iterate in reverse from an address:
+            let mut leaf_iter = merkle_db
+                .leaves_from(None, Some("aba001"), true)
+                .unwrap();
+            assert_eq!(
+                ("aba001".into(), "000a".as_bytes().to_vec()),
+                leaf_iter.next().unwrap().unwrap()
+            );
+            assert_eq!(
+                ("ab0000".into(), "0000".as_bytes().to_vec()),
+                leaf_iter.next().unwrap().unwrap()
+            );
+            assert!(leaf_iter.next().is_none(), "Iterator should be Exhausted");
+
+            // test that a start between addresses begins at the next one:
+            let mut leaf_iter = merkle_db
+                .leaves_from(None, Some("ab5000"), false)
+                .unwrap();
+            assert_eq!(
+                ("aba001".into(), "000a".as_bytes().to_vec()),
+                leaf_iter.next().unwrap().unwrap()
+            );
+        })
+    }
+
+    #[test]
+    fn merkle_get_multi() {
+        run_test(|merkle_path| {
+            let mut merkle_db = make_db(merkle_path);
+
+            let mut updates = HashMap::with_capacity(3);
+            updates.insert("ab0000".to_string(), "0000".as_bytes().to_vec());
+            updates.insert("ab0a01".to_string(), "000a".as_bytes().to_vec());
+            updates.insert("abff00".to_string(), "0014".as_bytes().to_vec());
+            let new_root = merkle_db.update(&updates, &[], false).unwrap();
+            merkle_db.set_merkle_root(new_root).unwrap();
+
+            let values = merkle_db
+                .get_multi(&["ab0000", "ab0a01", "ab0a02", "cd0000", "ab0a"])
+                .unwrap();
+
+            assert_eq!(2, values.len());
+            assert_eq!(Some(&"0000".as_bytes().to_vec()), values.get("ab0000"));
+            assert_eq!(Some(&"000a".as_bytes().to_vec()), values.get("ab0a01"));
         })
     }
 
@@ -14,13 +14,17 @@
  * limitations under the License.
  * ------------------------------------------------------------------------------
  */
+use cbor::encoder::GenericEncoder;
+use cbor::value::{Bytes, Key, Text, Value};
 use database::lmdb::LmdbDatabase;
 use state::error::StateDatabaseError;
 use state::merkle::*;
 /// This module contains all of the extern C functions for the Merkle trie
 use state::StateReader;
+use std::collections::BTreeMap;
 use std::collections::HashMap;
 use std::ffi::CStr;
+use std::io::Cursor;
 use std::mem;
 use std::os::raw::{c_char, c_void};
 use std::slice;
@@ -255,6 +259,84 @@ pub extern "C" fn merkle_db_get(
     }
 }
 
+/// Fetches the data at each of the given addresses, returning it as a CBOR
+/// encoded map of address to data. Addresses without data are omitted.
+#[no_mangle]
+pub extern "C" fn merkle_db_get_multi(
+    merkle_db: *mut c_void,
+    addresses: *const *const c_char,
+    addresses_len: usize,
+    bytes: *mut *const u8,
+    bytes_len: *mut usize,
+) -> ErrorCode {
+    if merkle_db.is_null() {
+        return ErrorCode::NullPointerProvided;
+    }
+
+    if addresses_len > 0 && addresses.is_null() {
+        return ErrorCode::NullPointerProvided;
+    }
+
+    let addresses: Result<Vec<&str>, ErrorCode> = if addresses_len > 0 {
+        unsafe { slice::from_raw_parts(addresses, addresses_len) }
+            .iter()
+            .map(|c_str| {
+                unsafe { CStr::from_ptr(*c_str).to_str() }.map_err(|_| ErrorCode::InvalidAddress)
+            })
+            .collect()
+    } else {
+        Ok(Vec::with_capacity(0))
+    };
+
+    let addresses = match addresses {
+        Ok(addresses) => addresses,
+        Err(err) => return err,
+    };
+
+    let values = match unsafe { (*(merkle_db as *mut MerkleDatabase)).get_multi(&addresses) } {
+        Ok(values) => values,
+        Err(StateDatabaseError::DatabaseError(err)) => {
+            error!("A Database Error occurred: {}", err);
+            return ErrorCode::DatabaseError;
+        }
+        Err(err) => {
+            error!("Unknown Error!: {:?}", err);
+            return ErrorCode::Unknown;
+        }
+    };
+
+    let map: BTreeMap<Key, Value> = values
+        .into_iter()
+        .map(|(address, data)| {
+            (
+                Key::Text(Text::Text(address)),
+                Value::Bytes(Bytes::Bytes(data)),
+            )
+        })
+        .collect();
+
+    let mut encoder = GenericEncoder::new(Cursor::new(Vec::new()));
+    if let Err(err) = encoder.value(&Value::Map(map)) {
+        error!("Unable to encode values: {:?}", err);
+        return ErrorCode::Unknown;
+    }
+
+    let data = encoder
+        .into_inner()
+        .into_writer()
+        .into_inner()
+        .into_boxed_slice();
+    unsafe {
+        *bytes_len = data.len();
+        *bytes = data.as_ptr();
+    }
+
+    // It will be up to the callee to cleanup this memory
+    mem::forget(data);
+
+    ErrorCode::Success
+}
+
 #[no_mangle]
 pub extern "C" fn merkle_db_set(
     merkle_db: *mut c_void,
@@ -495,6 +577,8 @@ pub extern "C" fn merkle_db_prune(
 pub extern "C" fn merkle_db_leaf_iterator_new(
     merkle_db: *mut c_void,
     prefix: *const c_char,
+    start: *const c_char,
+    reverse: bool,
     iterator: *mut *const c_void,
 ) -> ErrorCode {
     if merkle_db.is_null() {
@@ -505,6 +589,10 @@ pub extern "C" fn merkle_db_leaf_iterator_new(
         return ErrorCode::NullPointerProvided;
     }
 
+    if start.is_null() {
+        return ErrorCode::NullPointerProvided;
+    }
+
     let prefix = unsafe {
         match CStr::from_ptr(prefix).to_str() {
             Ok(s) => s,
@@ -512,10 +600,20 @@ pub extern "C" fn merkle_db_leaf_iterator_new(
         }
     };
 
-    match unsafe { (*(merkle_db as *mut MerkleDatabase)).leaves(Some(prefix)) } {
+    // An empty start address begins iteration at the first leaf
+    let start = unsafe {
+        match CStr::from_ptr(start).to_str() {
+            Ok("") => None,
+            Ok(s) => Some(s),
+            Err(_) => return ErrorCode::InvalidAddress,
+        }
+    };
+
+    let merkle_db = unsafe { &*(merkle_db as *mut MerkleDatabase) };
+    match merkle_db.leaves_from(Some(prefix), start, reverse) {
         Ok(leaf_iterator) => {
             unsafe {
-                *iterator = Box::into_raw(leaf_iterator) as *const c_void;
+                *iterator = Box::into_raw(Box::new(leaf_iterator)) as *const c_void;
             }
 
             ErrorCode::Success
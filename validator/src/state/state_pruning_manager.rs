@@ -16,6 +16,9 @@
  */
 use std::cmp::Ordering;
 use std::collections::BinaryHeap;
+use std::sync::{Arc, Condvar, Mutex};
+use std::thread;
+use std::time::Duration;
 
 use database::lmdb::LmdbDatabase;
 use metrics;
@@ -26,16 +29,39 @@ lazy_static! {
         metrics::get_collector("sawtooth_validator.state");
 }
 
+/// The time the pruning thread waits after pruning a state root, so that it
+/// only briefly holds the state database's writer at a time and leaves it
+/// free for block validation and commits.
+const PRUNE_INTERVAL_MILLIS: u64 = 100;
+
 /// The StatePruneManager manages a collection of state root hashes that will be
 /// prune from the MerkleDatabase at intervals.  Pruning will occur by decimating
 /// the state root hashes.  I.e. ten percent (rounded down) of the state roots in
 /// the queue will be pruned.  This allows state roots to remain in the queue for
 /// a period of time, on the chance that they are from a chain that has been
 /// abandoned and then re-chosen as the primary chain.
+///
+/// The state roots are pruned one at a time on a background thread, so the
+/// chain controller only updates the queue and the depth at which roots may be
+/// pruned as blocks are committed.
 pub struct StatePruningManager {
+    shared: Arc<(Mutex<PruneQueue>, Condvar)>,
+}
+
+struct PruneQueue {
     // Contains the state root hashes slated for pruning
     state_root_prune_queue: BinaryHeap<PruneCandidate>,
-    state_database: LmdbDatabase,
+    // Contains the state roots which could not be pruned, which are returned
+    // to the queue the next time the prune depth is updated
+    deferred: Vec<PruneCandidate>,
+    // State roots at or below this height may be pruned
+    prune_depth: Option<u64>,
+    // The state root being pruned by the pruning thread, if any
+    in_progress: Option<String>,
+    // Whether the state root being pruned has been switched back to, in which
+    // case its pruning must not be committed
+    cancelled: bool,
+    shutdown: bool,
 }
 
 #[derive(Eq, PartialEq, Debug, Ord)]
@@ -47,98 +73,252 @@ impl PartialOrd for PruneCandidate {
     }
 }
 
+impl PruneQueue {
+    fn contains(&self, state_root_hash: &str) -> bool {
+        let is_in_progress = !self.cancelled
+            && self.in_progress.as_ref().map(String::as_str) == Some(state_root_hash);
+        is_in_progress
+            || self
+                .state_root_prune_queue
+                .iter()
+                .chain(self.deferred.iter())
+                .any(|candidate| candidate.1 == state_root_hash)
+    }
+
+    /// Removes the given state roots from the queue. If one of them is being
+    /// pruned, its pruning is cancelled.
+    fn remove_roots(&mut self, state_root_hashes: &[&str]) {
+        let is_kept = |candidate: &PruneCandidate| {
+            if !state_root_hashes.contains(&candidate.1.as_str()) {
+                true
+            } else {
+                debug!("Removing {} from pruning queue", candidate.1);
+                false
+            }
+        };
+        let mut new_queue = BinaryHeap::with_capacity(0);
+        ::std::mem::swap(&mut self.state_root_prune_queue, &mut new_queue);
+        self.state_root_prune_queue = new_queue.into_iter().filter(&is_kept).collect();
+        self.deferred.retain(&is_kept);
+
+        if let Some(ref state_root_hash) = self.in_progress {
+            if state_root_hashes.contains(&state_root_hash.as_str()) {
+                debug!("Cancelling pruning of {}", state_root_hash);
+                self.cancelled = true;
+            }
+        }
+    }
+
+    /// Takes the next state root to prune, marking it as in progress until
+    /// finish_pruning is called.
+    fn start_pruning(&mut self) -> Option<PruneCandidate> {
+        let candidate = self.pop_prunable();
+        if let Some(ref candidate) = candidate {
+            self.in_progress = Some(candidate.1.clone());
+            self.cancelled = false;
+        }
+        candidate
+    }
+
+    /// Whether the pruning of the state root in progress may be committed.
+    fn may_commit(&self) -> bool {
+        !self.cancelled
+    }
+
+    /// Ends the pruning of the state root in progress. A state root which was
+    /// not pruned is returned to the queue, unless it has been switched back
+    /// to in the meantime.
+    fn finish_pruning(&mut self, candidate: PruneCandidate, pruned: bool) {
+        self.in_progress = None;
+        if self.cancelled {
+            self.cancelled = false;
+        } else if !pruned {
+            self.deferred.push(candidate);
+        }
+    }
+
+    /// Returns the lowest state root, if it is at or below the prune depth.
+    fn pop_prunable(&mut self) -> Option<PruneCandidate> {
+        let at_depth = match self.prune_depth {
+            Some(at_depth) => at_depth,
+            None => return None,
+        };
+
+        let prunable = self
+            .state_root_prune_queue
+            .peek()
+            .map(|candidate| candidate.0 <= at_depth)
+            .unwrap_or(false);
+        if prunable {
+            self.state_root_prune_queue.pop()
+        } else {
+            None
+        }
+    }
+}
+
 impl StatePruningManager {
     pub fn new(state_database: LmdbDatabase) -> Self {
-        StatePruningManager {
-            state_root_prune_queue: BinaryHeap::new(),
-            state_database,
-        }
+        let shared = Arc::new((
+            Mutex::new(PruneQueue {
+                state_root_prune_queue: BinaryHeap::new(),
+                deferred: vec![],
+                prune_depth: None,
+                in_progress: None,
+                cancelled: false,
+                shutdown: false,
+            }),
+            Condvar::new(),
+        ));
+
+        let thread_shared = shared.clone();
+        thread::Builder::new()
+            .name("StatePruningManager".into())
+            .spawn(move || run_pruning(&thread_shared, &state_database))
+            .expect("Unable to start the state pruning thread");
+
+        StatePruningManager { shared }
     }
 
     /// Updates the pruning queue.  Abandoned roots will be added to the queue.
     /// Added roots will be removed from the queue.  This ensures that the state
     /// roots won't be removed, regardless of the chain state.
     pub fn update_queue(&mut self, added_roots: &[&str], abandoned_roots: &[(u64, &str)]) {
+        let mut queue = self.lock_queue();
+
         // add the roots that have been abandoned.
         for (height, state_root_hash) in abandoned_roots {
-            self.add_to_queue(*height, state_root_hash);
+            add_to_queue(&mut queue, *height, state_root_hash);
         }
         // Remove any state root hashes from the pruning queue that we may have switched
-        // back too from an alternate chain
-        let mut new_queue = BinaryHeap::with_capacity(0);
-        ::std::mem::swap(&mut self.state_root_prune_queue, &mut new_queue);
-        self.state_root_prune_queue = new_queue
-            .into_iter()
-            .filter(|candidate| {
-                if !added_roots.contains(&candidate.1.as_str()) {
-                    true
-                } else {
-                    debug!("Removing {} from pruning queue", candidate.1);
-                    false
-                }
-            })
-            .collect();
+        // back too from an alternate chain, including one being pruned right now
+        queue.remove_roots(added_roots);
     }
 
     /// Add a single state root to the pruning queue.
     pub fn add_to_queue(&mut self, height: u64, state_root_hash: &str) {
-        let state_root_hash = state_root_hash.into();
-        if !self.state_root_prune_queue
-            .iter()
-            .any(|candidate| candidate.1 == state_root_hash)
-        {
-            debug!("Adding {} to pruning queue", state_root_hash);
-            self.state_root_prune_queue
-                .push(PruneCandidate(height, state_root_hash));
-        }
+        add_to_queue(&mut self.lock_queue(), height, state_root_hash);
     }
 
-    /// Executes prune on any state root hash at or below the given depth.
+    /// Allows any state root hash at or below the given depth to be pruned.
+    /// The pruning happens on the pruning thread, so this does not wait for it.
     pub fn execute(&mut self, at_depth: u64) {
-        let mut prune_candidates = vec![];
+        let &(_, ref condvar) = &*self.shared;
+        let mut queue = self.lock_queue();
 
-        loop {
-            if let Some(candidate) = self.state_root_prune_queue.pop() {
-                if candidate.0 <= at_depth {
-                    prune_candidates.push(candidate);
-                } else {
-                    self.state_root_prune_queue.push(candidate);
-                    break;
+        // Retry the roots which could not be pruned before
+        let deferred = ::std::mem::replace(&mut queue.deferred, vec![]);
+        queue.state_root_prune_queue.extend(deferred);
+        queue.prune_depth = Some(at_depth);
+
+        let mut prune_queue_length =
+            COLLECTOR.gauge("StatePruneManager.prune_queue_length", None, None);
+        prune_queue_length.set_value(queue.state_root_prune_queue.len());
+
+        condvar.notify_one();
+    }
+
+    fn lock_queue(&self) -> ::std::sync::MutexGuard<PruneQueue> {
+        let &(ref lock, _) = &*self.shared;
+        lock.lock()
+            .expect("No lock holder should have poisoned the lock")
+    }
+}
+
+impl Drop for StatePruningManager {
+    fn drop(&mut self) {
+        let &(_, ref condvar) = &*self.shared;
+        self.lock_queue().shutdown = true;
+        condvar.notify_one();
+    }
+}
+
+fn add_to_queue(queue: &mut PruneQueue, height: u64, state_root_hash: &str) {
+    if !queue.contains(state_root_hash) {
+        debug!("Adding {} to pruning queue", state_root_hash);
+        queue
+            .state_root_prune_queue
+            .push(PruneCandidate(height, state_root_hash.into()));
+    }
+}
+
+/// Prunes the state roots allowed by the prune depth, one at a time, until the
+/// manager is dropped.
+///
+/// The queue is locked again just before a pruning is committed, and held until
+/// the pruning is finished, so that a state root switched back to by
+/// update_queue in the meantime is never deleted.
+fn run_pruning(shared: &Arc<(Mutex<PruneQueue>, Condvar)>, state_database: &LmdbDatabase) {
+    let &(ref lock, ref condvar) = &**shared;
+
+    loop {
+        let candidate = {
+            let mut queue = lock
+                .lock()
+                .expect("No lock holder should have poisoned the lock");
+            loop {
+                if queue.shutdown {
+                    return;
                 }
-            } else {
-                break;
+                if let Some(candidate) = queue.start_pruning() {
+                    break candidate;
+                }
+                queue = condvar
+                    .wait(queue)
+                    .expect("No lock holder should have poisoned the lock");
             }
-        }
+        };
 
-        let mut total_pruned_entries: usize = 0;
-        for candidate in prune_candidates {
-            match MerkleDatabase::prune(&self.state_database, &candidate.1) {
-                Ok(removed_keys) => {
-                    total_pruned_entries += removed_keys.len();
-
-                    // the state root was not pruned (it is likely the root of a
-                    // fork), so push it back into the queue.
-                    if removed_keys.is_empty() {
-                        self.state_root_prune_queue.push(candidate);
-                    } else {
-                        let mut state_roots_pruned_count =
-                            COLLECTOR.counter("StatePruneManager.state_roots_pruned", None, None);
-                        state_roots_pruned_count.inc();
-                    }
-                }
-                Err(err) => {
-                    error!("Unable to prune state root {}: {:?}", candidate.1, err);
-                    self.state_root_prune_queue.push(candidate);
+        let mut locked_queue = None;
+        let result = MerkleDatabase::prune_with_size_if(state_database, &candidate.1, || {
+            let queue = lock
+                .lock()
+                .expect("No lock holder should have poisoned the lock");
+            let may_commit = queue.may_commit();
+            locked_queue = Some(queue);
+            may_commit
+        });
+
+        let pruned = match result {
+            Ok((removed_keys, removed_bytes)) => {
+                // if the state root was not pruned (it is likely the root of a
+                // fork), it is returned to the queue.
+                if removed_keys.is_empty() {
+                    false
+                } else {
+                    info!(
+                        "Pruned {} keys ({} bytes) of state root {} from the Global state Database",
+                        removed_keys.len(),
+                        removed_bytes,
+                        candidate.1
+                    );
+
+                    let mut state_roots_pruned_count =
+                        COLLECTOR.counter("StatePruneManager.state_roots_pruned", None, None);
+                    state_roots_pruned_count.inc();
+                    let mut pruned_nodes_count =
+                        COLLECTOR.counter("StatePruneManager.pruned_nodes", None, None);
+                    pruned_nodes_count.inc_n(removed_keys.len());
+                    let mut pruned_bytes_count =
+                        COLLECTOR.counter("StatePruneManager.pruned_bytes", None, None);
+                    pruned_bytes_count.inc_n(removed_bytes);
+                    true
                 }
             }
-        }
+            Err(err) => {
+                error!("Unable to prune state root {}: {:?}", candidate.1, err);
+                false
+            }
+        };
 
-        if total_pruned_entries > 0 {
-            info!(
-                "Pruned {} keys from the Global state Database",
-                total_pruned_entries
-            );
-        }
+        let mut queue = locked_queue.unwrap_or_else(|| {
+            lock.lock()
+                .expect("No lock holder should have poisoned the lock")
+        });
+        queue.finish_pruning(candidate, pruned);
+        drop(queue);
+
+        thread::sleep(Duration::from_millis(PRUNE_INTERVAL_MILLIS));
     }
 }
 
@@ -161,4 +341,75 @@ mod tests {
         assert_eq!(heap.pop(), Some(PruneCandidate(4, "four".into())));
         assert_eq!(heap.pop(), None);
     }
+
+    #[test]
+    fn pop_prunable_candidates() {
+        let mut queue = PruneQueue {
+            state_root_prune_queue: ::std::collections::BinaryHeap::new(),
+            deferred: vec![],
+            prune_depth: None,
+            in_progress: None,
+            cancelled: false,
+            shutdown: false,
+        };
+
+        add_to_queue(&mut queue, 3, "three");
+        add_to_queue(&mut queue, 1, "one");
+        add_to_queue(&mut queue, 1, "one");
+        assert_eq!(queue.state_root_prune_queue.len(), 2);
+
+        // Nothing may be pruned until the prune depth is set
+        assert_eq!(queue.pop_prunable(), None);
+
+        queue.prune_depth = Some(2);
+        assert_eq!(queue.pop_prunable(), Some(PruneCandidate(1, "one".into())));
+        assert_eq!(queue.pop_prunable(), None);
+
+        queue.prune_depth = Some(3);
+        assert_eq!(queue.pop_prunable(), Some(PruneCandidate(3, "three".into())));
+        assert_eq!(queue.pop_prunable(), None);
+    }
+
+    #[test]
+    fn switch_back_to_root_being_pruned() {
+        let mut queue = PruneQueue {
+            state_root_prune_queue: ::std::collections::BinaryHeap::new(),
+            deferred: vec![],
+            prune_depth: Some(2),
+            in_progress: None,
+            cancelled: false,
+            shutdown: false,
+        };
+
+        add_to_queue(&mut queue, 1, "one");
+        add_to_queue(&mut queue, 2, "two");
+
+        // A root which is not switched back to is deferred if it was not
+        // pruned
+        let candidate = queue.start_pruning().unwrap();
+        assert_eq!(candidate, PruneCandidate(1, "one".into()));
+        assert!(queue.contains("one"));
+        queue.remove_roots(&["two"]);
+        assert!(queue.may_commit());
+        queue.finish_pruning(candidate, false);
+        assert_eq!(queue.deferred, vec![PruneCandidate(1, "one".into())]);
+
+        // Switching back to the root being pruned cancels its pruning, and
+        // it is not returned to the queue
+        queue.deferred.clear();
+        add_to_queue(&mut queue, 2, "two");
+        let candidate = queue.start_pruning().unwrap();
+        assert_eq!(candidate, PruneCandidate(2, "two".into()));
+        queue.remove_roots(&["two"]);
+        assert!(!queue.may_commit());
+        assert!(!queue.contains("two"));
+        queue.finish_pruning(candidate, false);
+        assert!(queue.deferred.is_empty());
+        assert!(queue.state_root_prune_queue.is_empty());
+        assert!(queue.may_commit());
+
+        // If it is abandoned again, it may be pruned again
+        add_to_queue(&mut queue, 2, "two");
+        assert_eq!(queue.start_pruning(), Some(PruneCandidate(2, "two".into())));
+    }
 }
@@ -15,8 +15,12 @@
 import unittest
 from unittest.mock import Mock
 
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
 from sawtooth_validator.protobuf import batch_pb2
+from sawtooth_validator.protobuf import block_pb2
 from sawtooth_validator.protobuf import transaction_pb2
+from sawtooth_validator.protobuf.client_batch_submit_pb2 \
+    import ClientBatchStatus
 from sawtooth_validator.state.batch_tracker import BatchTracker
 
 
@@ -49,6 +53,79 @@ class BatchTrackerTest(unittest.TestCase):
         self.assertEqual(1, len(more_invalid_info))
         self.assertEqual("bad_txn", more_invalid_info[0]["id"])
 
+    def test_commit_and_fork(self):
+        """Test that batches are committed by the blocks containing them.
+
+        - Watch two pending batches
+        - Commit a block containing one, and ensure the watcher waits
+        - Commit a block containing the other, and ensure the watcher is
+          notified that both are committed
+        - Ensure that a batch whose block was forked out is pending again,
+          and committed once a block on the new fork contains it
+        """
+        block_store = MockBlockStore()
+        batch_tracker = BatchTracker(block_store)
+        batch_tracker.notify_batch_pending(make_batch("batch_a", "txn_a"))
+        batch_tracker.notify_batch_pending(make_batch("batch_b", "txn_b"))
+
+        observer = MockObserver()
+        batch_tracker.watch_statuses(observer, ["batch_a", "batch_b"])
+
+        block_store.commit(make_block("block_1", ["batch_a"]))
+        batch_tracker.chain_update(block_store.head, [])
+        self.assertEqual([], observer.statuses)
+
+        block_store.commit(make_block("block_2", ["batch_other", "batch_b"]))
+        batch_tracker.chain_update(block_store.head, [])
+        self.assertEqual(
+            [{"batch_a": ClientBatchStatus.COMMITTED,
+              "batch_b": ClientBatchStatus.COMMITTED}],
+            observer.statuses)
+
+        block_store.fork_out("block_2")
+        self.assertEqual(ClientBatchStatus.PENDING,
+                         batch_tracker.get_status("batch_b"))
+        observer = MockObserver()
+        batch_tracker.watch_statuses(observer, ["batch_b"])
+
+        block_store.commit(make_block("block_2b", ["batch_b"]))
+        batch_tracker.chain_update(block_store.head, [])
+        self.assertEqual(
+            [{"batch_b": ClientBatchStatus.COMMITTED}], observer.statuses)
+
+
+class MockBlockStore:
+    def __init__(self):
+        self.head = None
+        self.batches = {}
+
+    def commit(self, block):
+        self.head = block
+        for batch_id in block.header.batch_ids:
+            self.batches[batch_id] = block.header_signature
+
+    def fork_out(self, block_id):
+        self.batches = {batch_id: batch_block_id
+                        for batch_id, batch_block_id in self.batches.items()
+                        if batch_block_id != block_id}
+
+    def has_batch(self, batch_id):
+        return batch_id in self.batches
+
+
+class MockObserver:
+    def __init__(self):
+        self.statuses = []
+
+    def notify_batches_finished(self, statuses):
+        self.statuses.append(dict(statuses))
+
+
+def make_block(block_id, batch_ids):
+    header = block_pb2.BlockHeader(batch_ids=batch_ids)
+    return BlockWrapper(block_pb2.Block(
+        header=header.SerializeToString(), header_signature=block_id))
+
 
 def make_batch(batch_id, txn_id):
     transaction = transaction_pb2.Transaction(header_signature=txn_id)
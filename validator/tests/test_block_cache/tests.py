@@ -63,3 +63,43 @@ class BlockCacheTest(unittest.TestCase):
         self.assertIn("ABC", cache)
         self.assertNotIn("DEF", cache)
         self.assertIn("FED", cache)
+
+    def test_evict_least_recently_used(self):
+        """Test that the least recently accessed blocks are evicted once the
+        cache holds more than its maximum number of blocks, except for blocks
+        which are referenced by other blocks and not yet committed.
+        """
+        header1 = BlockHeader(previous_block_id="000")
+        block1 = BlockWrapper(Block(header=header1.SerializeToString(),
+                                    header_signature="ABC"))
+
+        header2 = BlockHeader(previous_block_id="ABC")
+        block2 = BlockWrapper(Block(header=header2.SerializeToString(),
+                                    header_signature="DEF"))
+
+        header3 = BlockHeader(previous_block_id="BCA")
+        block3 = BlockWrapper(Block(header=header3.SerializeToString(),
+                                    header_signature="FED"))
+
+        for committed in (False, True):
+            block_store = {}
+            cache = BlockCache(block_store=block_store, max_entries=2)
+
+            cache[block1.header_signature] = block1
+            cache[block2.header_signature] = block2
+            if committed:
+                block_store["ABC"] = block1
+
+            # Access "DEF" so that "ABC" is the least recently used
+            cache["DEF"]
+            cache[block3.header_signature] = block3
+
+            self.assertEqual(2, len(cache))
+            self.assertIn("FED", cache.cache)
+            if committed:
+                self.assertNotIn("ABC", cache.cache)
+                self.assertIn("DEF", cache.cache)
+            else:
+                # "ABC" is referenced by "DEF" and has not been committed
+                self.assertIn("ABC", cache.cache)
+                self.assertNotIn("DEF", cache.cache)
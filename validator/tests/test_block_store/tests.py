@@ -17,6 +17,7 @@
 
 import logging
 import unittest
+from unittest.mock import patch
 
 from sawtooth_validator.database.dict_database import DictDatabase
 from sawtooth_validator.journal.block_store import BlockStore
@@ -185,6 +186,40 @@ class BlockStoreTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             stored = block_store.get_transaction("bad")
 
+    def test_get_located_batches_and_transactions(self):
+        """ Test BlockStore retrieval of batches and transactions from the
+        positions recorded in its indexes, when a block has several batches.
+        """
+        block = self.block_tree_manager.create_block(batch_count=3)
+        block_store = self.create_block_store()
+        block_store.update_chain([block])
+
+        batch_ids = [batch.header_signature for batch in block.batches]
+        stored = block_store.get_batches(reversed(batch_ids + ["bad"]))
+        self.assertEqual(
+            [self.encode(batch) for batch in reversed(block.batches)],
+            [self.encode(batch) for batch in stored])
+
+        txns = [txn for batch in block.batches for txn in batch.transactions]
+        stored = block_store.get_transactions(
+            [txn.header_signature for txn in txns])
+        self.assertEqual(
+            [self.encode(txn) for txn in txns],
+            [self.encode(txn) for txn in stored])
+
+        for batch in block.batches:
+            stored = block_store.get_batch_by_transaction(
+                batch.transactions[-1].header_signature)
+            self.asset_protobufs_equal(stored, batch)
+
+        # A recorded position which does not hold the transaction is not
+        # trusted, and the block is searched instead
+        with patch('sawtooth_validator.journal.block_store._parse_location',
+                   return_value=(0, 0)):
+            stored = block_store.get_batch_by_transaction(
+                block.batches[-1].transactions[0].header_signature)
+        self.asset_protobufs_equal(stored, block.batches[-1])
+
     def test_get_count(self):
         """ Test BlockStore get_*_count operations.
         """
@@ -269,12 +304,43 @@ class BlockStorePredecessorIteratorTest(unittest.TestCase):
 
         self.assertEqual([], [b for b in block_store.get_predecessor_iter()])
 
-    def _create_chain(self, length):
+    def test_iterate_chain_after_fork(self):
+        """Given a block store whose blocks have been read, replace the end
+        of its chain with a fork and verify that the blocks of the abandoned
+        fork are no longer returned.
+
+        1. Create a chain of length 5 and read all of its blocks.
+        2. Replace blocks 3 and 4 with a fork of length 3
+        3. Verify that iteration, the chain head and lookups by number and
+           by id return the fork's blocks
+        """
+        block_store = BlockStore(DictDatabase(
+            indexes=BlockStore.create_index_configuration()))
+        chain = self._create_chain(5)
+        block_store.update_chain(chain)
+        self.assertEqual(5, len(list(block_store.get_predecessor_iter())))
+
+        fork = self._create_chain(
+            3, prefix='efgh', start=3, previous_block_id='abcd2')
+        block_store.update_chain(fork, chain[:2])
+
+        ids = [b.identifier for b in block_store.get_predecessor_iter()]
+        self.assertEqual(
+            ['efgh5', 'efgh4', 'efgh3', 'abcd2', 'abcd1', 'abcd0'],
+            ids)
+        self.assertEqual('efgh5', block_store.chain_head.identifier)
+        self.assertEqual(
+            'efgh3', block_store.get_block_by_number(3).identifier)
+        self.assertNotIn('abcd4', block_store)
+        with self.assertRaises(KeyError):
+            block_store['abcd4']
+
+    def _create_chain(self, length, prefix='abcd', start=0,
+                      previous_block_id=NULL_BLOCK_IDENTIFIER):
         chain = []
-        previous_block_id = NULL_BLOCK_IDENTIFIER
-        for i in range(length):
+        for i in range(start, start + length):
             block = BlockWrapper(
-                Block(header_signature='abcd{}'.format(i),
+                Block(header_signature='{}{}'.format(prefix, i),
                       batches=[],
                       header=BlockHeader(
                           block_num=i,
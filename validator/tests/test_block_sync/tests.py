@@ -0,0 +1,196 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from sawtooth_signing import create_context
+from sawtooth_signing import CryptoFactory
+from sawtooth_validator.journal.block_sync import BlockSync
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.journal.block_wrapper import NULL_BLOCK_IDENTIFIER
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.protobuf.network_pb2 import GossipBlockRangeResponse
+
+
+class MockGossip:
+    def __init__(self, peers):
+        self.peers = peers
+        self.requests = []
+
+    def get_peers(self):
+        return {peer: peer for peer in self.peers}
+
+    def send_block_range_request(self, start_block_num, count,
+                                 connection_id):
+        self.requests.append((start_block_num, count, connection_id))
+
+
+class MockCompleter:
+    def __init__(self):
+        self.blocks = []
+
+    def add_block(self, block):
+        self.blocks.append(block)
+
+
+class MockBlockStore:
+    def __init__(self):
+        self.chain_head = None
+
+
+class BlockSyncTest(unittest.TestCase):
+    def setUp(self):
+        context = create_context('secp256k1')
+        private_key = context.new_random_private_key()
+        self.signer = CryptoFactory(context).new_signer(private_key)
+
+        self.chain = self._create_chain(40)
+        self.gossip = MockGossip(['peer_a', 'peer_b'])
+        self.completer = MockCompleter()
+        self.block_store = MockBlockStore()
+        self.verify_pool = ThreadPoolExecutor(max_workers=2)
+        self.block_sync = BlockSync(
+            self.completer, self.gossip, self.block_store, self.verify_pool,
+            range_length=8, ranges=2)
+
+    def tearDown(self):
+        self.verify_pool.shutdown(wait=True)
+
+    def _create_chain(self, length):
+        chain = []
+        previous_block_id = NULL_BLOCK_IDENTIFIER
+        for block_num in range(length):
+            header = BlockHeader(
+                block_num=block_num,
+                previous_block_id=previous_block_id,
+                signer_public_key=self.signer.get_public_key().as_hex())
+            header_bytes = header.SerializeToString()
+            block = Block(
+                header=header_bytes,
+                header_signature=self.signer.sign(header_bytes))
+            chain.append(block)
+            previous_block_id = block.header_signature
+        return chain
+
+    def _set_chain_head(self, block_num):
+        self.block_store.chain_head = BlockWrapper(self.chain[block_num])
+
+    def _respond(self, request, count=None):
+        start_block_num, requested, connection_id = request
+        if count is None:
+            count = requested
+        blocks = self.chain[start_block_num:start_block_num + count]
+        self.block_sync.add_response(connection_id, GossipBlockRangeResponse(
+            start_block_num=start_block_num,
+            blocks=[block.SerializeToString() for block in blocks]))
+
+    def _delivered_block_nums(self):
+        return [BlockWrapper(block).block_num
+                for block in self.completer.blocks]
+
+    def test_sync_in_order(self):
+        """Test that ranges are requested from several peers at once, that
+        their blocks are delivered in order of block number whatever order
+        the responses arrive in, and that no more blocks are requested than
+        the requests in flight cover ahead of the chain head.
+        """
+        self._set_chain_head(9)
+        self.assertTrue(self.block_sync.sync_to(30))
+
+        first, second = self.gossip.requests
+        self.assertEqual((10, 8), first[:2])
+        self.assertEqual((18, 8), second[:2])
+        self.assertNotEqual(first[2], second[2])
+
+        self._respond(second)
+        self.assertEqual([], self.completer.blocks)
+
+        self._respond(first)
+        self.assertEqual(list(range(10, 26)), self._delivered_block_nums())
+        self.assertEqual(2, len(self.gossip.requests))
+
+        self._set_chain_head(25)
+        self.block_sync.chain_update(self.chain[25], [])
+        third = self.gossip.requests[2]
+        self.assertEqual((26, 5), third[:2])
+
+        self._respond(third)
+        self.assertEqual(list(range(10, 31)), self._delivered_block_nums())
+
+        # The sync is complete, so a new one starts from the chain head
+        self._set_chain_head(30)
+        self.assertTrue(self.block_sync.sync_to(33))
+        self.assertEqual((31, 3), self.gossip.requests[3][:2])
+
+    def test_short_and_empty_responses(self):
+        """Test that the rest of a range which a peer only partly serves is
+        requested from another peer, that a peer which serves none of a
+        range is not asked again, and that the sync stops once no peer is
+        left to ask.
+        """
+        self._set_chain_head(9)
+        self.block_sync.sync_to(17)
+        request = self.gossip.requests[0]
+        self.assertEqual((10, 8), request[:2])
+
+        self._respond(request, count=3)
+        self.assertEqual([10, 11, 12], self._delivered_block_nums())
+        retry = self.gossip.requests[1]
+        self.assertEqual((13, 5), retry[:2])
+
+        self._respond(retry, count=0)
+        retry_again = self.gossip.requests[2]
+        self.assertEqual((13, 5), retry_again[:2])
+        self.assertNotEqual(retry[2], retry_again[2])
+
+        self._respond(retry_again, count=0)
+        self.assertEqual(3, len(self.gossip.requests))
+        self.assertFalse(self.block_sync.sync_to(20))
+
+    def test_timed_out_requests(self):
+        """Test that a range whose request times out is asked of another
+        peer by the thread started by start(), without waiting on a chain
+        update, and that the sync stops once every peer has timed out.
+        """
+        self.block_sync = BlockSync(
+            self.completer, self.gossip, self.block_store, self.verify_pool,
+            range_length=8, ranges=2, request_timeout=0,
+            check_frequency=0.01)
+
+        self._set_chain_head(9)
+        self.block_sync.sync_to(17)
+        request = self.gossip.requests[0]
+        self.assertEqual((10, 8), request[:2])
+
+        self.block_sync.start()
+        try:
+            for _ in range(100):
+                if len(self.gossip.requests) > 1:
+                    break
+                time.sleep(0.01)
+        finally:
+            self.block_sync.stop()
+
+        retry = self.gossip.requests[1]
+        self.assertEqual((10, 8), retry[:2])
+        self.assertNotEqual(request[2], retry[2])
+
+        time.sleep(0.01)
+        self.block_sync.check_requests()
+        self.assertEqual(2, len(self.gossip.requests))
+        self.assertFalse(self.block_sync.sync_to(20))
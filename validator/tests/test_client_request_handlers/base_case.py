@@ -16,6 +16,7 @@
 # pylint: disable=attribute-defined-outside-init
 
 import unittest
+from sawtooth_validator.networking.dispatch import HandlerStatus
 from sawtooth_validator.protobuf import client_list_control_pb2
 
 
@@ -62,6 +63,8 @@ class ClientHandlerTestCase(unittest.TestCase):
 
     def _handle(self, request):
         result = self._handler.handle(self._identity, request)
+        if result.status == HandlerStatus.DEFER:
+            result = result.future.result()
         return result.message_out
 
     def make_bad_request(self, **kwargs):
@@ -92,6 +92,7 @@ class MockBlockStore(BlockStore):
     def clear(self):
         self._block_store = DictDatabase(
             indexes=BlockStore.create_index_configuration())
+        self._decoded_blocks.clear()
 
     def add_block(self, base_id, root='merkle_root'):
         block_id = 'b' * (128 - len(base_id)) + base_id
@@ -103,18 +104,19 @@ class MockBlockStore(BlockStore):
             previous_id = 'zzzzz'
             num = 0
 
+        batch = make_mock_batch(base_id)
         header = BlockHeader(
             block_num=num,
             previous_block_id=previous_id,
             signer_public_key='public_key-' + base_id,
-            batch_ids=[block_id],
+            batch_ids=[batch.header_signature],
             consensus=b'consensus',
             state_root_hash=root)
 
         block = Block(
             header=header.SerializeToString(),
             header_signature=block_id,
-            batches=[make_mock_batch(base_id)])
+            batches=[batch])
 
         self.update_chain([BlockWrapper(block)], [])
 
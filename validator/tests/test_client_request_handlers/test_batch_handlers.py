@@ -470,6 +470,58 @@ class TestBatchListRequests(ClientHandlerTestCase):
         self.assertEqual(A_0, response.batches[0].header_signature)
         self.assertEqual(A_2, response.batches[2].header_signature)
 
+    def test_batch_list_paginated_after_head(self):
+        """Verifies batch list requests break when paging starts after head.
+
+        Queries the default mock block store with 'bbb...1' as the head,
+        paging from 'aaa...2', which was committed in 'bbb...2'.
+
+        Expects to find:
+            - a status of INVALID_PAGING
+            - that head_id, paging, and batches are missing
+        """
+        response = self.make_paged_request(limit=1, start=A_2, head_id=B_1)
+
+        self.assertEqual(self.status.INVALID_PAGING, response.status)
+        self.assertFalse(response.head_id)
+        self.assertFalse(response.paging.SerializeToString())
+        self.assertFalse(response.batches)
+
+    def test_batch_list_paginated_in_reverse_by_start_id(self):
+        """Verifies batch list requests work sorted in reverse and paginated
+        by limit and start_id.
+
+        Queries the default mock block store with three blocks:
+            {
+                header_signature: 'bbb...2',
+                 batches: [{header_signature: 'aaa...2' ...}] ...
+            }
+            {
+                header_signature: 'bbb...1',
+                 batches: [{header_signature: 'aaa...1' ...}] ...
+            }
+            {
+                header_signature: 'bbb...0',
+                 batches: [{header_signature: 'aaa...0' ...}] ...
+            }
+
+        Expects to find:
+            - a status of OK
+            - a head_id of 'bbb...2', the latest
+            - a paging response with start of A_1, limit 1, and next A_2
+            - a list of batches with 1 item
+            - that item has a header_signature of 'aaa...1'
+        """
+        controls = self.make_sort_controls('default', reverse=True)
+        response = self.make_paged_request(
+            limit=1, start=A_1, sorting=controls)
+
+        self.assertEqual(self.status.OK, response.status)
+        self.assertEqual(B_2, response.head_id)
+        self.assert_valid_paging(response, A_1, 1, A_2)
+        self.assertEqual(1, len(response.batches))
+        self.assertEqual(A_1, response.batches[0].header_signature)
+
 
 class TestBatchGetRequests(ClientHandlerTestCase):
     def setUp(self):
@@ -430,6 +430,35 @@ class TestStateListRequests(ClientHandlerTestCase):
         self.assertEqual('0' * 69 + '1', response.entries[2].address)
         self.assertEqual(b'3', response.entries[2].data)
 
+    def test_state_list_paginated_in_reverse_by_start_id(self):
+        """Verifies data list requests work sorted in reverse and paginated
+        by limit and start_id.
+
+        Queries the latest state in the default mock db:
+            {'00...1': b'3', '00...2': b'5', '00...3': b'7'}
+
+        Expects to find:
+            - a status of OK
+            - the latest state_root
+            - a paging response with:
+                * limit 1
+                * start of '00..2'
+                * a next_id of '00..1'
+            - a list of entries with 1 item
+            - that ClientStateListResponse.Entry has an address of '00..2' and
+              data of b'5'
+        """
+        controls = self.make_sort_controls('default', reverse=True)
+        response = self.make_paged_request(
+            limit=1, start='0' * 69 + '2', sorting=controls)
+
+        self.assertEqual(self.status.OK, response.status)
+        self.assertEqual(self.roots[2], response.state_root)
+        self.assert_valid_paging(response, '0' * 69 + '2', 1, '0' * 69 + '1')
+        self.assertEqual(1, len(response.entries))
+        self.assertEqual('0' * 69 + '2', response.entries[0].address)
+        self.assertEqual(b'5', response.entries[0].data)
+
 
 class TestStateGetRequests(ClientHandlerTestCase):
     def setUp(self):
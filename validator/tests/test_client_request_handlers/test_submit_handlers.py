@@ -13,6 +13,7 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from threading import current_thread
 from threading import Thread
 from time import time, sleep
 
@@ -263,7 +264,7 @@ class TestBatchStatusRequests(ClientHandlerTestCase):
         def delayed_add():
             sleep(1)
             self._store.add_block('e')
-            self._tracker.chain_update(None, [])
+            self._tracker.chain_update(self._store.chain_head, [])
 
         Thread(target=delayed_add).start()
 
@@ -277,6 +278,23 @@ class TestBatchStatusRequests(ClientHandlerTestCase):
         self.assertEqual(response.batch_statuses[0].status,
                          ClientBatchStatus.COMMITTED)
 
+    def test_batch_statuses_with_wait_timeout(self):
+        """Verifies requests for status that wait for commit respond once
+        their timeout expires, with the batches' current statuses.
+
+        Expects to find:
+            - a response status of OK
+            - a status of PENDING at key 'aaa...d' in batch_statuses
+        """
+        response = self.make_request(
+            batch_ids=['a' * 127 + 'd'],
+            wait=True,
+            timeout=1)
+
+        self.assertEqual(self.status.OK, response.status)
+        self.assertEqual(response.batch_statuses[0].status,
+                         ClientBatchStatus.PENDING)
+
     def test_batch_statuses_with_committed_wait(self):
         """Verifies requests for status that wait for commit work properly,
         when the batch is already committed.
@@ -297,3 +315,30 @@ class TestBatchStatusRequests(ClientHandlerTestCase):
         self.assertEqual(self.status.OK, response.status)
         self.assertEqual(response.batch_statuses[0].status,
                          ClientBatchStatus.COMMITTED)
+
+    def test_batch_waiter_finished(self):
+        """Verifies a waiter whose batches have finished is answered once,
+        from the timeouts thread, and is no longer timed out.
+        """
+        # pylint: disable=protected-access
+        timeouts = handlers._BatchWaitTimeouts()
+        timeouts.start()
+        answers = []
+
+        def answer(statuses):
+            answers.append((current_thread(), statuses))
+
+        waiter = handlers._BatchWaiter(
+            self._tracker, [A_0], answer, timeouts)
+        waiter.watch(10)
+        start_time = time()
+        while not answers and time() - start_time < 5:
+            sleep(0.01)
+
+        self.assertEqual(1, len(answers))
+        self.assertIs(timeouts, answers[0][0])
+        self.assertEqual(ClientBatchStatus.COMMITTED, answers[0][1][0].status)
+        self.assertEqual({}, timeouts._entries)
+
+        waiter.time_out()
+        self.assertEqual(1, len(answers))
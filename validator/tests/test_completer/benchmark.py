@@ -0,0 +1,224 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Measures how long a validator which is far behind its peers takes to
+fetch and complete the missing predecessors of a new block, with the
+predecessors requested one at a time and as parallel chain requests.
+
+Usage:
+    python3 benchmark.py [--blocks N] [--peers P] [--latency SECONDS]
+
+The validators run in-process: each has its own Completer, Responder and
+Gossip, connected by a simulated network which delivers every message after
+a fixed latency.
+"""
+
+# pylint: disable=protected-access
+
+import argparse
+import heapq
+import itertools
+import sys
+import threading
+import time
+
+from sawtooth_validator.database.dict_database import DictDatabase
+from sawtooth_validator.gossip.gossip import Gossip
+from sawtooth_validator.journal.block_store import BlockStore
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.journal.block_wrapper import NULL_BLOCK_IDENTIFIER
+from sawtooth_validator.journal.completer import Completer
+from sawtooth_validator.journal.responder import Responder
+from sawtooth_validator.journal.responder import BlockResponderHandler
+from sawtooth_validator.protobuf import network_pb2
+from sawtooth_validator.protobuf import validator_pb2
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+
+
+class SimulatedNetwork(object):
+    """Delivers messages between validators after a fixed latency, in the
+    order they were sent.
+    """
+
+    def __init__(self, latency):
+        self._latency = latency
+        self._condition = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._nodes = {}
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add_node(self, name, node):
+        self._nodes[name] = node
+
+    def deliver(self, sender, receiver, message_type, message):
+        with self._condition:
+            heapq.heappush(
+                self._queue,
+                (time.time() + self._latency, next(self._sequence),
+                 sender, receiver, message_type, message))
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                deliver_at = self._queue[0][0]
+                now = time.time()
+                if deliver_at > now:
+                    self._condition.wait(deliver_at - now)
+                    continue
+                _, _, sender, receiver, message_type, message = \
+                    heapq.heappop(self._queue)
+            self._nodes[receiver].receive(sender, message_type, message)
+
+
+class NodeInterconnect(object):
+    """The part of the Interconnect used by Gossip, sending messages over
+    the simulated network.
+    """
+
+    def __init__(self, name, network):
+        self._name = name
+        self._network = network
+
+    def send(self, message_type, message, connection_id, one_way=False):
+        self._network.deliver(self._name, connection_id, message_type, message)
+
+    def is_connection_handshake_complete(self, connection_id):
+        return True
+
+
+class DefaultSettingsCache(object):
+    def get_setting(self, key, state_root, default_value=None):
+        return default_value
+
+
+class Node(object):
+    def __init__(self, name, network, peers, block_store, **completer_args):
+        self.gossip = Gossip(
+            NodeInterconnect(name, network),
+            DefaultSettingsCache(),
+            lambda: None,
+            lambda: None)
+        self.gossip._peers = {peer: peer for peer in peers}
+
+        self.completer = Completer(block_store, self.gossip, **completer_args)
+        self.completer.set_chain_has_block(lambda block_id: False)
+        self.completer.set_on_block_received(lambda block: None)
+        self.completer.set_on_batch_received(lambda batch: None)
+
+        self._block_request_handler = BlockResponderHandler(
+            Responder(self.completer), self.gossip)
+
+    def receive(self, sender, message_type, message):
+        if message_type == validator_pb2.Message.GOSSIP_BLOCK_REQUEST:
+            self._block_request_handler.handle(sender, message)
+        elif message_type == validator_pb2.Message.GOSSIP_BLOCK_RESPONSE:
+            block_response = network_pb2.GossipBlockResponse()
+            block_response.ParseFromString(message)
+            block = Block()
+            block.ParseFromString(block_response.content)
+            self.completer.add_block(block)
+
+
+def create_chain(length):
+    chain = []
+    previous_block_id = NULL_BLOCK_IDENTIFIER
+    for block_num in range(length):
+        block_id = '{:0128x}'.format(block_num + 1)
+        header = BlockHeader(
+            block_num=block_num,
+            previous_block_id=previous_block_id,
+            signer_public_key='0' * 66,
+            state_root_hash='0' * 64)
+        chain.append(BlockWrapper(Block(
+            header=header.SerializeToString(),
+            header_signature=block_id)))
+        previous_block_id = block_id
+    return chain
+
+
+def create_block_store(chain):
+    block_store = BlockStore(DictDatabase(
+        indexes=BlockStore.create_index_configuration()))
+    block_store.update_chain(chain)
+    return block_store
+
+
+def run_sync(chain, peers, latency, **completer_args):
+    """Returns the time taken by a validator which only has the genesis
+    block to complete every block of the chain, after receiving its tip.
+    """
+    network = SimulatedNetwork(latency)
+    peer_names = ['peer{}'.format(i) for i in range(peers)]
+    peer_block_store = create_block_store(chain)
+    for name in peer_names:
+        network.add_node(name, Node(
+            name, network, ['syncing'], peer_block_store))
+
+    syncing = Node('syncing', network, peer_names,
+                   create_block_store(chain[:1]), **completer_args)
+    network.add_node('syncing', syncing)
+
+    completed = threading.Event()
+    remaining = [len(chain) - 1]
+
+    def on_block_received(block):
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            completed.set()
+
+    syncing.completer.set_on_block_received(on_block_received)
+
+    start = time.time()
+    syncing.completer.add_block(chain[-1].get_block())
+    completed.wait()
+    elapsed = time.time() - start
+    network.stop()
+    return elapsed
+
+
+def main(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=500)
+    parser.add_argument('--peers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.01)
+    options = parser.parse_args(args)
+
+    chain = create_chain(options.blocks + 1)
+
+    one_at_a_time = run_sync(
+        chain, options.peers, options.latency, chain_request_ranges=0)
+    print('one request per block:  {:.2f}s'.format(one_at_a_time))
+
+    chain_requests = run_sync(chain, options.peers, options.latency)
+    print('parallel chain requests: {:.2f}s'.format(chain_requests))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
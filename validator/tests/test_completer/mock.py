@@ -15,17 +15,47 @@
 
 
 class MockGossip():
-    def __init__(self):
+    def __init__(self, peers=('peer_a',)):
+        self.peers = list(peers)
         self.requested_blocks = []
         self.requested_batches = []
         self.requested_batches_by_txn_id = []
+        self.requested_chains = []
+        self.requested_chain_ranges = []
 
     def broadcast_block_request(self, block_id):
         self.requested_blocks.append(block_id)
 
+    def send_block_chain_requests(self, block_id, chain_length,
+                                  range_length, chain_offset=0,
+                                  exclude=None):
+        peers = [peer for peer in self.peers
+                 if exclude is None or peer not in exclude]
+        if not peers:
+            return []
+
+        self.requested_chains.append((block_id, chain_length))
+        requested = []
+        end = chain_offset + chain_length
+        for i, offset in enumerate(range(chain_offset, end, range_length)):
+            length = min(range_length, end - offset)
+            requested.append((offset, length, peers[i % len(peers)]))
+        self.requested_chain_ranges.extend(
+            (block_id,) + request for request in requested)
+        return requested
+
     def broadcast_batch_by_batch_id_request(self, batch_id):
         self.requested_batches.append(batch_id)
 
     def broadcast_batch_by_transaction_id_request(self, transaction_ids):
         for txn_id in transaction_ids:
             self.requested_batches_by_txn_id.append(txn_id)
+
+
+class MockBlockSync():
+    def __init__(self):
+        self.synced_to = []
+
+    def sync_to(self, block_num):
+        self.synced_to.append(block_num)
+        return True
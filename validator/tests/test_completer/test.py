@@ -24,14 +24,17 @@ import cbor
 from sawtooth_signing import create_context
 from sawtooth_signing import CryptoFactory
 from sawtooth_validator.journal.completer import Completer
+from sawtooth_validator.journal.completer import BLOCK_SYNC_MIN_BLOCKS
 from sawtooth_validator.database.dict_database import DictDatabase
 from sawtooth_validator.journal.block_store import BlockStore
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
 from sawtooth_validator.journal.block_wrapper import NULL_BLOCK_IDENTIFIER
 from sawtooth_validator.protobuf.transaction_pb2 import TransactionHeader, \
     Transaction
 from sawtooth_validator.protobuf.batch_pb2 import BatchHeader, Batch
 from sawtooth_validator.protobuf.block_pb2 import BlockHeader, Block
 from test_completer.mock import MockGossip
+from test_completer.mock import MockBlockSync
 
 
 class TestCompleter(unittest.TestCase):
@@ -212,6 +215,130 @@ class TestCompleter(unittest.TestCase):
             block,
             self.completer.get_block(block.header_signature).get_block())
 
+    def test_block_missing_chain(self):
+        """
+        The block is many blocks ahead of the chain head. The missing
+        predecessors are requested as a chain at once, and blocks of that
+        chain arriving without their own predecessors do not trigger more
+        requests. The blocks are completed once the chain is filled in.
+        """
+        blocks = self._create_blocks(6, 1)
+        self.block_store.update_chain([BlockWrapper(blocks[0])])
+        self._has_block_value = False
+
+        self.completer.add_block(blocks[5])
+        self.assertEqual(
+            self.gossip.requested_chains, [(blocks[4].header_signature, 4)])
+        self.assertEqual(self.gossip.requested_blocks, [])
+
+        for block in (blocks[4], blocks[2], blocks[3]):
+            self.completer.add_block(block)
+        self.assertEqual(len(self.gossip.requested_chains), 1)
+        self.assertEqual(self.gossip.requested_blocks, [])
+        self.assertEqual(self.blocks, [])
+
+        self.completer.add_block(blocks[1])
+        self.assertEqual(
+            self.blocks, [block.header_signature for block in blocks[1:]])
+
+    def test_block_missing_chain_fork(self):
+        """
+        A block on another fork arrives at the height of a requested
+        predecessor. It neither stands in for that predecessor nor waits on
+        the chain requested, so its own predecessor is requested once the
+        chain's block at its height has arrived.
+        """
+        blocks = self._create_blocks(6, 1)
+        self.block_store.update_chain([BlockWrapper(blocks[0])])
+        self._has_block_value = False
+
+        self.completer.add_block(blocks[5])
+        header = BlockHeader(block_num=3, previous_block_id="Fork")
+        fork_block = Block(header_signature="ForkBlock",
+                           header=header.SerializeToString())
+        self.completer.add_block(fork_block)
+        self.assertEqual(len(self.gossip.requested_chains), 1)
+
+        self.completer.add_block(blocks[4])
+        self.completer.add_block(blocks[3])
+        self.assertEqual(self.gossip.requested_chains[1:], [("Fork", 2)])
+
+        for block in (blocks[2], blocks[1]):
+            self.completer.add_block(block)
+        self.assertEqual(
+            self.blocks, [block.header_signature for block in blocks[1:]])
+
+    def test_block_missing_chain_short_answer(self):
+        """
+        A peer answers a chain range with only its newest block, as a peer
+        which does not serve chains does. Once the range times out, the rest
+        of it is requested from another peer by the id of the newest block
+        still missing, or as before while that id is not known, and once no
+        peer is left to ask, that block is requested on its own.
+        """
+        self.gossip.peers = ['peer_a', 'peer_b']
+        self.completer = Completer(
+            self.block_store, self.gossip,
+            chain_request_range_length=2,
+            chain_request_timeout=0)
+        self.completer._on_block_received = self._on_block_received
+        self.completer._on_batch_received = self._on_batch_received
+        self.completer._has_block = self._has_block
+
+        blocks = self._create_blocks(6, 1)
+        self.block_store.update_chain([BlockWrapper(blocks[0])])
+        self._has_block_value = False
+
+        self.completer.add_block(blocks[5])
+        newest, oldest = self.gossip.requested_chain_ranges
+        self.assertEqual(
+            (blocks[4].header_signature, 0, 2, 'peer_a'), newest)
+        self.assertEqual(
+            (blocks[4].header_signature, 2, 2, 'peer_b'), oldest)
+
+        # Both ranges are answered short
+        for block in (blocks[4], blocks[2]):
+            self.completer.add_block(block)
+        self.assertEqual(self.blocks, [])
+
+        self.completer.check_chain_requests()
+        self.assertEqual(
+            self.gossip.requested_chain_ranges[2:],
+            [(blocks[3].header_signature, 0, 1, 'peer_b'),
+             (blocks[4].header_signature, 2, 2, 'peer_a')])
+        self.assertEqual(self.gossip.requested_blocks, [])
+
+        # Block 3 arrives, but block 1 does not
+        self.completer.add_block(blocks[3])
+        self.completer.check_chain_requests()
+        self.assertEqual(len(self.gossip.requested_chain_ranges), 4)
+        self.assertEqual(
+            self.gossip.requested_blocks, [blocks[1].header_signature])
+
+        self.completer.add_block(blocks[1])
+        self.assertEqual(
+            self.blocks, [block.header_signature for block in blocks[1:]])
+
+    def test_block_missing_long_chain(self):
+        """
+        The block is further ahead of the chain head than chain requests
+        cover. The missing predecessors are handed to block sync.
+        """
+        block_sync = MockBlockSync()
+        self.completer.set_block_sync(block_sync)
+        self._has_block_value = False
+
+        header = BlockHeader(
+            block_num=BLOCK_SYNC_MIN_BLOCKS + 1,
+            previous_block_id="Missing")
+        block = Block(header_signature="Ahead",
+                      header=header.SerializeToString())
+        self.completer.add_block(block)
+
+        self.assertEqual(block_sync.synced_to, [BLOCK_SYNC_MIN_BLOCKS])
+        self.assertEqual(self.gossip.requested_chains, [])
+        self.assertEqual(self.gossip.requested_blocks, [])
+
     def test_block_with_extra_batch(self):
         """
         The block has a batch that is not in the batch_id list.
@@ -0,0 +1,124 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Measures the cost of creating contexts at the end of long chains of
+dependent intkey transactions, using the ContextManager directly.
+
+Usage:
+    python3 benchmark.py [--chain-length N] [--chains M] [--keys K]
+
+Each chain is a sequence of transactions which increment intkey names, where
+every transaction is based on the context of the transaction before it. Each
+transaction reads its own name, which was last written many transactions
+earlier, so resolving its inputs requires searching deep into the chain.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cbor
+
+from sawtooth_validator.database.native_lmdb import NativeLmdbDatabase
+from sawtooth_validator.execution.context_manager import ContextManager
+from sawtooth_validator.state.merkle import MerkleDatabase
+
+
+INTKEY_ADDRESS_PREFIX = hashlib.sha512(
+    'intkey'.encode('utf-8')).hexdigest()[0:6]
+
+
+def make_intkey_address(name):
+    return INTKEY_ADDRESS_PREFIX + hashlib.sha512(
+        name.encode('utf-8')).hexdigest()[-64:]
+
+
+def run_chain(context_manager, state_hash, chain_length, keys):
+    """Creates and executes a chain of dependent transactions, returning the
+    time spent creating contexts.
+    """
+    addresses = [make_intkey_address('key{}'.format(i)) for i in range(keys)]
+
+    previous_context_id = None
+    create_time = 0.0
+    for i in range(chain_length):
+        address = addresses[i % keys]
+        base_contexts = [] if previous_context_id is None \
+            else [previous_context_id]
+
+        start = time.time()
+        context_id = context_manager.create_context(
+            state_hash=state_hash,
+            base_contexts=base_contexts,
+            inputs=[address],
+            outputs=[address])
+        create_time += time.time() - start
+
+        value = context_manager.get(context_id, [address])[0][1]
+        count = 0 if value is None else cbor.loads(value)[address]
+        context_manager.set(
+            context_id, [{address: cbor.dumps({address: count + 1})}])
+
+        previous_context_id = context_id
+
+    return create_time
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark ContextManager context creation for long '
+        'chains of dependent intkey transactions.')
+    parser.add_argument(
+        '--chain-length', type=int, default=2000,
+        help='number of transactions in each chain')
+    parser.add_argument(
+        '--chains', type=int, default=3,
+        help='number of chains to run')
+    parser.add_argument(
+        '--keys', type=int, default=500,
+        help='number of distinct intkey names incremented by each chain')
+    opts = parser.parse_args(args)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        database = NativeLmdbDatabase(
+            os.path.join(temp_dir, 'benchmark.lmdb'),
+            indexes=MerkleDatabase.create_index_configuration(),
+            _size=100 * 1024 * 1024)
+        context_manager = ContextManager(database)
+        state_hash = context_manager.get_first_root()
+
+        try:
+            for chain in range(opts.chains):
+                create_time = run_chain(
+                    context_manager, state_hash, opts.chain_length, opts.keys)
+                print('chain {}: {} contexts created in {:.3f}s '
+                      '({:.1f} us/context)'.format(
+                          chain,
+                          opts.chain_length,
+                          create_time,
+                          create_time / opts.chain_length * 1e6))
+        finally:
+            context_manager.stop()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,13 +13,15 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
-# pylint: disable=too-many-lines,broad-except
+# pylint: disable=too-many-lines,broad-except,protected-access
 
 import unittest
+from unittest.mock import patch
 
 from collections import namedtuple
 import hashlib
 import os
+from queue import Queue
 import shutil
 import tempfile
 import time
@@ -1380,6 +1382,71 @@ class TestContextManager(unittest.TestCase):
                          "The context manager must "
                          "calculate the correct state hash")
 
+    def test_reads_through_long_chain(self):
+        """Tests that contexts at the end of a long chain of contexts, each
+        based on the one before it, read the latest values set or deleted
+        anywhere in the chain, including after the chain forks.
+
+        Notes:
+            1. Create a chain of 200 contexts. The first sets 'a', the 100th
+               deletes 'b' (set by the 50th), and every context sets its own
+               address.
+            2. Assert that a context based on the last context in the chain
+               reads the correct values for 'a', 'b', and an early address.
+            3. Assert that a context based on a context in the middle of the
+               chain does not observe values set later in the chain.
+        """
+
+        sh0 = self.context_manager.get_first_root()
+        address_a = self._create_address('a')
+        address_b = self._create_address('b')
+
+        def chain_address(i):
+            return self._create_address('chain{}'.format(i))
+
+        context_ids = []
+        for i in range(200):
+            outputs = [chain_address(i), address_a, address_b]
+            context_id = self.context_manager.create_context(
+                state_hash=sh0,
+                base_contexts=context_ids[-1:],
+                inputs=[chain_address(i)],
+                outputs=outputs)
+            self.context_manager.set(
+                context_id, [{chain_address(i): str(i).encode()}])
+            if i == 0:
+                self.context_manager.set(context_id, [{address_a: b'a'}])
+            if i == 50:
+                self.context_manager.set(context_id, [{address_b: b'b'}])
+            if i == 100:
+                self.context_manager.delete(context_id, [address_b])
+            context_ids.append(context_id)
+
+        inputs = [address_a, address_b, chain_address(10)]
+        end_context = self.context_manager.create_context(
+            state_hash=sh0,
+            base_contexts=[context_ids[-1]],
+            inputs=inputs,
+            outputs=[])
+
+        self.assertEqual(
+            self.context_manager.get(end_context, inputs),
+            [(address_a, b'a'), (address_b, None), (chain_address(10), b'10')])
+
+        fork_context = self.context_manager.create_context(
+            state_hash=sh0,
+            base_contexts=[context_ids[75]],
+            inputs=inputs + [chain_address(150)],
+            outputs=[])
+
+        self.assertEqual(
+            self.context_manager.get(
+                fork_context, inputs + [chain_address(150)]),
+            [(address_a, b'a'),
+             (address_b, b'b'),
+             (chain_address(10), b'10'),
+             (chain_address(150), None)])
+
     def test_complex_read_write_delete(self):
         """Tests complex reads, writes, and deletes from contexts.
 
@@ -1517,3 +1584,53 @@ class TestContextManager(unittest.TestCase):
             virtual=False)
         self.assertEqual(sh2, sh2_assertion,
                          "The final state hash must be correct")
+
+
+class TestContextReader(unittest.TestCase):
+    def test_reads_coalesced_by_state_root(self):
+        """Tests that the reads requested by several contexts against the
+        same state root are fetched from the database in a single call, and
+        that each context receives exactly the addresses it requested, with
+        None for those not in state.
+        """
+        state = {
+            'root-a': {'a1': b'1', 'a2': b'2'},
+            'root-b': {'a1': b'3'},
+        }
+
+        class _MockMerkleDatabase(object):
+            calls = []
+
+            def __init__(self, database, state_hash):
+                self._state_hash = state_hash
+
+            def get_multi(self, addresses):
+                self.calls.append((self._state_hash, sorted(addresses)))
+                values = state[self._state_hash]
+                return [(a, values[a]) for a in addresses if a in values]
+
+        inflated_addresses = Queue()
+        reader = context_manager._ContextReader(
+            None, Queue(), inflated_addresses)
+
+        with patch.object(
+                context_manager, 'MerkleDatabase', _MockMerkleDatabase):
+            reader._read_requests([
+                ('context-1', 'root-a', ['a1', 'a2']),
+                ('context-2', 'root-a', ['a2', 'a3']),
+                ('context-3', 'root-b', ['a1', 'a2']),
+            ])
+
+        self.assertEqual(
+            [('root-a', ['a1', 'a2', 'a3']), ('root-b', ['a1', 'a2'])],
+            sorted(_MockMerkleDatabase.calls))
+
+        self.assertEqual(
+            ('context-1', [('a1', b'1'), ('a2', b'2')]),
+            inflated_addresses.get_nowait())
+        self.assertEqual(
+            ('context-2', [('a2', b'2'), ('a3', None)]),
+            inflated_addresses.get_nowait())
+        self.assertEqual(
+            ('context-3', [('a1', b'3'), ('a2', None)]),
+            inflated_addresses.get_nowait())
@@ -13,6 +13,7 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from concurrent.futures import Future
 from threading import RLock
 import time
 
@@ -44,6 +45,28 @@ class MockHandler2(dispatch.Handler):
             message_type=validator_pb2.Message.DEFAULT)
 
 
+class MockHandler3(dispatch.Handler):
+    def handle(self, connection_id, message_content):
+        request = validator_pb2.Message()
+        request.ParseFromString(message_content)
+        return dispatch.HandlerResult(
+            dispatch.HandlerStatus.RETURN,
+            message_out=validator_pb2.Message(
+                correlation_id=request.correlation_id,
+            ),
+            message_type=validator_pb2.Message.PING_RESPONSE)
+
+
+class MockDeferredHandler(dispatch.Handler):
+    def __init__(self):
+        self.futures = []
+
+    def handle(self, connection_id, message_content):
+        future = Future()
+        self.futures.append(future)
+        return dispatch.DeferredHandlerResult(future)
+
+
 class MockSendMessage(object):
     def __init__(self, connections):
         self.message_ids = []
@@ -13,15 +13,19 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+# pylint: disable=protected-access
+
 from concurrent.futures import ThreadPoolExecutor
 import unittest
 
 from sawtooth_validator.networking import dispatch
 from sawtooth_validator.protobuf import validator_pb2
 
+from test_dispatcher.mock import MockDeferredHandler
 from test_dispatcher.mock import MockSendMessage
 from test_dispatcher.mock import MockHandler1
 from test_dispatcher.mock import MockHandler2
+from test_dispatcher.mock import MockHandler3
 
 
 class TestDispatcherIdentityMessageMatch(unittest.TestCase):
@@ -76,3 +80,136 @@ class TestDispatcherIdentityMessageMatch(unittest.TestCase):
 
     def tearDown(self):
         self._dispatcher.stop()
+
+
+class TestDispatcherQueues(unittest.TestCase):
+    def setUp(self):
+        self._connection = "TestConnection"
+        self._connections = {"A": "0"}
+        self.mock_send_message = MockSendMessage(self._connections)
+
+    def _make_message(self, correlation_id):
+        return validator_pb2.Message(
+            content=validator_pb2.Message(
+                correlation_id=correlation_id).SerializeToString(),
+            correlation_id=correlation_id,
+            message_type=validator_pb2.Message.DEFAULT)
+
+    def test_weighted_round_robin(self):
+        """Tests that when messages of every priority are waiting, each
+        priority is served in proportion to its weight, and in the order
+        its messages were queued.
+        """
+        queue = dispatch._DispatchQueue()
+        for i in range(8):
+            for priority in dispatch.Priority:
+                queue.put(priority, priority, (priority, i))
+
+        served = [queue.get()[1] for _ in range(14)]
+
+        self.assertEqual(
+            [(dispatch.Priority.HIGH, 0),
+             (dispatch.Priority.HIGH, 1),
+             (dispatch.Priority.HIGH, 2),
+             (dispatch.Priority.HIGH, 3),
+             (dispatch.Priority.MEDIUM, 0),
+             (dispatch.Priority.MEDIUM, 1),
+             (dispatch.Priority.LOW, 0),
+             (dispatch.Priority.HIGH, 4),
+             (dispatch.Priority.HIGH, 5),
+             (dispatch.Priority.HIGH, 6),
+             (dispatch.Priority.HIGH, 7),
+             (dispatch.Priority.MEDIUM, 2),
+             (dispatch.Priority.MEDIUM, 3),
+             (dispatch.Priority.LOW, 1)],
+            served)
+        self.assertEqual(4, queue.depth(dispatch.Priority.MEDIUM))
+        self.assertEqual(6, queue.depth(dispatch.Priority.LOW))
+
+    def test_in_flight_limit(self):
+        """Tests that a priority at its in-flight limit is skipped until one
+        of its items is marked done, without holding up other priorities.
+        """
+        queue = dispatch._DispatchQueue(
+            max_in_flight={dispatch.Priority.LOW: 1})
+        queue.put(dispatch.Priority.LOW, 'low', 'low-0')
+        queue.put(dispatch.Priority.LOW, 'low', 'low-1')
+        queue.put(dispatch.Priority.HIGH, 'high', 'high-0')
+
+        self.assertEqual(('high', 'high-0'), queue.get())
+        self.assertEqual(('low', 'low-0'), queue.get())
+
+        queue.put(dispatch.Priority.HIGH, 'high', 'high-1')
+        self.assertEqual(('high', 'high-1'), queue.get())
+
+        queue.task_done(dispatch.Priority.LOW)
+        self.assertEqual(('low', 'low-1'), queue.get())
+
+    def test_full_queue_policies(self):
+        """Tests that messages arriving at a full queue are dropped by
+        default, or answered with the rejection for their type.
+        """
+        dispatcher = dispatch.Dispatcher(
+            max_queue_size={dispatch.Priority.LOW: 1})
+        dispatcher.add_send_message(
+            self._connection, self.mock_send_message.send_message)
+        dispatcher.add_handler(
+            validator_pb2.Message.DEFAULT,
+            MockHandler3(),
+            ThreadPoolExecutor())
+
+        dispatcher.dispatch(self._connection, self._make_message('0'), 'A')
+        dispatcher.dispatch(self._connection, self._make_message('1'), 'A')
+        self.assertEqual([], self.mock_send_message.message_ids)
+
+        dispatcher.set_message_queue_policy(
+            validator_pb2.Message.DEFAULT,
+            dispatch.QueuePolicy.REJECT,
+            reject_result=dispatch.HandlerResult(
+                status=dispatch.HandlerStatus.RETURN,
+                message_out=validator_pb2.Message(correlation_id='full'),
+                message_type=validator_pb2.Message.PING_RESPONSE))
+
+        dispatcher.dispatch(self._connection, self._make_message('2'), 'A')
+        self.assertEqual(['full'], self.mock_send_message.message_ids)
+
+        dispatcher.start()
+        dispatcher.block_until_complete()
+        dispatcher.stop()
+
+        self.assertEqual(['full', '0'], self.mock_send_message.message_ids)
+
+    def test_deferred_results(self):
+        """Tests that a message whose handler defers its result is released
+        at once, and its reply is sent once the result is ready.
+        """
+        dispatcher = dispatch.Dispatcher(
+            max_in_flight={dispatch.Priority.LOW: 1})
+        dispatcher.add_send_message(
+            self._connection, self.mock_send_message.send_message)
+        handler = MockDeferredHandler()
+        dispatcher.add_handler(
+            validator_pb2.Message.DEFAULT,
+            handler,
+            ThreadPoolExecutor())
+
+        dispatcher.start()
+        dispatcher.dispatch(self._connection, self._make_message('0'), 'A')
+        dispatcher.dispatch(self._connection, self._make_message('1'), 'A')
+        dispatcher.block_until_complete()
+
+        # Both messages were handled despite the in-flight limit
+        self.assertEqual(2, len(handler.futures))
+        self.assertEqual([], self.mock_send_message.message_ids)
+
+        for future, correlation_id in zip(reversed(handler.futures),
+                                          ['reply-1', 'reply-0']):
+            future.set_result(dispatch.HandlerResult(
+                status=dispatch.HandlerStatus.RETURN,
+                message_out=validator_pb2.Message(
+                    correlation_id=correlation_id),
+                message_type=validator_pb2.Message.PING_RESPONSE))
+        dispatcher.stop()
+
+        self.assertEqual(['reply-1', 'reply-0'],
+                         self.mock_send_message.message_ids)
@@ -15,8 +15,11 @@
 
 # pylint: disable=protected-access
 
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
 import unittest
 from unittest.mock import Mock
+from unittest.mock import patch
 from uuid import uuid4
 
 from sawtooth_validator.database.dict_database import DictDatabase
@@ -26,6 +29,7 @@ from sawtooth_validator.journal.event_extractors \
     import BlockEventExtractor
 from sawtooth_validator.journal.receipt_store import TransactionReceiptStore
 from sawtooth_validator.networking.dispatch import HandlerStatus
+from sawtooth_validator.networking.future import Future
 
 from sawtooth_validator.server.events.broadcaster import EventBroadcaster
 from sawtooth_validator.server.events.handlers \
@@ -39,6 +43,7 @@ from sawtooth_validator.server.events.handlers \
 
 from sawtooth_validator.server.events.subscription import EventSubscription
 from sawtooth_validator.server.events.subscription import EventFilterFactory
+from sawtooth_validator.server.events.subscription import SubscriptionIndex
 
 from sawtooth_validator.execution.tp_state_handlers import TpEventAddHandler
 
@@ -330,6 +335,59 @@ class ClientEventsGetRequestHandlerTest(unittest.TestCase):
             self.assertTrue(len(handler_output.message_out.events) > 0)
 
 
+class SubscriptionIndexTest(unittest.TestCase):
+    def test_match(self):
+        """Test that each group of listening subscribers with identical
+        subscriptions receives the events passing all the filters of any of
+        their subscriptions, in order.
+        """
+        def state_delta(*addresses):
+            return EventSubscription(
+                event_type="sawtooth/state-delta",
+                filters=[
+                    FILTER_FACTORY.create(
+                        key="address",
+                        match_string=address,
+                        filter_type=events_pb2.EventFilter.REGEX_ANY)
+                    for address in addresses
+                ])
+
+        index = SubscriptionIndex(
+            {
+                "prefix": [state_delta("^1cf126")],
+                "prefix_copy": [state_delta("^1cf126")],
+                "regex": [state_delta("^1cf1", "6$"), state_delta("ff$")],
+                "block_commit": [create_block_commit_subscription()],
+                "not_listening": [state_delta("^1cf126")],
+            },
+            {"prefix", "prefix_copy", "regex", "block_commit"})
+
+        def event(event_type, *addresses):
+            return events_pb2.Event(
+                event_type=event_type,
+                attributes=[
+                    events_pb2.Event.Attribute(key="address", value=address)
+                    for address in addresses
+                ])
+
+        events = [
+            event("sawtooth/state-delta", "1cf126aa", "5b7349ff"),
+            event("sawtooth/state-delta", "1cf1aa"),
+            event("sawtooth/block-commit"),
+            event("sawtooth/state-delta", "1cf1a6"),
+        ]
+
+        self.assertEqual(
+            sorted([
+                (["prefix", "prefix_copy"], [events[0]]),
+                (["regex"], [events[0], events[3]]),
+                (["block_commit"], [events[2]]),
+            ]),
+            sorted(
+                (sorted(connection_ids), matched)
+                for connection_ids, matched in index.match(events)))
+
+
 class EventBroadcasterTest(unittest.TestCase):
     def test_add_remove_subscriber(self):
         """Test adding and removing a subscriber."""
@@ -393,6 +451,70 @@ class EventBroadcasterTest(unittest.TestCase):
             validator_pb2.Message.CLIENT_EVENTS,
             event_list, connection_id="test_conn_id", one_way=True)
 
+    def test_catchup_subscriber(self):
+        """Test that a subscriber is caught up with the events of each block
+        after its last known block, in order, and that the events of
+        consecutive blocks are combined up to the EventList size limit.
+        """
+        block_store = BlockStore(DictDatabase(
+            indexes=BlockStore.create_index_configuration()))
+        chain = []
+        previous_block_id = "0000000000000000"
+        for block_num in range(5):
+            block = create_block(
+                block_num=block_num,
+                previous_block_id=previous_block_id,
+                block_id="abcd{}".format(block_num))
+            previous_block_id = block.identifier
+            chain.insert(0, block)
+        block_store.update_chain(chain)
+
+        subscriptions = [create_block_commit_subscription()]
+        expected_events = [
+            BlockEventExtractor(block).extract(subscriptions)
+            for block in reversed(chain[:3])
+        ]
+
+        mock_service = Mock()
+        event_broadcaster = EventBroadcaster(
+            mock_service,
+            block_store,
+            TransactionReceiptStore(DictDatabase()),
+            catchup_thread_pool=ThreadPoolExecutor(max_workers=2))
+        event_broadcaster.add_subscriber(
+            "test_conn_id", subscriptions, "abcd1")
+
+        event_broadcaster.catchup_subscriber("test_conn_id")
+        mock_service.send.assert_called_once_with(
+            validator_pb2.Message.CLIENT_EVENTS,
+            events_pb2.EventList(
+                events=[event for events in expected_events
+                        for event in events]).SerializeToString(),
+            connection_id="test_conn_id",
+            one_way=True)
+
+        mock_service.reset_mock()
+        with patch('sawtooth_validator.server.events.broadcaster.'
+                   'CATCHUP_EVENT_LIST_MAX_SIZE', 1):
+            event_broadcaster.catchup_subscriber("test_conn_id")
+        self.assertEqual(
+            [events_pb2.EventList(events=events).SerializeToString()
+             for events in expected_events],
+            [call[0][1] for call in mock_service.send.call_args_list])
+
+        # An event list is not sent until the previous one has been, and
+        # catching up stops if that takes too long
+        unsent = Future('correlation_id')
+        unsent.set_send_future(concurrent.futures.Future())
+        mock_service.reset_mock()
+        mock_service.send.return_value = unsent
+        with patch('sawtooth_validator.server.events.broadcaster.'
+                   'CATCHUP_EVENT_LIST_MAX_SIZE', 1), \
+                patch('sawtooth_validator.server.events.broadcaster.'
+                      'CATCHUP_SEND_TIMEOUT', 0):
+            event_broadcaster.catchup_subscriber("test_conn_id")
+        self.assertEqual(1, mock_service.send.call_count)
+
 
 class TpEventAddHandlerTest(unittest.TestCase):
     def test_add_event(self):
@@ -0,0 +1,105 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+import json
+import unittest
+
+from sawtooth_validator.execution.executor import TP_SETTINGS_KEY
+from sawtooth_validator.execution.executor import \
+    TransactionFamilyPolicyCache
+from sawtooth_validator.execution.processor_manager import ProcessorType
+
+
+class MockSettingsViewFactory(object):
+    def __init__(self):
+        self.settings = {}
+        self.created = []
+
+    def create_settings_view(self, state_root_hash):
+        self.created.append(state_root_hash)
+        return MockSettingsView(self.settings.get(state_root_hash, {}))
+
+
+class MockSettingsView(object):
+    def __init__(self, settings):
+        self._settings = settings
+
+    def get_setting(self, key, default_value=None):
+        return self._settings.get(key, default_value)
+
+
+class TestTransactionFamilyPolicyCache(unittest.TestCase):
+    def setUp(self):
+        self._factory = MockSettingsViewFactory()
+        self._intkey = ProcessorType('intkey', '1.0')
+        self._xo = ProcessorType('xo', '1.0')
+
+    def _set_families(self, state_root, families):
+        self._factory.settings[state_root] = {
+            TP_SETTINGS_KEY: json.dumps(families)
+        }
+
+    def test_policy_read_once_per_state_root(self):
+        """Tests that the setting is read and parsed only once for each
+        state root, and that the least recently used root is evicted once
+        the cache is full.
+        """
+        self._set_families('root1', [{'family': 'intkey', 'version': '1.0'}])
+        cache = TransactionFamilyPolicyCache(self._factory, size=2)
+
+        for _ in range(3):
+            policy = cache.get_policy('root1')
+            self.assertTrue(policy.is_allowed(self._intkey))
+            self.assertFalse(policy.is_allowed(self._xo))
+        self.assertEqual(['root1'], self._factory.created)
+
+        # No families are required at root2
+        self.assertTrue(cache.get_policy('root2').is_allowed(self._xo))
+        self.assertFalse(cache.get_policy('root2').is_required(self._xo))
+        cache.get_policy('root1')
+        cache.get_policy('root3')
+        self.assertEqual(2, len(cache))
+
+        cache.get_policy('root2')
+        self.assertEqual(
+            ['root1', 'root2', 'root3', 'root2'], self._factory.created)
+
+    def test_namespace_prefixes(self):
+        """Tests that the outputs not matching any namespace listed for a
+        family are returned as bad prefixes, and that a family without
+        namespaces may write anywhere.
+        """
+        self._set_families('root', [
+            {'family': 'intkey', 'version': '1.0', 'namespaces': ['1cf1']},
+            {'family': 'xo', 'version': '1.0'},
+        ])
+        policy = TransactionFamilyPolicyCache(self._factory).get_policy(
+            'root')
+
+        self.assertEqual(
+            ['5b7349'],
+            policy.bad_prefixes(self._intkey, ['1cf126', '5b7349']))
+        self.assertEqual(
+            [], policy.bad_prefixes(self._xo, ['1cf126', '5b7349']))
+
+    def test_misconfigured_families(self):
+        """Tests that a setting which is not valid json is treated as if
+        no families were required.
+        """
+        self._factory.settings['root'] = {TP_SETTINGS_KEY: 'not json'}
+        policy = TransactionFamilyPolicyCache(self._factory).get_policy(
+            'root')
+
+        self.assertTrue(policy.is_allowed(self._intkey))
+        self.assertFalse(policy.is_required(self._intkey))
@@ -1522,6 +1522,33 @@ class TestTimedCache(unittest.TestCase):
         self.assertTrue("test" in bc)
         self.assertTrue("test2" in bc)
 
+    def test_evict_least_recently_used(self):
+        """ Test that the least recently accessed values are evicted once
+        the cache holds more than its maximum number of entries or size.
+        """
+        bc = TimedCache(max_entries=2)
+
+        bc["test"] = "value"
+        bc["test2"] = "value2"
+        bc["test"]  # access to make test2 the least recently used
+        bc["test3"] = "value3"
+        self.assertEqual(len(bc), 2)
+        self.assertTrue("test" in bc)
+        self.assertFalse("test2" in bc)
+        self.assertTrue("test3" in bc)
+
+        bc = TimedCache(max_size=10, sizeof=len)
+
+        bc["test"] = "value"
+        self.assertEqual(bc.size, 5)
+        bc["test2"] = "value2"
+        self.assertEqual(bc.size, 6)
+        self.assertEqual(len(bc), 1)
+        self.assertTrue("test2" in bc)
+
+        del bc["test2"]
+        self.assertEqual(bc.size, 0)
+
 
 class TestChainCommitState(unittest.TestCase):
     """Test for:
@@ -144,6 +144,22 @@ class TestSawtoothMerkleTrie(unittest.TestCase):
             with self.assertRaises(KeyError):
                 self.get(address, ishash=True)
 
+    def test_merkle_trie_get_multi(self):
+        new_root = self.update({
+            "010101": {"my_data": 1},
+            "010202": {"my_data": 2},
+            "020303": {"my_data": 3}
+        }, [], virtual=False)
+
+        self.set_merkle_root(new_root)
+
+        self.assertEqual(
+            [("020303", {"my_data": 3}),
+             ("010101", {"my_data": 1})],
+            self.trie.get_multi(["020303", "010102", "010101", "0101"]))
+
+        self.assertEqual([], self.trie.get_multi([]))
+
     def test_merkle_trie_leaf_iteration(self):
         new_root = self.update({
             "010101": {"my_data": 1},
@@ -169,6 +185,19 @@ class TestSawtoothMerkleTrie(unittest.TestCase):
         self.assertEqual([("010202", {"my_data": 2})],
                          [entry for entry in self.trie.leaves('0102')])
 
+        # Test iteration from a start address
+        self.assertEqual(
+            [("010202", {"my_data": 2}),
+             ("010303", {"my_data": 3})],
+            [entry for entry in self.trie.leaves(start='010202')])
+
+        # Test reverse iteration from a start address
+        self.assertEqual(
+            [("010202", {"my_data": 2}),
+             ("010101", {"my_data": 1})],
+            [entry for entry in self.trie.leaves(
+                start='010202', reverse=True)])
+
     # assertions
     def assert_value_at_address(self, address, value, ishash=False):
         self.assertEqual(
@@ -16,6 +16,7 @@ import unittest
 import hashlib
 import random
 import string
+from unittest.mock import patch
 
 import cbor
 
@@ -228,3 +229,111 @@ class TestMessageValidation(unittest.TestCase):
         block = block_list[0]
         valid = verifier.is_valid_block(block)
         self.assertFalse(valid)
+
+    def test_engine_verify_batches(self):
+        """Tests that the signature verification engine validates whole
+        batch lists, both on the calling thread and across its process pool.
+        """
+        serial_engine = verifier.SignatureVerificationEngine(
+            parallel_threshold=1000)
+        parallel_engine = verifier.SignatureVerificationEngine(
+            max_workers=2, parallel_threshold=1)
+
+        try:
+            for engine in (serial_engine, parallel_engine):
+                batch_list = self._create_batches(5, 2)
+                self.assertTrue(engine.verify_batches(batch_list))
+
+                batch_list.extend(
+                    self._create_batches(1, 1, valid_batch=False))
+                self.assertFalse(engine.verify_batches(batch_list))
+
+                batch_list = self._create_batches(5, 2)
+                batch_list.extend(
+                    self._create_batches(1, 1, valid_batcher=False))
+                self.assertFalse(engine.verify_batches(batch_list))
+        finally:
+            parallel_engine.stop()
+
+    def test_engine_verify_block(self):
+        """Tests that the signature verification engine validates a block and
+        the batches sent with it.
+        """
+        engine = verifier.SignatureVerificationEngine(
+            max_workers=2, parallel_threshold=1)
+
+        try:
+            block = self._create_blocks(1, 3)[0]
+            self.assertTrue(engine.verify_block(block))
+
+            block = self._create_blocks(1, 3, valid_batch=False)[0]
+            self.assertFalse(engine.verify_block(block))
+
+            block = self._create_blocks(1, 3, valid_block=False)[0]
+            self.assertFalse(engine.verify_block(block))
+        finally:
+            engine.stop()
+
+    def test_engine_looks_up_signatures_once(self):
+        """Tests that the parallel path of the signature verification engine
+        looks up each signature in the verified signature cache only once.
+        """
+        engine = verifier.SignatureVerificationEngine(
+            max_workers=2, parallel_threshold=1)
+
+        try:
+            verifier.VERIFIED_SIGNATURES.clear()
+            batch_list = self._create_batches(4, 2)
+            for batch in batch_list[:2]:
+                verifier.VERIFIED_SIGNATURES.add_batch(batch)
+
+            with patch.object(
+                    verifier.VERIFIED_SIGNATURES, 'is_verified',
+                    wraps=verifier.VERIFIED_SIGNATURES.is_verified) \
+                    as is_verified:
+                self.assertTrue(engine.verify_batches(batch_list))
+
+            looked_up = [call[0][0] for call in is_verified.call_args_list]
+            self.assertEqual(len(set(looked_up)), len(looked_up))
+        finally:
+            engine.stop()
+
+    def test_verified_signature_cache(self):
+        """Tests that the verified signature cache only reports a signature
+        as verified for the header it was recorded with, and that it evicts
+        the least recently used signature when full.
+        """
+        cache = verifier.VerifiedSignatureCache(size=2)
+
+        cache.add('sig_a', b'header_a')
+        cache.add('sig_b', b'header_b')
+        self.assertTrue(cache.is_verified('sig_a', b'header_a'))
+        self.assertFalse(cache.is_verified('sig_a', b'header_b'))
+
+        # sig_b is now the least recently used entry
+        cache.add('sig_c', b'header_c')
+        self.assertEqual(2, len(cache))
+        self.assertFalse(cache.is_verified('sig_b', b'header_b'))
+        self.assertTrue(cache.is_verified('sig_a', b'header_a'))
+        self.assertTrue(cache.is_verified('sig_c', b'header_c'))
+
+    def test_verified_batch_signatures_are_cached(self):
+        """Tests that verifying a batch records its signatures, so that the
+        same batch received in a block is not verified again.
+        """
+        verifier.VERIFIED_SIGNATURES.clear()
+
+        batch = self._create_batches(1, 2)[0]
+        self.assertFalse(verifier.VERIFIED_SIGNATURES.is_verified(
+            batch.header_signature, batch.header))
+
+        self.assertTrue(verifier.is_valid_batch(batch))
+        self.assertTrue(verifier.VERIFIED_SIGNATURES.is_verified(
+            batch.header_signature, batch.header))
+        for txn in batch.transactions:
+            self.assertTrue(verifier.VERIFIED_SIGNATURES.is_verified(
+                txn.header_signature, txn.header))
+
+        # A cached transaction signature does not hide a tampered payload
+        batch.transactions[0].payload = b'tampered'
+        self.assertFalse(verifier.is_valid_batch(batch))
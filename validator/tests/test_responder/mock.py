@@ -55,6 +55,13 @@ class MockCompleter():
     def get_block(self, block_id):
         return self.store.get(block_id)
 
+    def get_block_by_num(self, block_num):
+        for value in self.store.values():
+            if isinstance(value, BlockWrapper) and \
+                    value.block_num == block_num:
+                return value
+        return None
+
     def get_batch(self, batch_id):
         return self.store.get(batch_id)
 
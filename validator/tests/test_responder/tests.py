@@ -23,6 +23,7 @@ from sawtooth_validator.protobuf import batch_pb2
 from sawtooth_validator.protobuf import transaction_pb2
 from sawtooth_validator.journal.responder import Responder
 from sawtooth_validator.journal.responder import BlockResponderHandler
+from sawtooth_validator.journal.responder import BlockRangeResponderHandler
 from sawtooth_validator.journal.responder import BatchByBatchIdResponderHandler
 from sawtooth_validator.journal.responder import \
     BatchByTransactionIdResponderHandler
@@ -41,6 +42,8 @@ class TestResponder(unittest.TestCase):
             BlockResponderHandler(self.responder, self.gossip)
         self.block_response_handler = \
             ResponderBlockResponseHandler(self.responder, self.gossip)
+        self.block_range_request_handler = \
+            BlockRangeResponderHandler(self.responder, self.gossip)
         self.batch_request_handler = \
             BatchByBatchIdResponderHandler(self.responder, self.gossip)
         self.batch_response_handler = \
@@ -152,6 +155,85 @@ class TestResponder(unittest.TestCase):
             requested_id="ABC", connection_id="Connection_2")
         self.assert_message_not_sent(connection_id="Connection_2")
 
+    def test_block_responder_handler_chain(self):
+        """
+        Test that the BlockResponderHandler responds to a chain request with
+        the requested range of the chain ending at the requested block,
+        newest first, stopping at the first block it does not have.
+        """
+        previous_block_id = "0000000000000000"
+        for block_id in ("A", "B", "C", "D", "E"):
+            header = block_pb2.BlockHeader(previous_block_id=previous_block_id)
+            self.completer.add_block(block_pb2.Block(
+                header_signature=block_id,
+                header=header.SerializeToString()))
+            previous_block_id = block_id
+
+        message = network_pb2.GossipBlockRequest(
+            block_id="E",
+            nonce="1",
+            time_to_live=1,
+            chain_length=2,
+            chain_offset=1)
+
+        self.block_request_handler.handle(
+            "Connection_1", message.SerializeToString())
+
+        self.assertEqual(["D", "C"], self.sent_block_ids("Connection_1"))
+
+        message = network_pb2.GossipBlockRequest(
+            block_id="E",
+            nonce="2",
+            time_to_live=1,
+            chain_length=4,
+            chain_offset=3)
+
+        self.block_request_handler.handle(
+            "Connection_2", message.SerializeToString())
+
+        self.assertEqual(["B", "A"], self.sent_block_ids("Connection_2"))
+
+    def test_block_range_responder_handler(self):
+        """
+        Test that the BlockRangeResponderHandler responds with the blocks of
+        the requested range which are on the chain, in order of block
+        number, and with an empty response when it has none of them.
+        """
+        for block_num in range(3):
+            header = block_pb2.BlockHeader(block_num=block_num)
+            self.completer.add_block(block_pb2.Block(
+                header_signature="block{}".format(block_num),
+                header=header.SerializeToString()))
+
+        message = network_pb2.GossipBlockRangeRequest(
+            start_block_num=1, count=5)
+        self.block_range_request_handler.handle(
+            "Connection_1", message.SerializeToString())
+
+        message = network_pb2.GossipBlockRangeRequest(
+            start_block_num=3, count=5)
+        self.block_range_request_handler.handle(
+            "Connection_2", message.SerializeToString())
+
+        expected = [
+            ("Connection_1", 1, ["block1", "block2"]),
+            ("Connection_2", 3, []),
+        ]
+        for connection_id, start_block_num, block_ids in expected:
+            (message_type, message_data), = self.gossip.sent[connection_id]
+            self.assertEqual(
+                validator_pb2.Message.GOSSIP_BLOCK_RANGE_RESPONSE,
+                message_type)
+            response = network_pb2.GossipBlockRangeResponse()
+            response.ParseFromString(message_data)
+            self.assertEqual(start_block_num, response.start_block_num)
+            sent_block_ids = []
+            for content in response.blocks:
+                block = block_pb2.Block()
+                block.ParseFromString(content)
+                sent_block_ids.append(block.header_signature)
+            self.assertEqual(block_ids, sent_block_ids)
+
     def test_responder_block_response_handler(self):
         """
         Test that the ResponderBlockResponseHandler, after receiving a Block
@@ -554,6 +636,18 @@ class TestResponder(unittest.TestCase):
         self.assertTrue(
             self.gossip.sent.get(connection_id)[0][0] == message_type)
 
+    def sent_block_ids(self, connection_id):
+        block_ids = []
+        for message_type, message_data in self.gossip.sent[connection_id]:
+            self.assertEqual(
+                validator_pb2.Message.GOSSIP_BLOCK_RESPONSE, message_type)
+            block_response = network_pb2.GossipBlockResponse()
+            block_response.ParseFromString(message_data)
+            block = block_pb2.Block()
+            block.ParseFromString(block_response.content)
+            block_ids.append(block.header_signature)
+        return block_ids
+
     def assert_request_pending(self, requested_id, connection_id):
         self.assertIn(connection_id, self.responder.get_request(requested_id))
 
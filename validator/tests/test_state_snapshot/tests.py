@@ -0,0 +1,328 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+# pylint: disable=protected-access
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from sawtooth_signing import create_context
+from sawtooth_signing import CryptoFactory
+from sawtooth_validator.database.native_lmdb import NativeLmdbDatabase
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.protobuf.network_pb2 import GossipBlockRangeResponse
+from sawtooth_validator.protobuf.network_pb2 import StateSnapshotManifest
+from sawtooth_validator.protobuf.setting_pb2 import Setting
+from sawtooth_validator.state.merkle import MerkleDatabase
+from sawtooth_validator.state.settings_view import SettingsView
+from sawtooth_validator.state.snapshot import SnapshotError
+from sawtooth_validator.state.snapshot import StateSnapshotImporter
+from sawtooth_validator.state.snapshot import StateSnapshotStore
+from sawtooth_validator.state.snapshot import read_chunk
+from sawtooth_validator.state.snapshot import verify_block_publisher
+from sawtooth_validator.state.snapshot_bootstrap import \
+    StateSnapshotBootstrap
+
+
+def _address(i):
+    return '{:070x}'.format(i)
+
+
+class MockGossip:
+    """Answers manifest and block range requests straight away, with the
+    manifest each peer offers and the block on each peer's chain.
+    """
+
+    def __init__(self, manifests, chains):
+        self.manifests = manifests
+        self.chains = chains
+        self.snapshot_bootstrap = None
+
+    def get_peers(self):
+        return {peer: peer for peer in self.chains}
+
+    def send_state_snapshot_manifest_request(self, connection_id):
+        if connection_id in self.manifests:
+            self.snapshot_bootstrap.add_manifest(
+                connection_id, self.manifests[connection_id])
+
+    def send_block_range_request(self, start_block_num, count,
+                                 connection_id):
+        blocks = self.chains[connection_id][start_block_num:][:count]
+        self.snapshot_bootstrap.add_block_range(
+            connection_id, GossipBlockRangeResponse(
+                start_block_num=start_block_num,
+                blocks=[block.SerializeToString() for block in blocks]))
+
+
+class StateSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store = StateSnapshotStore(
+            os.path.join(self.dir, 'snapshots'), keep=2)
+
+        self.source_db = self._create_database('source.lmdb')
+        merkle_db = MerkleDatabase(self.source_db)
+        self.state = {_address(i): 'value {}'.format(i).encode()
+                      for i in range(25)}
+        self.state_root_hash = merkle_db.update(self.state, virtual=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _create_database(self, name):
+        return NativeLmdbDatabase(
+            os.path.join(self.dir, name),
+            indexes=MerkleDatabase.create_index_configuration(),
+            _size=10 * 1024 * 1024)
+
+    def _create_block(self, block_num, state_root_hash):
+        header = BlockHeader(
+            block_num=block_num,
+            state_root_hash=state_root_hash)
+        return BlockWrapper(Block(
+            header=header.SerializeToString(),
+            header_signature='{:0128x}'.format(block_num)))
+
+    def test_export_and_import(self):
+        """Test that importing the chunks of an exported snapshot into an
+        empty state database produces the snapshot's state root and state.
+        """
+        block = self._create_block(10, self.state_root_hash)
+        self.store.export(self.source_db, block, chunk_size=10)
+
+        manifest = self.store.get_manifest()
+        self.assertEqual(block.get_block().SerializeToString(),
+                         manifest.block)
+        self.assertEqual(3, len(manifest.chunk_hashes))
+
+        target_db = self._create_database('target.lmdb')
+        importer = StateSnapshotImporter(target_db)
+        for chunk_index in range(len(manifest.chunk_hashes)):
+            content = self.store.get_chunk(self.state_root_hash, chunk_index)
+            importer.add_chunk(read_chunk(manifest, chunk_index, content))
+
+        self.assertEqual(self.state_root_hash, importer.state_root_hash)
+        self.assertEqual(
+            self.state,
+            dict(MerkleDatabase(target_db, self.state_root_hash).leaves()))
+
+    def test_invalid_chunk(self):
+        """Test that a chunk which does not match its hash in the manifest,
+        or is not in the manifest, is rejected.
+        """
+        block = self._create_block(10, self.state_root_hash)
+        manifest = self.store.export(self.source_db, block, chunk_size=10)
+
+        content = self.store.get_chunk(self.state_root_hash, 0)
+        with self.assertRaises(SnapshotError):
+            read_chunk(manifest, 0, content[:-1] + b'x')
+        with self.assertRaises(SnapshotError):
+            read_chunk(manifest, 1, content)
+        with self.assertRaises(SnapshotError):
+            read_chunk(manifest, 3, content)
+
+    def test_verify_block_publisher(self):
+        """Test that the block of a snapshot must be signed by one of the
+        valid block publishers in the snapshot's state, if any are set.
+        """
+        block = self._create_block(10, self.state_root_hash)
+        verify_block_publisher(self.source_db, block.header)
+
+        key = 'sawtooth.consensus.valid_block_publishers'
+        setting = Setting(entries=[Setting.Entry(key=key, value='a,b')])
+        state_root_hash = MerkleDatabase(
+            self.source_db, self.state_root_hash).update(
+                {SettingsView.setting_address(key):
+                 setting.SerializeToString()},
+                virtual=False)
+
+        header = BlockHeader(
+            block_num=10,
+            state_root_hash=state_root_hash,
+            signer_public_key='b')
+        verify_block_publisher(self.source_db, header)
+
+        header.signer_public_key = 'c'
+        with self.assertRaises(SnapshotError):
+            verify_block_publisher(self.source_db, header)
+
+    def test_keep_newest_snapshots(self):
+        """Test that only the newest snapshots are kept, and the manifest
+        served is the newest one.
+        """
+        merkle_db = MerkleDatabase(self.source_db, self.state_root_hash)
+        state_root_hashes = []
+        for block_num in range(1, 4):
+            state_root_hash = merkle_db.update(
+                {_address(100): str(block_num).encode()}, virtual=False)
+            self.store.export(
+                self.source_db,
+                self._create_block(block_num, state_root_hash))
+            state_root_hashes.append(state_root_hash)
+
+        manifest = self.store.get_manifest()
+        block = Block()
+        block.ParseFromString(manifest.block)
+        self.assertEqual('{:0128x}'.format(3), block.header_signature)
+
+        self.assertIsNone(self.store.get_chunk(state_root_hashes[0], 0))
+        self.assertIsNotNone(self.store.get_chunk(state_root_hashes[-1], 0))
+
+
+class StateSnapshotBootstrapTest(unittest.TestCase):
+    def setUp(self):
+        context = create_context('secp256k1')
+        private_key = context.new_random_private_key()
+        self.signer = CryptoFactory(context).new_signer(private_key)
+
+        self.chain = self._create_chain(self.signer, 12)
+        other_signer = CryptoFactory(context).new_signer(
+            context.new_random_private_key())
+        self.fork = self.chain[:8] + self._create_chain(
+            other_signer, 4, self.chain[7])
+
+    def _create_chain(self, signer, length, parent=None):
+        chain = []
+        previous_block = parent
+        for _ in range(length):
+            header = BlockHeader(
+                block_num=(0 if previous_block is None
+                           else _block_num(previous_block) + 1),
+                previous_block_id=(
+                    '0' * 16 if previous_block is None
+                    else previous_block.header_signature),
+                state_root_hash='{:064x}'.format(len(chain)),
+                signer_public_key=signer.get_public_key().as_hex())
+            header_bytes = header.SerializeToString()
+            block = Block(
+                header=header_bytes,
+                header_signature=signer.sign(header_bytes))
+            chain.append(block)
+            previous_block = block
+        return chain
+
+    def _choose(self, manifests, chains, trusted_block_id=None):
+        gossip = MockGossip(manifests, chains)
+        bootstrap = StateSnapshotBootstrap(
+            gossip, None, None,
+            trusted_block_id=trusted_block_id,
+            manifest_wait_time=0)
+        gossip.snapshot_bootstrap = bootstrap
+        block, _, _, sources = bootstrap._choose_snapshot(
+            sorted(chains))
+        return block, sources
+
+    def test_choose_snapshot_on_peers_chain(self):
+        """Test that the newest snapshot whose block most peers have on
+        their chain is chosen, and that a newer snapshot offered by a peer
+        on another fork is not.
+        """
+        manifests = {
+            'peer_a': _manifest(self.chain[8]),
+            'peer_b': _manifest(self.chain[4]),
+            'peer_c': _manifest(self.fork[10]),
+        }
+        chains = {
+            'peer_a': self.chain,
+            'peer_b': self.chain,
+            'peer_c': self.fork,
+        }
+        block, sources = self._choose(manifests, chains)
+        self.assertEqual(self.chain[8], block)
+        self.assertEqual(['peer_a'], sources)
+
+        # A peer which is behind does not have the block on its chain, so
+        # only one peer does
+        chains['peer_b'] = self.chain[:6]
+        block, _ = self._choose(manifests, chains)
+        self.assertEqual(self.chain[4], block)
+
+        # A single peer is not enough, however many peers there are
+        block, _ = self._choose(
+            {'peer_a': _manifest(self.chain[8])}, {'peer_a': self.chain})
+        self.assertIsNone(block)
+
+    def test_choose_trusted_snapshot(self):
+        """Test that only the snapshot at the trusted block is chosen, even
+        if no other peer has it on its chain.
+        """
+        manifests = {
+            'peer_a': _manifest(self.chain[8]),
+            'peer_b': _manifest(self.fork[10]),
+        }
+        chains = {'peer_a': self.chain, 'peer_b': self.fork}
+
+        block, sources = self._choose(
+            manifests, chains,
+            trusted_block_id=self.fork[10].header_signature)
+        self.assertEqual(self.fork[10], block)
+        self.assertEqual(['peer_b'], sources)
+
+        block, _ = self._choose(
+            manifests, chains,
+            trusted_block_id=self.chain[4].header_signature)
+        self.assertIsNone(block)
+
+    def test_count_only_requested_block_ranges(self):
+        """Test that block ranges which were not requested, or which answer
+        a request more than once, do not count toward the peers which have
+        a block on their chain.
+        """
+        manifests = {
+            'peer_a': _manifest(self.chain[8]),
+            'peer_b': _manifest(self.fork[10]),
+        }
+        chains = {'peer_a': self.chain, 'peer_b': self.fork}
+        gossip = MockGossip(manifests, chains)
+        bootstrap = StateSnapshotBootstrap(
+            gossip, None, None, manifest_wait_time=0)
+        gossip.snapshot_bootstrap = bootstrap
+
+        send_block_range_request = gossip.send_block_range_request
+
+        def send_and_repeat(start_block_num, count, connection_id):
+            send_block_range_request(start_block_num, count, connection_id)
+            send_block_range_request(start_block_num, count, connection_id)
+            # A connection which was never asked, and a block at a number
+            # which was not requested
+            bootstrap.add_block_range(
+                'peer_x', GossipBlockRangeResponse(
+                    start_block_num=start_block_num,
+                    blocks=[self.fork[10].SerializeToString()]))
+            bootstrap.add_block_range(
+                'peer_b', GossipBlockRangeResponse(
+                    start_block_num=start_block_num,
+                    blocks=[self.fork[10].SerializeToString()]))
+
+        gossip.send_block_range_request = send_and_repeat
+        block, _, _, _ = bootstrap._choose_snapshot(sorted(chains))
+        self.assertIsNone(block)
+
+
+def _block_num(block):
+    header = BlockHeader()
+    header.ParseFromString(block.header)
+    return header.block_num
+
+
+def _manifest(block):
+    return StateSnapshotManifest(
+        block=block.SerializeToString(),
+        chunk_hashes=[bytes(32)])
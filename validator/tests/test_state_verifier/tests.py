@@ -0,0 +1,209 @@
+# Copyright 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+from collections import namedtuple
+
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.journal.block_wrapper import NULL_BLOCK_IDENTIFIER
+from sawtooth_validator.protobuf.batch_pb2 import Batch
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.server.state_verifier import InvalidChainError
+from sawtooth_validator.server.state_verifier import process_blocks
+from sawtooth_validator.server.state_verifier import \
+    search_for_present_state_root
+from sawtooth_validator.state.merkle import INIT_ROOT_KEY
+
+BatchExecutionResult = namedtuple(
+    'BatchExecutionResult', ['is_valid', 'state_hash'])
+
+
+class MockStateView:
+    def get_multi(self, addresses):
+        return []
+
+
+class MockStateViewFactory:
+    def __init__(self, state_roots):
+        self.state_roots = set(state_roots)
+
+    def create_view(self, state_root_hash):
+        if state_root_hash not in self.state_roots:
+            raise KeyError(state_root_hash)
+        return MockStateView()
+
+
+class MockBlockStore:
+    def __init__(self, chain):
+        self.chain = chain
+
+    @property
+    def chain_head(self):
+        return self.chain[-1]
+
+    def get_block_iter(self, reverse=True):
+        return iter(reversed(self.chain) if reverse else self.chain)
+
+
+class MockScheduler:
+    def __init__(self, executor, previous_state_root):
+        self._executor = executor
+        self._previous_state_root = previous_state_root
+        self._batches = []
+
+    def add_batch(self, batch):
+        self._batches.append(batch)
+
+    def finalize(self):
+        pass
+
+    def complete(self, block):
+        pass
+
+    def get_batch_execution_result(self, batch_id):
+        if batch_id != self._batches[-1].header_signature:
+            return BatchExecutionResult(is_valid=True, state_hash=None)
+        state_root_hash = self._executor.results[batch_id]
+        self._executor.executed.append(
+            (self._previous_state_root, state_root_hash))
+        self._executor.state_view_factory.state_roots.add(state_root_hash)
+        return BatchExecutionResult(
+            is_valid=True, state_hash=state_root_hash)
+
+
+class MockTransactionExecutor:
+    def __init__(self, state_view_factory, results):
+        self.state_view_factory = state_view_factory
+        # The state root produced by the last batch of each block
+        self.results = results
+        self.executed = []
+
+    def create_scheduler(self, previous_state_root, always_persist=False):
+        return MockScheduler(self, previous_state_root)
+
+    def execute(self, scheduler):
+        pass
+
+
+class MockSignatureVerificationEngine:
+    def __init__(self, invalid_block_ids):
+        self.invalid_block_ids = invalid_block_ids
+
+    def verify_block(self, block):
+        return block.header_signature not in self.invalid_block_ids
+
+
+def create_chain(length):
+    chain = []
+    previous_block_id = NULL_BLOCK_IDENTIFIER
+    for block_num in range(length):
+        header = BlockHeader(
+            block_num=block_num,
+            previous_block_id=previous_block_id,
+            state_root_hash='root{}'.format(block_num))
+        block = Block(
+            header=header.SerializeToString(),
+            header_signature='block{}'.format(block_num),
+            batches=[Batch(header_signature='batch{}'.format(block_num))])
+        chain.append(BlockWrapper(block))
+        previous_block_id = block.header_signature
+    return chain
+
+
+class StateVerifierTest(unittest.TestCase):
+    def setUp(self):
+        self.chain = create_chain(10)
+        self.block_store = MockBlockStore(self.chain)
+
+    def test_search_resumes_after_last_present_root(self):
+        """Test that the search for missing state starts after the newest
+        block whose state root is present, even if the state roots of older
+        blocks were pruned, and starts from genesis if there is no state.
+        """
+        factory = MockStateViewFactory(['root5', 'root6'])
+        block, state_root = search_for_present_state_root(
+            self.block_store, factory)
+        self.assertEqual(7, block.block_num)
+        self.assertEqual('root6', state_root)
+
+        block, state_root = search_for_present_state_root(
+            self.block_store, MockStateViewFactory([]))
+        self.assertEqual(0, block.block_num)
+        self.assertEqual(INIT_ROOT_KEY, state_root)
+
+        block, state_root = search_for_present_state_root(
+            self.block_store, MockStateViewFactory(['root9']))
+        self.assertIsNone(block)
+
+    def test_process_blocks(self):
+        """Test that each missing state root is recomputed from the state
+        root of the block before it, in order of block number.
+        """
+        factory = MockStateViewFactory(['root3'])
+        executor = MockTransactionExecutor(
+            factory,
+            {block.batches[0].header_signature: block.state_root_hash
+             for block in self.chain})
+
+        process_blocks(
+            initial_state_root='root3',
+            blocks=iter(self.chain[4:]),
+            transaction_executor=executor,
+            context_manager=None,
+            state_view_factory=factory,
+            signature_verification_engine=MockSignatureVerificationEngine(
+                []),
+            total_blocks=6,
+            lookahead=2)
+
+        self.assertEqual(
+            [('root{}'.format(i - 1), 'root{}'.format(i))
+             for i in range(4, 10)],
+            executor.executed)
+
+    def test_process_blocks_invalid(self):
+        """Test that replay stops at a block with an invalid signature or
+        which does not produce the state root in its header.
+        """
+        factory = MockStateViewFactory([])
+        results = {block.batches[0].header_signature: block.state_root_hash
+                   for block in self.chain}
+        executor = MockTransactionExecutor(factory, results)
+
+        with self.assertRaises(InvalidChainError):
+            process_blocks(
+                initial_state_root=INIT_ROOT_KEY,
+                blocks=iter(self.chain),
+                transaction_executor=executor,
+                context_manager=None,
+                state_view_factory=factory,
+                signature_verification_engine=MockSignatureVerificationEngine(
+                    ['block3']),
+                lookahead=2)
+        self.assertEqual(3, len(executor.executed))
+
+        factory = MockStateViewFactory([])
+        results['batch2'] = 'wrong'
+        executor = MockTransactionExecutor(factory, results)
+        with self.assertRaises(InvalidChainError):
+            process_blocks(
+                initial_state_root=INIT_ROOT_KEY,
+                blocks=iter(self.chain),
+                transaction_executor=executor,
+                context_manager=None,
+                state_view_factory=factory,
+                lookahead=2)
+        self.assertEqual(3, len(executor.executed))